@@ -0,0 +1,271 @@
+"""
+Admission control for agent turns.
+
+An agent turn holds several Gemini calls for tens of seconds, and every turn
+used to start at once: one user firing off requests, or a burst of scheduled
+proactive insights, could take every slot while interactive users waited
+behind them. Turns now pass through an AdmissionController first:
+
+- At most ``max_in_flight`` turns run at once, of which at most
+  ``max_background_in_flight`` may be background turns (the backend's
+  proactive insights), so some capacity is always left for chat.
+- A user runs at most ``user_max_in_flight`` turns and queues at most
+  ``user_max_queued`` more. Their turns run one at a time anyway (see
+  sessions.py), so extra ones would only hold slots while they wait. These
+  slots are leased in the state store, so the limit holds across workers.
+- Turns that cannot start wait in a queue of at most ``max_queue``, served
+  interactive first, then in arrival order. A full queue drops its newest
+  background waiter to make room for an interactive turn.
+- Every waiter has a deadline. A turn whose estimated wait (from the recent
+  turn durations) already exceeds it is rejected on arrival rather than left
+  to time out, and one still queued at its deadline is rejected then.
+
+Rejections become 429 responses with a Retry-After estimate, so clients back
+off instead of piling on.
+
+The configured ``max_*`` limits are for the whole deployment: with
+AEGNT_WORKERS=N, each worker enforces 1/N of them, rounded up.
+"""
+
+import asyncio
+import itertools
+import math
+import time
+import uuid
+from collections import Counter
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+import config
+from state_store import MemoryStateStore, StateStore, state_store
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+PRIORITIES = (INTERACTIVE, BACKGROUND)
+
+# Weight of the latest turn in the running estimate of turn duration
+DURATION_SMOOTHING = 0.2
+
+# State store namespace of the users' leased turn slots
+USER_SLOTS = "admission_slots"
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"Agent is busy ({reason}), retry in {math.ceil(retry_after)}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+@dataclass
+class Ticket:
+    """An admitted turn; released exactly once."""
+    user_id: str
+    priority: str
+    started: float
+    # The user's slot leased in the state store
+    slot: str = ""
+    released: bool = False
+
+
+@dataclass(order=True)
+class _Waiter:
+    rank: int
+    seq: int
+    user_id: str = field(compare=False)
+    priority: str = field(compare=False)
+    slot: str = field(compare=False)
+    deadline: float = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_in_flight: int = config.ADMISSION_MAX_IN_FLIGHT,
+        max_background_in_flight: int = config.ADMISSION_MAX_BACKGROUND_IN_FLIGHT,
+        user_max_in_flight: int = config.ADMISSION_USER_MAX_IN_FLIGHT,
+        user_max_queued: int = config.ADMISSION_USER_MAX_QUEUED,
+        max_queue: int = config.ADMISSION_MAX_QUEUE,
+        max_wait_seconds: float = config.ADMISSION_MAX_WAIT_SECONDS,
+        background_max_wait_seconds: float = config.ADMISSION_BACKGROUND_MAX_WAIT_SECONDS,
+        turn_seconds: float = config.ADMISSION_TURN_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+        workers: int = config.AEGNT_WORKERS,
+        store: Optional[StateStore] = None,
+        turn_lock_seconds: float = config.SESSION_TURN_LOCK_SECONDS,
+    ):
+        # This worker's share of the deployment-wide limits
+        self.max_in_flight = math.ceil(max_in_flight / workers)
+        self.max_background_in_flight = math.ceil(max_background_in_flight / workers)
+        self.max_queue = math.ceil(max_queue / workers)
+        self.user_max_in_flight = user_max_in_flight
+        self.user_max_queued = user_max_queued
+        self.max_wait_seconds = {INTERACTIVE: max_wait_seconds, BACKGROUND: background_max_wait_seconds}
+        # Running estimate of how long a turn holds its slot
+        self.turn_seconds = turn_seconds
+        self.clock = clock
+        self.store = store or MemoryStateStore()
+        # A slot outlives its turn by at most this long if the worker dies
+        self.turn_lock_seconds = turn_lock_seconds
+        self.in_flight = 0
+        self.background_in_flight = 0
+        self._user_in_flight: Counter = Counter()
+        self._queue: List[_Waiter] = []
+        self._seq = itertools.count()
+        self.admitted = 0
+        self.rejected: Counter = Counter()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_in_flight > 0
+
+    @asynccontextmanager
+    async def admit(self, user_id: str, priority: str = INTERACTIVE):
+        """Holds a slot for the duration of the block; raises AdmissionRejected."""
+        ticket = await self.acquire(user_id, priority)
+        try:
+            yield ticket
+        finally:
+            await self.release(ticket)
+
+    async def acquire(self, user_id: str, priority: str = INTERACTIVE) -> Ticket:
+        """Waits for a slot. The caller must ``release`` the ticket."""
+        if priority not in PRIORITIES:
+            priority = INTERACTIVE
+        if not self.enabled:
+            return Ticket(user_id, priority, self.clock())
+        slot = uuid.uuid4().hex
+        lease_seconds = self.max_wait_seconds[priority] + self.turn_lock_seconds
+        if not await self.store.run(self.store.take_slot, USER_SLOTS, user_id, slot, self.user_max_in_flight + self.user_max_queued, lease_seconds):
+            self._reject("user_limit", self.turn_seconds)
+        try:
+            return await self._wait(user_id, priority, slot)
+        except BaseException:
+            await self.store.run(self.store.release_slot, USER_SLOTS, user_id, slot)
+            raise
+
+    async def _wait(self, user_id: str, priority: str, slot: str) -> Ticket:
+        now = self.clock()
+        waiter = _Waiter(
+            rank=PRIORITIES.index(priority),
+            seq=next(self._seq),
+            user_id=user_id,
+            priority=priority,
+            slot=slot,
+            deadline=now + self.max_wait_seconds[priority],
+            future=asyncio.get_running_loop().create_future(),
+        )
+        self._enqueue(waiter)
+        self._dispatch()
+        if waiter.future.done():
+            return waiter.future.result()
+
+        estimate = self.estimated_wait(waiter)
+        if now + estimate > waiter.deadline:
+            self._remove(waiter)
+            self._reject("deadline", estimate)
+        try:
+            return await asyncio.wait_for(asyncio.shield(waiter.future), timeout=waiter.deadline - now)
+        except asyncio.TimeoutError:
+            self._abandon(waiter)
+            self._reject("timeout", self.estimated_wait(waiter))
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+
+    async def release(self, ticket: Ticket):
+        if ticket.released:
+            return
+        self._finish(ticket)
+        if ticket.slot:
+            await self.store.run(self.store.release_slot, USER_SLOTS, ticket.user_id, ticket.slot)
+
+    def _finish(self, ticket: Ticket):
+        """Gives back this worker's slot; the user's slot in the store is the caller's to release."""
+        if ticket.released:
+            return
+        ticket.released = True
+        if not self.enabled:
+            return
+        self.in_flight -= 1
+        if ticket.priority == BACKGROUND:
+            self.background_in_flight -= 1
+        self._user_in_flight[ticket.user_id] -= 1
+        if not self._user_in_flight[ticket.user_id]:
+            del self._user_in_flight[ticket.user_id]
+        elapsed = self.clock() - ticket.started
+        self.turn_seconds += DURATION_SMOOTHING * (elapsed - self.turn_seconds)
+        self._dispatch()
+
+    def estimated_wait(self, waiter: _Waiter) -> float:
+        """Seconds until ``waiter`` is likely to start, from its place in the queue."""
+        ahead = sum(1 for other in self._queue if other < waiter)
+        return self.turn_seconds * (ahead // max(self.max_in_flight, 1) + 1)
+
+    def status(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "background_in_flight": self.background_in_flight,
+            "queued": len(self._queue),
+            "turn_seconds": round(self.turn_seconds, 3),
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+        }
+
+    # --- queue ------------------------------------------------------------
+
+    def _reject(self, reason: str, retry_after: float):
+        self.rejected[reason] += 1
+        raise AdmissionRejected(reason, retry_after)
+
+    def _enqueue(self, waiter: _Waiter):
+        if len(self._queue) >= self.max_queue:
+            shed = max((other for other in self._queue if other.priority == BACKGROUND), default=None)
+            if waiter.priority == BACKGROUND or shed is None:
+                self._reject("queue_full", self.turn_seconds)
+            self._remove(shed)
+            self.rejected["shed"] += 1
+            shed.future.set_exception(AdmissionRejected("shed", self.turn_seconds))
+        self._queue.append(waiter)
+        self._queue.sort()
+
+    def _remove(self, waiter: _Waiter):
+        self._queue.remove(waiter)
+
+    def _abandon(self, waiter: _Waiter):
+        """Takes back a waiter that gave up; a slot granted in the meantime is released."""
+        if waiter in self._queue:
+            self._remove(waiter)
+        elif waiter.future.done() and not waiter.future.exception():
+            self._finish(waiter.future.result())
+
+    def _can_start(self, waiter: _Waiter) -> bool:
+        if self.in_flight >= self.max_in_flight:
+            return False
+        if waiter.priority == BACKGROUND and self.background_in_flight >= self.max_background_in_flight:
+            return False
+        return self._user_in_flight[waiter.user_id] < self.user_max_in_flight
+
+    def _dispatch(self):
+        """Starts queued turns, in order, while there are slots for them."""
+        for waiter in list(self._queue):
+            if self.in_flight >= self.max_in_flight:
+                return
+            if not self._can_start(waiter):
+                continue
+            self._remove(waiter)
+            self.in_flight += 1
+            if waiter.priority == BACKGROUND:
+                self.background_in_flight += 1
+            self._user_in_flight[waiter.user_id] += 1
+            self.admitted += 1
+            waiter.future.set_result(Ticket(waiter.user_id, waiter.priority, self.clock(), waiter.slot))
+
+
+admission_controller = AdmissionController(store=state_store)
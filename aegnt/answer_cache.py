@@ -0,0 +1,107 @@
+"""
+Reuse of agent answers to repeated questions over unchanged data.
+
+Users and the dashboard ask the same things over and over ("spending trends by
+category", the proactive-insights prompt), and each one costs a full agent run
+with Gemini analysis. The backend sends the user's ``data_version`` with every
+turn, a counter it bumps on any write to the user's transactions or
+challenges, so an answer cached under (user, normalized prompt, data version)
+is still correct until that data changes. Entries also expire after a TTL (for
+answers drawing on other sources, like recipe suggestions), and the least
+recently used are evicted past ``max_entries``.
+
+Only standalone questions are cached. A follow-up such as "and the month
+before?" depends on the conversation so far, and turns that sent notifications
+or created calendar events or wallet passes must run again to have an effect.
+Turns that wrote to the user's data need no special handling: the write bumps
+the data version, so the entry they leave behind is never hit.
+
+Entries live in the state store (see state_store.py), so with several workers
+an answer cached by one is served by all of them.
+"""
+
+import re
+import time
+from typing import Callable, Optional, Tuple
+
+import config
+from state_store import MemoryStateStore, StateStore, state_store
+
+NAMESPACE = "answers"
+
+# Answers leaning on earlier turns ("what about food?", "and last month?",
+# "why is that?") are never cached or served from the cache
+FOLLOW_UP_PATTERN = re.compile(
+    r"^(?:and|but|also|so|then|what about|how about)\b"
+    r"|\b(?:it|that|those|them|they|same|again|above|previous|instead|else|more detail)\b"
+)
+
+# Agents whose tools have effects outside the user's data
+SIDE_EFFECT_CALLS = frozenset({"notification_agent", "wallet_agent", "process_receipt"})
+
+CacheKey = Tuple[str, str, int]
+
+
+def normalize_prompt(prompt: str) -> str:
+    return " ".join(prompt.lower().split()).rstrip("?.! ")
+
+
+def is_cacheable_prompt(prompt: str) -> bool:
+    return not FOLLOW_UP_PATTERN.search(normalize_prompt(prompt))
+
+
+def is_cacheable_answer(parts: list) -> bool:
+    """Whether a turn's response parts can be replayed: some text and no side effects."""
+    if not any(part["type"] == "text" for part in parts):
+        return False
+    return not any(part["type"] == "function_call" and part["name"] in SIDE_EFFECT_CALLS for part in parts)
+
+
+class AnswerCache:
+    """LRU map from (user, normalized prompt, data version) to a turn's response parts."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float, clock: Callable[[], float] = time.time, store: Optional[StateStore] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # Expiry follows the store's clock; ``clock`` is for the private store
+        # made when none is given
+        self.store = store or MemoryStateStore(clock)
+        # Hits and misses of this process
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(user_id: str, prompt: str, data_version: Optional[int]) -> Optional[CacheKey]:
+        """The cache key for a turn, or None when it must not use the cache."""
+        if data_version is None or not is_cacheable_prompt(prompt):
+            return None
+        return (user_id, normalize_prompt(prompt), data_version)
+
+    @staticmethod
+    def _store_key(key: CacheKey) -> str:
+        user_id, prompt, data_version = key
+        return f"{user_id}\x1f{data_version}\x1f{prompt}"
+
+    def get(self, key: CacheKey) -> Optional[list]:
+        parts = self.store.get(NAMESPACE, self._store_key(key), touch=True)
+        if parts is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return parts
+
+    def put(self, key: CacheKey, parts: list):
+        if self.max_entries <= 0 or not is_cacheable_answer(parts):
+            return
+        self.store.put(NAMESPACE, self._store_key(key), parts, ttl_seconds=self.ttl_seconds)
+        self.store.trim(NAMESPACE, self.max_entries)
+
+    def clear(self):
+        self.store.clear(NAMESPACE)
+        self.hits = self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.store.items(NAMESPACE))
+
+
+answer_cache = AnswerCache(config.ANSWER_CACHE_MAX_ENTRIES, config.ANSWER_CACHE_TTL_SECONDS, store=state_store)
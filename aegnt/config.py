@@ -22,4 +22,85 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 BACKEND_API_TOKEN = os.getenv("BACKEND_API_TOKEN")
 
 # The API key for the Spoonacular API, used for recipe suggestions.
-SPOONACULAR_API_KEY = os.getenv("SPOONACULAR_API_KEY")
\ No newline at end of file
+SPOONACULAR_API_KEY = os.getenv("SPOONACULAR_API_KEY")
+
+# Per-request profiling (see profiling.py). Requests sending X-Aegis-Profile with
+# this token are profiled, plus a random fraction of all requests. Off by default.
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "1"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))
+
+# LLM usage accounting (see llm_usage.py). Daily per-user budgets, 0 = unlimited;
+# LLM_USER_BUDGETS overrides them per user as JSON, e.g.
+# {"<uid>": {"tokens": 200000, "cost_usd": 0.25}}. Users over budget are served
+# by LLM_FALLBACK_MODEL for the rest of the day.
+LLM_DAILY_TOKEN_BUDGET = int(os.getenv("LLM_DAILY_TOKEN_BUDGET", "0"))
+LLM_DAILY_COST_BUDGET_USD = float(os.getenv("LLM_DAILY_COST_BUDGET_USD", "0"))
+LLM_USER_BUDGETS = os.getenv("LLM_USER_BUDGETS", "")
+LLM_FALLBACK_MODEL = os.getenv("LLM_FALLBACK_MODEL", "gemini-2.5-flash-lite")
+# Per-model prices as JSON, merged over the defaults in llm_usage.py
+LLM_PRICES = os.getenv("LLM_PRICES", "")
+# Token required in the X-Aegis-Admin header by admin endpoints (disabled when empty)
+ADMIN_API_TOKEN = os.getenv("ADMIN_API_TOKEN", "")
+
+# Agent sessions (see sessions.py): one persistent conversation per user in a
+# local SQLite file (":memory:" keeps them in process). Idle sessions are
+# deleted after the TTL; long ones are compacted to their last turns.
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions.db")
+SESSION_IDLE_TTL_SECONDS = float(os.getenv("SESSION_IDLE_TTL_SECONDS", "1800"))
+SESSION_MAX_TURNS = int(os.getenv("SESSION_MAX_TURNS", "20"))
+SESSION_KEEP_TURNS = int(os.getenv("SESSION_KEEP_TURNS", "8"))
+SESSION_EVICTION_INTERVAL_SECONDS = float(os.getenv("SESSION_EVICTION_INTERVAL_SECONDS", "300"))
+
+# Answer common spending questions (totals, top store, category breakdown) from
+# the backend's transaction summary without calling the model (see fast_path.py)
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "true").lower() == "true"
+
+# Answers to repeated questions over unchanged data (see answer_cache.py), keyed
+# on the data version the backend sends. 0 entries disables the cache.
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "600"))
+
+# Shared HTTP client for the tools' calls to the backend and third-party APIs
+# (see http_client.py). Calls that need longer, like receipt processing, pass
+# their own timeout.
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "10"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+
+# How the tools read the user's transactions: "http" calls the backend's REST
+# API at BACKEND_API_BASE_URL; "direct" imports the backend's data layer from
+# BACKEND_SOURCE_DIR and queries its storage in process (see data_access.py),
+# for deployments running both apps on one node. The backend's own settings
+# (STORAGE_BACKEND, SQLITE_DB_PATH, GOOGLE_APPLICATION_CREDENTIALS, ...) then
+# apply to aegnt as well.
+DATA_ACCESS_MODE = os.getenv("DATA_ACCESS_MODE", "http")
+BACKEND_SOURCE_DIR = os.getenv("BACKEND_SOURCE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+# Worker processes serving the app (see main_agent.py) and the store holding the
+# state they share: sessions' turn locks, cached answers and LLM usage totals
+# (see state_store.py). "memory" is per process, so more than one worker needs
+# "sqlite", a file every worker on the host opens.
+AEGNT_WORKERS = int(os.getenv("AEGNT_WORKERS", "1"))
+STATE_STORE = os.getenv("STATE_STORE", "memory")
+STATE_DB_PATH = os.getenv("STATE_DB_PATH", "aegnt_state.db")
+# A turn holds its user's lock at most this long, so a worker dying mid-turn
+# does not lock the user out for good
+SESSION_TURN_LOCK_SECONDS = float(os.getenv("SESSION_TURN_LOCK_SECONDS", "600"))
+
+# Admission control for agent turns (see admission.py). The MAX_ limits are for
+# the whole deployment: each of the AEGNT_WORKERS workers enforces its share,
+# rounded up. The USER_ limits are shared through the state store.
+# Background turns are the backend's proactive insights; 0 in-flight disables it.
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "32"))
+ADMISSION_MAX_BACKGROUND_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_BACKGROUND_IN_FLIGHT", "16"))
+ADMISSION_USER_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_USER_MAX_IN_FLIGHT", "1"))
+ADMISSION_USER_MAX_QUEUED = int(os.getenv("ADMISSION_USER_MAX_QUEUED", "2"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+# How long a turn may wait for a slot before it is rejected with a 429
+ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "15"))
+ADMISSION_BACKGROUND_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_BACKGROUND_MAX_WAIT_SECONDS", "60"))
+# Starting estimate of a turn's duration, refined as turns finish
+ADMISSION_TURN_SECONDS = float(os.getenv("ADMISSION_TURN_SECONDS", "10"))
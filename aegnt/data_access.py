@@ -0,0 +1,127 @@
+"""
+In-process access to the backend's data for co-located deployments.
+
+In the default "http" mode every transaction read by a tool is a request to the
+backend: a loopback round trip, a second ID token check, and the whole result
+set encoded to JSON by the backend and decoded again here. When both apps run
+on one node, DATA_ACCESS_MODE=direct skips all of that: the backend's data
+layer is imported from BACKEND_SOURCE_DIR and called from the tools. Tokens
+go through the backend's own cached verifier (core.auth.user_for_token), so
+they resolve to the same user as over HTTP, and the results are the same
+JSON-shaped dicts the API returns.
+
+Storage is the one the backend's settings select. Firestore and SQLite are
+shared with the backend process; the in-memory backend is not, so it only
+makes sense when the backend's services are attached in process (``attach``,
+as the benchmarks do).
+
+Only reads go through here. Receipts, wallet passes, challenges and
+notifications still call the API, which owns those side effects.
+"""
+
+import asyncio
+import sys
+from typing import Callable, List, Optional
+
+import config
+
+
+class DataAccessError(Exception):
+    """A direct read failed; callers treat it like a failed backend request."""
+
+
+_firestore_service = None
+_resolve_user: Optional[Callable] = None
+
+
+def enabled() -> bool:
+    return config.DATA_ACCESS_MODE == "direct"
+
+
+def _import_backend():
+    # Appended, not prepended, so aegnt's own top-level modules (config,
+    # tracing, ...) keep precedence; the backend's live in packages.
+    path = config.BACKEND_SOURCE_DIR
+    if path not in sys.path:
+        sys.path.append(path)
+
+
+def attach(firestore_service, resolve_user: Optional[Callable] = None):
+    """
+    Uses an existing FirestoreService (and optionally a token -> User function)
+    instead of building them, when the backend's services live in this process.
+    """
+    global _firestore_service, _resolve_user
+    _firestore_service = firestore_service
+    _resolve_user = resolve_user
+
+
+def get_firestore_service():
+    global _firestore_service
+    if _firestore_service is None:
+        _import_backend()
+        from services.firestore_service import FirestoreService
+        _firestore_service = FirestoreService()
+    return _firestore_service
+
+
+def _user_for_token(id_token: str):
+    if _resolve_user is not None:
+        return _resolve_user(id_token)
+    _import_backend()
+    from core.auth import user_for_token
+    return user_for_token(id_token)
+
+
+async def get_user_id(id_token: str) -> str:
+    # Verification blocks on a token cache miss, so it runs off the event loop
+    user = await asyncio.to_thread(_user_for_token, id_token)
+    return user.uid
+
+
+async def get_transactions(
+    id_token: str,
+    start_date: str,
+    end_date: str,
+    category: Optional[str] = None,
+    store_name: Optional[str] = None,
+    item_name: Optional[str] = None,
+) -> List[dict]:
+    """What GET /transactions returns for the same parameters."""
+    try:
+        user_id = await get_user_id(id_token)
+        transactions = await get_firestore_service().get_transactions(
+            user_id, start_date, end_date, category=category, store_name=store_name, item_name=item_name
+        )
+    except Exception as e:
+        raise DataAccessError(str(e)) from e
+    return [transaction.model_dump(mode="json") for transaction in transactions]
+
+
+async def get_transaction_summary(
+    id_token: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    categories: Optional[List[str]] = None,
+    store_name: Optional[str] = None,
+    top: int = 5,
+) -> dict:
+    """What GET /transactions/summary returns for the same parameters."""
+    try:
+        user_id = await get_user_id(id_token)
+        summary = await get_firestore_service().get_transaction_summary(
+            user_id, start_date, end_date, categories, store_name, top
+        )
+    except Exception as e:
+        raise DataAccessError(str(e)) from e
+    return summary.model_dump(mode="json")
+
+
+async def get_spending_stats(id_token: str) -> dict:
+    """What GET /transactions/stats returns."""
+    try:
+        user_id = await get_user_id(id_token)
+        stats = await get_firestore_service().get_spending_stats(user_id)
+    except Exception as e:
+        raise DataAccessError(str(e)) from e
+    return stats.model_dump(mode="json")
@@ -0,0 +1,261 @@
+"""
+Date ranges from the periods people name in questions.
+
+analyze_financial_data used to recognise only "last month", "this month",
+"since YYYY" and a fixed list of years, and sent any question mentioning a
+"total", "store" or "category" over the whole history, so "how much did I
+spend at FreshMart in the last 3 weeks" fetched (and prompted with) every
+transaction since 2015. The fast path had its own, separate period grammar.
+Both now resolve periods here, with one compiled pattern:
+
+- today, yesterday; this/last/past/previous week, month, quarter, year
+- the last N days, weeks, months, quarters or years (N in digits or words)
+- year, quarter and month to date (YTD, QTD, MTD)
+- named months with or without a year, quarters (Q3, Q3 2024, third quarter
+  of 2024), years, and ISO dates
+- ranges between two of these ("from March to May 2024", "between 2022 and
+  2023") and open ranges up to today ("since last April")
+
+Each period resolves to the narrowest range that covers it; a month or
+quarter without a year is its most recent occurrence. Weeks start on Monday.
+"""
+
+import re
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import List, Optional
+
+MONTHS = ["january", "february", "march", "april", "may", "june", "july", "august", "september", "october", "november", "december"]
+_MONTH_ABBREVIATIONS = {"jan": 1, "feb": 2, "mar": 3, "apr": 4, "jun": 6, "jul": 7, "aug": 8, "sep": 9, "sept": 9, "oct": 10, "nov": 11, "dec": 12}
+_MONTH_NUMBERS = {**{name: number for number, name in enumerate(MONTHS, 1)}, **_MONTH_ABBREVIATIONS}
+
+_NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12,
+}
+_ORDINALS = {"first": 1, "1st": 1, "second": 2, "2nd": 2, "third": 3, "3rd": 3, "fourth": 4, "4th": 4}
+
+# Words before a number that make it an amount: "more than 2000", "over 1999"
+_AMOUNT_WORDS = ["rs", "than", "over", "under", "above", "below", "more", "less", "least", "most", "about", "around", "spent", "spend"]
+
+# Not an amount: "2000 rupees", "rs 2000" (currency symbols are normalized to "rs"), "over 2000"
+_YEAR = "".join(rf"(?<!\b{word} )" for word in _AMOUNT_WORDS) + r"(?:19|20)\d{2}(?! ?(?:rs|rupees|inr|usd|dollars|eur|euros|bucks)\b)"
+_MONTH = "|".join(sorted(_MONTH_NUMBERS, key=len, reverse=True))
+_NUMBER = r"\d{1,3}|" + "|".join(_NUMBER_WORDS)
+_ORDINAL = "|".join(_ORDINALS)
+
+
+def _point(named: bool) -> str:
+    """
+    One period. With ``named`` its parts are named groups for resolving it;
+    without, it is a plain sub-pattern for building ranges out of points.
+    """
+    def group(name: str, pattern: str) -> str:
+        return f"(?P<{name}>{pattern})" if named else f"(?:{pattern})"
+
+    return "(?:" + "|".join([
+        group("iso", r"\d{4}-\d{2}-\d{2}"),
+        r"(?:the )?(?:last|past|previous) " + group("count", _NUMBER) + " " + group("unit", r"(?:day|week|month|quarter|year)s?"),
+        group("to_date", r"(?:year|quarter|month)[ -]to[ -]date|ytd|qtd|mtd"),
+        group("relative", r"today|yesterday|(?:this|current|last|past|previous) (?:week|month|quarter|year)"),
+        r"q" + group("quarter", "[1-4]") + "(?: " + group("quarter_year", _YEAR) + ")?",
+        group("year_first", _YEAR) + " q" + group("year_quarter", "[1-4]"),
+        r"(?:the )?" + group("ordinal", _ORDINAL) + r" quarter(?: of)?(?: " + group("ordinal_year", _YEAR) + ")?",
+        "(?:" + group("month_last", "last ") + "|this )?" + group("month", _MONTH) + "(?: (?:of )?" + group("month_year", _YEAR) + ")?",
+        group("year", _YEAR),
+    ]) + ")"
+
+
+POINT_PATTERN = re.compile(_point(named=True))
+
+PERIOD_PATTERN = re.compile(
+    r"\b(?:in |during |over |for )?(?:the )?(?:"
+    rf"(?:from |between )(?P<first>{_point(False)})(?: to| and| until| till| through| -) (?P<last>{_point(False)})"
+    rf"|(?:since|from) (?P<since>{_point(False)})"
+    rf"|(?P<point>{_point(False)})"
+    r")\b"
+)
+
+
+@dataclass(frozen=True)
+class DateRange:
+    start: date
+    end: date
+    # How an answer refers to the period, e.g. "last month" or "in March 2024"
+    label: str
+
+
+def _month_end(year: int, month: int) -> date:
+    return date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+
+
+def _months_before(day: date, months: int) -> date:
+    """``day`` moved back ``months`` calendar months, clamped to the month's end."""
+    index = day.year * 12 + day.month - 1 - months
+    year, month = divmod(index, 12)
+    return min(day.replace(year=year, month=month + 1, day=1) + timedelta(days=day.day - 1), _month_end(year, month + 1))
+
+
+def _quarter(year: int, quarter: int) -> DateRange:
+    return DateRange(date(year, 3 * quarter - 2, 1), _month_end(year, 3 * quarter), f"in Q{quarter} {year}")
+
+
+def _latest_year(month: int, today: date) -> int:
+    """The year of the most recent occurrence of ``month``."""
+    return today.year if month <= today.month else today.year - 1
+
+
+def _relative(phrase: str, today: date) -> DateRange:
+    if phrase == "today":
+        return DateRange(today, today, "today")
+    if phrase == "yesterday":
+        day = today - timedelta(days=1)
+        return DateRange(day, day, "yesterday")
+    which, unit = phrase.split()
+    label = f"{'this' if which in ('this', 'current') else 'last'} {unit}"
+    if unit == "week":
+        start = today - timedelta(days=today.weekday())
+        if which in ("this", "current"):
+            return DateRange(start, today, label)
+        return DateRange(start - timedelta(days=7), start - timedelta(days=1), label)
+    if unit == "month":
+        if which in ("this", "current"):
+            return DateRange(today.replace(day=1), today, label)
+        end = today.replace(day=1) - timedelta(days=1)
+        return DateRange(end.replace(day=1), end, label)
+    if unit == "quarter":
+        quarter = (today.month - 1) // 3 + 1
+        if which in ("this", "current"):
+            return DateRange(_quarter(today.year, quarter).start, today, label)
+        year, quarter = (today.year, quarter - 1) if quarter > 1 else (today.year - 1, 4)
+        return DateRange(_quarter(year, quarter).start, _quarter(year, quarter).end, label)
+    if which in ("this", "current"):
+        return DateRange(today.replace(month=1, day=1), today, label)
+    return DateRange(date(today.year - 1, 1, 1), date(today.year - 1, 12, 31), label)
+
+
+def _resolve_point(text: str, today: date) -> Optional[DateRange]:
+    """The range of one period, or None if it names no real dates ("2024-02-30", "the last 0 days")."""
+    try:
+        return _resolve_valid_point(text, today)
+    except ValueError:
+        return None
+
+
+def _resolve_valid_point(text: str, today: date) -> Optional[DateRange]:
+    match = POINT_PATTERN.fullmatch(text)
+    if match.group("iso"):
+        day = date.fromisoformat(match.group("iso"))
+        return DateRange(day, day, f"on {day.isoformat()}")
+    if match.group("count"):
+        count = match.group("count")
+        count = int(count) if count.isdigit() else _NUMBER_WORDS[count]
+        if count < 1:
+            return None
+        unit = match.group("unit").rstrip("s")
+        if unit in ("day", "week"):
+            start = today - timedelta(days=count * (7 if unit == "week" else 1) - 1)
+        else:
+            start = _months_before(today, count * {"month": 1, "quarter": 3, "year": 12}[unit]) + timedelta(days=1)
+        return DateRange(start, today, f"in the last {count} {unit}{'s' if count != 1 else ''}")
+    if match.group("to_date"):
+        unit = {"y": "year", "q": "quarter", "m": "month"}[match.group("to_date")[0]]
+        return DateRange(_relative(f"this {unit}", today).start, today, f"so far this {unit}")
+    if match.group("relative"):
+        return _relative(match.group("relative"), today)
+    quarter = match.group("quarter") or match.group("year_quarter") or match.group("ordinal")
+    if quarter:
+        quarter = _ORDINALS.get(quarter) or int(quarter)
+        year = match.group("quarter_year") or match.group("year_first") or match.group("ordinal_year")
+        if year is None:
+            # A bare quarter means its most recent occurrence
+            year = today.year if quarter <= (today.month - 1) // 3 + 1 else today.year - 1
+        return _quarter(int(year), quarter)
+    if match.group("month"):
+        month = _MONTH_NUMBERS[match.group("month")]
+        year = match.group("month_year")
+        if year is None:
+            # "last March" in March is a year ago
+            year = _latest_year(month, today) - (month == today.month and match.group("month_last") is not None)
+        year = int(year)
+        return DateRange(date(year, month, 1), _month_end(year, month), f"in {MONTHS[month - 1].title()} {year}")
+    year = int(match.group("year"))
+    return DateRange(date(year, 1, 1), date(year, 12, 31), f"in {year}")
+
+
+def resolve(match: re.Match, today: date) -> Optional[DateRange]:
+    """The range of a PERIOD_PATTERN match, or None if it names no real dates."""
+    if match.group("point"):
+        return _resolve_point(match.group("point"), today)
+    if match.group("since"):
+        since = _resolve_point(match.group("since"), today)
+        if since is None or since.start > today:
+            return None
+        return DateRange(since.start, today, f"since {since.start.isoformat()}")
+    last = _resolve_point(match.group("last"), today)
+    if last is None:
+        return None
+    # "from March to May 2023": a start without a year is the latest one before the end
+    first = _resolve_point(match.group("first"), last.end)
+    if first is None:
+        return None
+    start, end = min(first.start, last.start), max(first.end, last.end)
+    return DateRange(start, end, f"from {start.isoformat()} to {end.isoformat()}")
+
+
+_MAY = re.compile(r"\bmay\b", re.IGNORECASE)
+_PRONOUNS = frozenset("i we you he she it they who".split())
+# "may I see", "may be", "may not"
+_MODAL_OBJECTS = frozenset("i we you it be have not".split())
+# Words that make a lowercase "may" next to them the month
+_MONTH_BEFORE = frozenset("in of during last this since from to and between until till through".split())
+_MONTH_AFTER = re.compile(rf"(?:\d{{1,2}}(?:st|nd|rd|th)?|{_YEAR}|of|to|and|through|until|till)\b")
+
+
+def _is_month_may(text: str, match: re.Match) -> bool:
+    before = re.findall(r"[\w']+", text[:match.start()])[-1:]
+    after = re.findall(r"[\w']+", text[match.end():])[:1]
+    if before and before[0].lower() in _PRONOUNS or after and after[0].lower() in _MODAL_OBJECTS:
+        return False
+    if match.group() == "May" or before and before[0].lower() in _MONTH_BEFORE:
+        return True
+    return bool(after) and _MONTH_AFTER.fullmatch(after[0].lower()) is not None
+
+
+def disambiguate_may(text: str) -> str:
+    """
+    ``text`` with the verb "may" replaced by "might", so only the month is read
+    as a period. Needs the original casing: "May" is the month unless a pronoun
+    comes before it or it opens a question ("May I see"), while a lowercase "may"
+    is the month only next to a day, a year or words like "in" and "of".
+    """
+    return _MAY.sub(lambda match: match.group() if _is_month_may(text, match) else "might", text)
+
+
+def normalize(text: str) -> str:
+    text = disambiguate_may(text).lower().replace("’", "'")
+    text = re.sub(r"[₹$€£]", " rs ", text)
+    text = re.sub(r"[^\w'\- ]+", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def find_periods(text: str) -> List[re.Match]:
+    """PERIOD_PATTERN matches in normalized ``text`` (see ``normalize``)."""
+    return list(PERIOD_PATTERN.finditer(text))
+
+
+def parse_date_range(text: str, today: Optional[date] = None) -> Optional[DateRange]:
+    """
+    The range covering every period named in ``text``, or None if it names
+    none. Several periods ("May and June", "this month versus last month")
+    give the one range spanning them all; ones naming no real dates are left out.
+    """
+    today = today or date.today()
+    ranges = [resolve(match, today) for match in find_periods(normalize(text))]
+    ranges = [date_range for date_range in ranges if date_range is not None]
+    if not ranges:
+        return None
+    if len(ranges) == 1:
+        return ranges[0]
+    start, end = min(r.start for r in ranges), max(r.end for r in ranges)
+    return DateRange(start, end, f"from {start.isoformat()} to {end.isoformat()}")
@@ -0,0 +1,200 @@
+"""
+Deterministic answers for the most frequent chat questions.
+
+Questions like "how much did I spend this month", "where did I spend the most
+last year" or "break down my grocery spending by category" do not need the
+root agent: routing them costs a model call, and analyze_financial_data then
+downloads every matching transaction and asks the model again. Here they are
+recognised with compiled patterns and answered from the backend's
+``/transactions/summary`` aggregate, using a template and no model calls.
+
+A prompt takes the fast path only when every word is accounted for: one intent
+phrase, at most one period (see date_ranges.py), at most one category, and
+filler words. Anything else (a store name, "compare", "and", a follow-up like
+"what about food?") falls through to the root agent.
+"""
+
+import logging
+import re
+from dataclasses import dataclass
+from datetime import date
+from typing import List, Optional
+
+import httpx
+
+import config
+import data_access
+import date_ranges
+import http_client
+
+logger = logging.getLogger(__name__)
+
+# Checked in order; the first match wins
+INTENT_PATTERNS = [
+    ("top_store", re.compile(
+        r"\b(?:which|what|where)\b(?: \w+){0,3}? (?:store|shop|merchant|place)s? (?:did|have|do) i (?:spend|spent|shop|shopped)(?: \w+)? (?:the )?most\b"
+        r"|\bwhere (?:did|have|do) i (?:spend|spent|shop|shopped)(?: the)? most\b"
+        r"|\b(?:my )?(?:top|biggest) (?:stores|merchants|shops)\b"
+    )),
+    ("category_breakdown", re.compile(
+        r"\b(?:spending |spend )?(?:breakdown|break down)(?: of)?(?: my)?(?: spending)?(?: by category| per category)?\b"
+        r"|\b(?:my )?(?:spending )?(?:by|per) category\b"
+        r"|\bwhat (?:did|have) i (?:spend|spent) (?:my money )?on\b"
+    )),
+    ("total", re.compile(
+        r"\bhow much (?:money )?(?:did|have|do) i (?:spend|spent)\b"
+        r"|\bwhat(?: is| was|'s) my (?:total )?(?:spend|spending)\b"
+        r"|\b(?:my )?(?:total|overall) (?:spend|spending|spent)\b"
+    )),
+]
+# "by category" where it does not follow the breakdown phrase, as in "break down
+# my grocery spending by category"
+BY_CATEGORY_PATTERN = re.compile(r"\b(?:by|per) category\b")
+
+# Spoken category -> the merchant categories receipts are filed under
+CATEGORY_WORDS = {
+    "Restaurant": (("restaurant", "restaurants", "food", "dining", "eating out"), ["Restaurant", "Food & Dining"]),
+    "Grocery": (("grocery", "groceries", "supermarket", "supermarkets"), ["Supermarket", "Grocery Store"]),
+    "Electronics": (("electronics", "gadgets"), ["Electronics Store"]),
+}
+CATEGORY_PATTERN = re.compile(r"\b(?:on |for |at )?(?P<word>" + "|".join(
+    re.escape(word) for words, _ in CATEGORY_WORDS.values() for word in words
+) + r")\b")
+
+FILLER_WORDS = frozenset("""
+    a an the i me my so far in on for at of to up please can could you tell show
+    give what is was did do have much how money total overall spending spend spent
+""".split())
+
+
+@dataclass
+class Intent:
+    name: str
+    start_date: Optional[str]
+    end_date: Optional[str]
+    period: str
+    category: Optional[str] = None
+    categories: Optional[List[str]] = None
+
+
+def _normalize(prompt: str) -> str:
+    text = date_ranges.disambiguate_may(prompt).lower().replace("’", "'")
+    text = re.sub(r"[^\w'& ]+", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def classify(prompt: str, today: Optional[date] = None) -> Optional[Intent]:
+    """The fast-path intent of a prompt, or None when it should go to the agent."""
+    text = _normalize(prompt)
+    for name, pattern in INTENT_PATTERNS:
+        intent_match = pattern.search(text)
+        if intent_match:
+            break
+    else:
+        return None
+
+    rest = text[:intent_match.start()] + " " + text[intent_match.end():]
+    if name == "category_breakdown":
+        rest = BY_CATEGORY_PATTERN.sub(" ", rest)
+    periods = date_ranges.find_periods(rest)
+    if len(periods) > 1:
+        return None
+    if periods:
+        rest = rest[:periods[0].start()] + " " + rest[periods[0].end():]
+    categories = list(CATEGORY_PATTERN.finditer(rest))
+    if len(categories) > 1:
+        return None
+    if categories:
+        rest = rest[:categories[0].start()] + " " + rest[categories[0].end():]
+    if any(word not in FILLER_WORDS for word in rest.split()):
+        return None
+
+    if periods:
+        period = date_ranges.resolve(periods[0], today or date.today())
+        if period is None:
+            return None
+        intent = Intent(name, period.start.isoformat(), period.end.isoformat(), period.label)
+    else:
+        intent = Intent(name, None, None, "in total")
+    if categories:
+        word = categories[0].group("word")
+        intent.category, intent.categories = next(
+            (category, stored) for category, (words, stored) in CATEGORY_WORDS.items() if word in words
+        )
+    return intent
+
+
+def _money(amount: float, currency: str) -> str:
+    return f"{currency} {amount:,.2f}"
+
+
+def _totals(totals: dict) -> str:
+    return " and ".join(_money(amount, currency) for currency, amount in sorted(totals.items(), key=lambda item: -item[1]))
+
+
+def render_answer(intent: Intent, summary: dict) -> str:
+    scope = f" on {intent.category.lower()}" if intent.category else ""
+    count = summary["transaction_count"]
+    if not count:
+        return f"I couldn't find any transactions{scope} {intent.period}."
+    plural = "s" if count != 1 else ""
+
+    if intent.name == "total":
+        answer = f"You spent {_totals(summary['totals'])}{scope} {intent.period}, across {count} transaction{plural}."
+        largest = summary.get("largest_transaction")
+        if largest and count > 1:
+            answer += f" The largest was {_money(largest['total_amount'], largest['currency'])} at {largest['store_name']}."
+        return answer
+
+    if intent.name == "top_store":
+        top = summary["by_store"][0]
+        answer = (
+            f"You spent the most{scope} at {top['store_name']} {intent.period}: "
+            f"{_money(top['total'], top['currency'])} over {top['count']} visit{'s' if top['count'] != 1 else ''}."
+        )
+        others = summary["by_store"][1:3]
+        if others:
+            answer += " Next were " + " and ".join(f"{store['store_name']} ({_money(store['total'], store['currency'])})" for store in others) + "."
+        return answer
+
+    lines = [f"Here is your spending{scope} by category {intent.period} ({count} transaction{plural}):"]
+    for group in summary["by_category"]:
+        lines.append(f"- {group['category']}: {_money(group['total'], group['currency'])} ({group['count']})")
+    return "\n".join(lines)
+
+
+async def fetch_summary(intent: Intent, id_token: str) -> dict:
+    if data_access.enabled():
+        return await data_access.get_transaction_summary(
+            id_token, intent.start_date, intent.end_date, intent.categories, top=3
+        )
+    params = {"top": 3}
+    if intent.start_date:
+        params["start_date"] = intent.start_date
+    if intent.end_date:
+        params["end_date"] = intent.end_date
+    if intent.categories:
+        params["category"] = intent.categories
+    response = await http_client.get_client().get(
+        f"{config.BACKEND_API_BASE_URL}/transactions/summary",
+        params=params,
+        headers={"Authorization": f"Bearer {id_token}"},
+        timeout=10.0,
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+async def try_answer(prompt: str, id_token: str) -> Optional[str]:
+    """A templated answer for a recognised prompt, or None to run the agent instead."""
+    if not config.FAST_PATH_ENABLED:
+        return None
+    intent = classify(prompt)
+    if intent is None:
+        return None
+    try:
+        summary = await fetch_summary(intent, id_token)
+    except (httpx.HTTPError, ValueError, data_access.DataAccessError) as e:
+        logger.warning(f"Fast path for '{intent.name}' failed, falling back to the agent: {e}")
+        return None
+    return render_answer(intent, summary)
@@ -0,0 +1,53 @@
+"""
+The HTTP client shared by aegnt's tools.
+
+Tools used to open an ``httpx.Client`` per call, paying for a new TCP (and TLS)
+connection every time and blocking the event loop the ADK runner shares
+between all users while they waited. They now await one ``httpx.AsyncClient``
+that keeps connections alive between calls and speaks HTTP/2 where the server
+offers it (TLS endpoints like Spoonacular; plain-HTTP backends stay on 1.1).
+Requests carry the current trace context (see tracing.py), and every call
+passes its own timeout.
+"""
+
+import asyncio
+from typing import Optional
+
+import httpx
+
+import config
+from tracing import async_backend_client
+
+_client: Optional[httpx.AsyncClient] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _new_client() -> httpx.AsyncClient:
+    return async_backend_client(
+        http2=True,
+        timeout=config.HTTP_TIMEOUT_SECONDS,
+        limits=httpx.Limits(
+            max_connections=config.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=config.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        ),
+    )
+
+
+def get_client() -> httpx.AsyncClient:
+    """The shared client. Must be called on the event loop that will use it."""
+    global _client, _loop
+    loop = asyncio.get_running_loop()
+    # Pooled connections belong to the loop that opened them, so a new loop
+    # (tests, or asyncio.run in scripts) gets a client of its own
+    if _client is None or _client.is_closed or _loop is not loop:
+        _client = _new_client()
+        _loop = loop
+    return _client
+
+
+async def aclose():
+    """Closes the shared client. Called from the app's lifespan shutdown."""
+    global _client, _loop
+    if _client is not None:
+        await _client.aclose()
+    _client = _loop = None
@@ -0,0 +1,237 @@
+"""
+Token and cost accounting for every Gemini call the agent makes.
+
+Two kinds of calls are recorded in one ledger:
+- ADK's agent turns, through ``before_model_callback``/``after_model_callback``
+  installed on every agent.
+- The tools' direct google.generativeai calls, through
+  ``tool_definitions._generate``.
+
+Each call records the user, the tool (or agent) and the prompt template,
+along with the model, the prompt/output/cached token counts from
+``usage_metadata``, latency and estimated cost. Totals are kept per UTC day in
+the state store (see state_store.py), so budgets and the admin report cover
+the calls of every worker.
+
+Per-user daily budgets (``LLM_DAILY_TOKEN_BUDGET``,
+``LLM_DAILY_COST_BUDGET_USD``, with per-user overrides in ``LLM_USER_BUDGETS``)
+do not reject requests. A user over budget is switched to
+``LLM_FALLBACK_MODEL`` for the rest of the day.
+"""
+
+import hmac
+import json
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, Mapping, Optional, Tuple
+
+import config
+from state_store import MemoryStateStore, StateStore, state_store
+
+# USD per million tokens. Thinking tokens are billed as output.
+DEFAULT_PRICES = {
+    "gemini-2.5-pro": {"input": 1.25, "output": 10.00, "cached": 0.31},
+    "gemini-2.5-flash": {"input": 0.30, "output": 2.50, "cached": 0.075},
+    "gemini-2.5-flash-lite": {"input": 0.10, "output": 0.40, "cached": 0.025},
+}
+PRICES = {**DEFAULT_PRICES, **json.loads(config.LLM_PRICES or "{}")}
+
+# Days of per-user totals kept
+RETENTION_DAYS = 7
+
+NAMESPACE = "llm_usage"
+# Joins (day, user, tool, template, model) into one store key
+_SEPARATOR = "\x1f"
+
+ADMIN_HEADER = "X-Aegis-Admin"
+
+# The user whose agent turn is running. Set by before_model_callback so tools
+# that are not given a user_id (summaries, recipes) are still attributed.
+current_user: ContextVar[Optional[str]] = ContextVar("llm_usage_current_user", default=None)
+
+_FIELDS = ("calls", "errors", "prompt_tokens", "output_tokens", "cached_tokens", "total_tokens", "cost_usd", "seconds")
+
+
+def _today() -> str:
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+def _usage_counts(usage) -> Tuple[int, int, int]:
+    """(prompt, output, cached) tokens from a google.genai or google.generativeai usage_metadata."""
+    if usage is None:
+        return 0, 0, 0
+    prompt = getattr(usage, "prompt_token_count", 0) or 0
+    output = (getattr(usage, "candidates_token_count", 0) or 0) + (getattr(usage, "thoughts_token_count", 0) or 0)
+    cached = getattr(usage, "cached_content_token_count", 0) or 0
+    return prompt, output, cached
+
+
+def estimate_cost(model: str, prompt_tokens: int, output_tokens: int, cached_tokens: int) -> float:
+    prices = PRICES.get(model)
+    if prices is None:
+        return 0.0
+    uncached = max(0, prompt_tokens - cached_tokens)
+    return (uncached * prices["input"] + cached_tokens * prices["cached"] + output_tokens * prices["output"]) / 1_000_000
+
+
+class UsageLedger:
+    """Daily totals keyed by (day, user, tool, template, model)."""
+
+    def __init__(self, store: Optional[StateStore] = None):
+        self.store = store or MemoryStateStore()
+        # (invocation id, agent) -> (start time, model requested), for ADK model
+        # calls; both callbacks of a call run in the same process
+        self._started: Dict[Tuple[str, str], Tuple[float, str]] = {}
+        self._pruned_day: Optional[str] = None
+
+    def record(self, user_id: Optional[str], tool: str, template: str, model: str, usage=None, seconds: float = 0.0, failed: bool = False):
+        prompt, output, cached = _usage_counts(usage)
+        day = _today()
+        if day != self._pruned_day:
+            self._prune(day)
+        key = _SEPARATOR.join((day, user_id or "unknown", tool, template, model))
+        self.store.add(NAMESPACE, key, {
+            "calls": 1,
+            "errors": int(failed),
+            "prompt_tokens": prompt,
+            "output_tokens": output,
+            "cached_tokens": cached,
+            "total_tokens": prompt + output,
+            "cost_usd": estimate_cost(model, prompt, output, cached),
+            "seconds": seconds,
+        }, maxima={"max_seconds": seconds})
+
+    def _prune(self, today: str):
+        self._pruned_day = today
+        days = sorted({key.split(_SEPARATOR, 1)[0] for key, _ in self.store.items(NAMESPACE)} | {today})
+        for day in days[:-RETENTION_DAYS]:
+            for key, _ in self.store.items(NAMESPACE, prefix=day + _SEPARATOR):
+                self.store.delete(NAMESPACE, key)
+
+    def _rows(self, day: str, user_id: Optional[str] = None) -> list:
+        """((day, user, tool, template, model), totals) for one day, optionally one user."""
+        prefix = _SEPARATOR.join((day, user_id, "")) if user_id else day + _SEPARATOR
+        return [(tuple(key.split(_SEPARATOR)), totals) for key, totals in self.store.items(NAMESPACE, prefix=prefix)]
+
+    def clear(self):
+        self.store.clear(NAMESPACE)
+        self._started.clear()
+
+    # --- budgets ----------------------------------------------------------
+
+    def user_spend(self, user_id: str, day: Optional[str] = None) -> dict:
+        day = day or _today()
+        tokens, cost = 0, 0.0
+        for _, totals in self._rows(day, user_id):
+            tokens += totals["total_tokens"]
+            cost += totals["cost_usd"]
+        return {"tokens": tokens, "cost_usd": cost}
+
+    def over_budget(self, user_id: Optional[str]) -> bool:
+        if not user_id:
+            return False
+        budget = user_budget(user_id)
+        if not budget["tokens"] and not budget["cost_usd"]:
+            return False
+        spend = self.user_spend(user_id)
+        return bool(
+            (budget["tokens"] and spend["tokens"] >= budget["tokens"])
+            or (budget["cost_usd"] and spend["cost_usd"] >= budget["cost_usd"])
+        )
+
+    def model_for(self, user_id: Optional[str], model: str) -> str:
+        """The model to call for this user: ``model``, or the fallback once they are over budget."""
+        if config.LLM_FALLBACK_MODEL and self.over_budget(user_id):
+            return config.LLM_FALLBACK_MODEL
+        return model
+
+    # --- reporting --------------------------------------------------------
+
+    def summary(self, day: Optional[str] = None) -> dict:
+        """Totals for one day grouped by user, tool, template and model, most expensive first."""
+        day = day or _today()
+        groups = {"by_user": {}, "by_tool": {}, "by_template": {}, "by_model": {}}
+        rows = self._rows(day)
+        for (_, user_id, tool, template, model), totals in rows:
+            for group, name in (("by_user", user_id), ("by_tool", tool), ("by_template", template), ("by_model", model)):
+                merged = groups[group].setdefault(name, {**dict.fromkeys(_FIELDS, 0), "max_seconds": 0.0})
+                for field in _FIELDS:
+                    merged[field] += totals[field]
+                merged["max_seconds"] = max(merged["max_seconds"], totals["max_seconds"])
+
+        def rendered(entries: dict, key_name: str):
+            return [
+                {key_name: name, **totals, "cost_usd": round(totals["cost_usd"], 6), "mean_seconds": round(totals["seconds"] / totals["calls"], 4) if totals["calls"] else 0.0}
+                for name, totals in sorted(entries.items(), key=lambda item: -item[1]["cost_usd"])
+            ]
+
+        by_user = rendered(groups["by_user"], "user_id")
+        for entry in by_user:
+            entry["budget"] = user_budget(entry["user_id"])
+            entry["over_budget"] = self.over_budget(entry["user_id"])
+        return {
+            "day": day,
+            "fallback_model": config.LLM_FALLBACK_MODEL,
+            "by_user": by_user,
+            "by_tool": rendered(groups["by_tool"], "tool"),
+            "by_template": rendered(groups["by_template"], "template"),
+            "by_model": rendered(groups["by_model"], "model"),
+        }
+
+    # --- ADK callbacks ----------------------------------------------------
+
+    async def before_model_callback(self, callback_context, llm_request):
+        """Starts the clock and switches over-budget users to the fallback model."""
+        current_user.set(callback_context.user_id)
+        if llm_request.model:
+            llm_request.model = await self.store.run(self.model_for, callback_context.user_id, llm_request.model)
+        self._started[(callback_context.invocation_id, callback_context.agent_name)] = (time.perf_counter(), llm_request.model)
+        return None
+
+    async def after_model_callback(self, callback_context, llm_response):
+        if llm_response.partial:
+            return None
+        started, model = self._started.pop((callback_context.invocation_id, callback_context.agent_name), (None, None))
+        seconds = time.perf_counter() - started if started is not None else 0.0
+        await self.store.run(
+            self.record,
+            callback_context.user_id,
+            tool=callback_context.agent_name,
+            template=f"agent:{callback_context.agent_name}",
+            # Priced by the model asked for; model_version can carry a dated suffix
+            model=model or llm_response.model_version or "unknown",
+            usage=llm_response.usage_metadata,
+            seconds=seconds,
+            failed=bool(llm_response.error_code),
+        )
+        return None
+
+
+def is_admin(headers: Mapping[str, str]) -> bool:
+    value = headers.get(ADMIN_HEADER)
+    token = config.ADMIN_API_TOKEN
+    return bool(token) and value is not None and hmac.compare_digest(value.encode(), token.encode())
+
+
+def user_budget(user_id: str) -> dict:
+    """A user's daily budget; 0 means unlimited."""
+    override = _user_budgets().get(user_id, {})
+    return {
+        "tokens": int(override.get("tokens", config.LLM_DAILY_TOKEN_BUDGET)),
+        "cost_usd": float(override.get("cost_usd", config.LLM_DAILY_COST_BUDGET_USD)),
+    }
+
+
+_parsed_user_budgets: Tuple[str, dict] = ("", {})
+
+
+def _user_budgets() -> dict:
+    global _parsed_user_budgets
+    raw = config.LLM_USER_BUDGETS or ""
+    if raw != _parsed_user_budgets[0]:
+        _parsed_user_budgets = (raw, json.loads(raw) if raw else {})
+    return _parsed_user_budgets[1]
+
+
+usage_ledger = UsageLedger(state_store)
@@ -8,20 +8,43 @@ the agent.
 
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from pydantic import BaseModel
+from typing import Optional
 import uvicorn
 from google.adk.agents import Agent
 from google.adk.tools.agent_tool import AgentTool
 import tool_definitions
-from google.adk.runners import InMemoryRunner
-from google.genai.types import Part, UserContent
+import tracing
+import profiling
+import llm_usage
+from llm_usage import usage_ledger
+from answer_cache import answer_cache
+from admission import INTERACTIVE, AdmissionRejected, admission_controller
+from google.adk.agents.run_config import RunConfig, StreamingMode
+from google.adk.artifacts import InMemoryArtifactService
+from google.adk.events import Event
+from google.adk.runners import Runner
+from google.adk.sessions.sqlite_session_service import SqliteSessionService
+from google.genai.types import Content, Part, UserContent
 import asyncio
+import copy
+import json
+import uuid
+from contextlib import asynccontextmanager
+import config
+import fast_path
+import http_client
+from sessions import SessionManager
+from state_store import state_store
 
 # Sub-agent for handling transactions
 transaction_agent = Agent(
     name="transaction_agent",
     model="gemini-2.5-flash",
+    before_model_callback=usage_ledger.before_model_callback,
+    after_model_callback=usage_ledger.after_model_callback,
     description="Handles processing and querying of financial transactions with analysis.",
     instruction="""You are a specialized agent for handling financial transactions and analysis.
     
@@ -48,6 +71,8 @@ transaction_agent = Agent(
 planning_agent = Agent(
     name="planning_agent",
     model="gemini-2.5-flash",
+    before_model_callback=usage_ledger.before_model_callback,
+    after_model_callback=usage_ledger.after_model_callback,
     description="Helps users with financial planning, including savings plans and challenges.",
     instruction="""You are a specialized agent for financial planning.
     - Use `generate_savings_plan` to create personalized savings plans.
@@ -64,6 +89,8 @@ planning_agent = Agent(
 creative_agent = Agent(
     name="creative_agent",
     model="gemini-2.5-flash",
+    before_model_callback=usage_ledger.before_model_callback,
+    after_model_callback=usage_ledger.after_model_callback,
     description="Provides creative suggestions, such as recipes based on virtual pantry items from recent purchases.",
     instruction="""You are a specialized agent for creative tasks.
     - Use `generate_recipe_suggestion` to suggest recipes based on ingredients automatically detected from the user's recent grocery purchases.
@@ -76,6 +103,8 @@ creative_agent = Agent(
 notification_agent = Agent(
     name="notification_agent",
     model="gemini-2.5-flash",
+    before_model_callback=usage_ledger.before_model_callback,
+    after_model_callback=usage_ledger.after_model_callback,
     description="Manages notifications and calendar events.",
     instruction="""You are a specialized agent for sending notifications and creating calendar events.
     - Use `send_push_notification` to send alerts to the user.
@@ -90,6 +119,8 @@ notification_agent = Agent(
 proactive_agent = Agent(
     name="proactive_agent",
     model="gemini-2.5-flash",
+    before_model_callback=usage_ledger.before_model_callback,
+    after_model_callback=usage_ledger.after_model_callback,
     description="Performs proactive analysis of user's financial data to provide insights.",
     instruction="""You are a specialized agent for proactive financial analysis and insights.
     
@@ -127,6 +158,8 @@ proactive_agent = Agent(
 wallet_agent = Agent(
     name="wallet_agent",
     model="gemini-2.5-flash",
+    before_model_callback=usage_ledger.before_model_callback,
+    after_model_callback=usage_ledger.after_model_callback,
     description="Manages Google Wallet passes.",
     instruction="""You are a specialized agent for managing Google Wallet passes. The user_id is automatically provided by the system and should not be requested from the user.
     - Use `create_wallet_pass` to create new wallet passes.""",
@@ -138,6 +171,8 @@ wallet_agent = Agent(
 root_agent = Agent(
     name="Aegnt",
     model="gemini-2.5-flash",
+    before_model_callback=usage_ledger.before_model_callback,
+    after_model_callback=usage_ledger.after_model_callback,
     global_instruction="""You are Aegnt, a sophisticated AI financial assistant.
     Your primary role is to help users with financial analysis by using the available tools.
     
@@ -196,7 +231,27 @@ root_agent = Agent(
     ],
 )
 
-app = FastAPI()
+# Export spans (ADK's and our own) when an OTLP endpoint is configured
+tracing.configure_tracing("aegnt")
+
+runner = Runner(
+    app_name="aegnt",
+    agent=root_agent,
+    artifact_service=InMemoryArtifactService(),
+    session_service=SqliteSessionService(config.SESSION_DB_PATH),
+)
+session_manager = SessionManager(runner.session_service, runner.app_name, store=state_store)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    eviction_task = asyncio.create_task(session_manager.run_evictions())
+    yield
+    eviction_task.cancel()
+    await runner.session_service.close()
+    await http_client.aclose()
+    state_store.close()
+
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -218,12 +273,170 @@ async def validate_request(request: Request, call_next):
     response = await call_next(request)
     return response
 
-runner = InMemoryRunner(agent=root_agent)
+# Registered last so it runs first: the request span covers validation too, and
+# ADK's agent, LLM and tool spans nest under the backend's trace. Opt-in
+# profiling (see profiling.py) wraps the same span.
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    request_id = profiling.request_id_for(request.headers)
+    profiler = profiling.start_profiler() if profiling.should_profile(request.url.path, request.headers) else None
+    try:
+        with tracing.server_span(f"{request.method} {request.url.path}", request.headers) as span:
+            response = await call_next(request)
+            tracing.set_status_code(span, response.status_code)
+    finally:
+        if profiler is not None:
+            profiler.stop()
+    response.headers[profiling.REQUEST_ID_HEADER] = request_id
+    if profiler is not None:
+        try:
+            profile_id = await run_in_threadpool(profiling.save_profile, request_id, profiler, f"{request.method} {request.url.path}")
+            response.headers[profiling.PROFILE_HEADER] = profile_id
+        except Exception as e:
+            print(f"Saving profile for request {request_id} failed: {e}")
+    return response
+
+def require_profile_admin(request: Request):
+    if not profiling.is_admin(request.headers):
+        raise HTTPException(status_code=404)
+
+@app.get(profiling.PROFILES_PATH)
+def list_request_profiles(request: Request):
+    require_profile_admin(request)
+    return {"profiles": profiling.list_profiles()}
+
+@app.get(profiling.PROFILES_PATH + "/{profile_id}")
+def get_request_profile(profile_id: str, request: Request):
+    require_profile_admin(request)
+    path = profiling.profile_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/json", filename=f"{profile_id}.speedscope.json")
+
+@app.get("/admin/llm_usage")
+def get_llm_usage(request: Request, day: Optional[str] = None):
+    """Today's (or ``day``'s) Gemini tokens and cost by user, tool, prompt template and model."""
+    if not llm_usage.is_admin(request.headers):
+        raise HTTPException(status_code=404)
+    return usage_ledger.summary(day)
+
+@app.get("/admin/admission")
+def get_admission_status(request: Request):
+    """Running and queued agent turns in this worker, and rejections so far."""
+    if not llm_usage.is_admin(request.headers):
+        raise HTTPException(status_code=404)
+    return admission_controller.status()
 
 class AegntRequest(BaseModel):
     user_id: str
     prompt: str
     id_token: str
+    # Bumped by the backend on every write to the user's data; answers are
+    # only cached when it is sent (see answer_cache.py)
+    data_version: Optional[int] = None
+    # "interactive" chat, or "background" for scheduled insights, which yield
+    # to chat under load (see admission.py)
+    priority: str = INTERACTIVE
+
+def _response_parts(event, request: AegntRequest) -> list:
+    """The client-facing parts of one complete (non-partial) runner event."""
+    response_parts = []
+    if event.content and event.content.parts:
+        # Check if we have function calls
+        has_function_calls = any(
+            part.function_call for part in event.content.parts
+        )
+
+        for part in event.content.parts:
+            if has_function_calls and part.function_call:
+                # Handle function calls
+                tool_args = part.function_call.args
+                tool_args['user_id'] = request.user_id
+                tool_args['id_token'] = request.id_token
+                part_data = {
+                    "type": "function_call",
+                    "name": part.function_call.name,
+                    "args": tool_args,
+                    "content": part.function_call.model_dump()
+                }
+                response_parts.append(part_data)
+            elif part.text:
+                # Handle text parts
+                part_data = {
+                    "type": "text",
+                    "content": part.text
+                }
+                response_parts.append(part_data)
+            else:
+                # Handle any other part types
+                part_data = {
+                    "type": "other",
+                    "content": part.model_dump(exclude_none=True)
+                }
+                response_parts.append(part_data)
+    return response_parts
+
+async def _record_exchange(request: AegntRequest, session_id: str, answer: str, source: str):
+    """Appends a turn answered without the agent to the session, so follow-ups keep the context."""
+    session = await runner.session_service.get_session(app_name=runner.app_name, user_id=request.user_id, session_id=session_id)
+    invocation_id = f"{source}-{uuid.uuid4()}"
+    await runner.session_service.append_event(session, Event(
+        author="user", invocation_id=invocation_id, content=UserContent(parts=[Part(text=request.prompt)])
+    ))
+    await runner.session_service.append_event(session, Event(
+        author=root_agent.name, invocation_id=invocation_id, content=Content(role="model", parts=[Part(text=answer)])
+    ))
+
+def _with_credentials(parts: list, request: Optional[AegntRequest] = None) -> list:
+    """
+    A deep copy of response parts whose tool calls carry ``request``'s user and
+    ID token, or no credentials at all when ``request`` is None.
+    """
+    parts = copy.deepcopy(parts)
+    for part in parts:
+        if part["type"] != "function_call":
+            continue
+        for args in (part["args"], part["content"].get("args")):
+            if args is None:
+                continue
+            args.pop("user_id", None)
+            args.pop("id_token", None)
+            if request is not None:
+                args.update(user_id=request.user_id, id_token=request.id_token)
+    return parts
+
+async def _cache_answer(cache_key, parts: list):
+    """Caches a turn's response parts, without the credentials in its tool calls."""
+    if cache_key:
+        await answer_cache.store.run(answer_cache.put, cache_key, _with_credentials(parts))
+
+async def _answer_without_agent(request: AegntRequest, session_id: str, cache_key) -> Optional[list]:
+    """
+    Response parts from the answer cache (see answer_cache.py) or the fast path
+    (see fast_path.py), or None when the agent has to run.
+    """
+    cached = await answer_cache.store.run(answer_cache.get, cache_key) if cache_key else None
+    source = "cache"
+    if cached is None:
+        answer = await fast_path.try_answer(request.prompt, request.id_token)
+        if answer is None:
+            return None
+        parts = [{"type": "text", "content": answer}]
+        source = "fast-path"
+        await _cache_answer(cache_key, parts)
+    else:
+        # Tool arguments carry the credentials of the request being answered
+        parts = _with_credentials(cached, request)
+    text = "".join(part["content"] for part in parts if part["type"] == "text")
+    await _record_exchange(request, session_id, text, source)
+    return parts
+
+def _busy_response(rejected: AdmissionRejected) -> JSONResponse:
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(rejected), "reason": rejected.reason},
+        headers={"Retry-After": rejected.retry_after_header},
+    )
 
 @app.post("/invoke_agent")
 async def invoke_agent(request: AegntRequest):
@@ -233,76 +446,141 @@ async def invoke_agent(request: AegntRequest):
             status_code=400,
             content={"error": "Empty prompt received"}
         )
-    
-    session = None
     try:
-        # Create a new session
-        session = await runner.session_service.create_session(app_name=runner.app_name, user_id=request.user_id)
+        async with admission_controller.admit(request.user_id, request.priority):
+            return await _run_turn(request)
+    except AdmissionRejected as e:
+        return _busy_response(e)
+
+async def _run_turn(request: AegntRequest):
+    try:
         content = UserContent(parts=[Part(text=request.prompt)])
         response_parts = []
-        async for event in runner.run_async(
-            user_id=request.user_id, session_id=session.id, new_message=content
-        ):
-            if event.content and event.content.parts:
-                # Check if we have function calls
-                has_function_calls = any(
-                    part.function_call for part in event.content.parts
-                )
-                
-                for part in event.content.parts:
-                    if has_function_calls and part.function_call:
-                        # Handle function calls
-                        tool_args = part.function_call.args
-                        tool_args['user_id'] = request.user_id
-                        tool_args['id_token'] = request.id_token
-                        part_data = {
-                            "type": "function_call",
-                            "name": part.function_call.name,
-                            "args": tool_args,
-                            "content": part.function_call.model_dump()
-                        }
-                        response_parts.append(part_data)
-                    elif part.text:
-                        # Handle text parts
-                        part_data = {
-                            "type": "text",
-                            "content": part.text
-                        }
-                        response_parts.append(part_data)
-                    else:
-                        # Handle any other part types
-                        part_data = {
-                            "type": "other",
-                            "content": part.model_dump(exclude_none=True)
-                        }
-                        response_parts.append(part_data)
-
-        await runner.session_service.delete_session(
-            user_id=request.user_id,
-            session_id=session.id,
-            app_name=runner.app_name
-        )
-        
+        # The user's conversation carries over between turns (see sessions.py)
+        cache_key = answer_cache.key(request.user_id, request.prompt, request.data_version)
+        async with session_manager.turn(request.user_id) as session_id:
+            cached_parts = await _answer_without_agent(request, session_id, cache_key)
+            if cached_parts is not None:
+                return {"parts": cached_parts}
+            async for event in runner.run_async(
+                user_id=request.user_id, session_id=session_id, new_message=content
+            ):
+                response_parts.extend(_response_parts(event, request))
+        await _cache_answer(cache_key, response_parts)
+
         if not response_parts:
             return {"response": "No response from agent."}
             
         return {"parts": response_parts}
     except Exception as e:
         print(f"Error in invoke_agent: {e}")
-        if session:
-            try:
-                await runner.session_service.delete_session(
-                    user_id=session.user_id,
-                    session_id=session.id,
-                    app_name=runner.app_name
-                )
-            except Exception as cleanup_error:
-                print(f"Error cleaning up session: {cleanup_error}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def _stream_turn(request: AegntRequest):
+    content = UserContent(parts=[Part(text=request.prompt)])
+    response_parts = []
+    # Whether the text of the event being built was already sent as deltas
+    streamed_text = False
+    try:
+        cache_key = answer_cache.key(request.user_id, request.prompt, request.data_version)
+        async with session_manager.turn(request.user_id) as session_id:
+            cached_parts = await _answer_without_agent(request, session_id, cache_key)
+            if cached_parts is not None:
+                for part in cached_parts:
+                    if part["type"] == "function_call":
+                        yield _sse("function_call", {"author": root_agent.name, "name": part["name"]})
+                    elif part["type"] == "text":
+                        yield _sse("text_delta", {"author": root_agent.name, "content": part["content"]})
+                yield _sse("done", {"parts": cached_parts})
+                return
+            async for event in runner.run_async(
+                user_id=request.user_id,
+                session_id=session_id,
+                new_message=content,
+                run_config=RunConfig(streaming_mode=StreamingMode.SSE),
+            ):
+                if event.partial:
+                    for part in (event.content.parts if event.content else None) or []:
+                        if part.text and not part.thought:
+                            streamed_text = True
+                            yield _sse("text_delta", {"author": event.author, "content": part.text})
+                    continue
+
+                parts = _response_parts(event, request)
+                response_parts.extend(parts)
+                for part, part_data in zip(event.content.parts if parts else [], parts):
+                    if part_data["type"] == "function_call":
+                        yield _sse("function_call", {"author": event.author, "name": part_data["name"]})
+                    elif part.function_response:
+                        yield _sse("function_response", {"author": event.author, "name": part.function_response.name})
+                    elif part_data["type"] == "text" and not streamed_text:
+                        # Models that don't stream send the whole text at once
+                        yield _sse("text_delta", {"author": event.author, "content": part_data["content"]})
+                streamed_text = False
+        await _cache_answer(cache_key, response_parts)
+
+        yield _sse("done", {"parts": response_parts} if response_parts else {"response": "No response from agent."})
+    except Exception as e:
+        print(f"Error in invoke_agent_stream: {e}")
+        yield _sse("error", {"detail": str(e)})
+
+class _AdmittedStreamingResponse(StreamingResponse):
+    """Releases the turn's admission slot once the stream has ended, however it ended."""
+
+    def __init__(self, content, ticket, **kwargs):
+        super().__init__(content, **kwargs)
+        self.ticket = ticket
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await admission_controller.release(self.ticket)
+
+@app.post("/invoke_agent/stream")
+async def invoke_agent_stream(request: AegntRequest):
+    """
+    Streams the turn as server-sent events instead of one JSON body:
+    ``text_delta`` events as the model writes, ``function_call`` and
+    ``function_response`` as tools start and finish, then ``done`` carrying the
+    same parts /invoke_agent returns (or ``error``).
+    """
+    print(f"Received streaming request from user: {request.user_id}")
+    if not request.prompt or not request.prompt.strip():
+        return JSONResponse(
+            status_code=400,
+            content={"error": "Empty prompt received"}
+        )
+    # Admitted before the response starts, so a rejection is still a plain 429
+    try:
+        ticket = await admission_controller.acquire(request.user_id, request.priority)
+    except AdmissionRejected as e:
+        return _busy_response(e)
+    return _AdmittedStreamingResponse(
+        _stream_turn(request),
+        ticket,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def check_worker_settings(workers: int):
+    """Several workers can only share sessions and state kept in files they all open."""
+    if workers <= 1:
+        return
+    if state_store.name == "memory":
+        raise SystemExit("AEGNT_WORKERS > 1 needs a shared state store: set STATE_STORE=sqlite")
+    if config.SESSION_DB_PATH == ":memory:":
+        raise SystemExit("AEGNT_WORKERS > 1 needs a session database file: set SESSION_DB_PATH")
+
 if __name__ == "__main__":
+    check_worker_settings(config.AEGNT_WORKERS)
     uvicorn.run(
-        app, 
+        # Workers import the app themselves, so it is passed by name
+        "main_agent:app",
+        workers=config.AEGNT_WORKERS,
         host="0.0.0.0", 
         port=8001,
         log_level="info",
@@ -0,0 +1,118 @@
+"""
+Opt-in statistical profiling of single agent requests.
+
+The same scheme as the backend's core/profiling.py. A request sending
+``X-Aegis-Profile: <PROFILE_ADMIN_TOKEN>``, or sampled by
+``PROFILE_SAMPLE_RATE``, is run under pyinstrument. Its profile is written
+to ``PROFILE_DIR/<profile id>.speedscope.json``, named after the request id.
+
+ADK runs the tools on the event loop thread, so their JSON handling and the
+proactive-analysis helpers appear in the flamegraph. Time spent waiting on
+Gemini or the backend appears as await time.
+"""
+
+import hmac
+import json
+import logging
+import os
+import random
+import re
+import uuid
+from datetime import datetime, timezone
+from typing import List, Mapping, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Aegis-Profile"
+REQUEST_ID_HEADER = "X-Request-ID"
+PROFILE_SUFFIX = ".speedscope.json"
+PROFILES_PATH = "/debug/profiles"
+
+_REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+# Profiles are stored under ids of our own, so no caller can overwrite one
+_PROFILE_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+_missing_profiler_logged = False
+
+
+def request_id_for(headers: Mapping[str, str]) -> str:
+    """Reuses the backend's X-Request-ID, so both apps' profiles of one turn are named after it."""
+    request_id = headers.get(REQUEST_ID_HEADER)
+    if request_id and _REQUEST_ID_PATTERN.match(request_id):
+        return request_id
+    return uuid.uuid4().hex
+
+
+def is_admin(headers: Mapping[str, str]) -> bool:
+    value = headers.get(PROFILE_HEADER)
+    token = config.PROFILE_ADMIN_TOKEN
+    return bool(token) and value is not None and hmac.compare_digest(value.encode(), token.encode())
+
+
+def should_profile(path: str, headers: Mapping[str, str]) -> bool:
+    if path.startswith(PROFILES_PATH):
+        return False
+    if is_admin(headers):
+        return True
+    return config.PROFILE_SAMPLE_RATE > 0 and random.random() < config.PROFILE_SAMPLE_RATE
+
+
+def start_profiler():
+    global _missing_profiler_logged
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        if not _missing_profiler_logged:
+            logger.warning("Request profiling was requested but pyinstrument is not installed")
+            _missing_profiler_logged = True
+        return None
+    profiler = Profiler(interval=config.PROFILE_INTERVAL_MS / 1000, async_mode="enabled")
+    profiler.start()
+    return profiler
+
+
+def save_profile(request_id: str, profiler, description: str) -> str:
+    """Writes a stopped profiler's session in speedscope format and returns its profile id. Blocking."""
+    from pyinstrument.renderers import SpeedscopeRenderer
+
+    os.makedirs(config.PROFILE_DIR, exist_ok=True)
+    document = json.loads(profiler.output(SpeedscopeRenderer()))
+    document["name"] = f"{description} ({request_id})"
+    profile_id = uuid.uuid4().hex
+    path = os.path.join(config.PROFILE_DIR, profile_id + PROFILE_SUFFIX)
+    with open(path, "w") as f:
+        json.dump(document, f)
+
+    profiles = sorted(
+        (entry for entry in os.scandir(config.PROFILE_DIR) if entry.name.endswith(PROFILE_SUFFIX)),
+        key=lambda entry: entry.stat().st_mtime,
+    )
+    for entry in profiles[:max(0, len(profiles) - config.PROFILE_MAX_FILES)]:
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+    return profile_id
+
+
+def list_profiles() -> List[dict]:
+    if not os.path.isdir(config.PROFILE_DIR):
+        return []
+    profiles = []
+    for entry in os.scandir(config.PROFILE_DIR):
+        if entry.name.endswith(PROFILE_SUFFIX):
+            stat = entry.stat()
+            profiles.append({
+                "profile_id": entry.name[:-len(PROFILE_SUFFIX)],
+                "created": datetime.fromtimestamp(stat.st_mtime, timezone.utc).isoformat(),
+                "bytes": stat.st_size,
+            })
+    return sorted(profiles, key=lambda profile: profile["created"], reverse=True)
+
+
+def profile_path(profile_id: str) -> Optional[str]:
+    if not _PROFILE_ID_PATTERN.match(profile_id):
+        return None
+    path = os.path.join(config.PROFILE_DIR, profile_id + PROFILE_SUFFIX)
+    return path if os.path.exists(path) else None
@@ -0,0 +1,204 @@
+"""
+Per-user agent sessions that persist across turns.
+
+Each user has one conversation session in ADK's SQLite session store
+(``SESSION_DB_PATH``). Consecutive turns reuse it, so the model sees the
+earlier questions, answers and tool results, and the session outlives restarts.
+
+Three things keep it bounded:
+- Idle TTL. A session untouched for ``SESSION_IDLE_TTL_SECONDS`` is deleted,
+  by a periodic sweep and when the user comes back. The next turn starts a
+  fresh conversation.
+- Compaction. Once a session holds more than ``SESSION_MAX_TURNS`` user turns,
+  it is replaced by a new session holding only the last
+  ``SESSION_KEEP_TURNS`` turns and the session state. The cut is always at the
+  start of a user turn, so no function call is separated from its response.
+- Serialised turns. Turns of one user run one at a time, because ADK rejects
+  appends to a session that changed underneath it. Across worker processes
+  this is a lock in the state store (see state_store.py), which also records
+  the session each user is on, so any worker can serve the next turn.
+
+A turn that fails drops the session, because a half-finished tool call left in
+the history would break every later turn.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass
+from typing import AsyncIterator, Callable, Dict, Optional
+
+import config
+from state_store import MemoryStateStore, StateStore
+
+logger = logging.getLogger(__name__)
+
+NAMESPACE = "sessions"
+
+# How often a turn waiting on another worker's turn for the same user retries
+TURN_LOCK_POLL_SECONDS = 0.05
+
+
+@dataclass
+class _ActiveSession:
+    session_id: str
+    last_used: float
+    turns: int
+
+
+def _is_user_turn(event) -> bool:
+    return event.author == "user" and bool(event.content and event.content.parts) and any(part.text for part in event.content.parts)
+
+
+class SessionManager:
+    def __init__(
+        self,
+        session_service,
+        app_name: str,
+        idle_ttl_seconds: float = config.SESSION_IDLE_TTL_SECONDS,
+        max_turns: int = config.SESSION_MAX_TURNS,
+        keep_turns: int = config.SESSION_KEEP_TURNS,
+        clock: Callable[[], float] = time.time,
+        store: Optional[StateStore] = None,
+        turn_lock_seconds: float = config.SESSION_TURN_LOCK_SECONDS,
+    ):
+        self.session_service = session_service
+        self.app_name = app_name
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.max_turns = max_turns
+        self.keep_turns = min(keep_turns, max_turns)
+        self.clock = clock
+        self.store = store or MemoryStateStore()
+        self.turn_lock_seconds = turn_lock_seconds
+        # Queue this process's turns of a user before they contend for the store's lock
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    @asynccontextmanager
+    async def turn(self, user_id: str) -> AsyncIterator[str]:
+        """Holds the user's session for one turn and yields its id."""
+        lock = self._locks.setdefault(user_id, asyncio.Lock())
+        async with lock, self._turn_lock(user_id):
+            active = await self._session_for(user_id)
+            try:
+                yield active.session_id
+            except BaseException:
+                await self.reset(user_id)
+                raise
+            active.turns += 1
+            active.last_used = self.clock()
+            if active.turns > self.max_turns:
+                active = await self._compact(user_id, active)
+            if active is not None:
+                await self._save(user_id, active)
+
+    @asynccontextmanager
+    async def _turn_lock(self, user_id: str):
+        name = f"turn:{user_id}"
+        owner = uuid.uuid4().hex
+        while not await self.store.run(self.store.acquire, name, owner, self.turn_lock_seconds):
+            await asyncio.sleep(TURN_LOCK_POLL_SECONDS)
+        try:
+            yield
+        finally:
+            await self.store.run(self.store.release, name, owner)
+
+    async def _is_turn_running(self, user_id: str) -> bool:
+        return await self.store.run(self.store.is_locked, f"turn:{user_id}")
+
+    async def _active(self, user_id: str) -> Optional[_ActiveSession]:
+        record = await self.store.run(self.store.get, NAMESPACE, user_id)
+        return _ActiveSession(**record) if record is not None else None
+
+    async def _save(self, user_id: str, active: _ActiveSession):
+        await self.store.run(self.store.put, NAMESPACE, user_id, asdict(active))
+
+    async def _forget(self, user_id: str):
+        await self.store.run(self.store.delete, NAMESPACE, user_id)
+
+    async def reset(self, user_id: str):
+        """Ends the user's conversation; the next turn starts a new one."""
+        active = await self._active(user_id)
+        if active is not None:
+            await self._forget(user_id)
+            await self._delete(user_id, active.session_id)
+
+    async def _session_for(self, user_id: str) -> _ActiveSession:
+        now = self.clock()
+        active = await self._active(user_id)
+        if active is None:
+            active = await self._load(user_id)
+        if active is not None and now - active.last_used > self.idle_ttl_seconds:
+            await self._delete(user_id, active.session_id)
+            active = None
+        if active is None:
+            session = await self.session_service.create_session(app_name=self.app_name, user_id=user_id)
+            active = _ActiveSession(session.id, now, 0)
+        await self._save(user_id, active)
+        return active
+
+    async def _load(self, user_id: str) -> Optional[_ActiveSession]:
+        """The user's most recent persisted session, e.g. after a restart."""
+        listed = await self.session_service.list_sessions(app_name=self.app_name, user_id=user_id)
+        if not listed.sessions:
+            return None
+        latest = max(listed.sessions, key=lambda session: session.last_update_time)
+        session = await self.session_service.get_session(app_name=self.app_name, user_id=user_id, session_id=latest.id)
+        if session is None:
+            return None
+        return _ActiveSession(session.id, session.last_update_time, sum(_is_user_turn(event) for event in session.events))
+
+    async def _compact(self, user_id: str, active: _ActiveSession) -> Optional[_ActiveSession]:
+        """The session to continue in, or None if it has disappeared."""
+        session = await self.session_service.get_session(app_name=self.app_name, user_id=user_id, session_id=active.session_id)
+        if session is None:
+            await self._forget(user_id)
+            return None
+        turn_starts = [index for index, event in enumerate(session.events) if _is_user_turn(event)]
+        if len(turn_starts) <= self.keep_turns:
+            active.turns = len(turn_starts)
+            return active
+        kept = session.events[turn_starts[-self.keep_turns]:] if self.keep_turns else []
+        compacted = await self.session_service.create_session(app_name=self.app_name, user_id=user_id, state=dict(session.state))
+        for event in kept:
+            await self.session_service.append_event(compacted, event)
+        await self._delete(user_id, session.id)
+        active.session_id = compacted.id
+        active.turns = min(len(turn_starts), self.keep_turns)
+        logger.info(f"Compacted session for user {user_id}: kept {len(kept)} of {len(session.events)} events")
+        return active
+
+    async def evict_idle(self) -> int:
+        """Deletes every session idle for longer than the TTL. Returns how many were deleted."""
+        cutoff = self.clock() - self.idle_ttl_seconds
+        listed = await self.session_service.list_sessions(app_name=self.app_name)
+        evicted = 0
+        for session in listed.sessions:
+            if session.last_update_time >= cutoff or await self._is_turn_running(session.user_id):
+                continue
+            await self._delete(session.user_id, session.id)
+            active = await self._active(session.user_id)
+            if active is not None and active.session_id == session.id:
+                await self._forget(session.user_id)
+            evicted += 1
+        for user_id in [user_id for user_id, lock in self._locks.items() if not lock.locked()]:
+            del self._locks[user_id]
+        return evicted
+
+    async def run_evictions(self, interval_seconds: float = config.SESSION_EVICTION_INTERVAL_SECONDS):
+        """Background task sweeping idle sessions until cancelled."""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                evicted = await self.evict_idle()
+                if evicted:
+                    logger.info(f"Evicted {evicted} idle agent sessions")
+            except Exception as e:
+                logger.warning(f"Evicting idle agent sessions failed: {e}")
+
+    async def _delete(self, user_id: str, session_id: str):
+        try:
+            await self.session_service.delete_session(app_name=self.app_name, user_id=user_id, session_id=session_id)
+        except Exception as e:
+            logger.warning(f"Deleting session {session_id} of user {user_id} failed: {e}")
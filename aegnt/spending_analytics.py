@@ -0,0 +1,227 @@
+"""
+Pattern detection for run_comprehensive_proactive_analysis on a user's
+transactions, for when the backend's spending stats can't be read (the
+analysis otherwise runs on those; see spending_stats.py).
+
+The five detectors (recurring-charge price increases, category trends, top
+merchants, seasonal highs and outlier transactions) used to walk the
+transaction dicts one after another, each re-reading the same fields,
+re-parsing date strings and re-casting amounts, which took about half a
+second on 100k transactions. The transactions are now read once into a
+SpendingFrame of NumPy columns, and every detector is a handful of
+vectorized group-bys over it.
+
+Insights, and their order, are the same as the per-dict detectors produced.
+Groups are listed in the order they first appear in the transactions, and
+merchants or categories with a zero baseline, which used to raise
+ZeroDivisionError, are skipped.
+"""
+
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+
+_MONTH_NAMES = ["", "Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+# Months since 1970-01 for rows without a usable date
+_NO_MONTH = np.iinfo(np.int64).min
+
+# Largest category x month grid counted in one dense array
+MAX_DENSE_CELLS = 1 << 20
+
+
+def _codes(names: list) -> tuple:
+    """Integer codes for ``names``, numbered in order of first appearance, and the names by code."""
+    index = {name: code for code, name in enumerate(dict.fromkeys(names))}
+    return np.fromiter(map(index.__getitem__, names), dtype=np.int64, count=len(names)), list(index)
+
+
+def _first_seen(codes: np.ndarray, groups: np.ndarray) -> np.ndarray:
+    """``groups`` (codes present in ``codes``) ordered by where each first appears."""
+    present, first = np.unique(codes, return_index=True)
+    positions = dict(zip(present.tolist(), first.tolist()))
+    return groups[np.argsort([positions[group] for group in groups.tolist()], kind="stable")]
+
+
+@dataclass
+class SpendingFrame:
+    """Transactions as columns: one row per transaction, in the original order."""
+    transactions: List[dict]
+    amounts: np.ndarray  # float64
+    days: np.ndarray  # datetime64[D]; NaT where the date is missing or unreadable
+    months: np.ndarray  # int64 months since 1970-01; _NO_MONTH where there is no date
+    merchant_codes: np.ndarray
+    merchants: list
+    category_codes: np.ndarray
+    categories: list
+
+    @classmethod
+    def from_transactions(cls, transactions: List[dict]) -> "SpendingFrame":
+        amounts = np.array([t.get("total_amount") or 0.0 for t in transactions], dtype=np.float64)
+        dates = [str(t.get("transaction_date") or "")[:10] or "NaT" for t in transactions]
+        try:
+            days = np.array(dates, dtype="datetime64[D]")
+        except ValueError:
+            days = np.array([_day(date) for date in dates], dtype="datetime64[D]")
+        dated = ~np.isnat(days)
+        months = np.full(len(transactions), _NO_MONTH, dtype=np.int64)
+        months[dated] = days[dated].astype("datetime64[M]").astype(np.int64)
+        # Missing or empty names group as the transaction digest and backend summary do
+        merchant_codes, merchants = _codes([t.get("store_name") or "Unknown" for t in transactions])
+        category_codes, categories = _codes([t.get("category") or "General" for t in transactions])
+        return cls(transactions, amounts, days, months, merchant_codes, merchants, category_codes, categories)
+
+    def __len__(self) -> int:
+        return len(self.amounts)
+
+    @property
+    def dated(self) -> np.ndarray:
+        return self.months != _NO_MONTH
+
+
+def _day(date: str):
+    try:
+        return np.datetime64(date, "D")
+    except ValueError:
+        return np.datetime64("NaT")
+
+
+def subscription_insights(frame: SpendingFrame) -> list:
+    """Merchants charged at least three times whose amount has risen more than 10%."""
+    if not len(frame):
+        return []
+    groups = len(frame.merchants)
+    counts = np.bincount(frame.merchant_codes, minlength=groups)
+    lowest = np.full(groups, np.inf)
+    highest = np.full(groups, -np.inf)
+    np.minimum.at(lowest, frame.merchant_codes, frame.amounts)
+    np.maximum.at(highest, frame.merchant_codes, frame.amounts)
+
+    insights = []
+    for code in np.flatnonzero((counts >= 3) & (highest > lowest) & (highest > lowest * 1.1) & (lowest != 0)):
+        merchant, old, new = frame.merchants[code], float(lowest[code]), float(highest[code])
+        insights.append({
+            "type": "subscription_price_increase",
+            "merchant": merchant,
+            "old_amount": old,
+            "new_amount": new,
+            "increase_percent": ((new - old) / old) * 100,
+            "message": f"{merchant} subscription increased from ${old:.2f} to ${new:.2f}"
+        })
+    return insights
+
+
+def category_trend_insights(frame: SpendingFrame) -> list:
+    """Categories whose last two months average over 25% above the months before."""
+    dated = frame.dated
+    if not dated.any():
+        return []
+    categories, months, amounts = frame.category_codes[dated], frame.months[dated], frame.amounts[dated]
+    first_month = months.min()
+    span = int(months.max() - first_month) + 1
+    # One group per (category, month) with transactions, sorted by category then month
+    cells = categories * span + (months - first_month)
+    if len(frame.categories) * span <= MAX_DENSE_CELLS:
+        counts = np.bincount(cells, minlength=len(frame.categories) * span)
+        keys = np.flatnonzero(counts)
+        totals = np.bincount(cells, weights=amounts, minlength=len(counts))[keys]
+    else:
+        # Dates scattered over centuries: group the occupied cells only
+        keys, group_of = np.unique(cells, return_inverse=True)
+        totals = np.bincount(group_of, weights=amounts)
+    group_category = keys // span
+
+    size = np.bincount(group_category, minlength=len(frame.categories))
+    ends = np.cumsum(size)
+    from_end = ends[group_category] - 1 - np.arange(len(keys))
+    recent = from_end < 2
+    recent_avg = np.bincount(group_category[recent], weights=totals[recent], minlength=len(size)) / 2
+    older_total = np.bincount(group_category[~recent], weights=totals[~recent], minlength=len(size))
+    older_avg = np.where(size > 2, older_total / np.maximum(size - 2, 1), totals[np.minimum(ends - size, len(totals) - 1)])
+
+    trending = np.flatnonzero((size >= 2) & (recent_avg > older_avg * 1.25) & (older_avg != 0))
+    insights = []
+    for code in _first_seen(categories, trending):
+        category, old, new = frame.categories[code], float(older_avg[code]), float(recent_avg[code])
+        insights.append({
+            "type": "category_spending_increase",
+            "category": category,
+            "old_average": old,
+            "new_average": new,
+            "increase_percent": ((new - old) / old) * 100,
+            "message": f"{category} spending increased {((new - old) / old) * 100:.0f}%"
+        })
+    return insights
+
+
+def merchant_insights(frame: SpendingFrame) -> list:
+    """The five merchants with the most spending, where that is over 200."""
+    if not len(frame):
+        return []
+    totals = np.bincount(frame.merchant_codes, weights=frame.amounts)
+    counts = np.bincount(frame.merchant_codes)
+    insights = []
+    for code in np.argsort(-totals, kind="stable")[:5]:
+        if totals[code] > 200:
+            merchant, total, count = frame.merchants[code], float(totals[code]), int(counts[code])
+            insights.append({
+                "type": "top_merchant",
+                "merchant": merchant,
+                "total_spent": total,
+                "transaction_count": count,
+                "average_transaction": total / count,
+                "message": f"Top spending: ${total:.2f} at {merchant} ({count} transactions)"
+            })
+    return insights
+
+
+def seasonal_insights(frame: SpendingFrame) -> list:
+    """Calendar months whose average transaction is over 30% above the average month's."""
+    dated = frame.dated
+    month_of_year = frame.months[dated] % 12 + 1
+    counts = np.bincount(month_of_year, minlength=13)
+    present = np.flatnonzero(counts)
+    if len(present) < 3:
+        return []
+    averages = np.bincount(month_of_year, weights=frame.amounts[dated], minlength=13)[present] / counts[present]
+    overall = float(averages.mean())
+
+    insights = []
+    high = present[averages > overall * 1.3]
+    for month in _first_seen(month_of_year, high).tolist():
+        average = float(averages[np.searchsorted(present, month)])
+        insights.append({
+            "type": "seasonal_high_spending",
+            "month": month,
+            "month_name": _MONTH_NAMES[month],
+            "average_spending": average,
+            "overall_average": overall,
+            "message": f"High spending in {_MONTH_NAMES[month]}: ${average:.2f} vs ${overall:.2f} average"
+        })
+    return insights
+
+
+def anomaly_insights(frame: SpendingFrame) -> list:
+    """Up to three transactions above the upper Tukey fence (Q3 + 1.5 IQR)."""
+    n = len(frame)
+    if not n:
+        return []
+    average = float(frame.amounts.mean())
+    q1, q3 = np.partition(frame.amounts, [n // 4, 3 * n // 4])[[n // 4, 3 * n // 4]]
+    upper_bound = q3 + 1.5 * (q3 - q1)
+
+    insights = []
+    for row in np.flatnonzero(frame.amounts > upper_bound)[:3].tolist():
+        transaction = frame.transactions[row]
+        amount = float(frame.amounts[row])
+        merchant = frame.merchants[frame.merchant_codes[row]]
+        insights.append({
+            "type": "spending_anomaly",
+            "amount": amount,
+            "merchant": merchant,
+            "date": transaction.get("transaction_date", ""),
+            "average_amount": average,
+            "message": f"Unusual transaction: ${amount:.2f} at {merchant} (avg: ${average:.2f})"
+        })
+    return insights
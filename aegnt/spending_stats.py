@@ -0,0 +1,268 @@
+"""
+Proactive analysis on the backend's running spending statistics.
+
+run_proactive_analysis and run_comprehensive_proactive_analysis used to fetch
+up to two years of transactions on every run and recompute merchant totals,
+monthly category sums, quartiles and recurring charges from scratch. The
+backend now keeps a per-user statistics document (GET /transactions/stats)
+up to date at every write, and both analyses read it instead, so their cost
+no longer grows with the history.
+
+The document holds monthly series (overall, per category and per merchant),
+each merchant's latest charges and a log-scale histogram of amounts. The
+detectors below are the SpendingFrame ones (spending_analytics) over those:
+
+- periods are whole months, so a window starting mid-month covers all of it;
+- recurring-charge price increases compare a merchant's latest charges only;
+- outlier bounds come from the histogram (quartiles to within about 9%), and
+  outliers are looked for among the latest charges.
+"""
+
+from datetime import date
+from typing import List, Optional, Tuple
+
+_MONTH_NAMES = ["", "Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+# Histogram resolution used by the backend (services/spending_stats.py)
+_BUCKETS_PER_DOUBLING = 8
+_ZERO_BUCKET = "zero"
+
+# Lengths, in months, of the periods run_proactive_analysis tries, shortest first
+PERIOD_MONTHS = (1, 3, 6, 12, 24)
+
+# Merchants described per period in run_proactive_analysis's prompt
+PERIOD_MERCHANTS = 15
+
+
+def _month(index: int) -> str:
+    year, month = divmod(index, 12)
+    return f"{year:04d}-{month + 1:02d}"
+
+
+def _month_index(day: date) -> int:
+    return day.year * 12 + day.month - 1
+
+
+def _in(months: dict, first: str, last: str = "9999-12") -> dict:
+    """The tallies of ``months`` (YYYY-MM keys) from ``first`` to ``last``, in month order."""
+    return {month: months[month] for month in sorted(months) if first <= month <= last}
+
+
+def _first_seen(groups: dict, first: str) -> List[Tuple[str, dict]]:
+    """(name, months) pairs with months since ``first``, ordered by the first of those months."""
+    windowed = [(name, _in(months, first)) for name, months in groups.items()]
+    return sorted([(name, months) for name, months in windowed if months], key=lambda group: next(iter(group[1])))
+
+
+def _count(months: dict) -> int:
+    return sum(tally["count"] for tally in months.values())
+
+
+def _total(months: dict) -> float:
+    return sum(tally["total"] for tally in months.values())
+
+
+def _merchant_months(stats: dict) -> dict:
+    return {merchant: entry["months"] for merchant, entry in stats["merchants"].items()}
+
+
+def _charges_since(stats: dict, merchant: str, since: date) -> List[dict]:
+    return [charge for charge in stats["merchants"][merchant]["recent"] if charge["date"][:10] >= since.isoformat()]
+
+
+def transaction_count(stats: dict, since: date) -> int:
+    return _count(_in(stats["months"], _month(_month_index(since))))
+
+
+def subscription_insights(stats: dict, since: date) -> list:
+    """Merchants charged at least three times whose latest charges have risen more than 10%."""
+    insights = []
+    for merchant, months in _first_seen(_merchant_months(stats), _month(_month_index(since))):
+        amounts = [charge["amount"] for charge in _charges_since(stats, merchant, since)]
+        if _count(months) < 3 or len(amounts) < 2:
+            continue
+        old, new = min(amounts), max(amounts)
+        if new > old * 1.1 and old != 0:
+            insights.append({
+                "type": "subscription_price_increase",
+                "merchant": merchant,
+                "old_amount": old,
+                "new_amount": new,
+                "increase_percent": ((new - old) / old) * 100,
+                "message": f"{merchant} subscription increased from ${old:.2f} to ${new:.2f}"
+            })
+    return insights
+
+
+def category_trend_insights(stats: dict, since: date) -> list:
+    """Categories whose last two months average over 25% above the months before."""
+    insights = []
+    for category, months in _first_seen(stats["categories"], _month(_month_index(since))):
+        totals = [tally["total"] for tally in months.values()]
+        if len(totals) < 2:
+            continue
+        new = sum(totals[-2:]) / 2
+        old = sum(totals[:-2]) / (len(totals) - 2) if len(totals) > 2 else totals[0]
+        if new > old * 1.25 and old != 0:
+            insights.append({
+                "type": "category_spending_increase",
+                "category": category,
+                "old_average": old,
+                "new_average": new,
+                "increase_percent": ((new - old) / old) * 100,
+                "message": f"{category} spending increased {((new - old) / old) * 100:.0f}%"
+            })
+    return insights
+
+
+def merchant_insights(stats: dict, since: date) -> list:
+    """The five merchants with the most spending, where that is over 200."""
+    merchants = [(merchant, _total(months), _count(months)) for merchant, months in _first_seen(_merchant_months(stats), _month(_month_index(since)))]
+    insights = []
+    for merchant, total, count in sorted(merchants, key=lambda merchant: -merchant[1])[:5]:
+        if total > 200:
+            insights.append({
+                "type": "top_merchant",
+                "merchant": merchant,
+                "total_spent": total,
+                "transaction_count": count,
+                "average_transaction": total / count,
+                "message": f"Top spending: ${total:.2f} at {merchant} ({count} transactions)"
+            })
+    return insights
+
+
+def seasonal_insights(stats: dict, since: date) -> list:
+    """Calendar months whose average transaction is over 30% above the average month's."""
+    by_month = {}
+    for month, tally in _in(stats["months"], _month(_month_index(since))).items():
+        entry = by_month.setdefault(int(month[5:]), [0.0, 0])
+        entry[0] += tally["total"]
+        entry[1] += tally["count"]
+    if len(by_month) < 3:
+        return []
+    averages = {month: total / count for month, (total, count) in by_month.items()}
+    overall = sum(averages.values()) / len(averages)
+
+    insights = []
+    for month, average in averages.items():
+        if average > overall * 1.3:
+            insights.append({
+                "type": "seasonal_high_spending",
+                "month": month,
+                "month_name": _MONTH_NAMES[month],
+                "average_spending": average,
+                "overall_average": overall,
+                "message": f"High spending in {_MONTH_NAMES[month]}: ${average:.2f} vs ${overall:.2f} average"
+            })
+    return insights
+
+
+def _bucket_amount(bucket: str) -> float:
+    if bucket == _ZERO_BUCKET:
+        return 0.0
+    return 2 ** ((int(bucket) + 0.5) / _BUCKETS_PER_DOUBLING)
+
+
+def amount_quantiles(stats: dict, *fractions: float) -> List[float]:
+    """Amounts at ``fractions`` of the way through all transactions, from the histogram."""
+    buckets = sorted(stats["amount_buckets"].items(), key=lambda bucket: _bucket_amount(bucket[0]))
+    n = sum(count for _, count in buckets)
+    quantiles = []
+    for fraction in fractions:
+        rank, seen = int(n * fraction), 0
+        for bucket, count in buckets:
+            seen += count
+            if seen > rank:
+                quantiles.append(_bucket_amount(bucket))
+                break
+    return quantiles
+
+
+def anomaly_insights(stats: dict, since: date) -> list:
+    """The (up to) three latest charges above the upper Tukey fence (Q3 + 1.5 IQR), oldest first."""
+    months = _in(stats["months"], _month(_month_index(since)))
+    if not months or not stats["amount_buckets"]:
+        return []
+    average = _total(months) / _count(months)
+    q1, q3 = amount_quantiles(stats, 0.25, 0.75)
+    upper_bound = q3 + 1.5 * (q3 - q1)
+
+    outliers = sorted(
+        ((charge, merchant) for merchant in stats["merchants"] for charge in _charges_since(stats, merchant, since) if charge["amount"] > upper_bound),
+        key=lambda outlier: outlier[0]["date"],
+    )
+    insights = []
+    for charge, merchant in outliers[-3:]:
+        amount = charge["amount"]
+        insights.append({
+            "type": "spending_anomaly",
+            "amount": amount,
+            "merchant": merchant,
+            "date": charge["date"],
+            "average_amount": average,
+            "message": f"Unusual transaction: ${amount:.2f} at {merchant} (avg: ${average:.2f})"
+        })
+    return insights
+
+
+def insights(stats: dict, since: date) -> list:
+    """Every detector's insights for the months from ``since``, in the order the analysis lists them."""
+    return [
+        *subscription_insights(stats, since),
+        *category_trend_insights(stats, since),
+        *merchant_insights(stats, since),
+        *seasonal_insights(stats, since),
+        *anomaly_insights(stats, since),
+    ]
+
+
+def period_summary(stats: dict, first: str, last: str) -> dict:
+    """Spending from month ``first`` to ``last`` (YYYY-MM): totals, per category, and per merchant with their latest charges."""
+    months = _in(stats["months"], first, last)
+    merchants = []
+    for merchant, entry in stats["merchants"].items():
+        merchant_months = _in(entry["months"], first, last)
+        if merchant_months:
+            merchants.append({
+                "merchant": merchant,
+                "count": _count(merchant_months),
+                "total": round(_total(merchant_months), 2),
+                "recent_charges": [
+                    {"amount": charge["amount"], "date": charge["date"]}
+                    for charge in entry["recent"] if first <= charge["date"][:7] <= last
+                ],
+            })
+    merchants.sort(key=lambda merchant: -merchant["total"])
+    by_category = {category: _in(series, first, last) for category, series in stats["categories"].items()}
+    return {
+        "period": f"{first} to {last}",
+        "transaction_count": _count(months),
+        "total": round(_total(months), 2),
+        "by_category": {category: round(_total(series), 2) for category, series in by_category.items() if series},
+        "by_merchant": merchants[:PERIOD_MERCHANTS],
+        "merchants_omitted": max(len(merchants) - PERIOD_MERCHANTS, 0),
+    }
+
+
+def recent_periods(stats: dict, today: date) -> Optional[Tuple[dict, dict]]:
+    """
+    The summary of the shortest of the last PERIOD_MONTHS months (up to
+    ``today``'s) with any transactions, and of the same number of months
+    before it; None if there were none in the longest.
+    """
+    end = _month_index(today)
+    for months in PERIOD_MONTHS:
+        current = period_summary(stats, _month(end - months + 1), _month(end))
+        if current["transaction_count"]:
+            return current, period_summary(stats, _month(end - 2 * months + 1), _month(end - months))
+    return None
+
+
+def charges(summary: dict) -> List[dict]:
+    """A period summary's latest charges as transaction-like dicts, in date order."""
+    rows = [
+        {"store_name": merchant["merchant"], "total_amount": charge["amount"], "transaction_date": charge["date"]}
+        for merchant in summary["by_merchant"] for charge in merchant["recent_charges"]
+    ]
+    return sorted(rows, key=lambda row: row["transaction_date"])
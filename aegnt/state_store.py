@@ -0,0 +1,400 @@
+"""
+State shared between aegnt's worker processes.
+
+Which session each user is on and the lock on their running turn
+(sessions.py), cached answers (answer_cache.py), the LLM usage totals behind
+the per-user budgets (llm_usage.py) and each user's admission slots
+(admission.py) used to live in module-level dicts, so every uvicorn worker kept
+its own: a user's turns could run at once in two workers, budgets and turn
+limits were counted per worker, and each worker missed the others' cached
+answers. They now go through a StateStore selected by STATE_STORE:
+
+- "memory": dicts in this process. For a single worker (the default) and tests.
+- "sqlite": one database file (STATE_DB_PATH) shared by all workers on the
+  host. Writes are serialised by SQLite's own file lock, so read-modify-write
+  operations are atomic across processes.
+
+Deployments spanning several hosts can add a backend (e.g. Redis) by
+implementing the primitives below.
+
+Values are JSON-serialisable documents grouped in namespaces. The API is
+synchronous, but a SQLite write can wait up to its busy timeout for another
+worker's transaction, so async code calls the store through ``run``, which
+moves a blocking backend's calls onto a worker thread.
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import config
+
+STATE_STORES = ("memory", "sqlite")
+
+LOCKS = "locks"
+
+# (value, expires_at); expires_at None means no expiry
+_Entry = Tuple[Any, Optional[float]]
+
+
+def _prefix_end(prefix: str) -> str:
+    """The smallest string greater than every string starting with ``prefix``."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class StateStore(ABC):
+    """
+    Namespaced JSON documents with expiry, least-recently-used trimming,
+    atomic counters, leased locks and leased slots.
+
+    Backends provide the primitives; every public method runs inside
+    ``_atomic`` so it is one unit against other threads and processes.
+    """
+
+    name = "base"
+
+    # Whether calls can wait on other processes, e.g. for SQLite's write lock
+    blocking = False
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        # Wall-clock time, so expiry means the same thing in every process
+        self.clock = clock
+
+    async def run(self, operation: Callable, *args, **kwargs):
+        """
+        Calls ``operation`` (a method of the store, or a function using it) from
+        async code; on a blocking store it runs in a worker thread, so the event
+        loop never waits on another process's lock.
+        """
+        if self.blocking:
+            return await asyncio.to_thread(operation, *args, **kwargs)
+        return operation(*args, **kwargs)
+
+    # --- primitives -------------------------------------------------------
+
+    @abstractmethod
+    def _atomic(self, write: bool = True):
+        """
+        Context manager grouping primitives into one atomic unit. Read-only
+        units (``write=False``) need not exclude other readers.
+        """
+
+    @abstractmethod
+    def _read(self, namespace: str, key: str) -> Optional[_Entry]:
+        """The stored entry, expired or not, or None."""
+
+    @abstractmethod
+    def _write(self, namespace: str, key: str, value: Any, expires_at: Optional[float]):
+        """Creates or replaces an entry and marks it most recently used."""
+
+    @abstractmethod
+    def _touch(self, namespace: str, key: str):
+        """Marks an existing entry most recently used."""
+
+    @abstractmethod
+    def _remove(self, namespace: str, key: str):
+        """Deletes an entry if it exists."""
+
+    @abstractmethod
+    def _scan(self, namespace: str, prefix: str) -> List[Tuple[str, Any, Optional[float]]]:
+        """(key, value, expires_at) of the entries whose key starts with ``prefix``, by key."""
+
+    @abstractmethod
+    def _trim(self, namespace: str, max_entries: int):
+        """Deletes the least recently used entries beyond ``max_entries``."""
+
+    @abstractmethod
+    def _remove_namespace(self, namespace: Optional[str]):
+        """Deletes every entry of a namespace, or of all of them."""
+
+    def close(self):
+        """Releases connections."""
+
+    # --- documents --------------------------------------------------------
+
+    def _live(self, entry: Optional[_Entry]) -> bool:
+        return entry is not None and (entry[1] is None or entry[1] > self.clock())
+
+    def get(self, namespace: str, key: str, touch: bool = False) -> Any:
+        """The value stored under ``key``, or None if missing or expired."""
+        with self._atomic(write=touch):
+            entry = self._read(namespace, key)
+            if not self._live(entry):
+                return None
+            if touch:
+                self._touch(namespace, key)
+            return entry[0]
+
+    def put(self, namespace: str, key: str, value: Any, ttl_seconds: Optional[float] = None):
+        expires_at = self.clock() + ttl_seconds if ttl_seconds is not None else None
+        with self._atomic():
+            self._write(namespace, key, value, expires_at)
+
+    def delete(self, namespace: str, key: str):
+        with self._atomic():
+            self._remove(namespace, key)
+
+    def items(self, namespace: str, prefix: str = "") -> List[Tuple[str, Any]]:
+        """Unexpired (key, value) pairs whose key starts with ``prefix``, ordered by key."""
+        with self._atomic(write=False):
+            entries = self._scan(namespace, prefix)
+        now = self.clock()
+        return [(key, value) for key, value, expires_at in entries if expires_at is None or expires_at > now]
+
+    def trim(self, namespace: str, max_entries: int):
+        with self._atomic():
+            self._trim(namespace, max_entries)
+
+    def add(self, namespace: str, key: str, amounts: Dict[str, float], maxima: Optional[Dict[str, float]] = None) -> dict:
+        """Adds ``amounts`` to (and raises to ``maxima``) the numeric fields of a document atomically."""
+        with self._atomic():
+            entry = self._read(namespace, key)
+            document = dict(entry[0]) if self._live(entry) else {}
+            for field, amount in amounts.items():
+                document[field] = document.get(field, 0) + amount
+            for field, value in (maxima or {}).items():
+                document[field] = max(document.get(field, value), value)
+            self._write(namespace, key, document, None)
+            return document
+
+    def clear(self, namespace: Optional[str] = None):
+        with self._atomic():
+            self._remove_namespace(namespace)
+
+    # --- locks ------------------------------------------------------------
+
+    def acquire(self, name: str, owner: str, ttl_seconds: float) -> bool:
+        """
+        Takes the lock ``name`` for ``owner`` unless someone else holds it.
+
+        The lock lapses after ``ttl_seconds``, so one held by a worker that died
+        is not held forever.
+        """
+        with self._atomic():
+            entry = self._read(LOCKS, name)
+            if self._live(entry) and entry[0] != owner:
+                return False
+            self._write(LOCKS, name, owner, self.clock() + ttl_seconds)
+            return True
+
+    def release(self, name: str, owner: str):
+        with self._atomic():
+            entry = self._read(LOCKS, name)
+            if entry is not None and entry[0] == owner:
+                self._remove(LOCKS, name)
+
+    def is_locked(self, name: str) -> bool:
+        return self.get(LOCKS, name) is not None
+
+    # --- slots ------------------------------------------------------------
+
+    def take_slot(self, namespace: str, name: str, holder: str, limit: int, ttl_seconds: float) -> bool:
+        """
+        Leases one of the ``limit`` slots of ``name`` to ``holder`` unless they
+        are all taken. Like a lock, the slot lapses after ``ttl_seconds``.
+        """
+        with self._atomic():
+            holders = self._holders(namespace, name)
+            if len(holders) >= limit:
+                return False
+            holders[holder] = self.clock() + ttl_seconds
+            self._write(namespace, name, holders, max(holders.values()))
+            return True
+
+    def release_slot(self, namespace: str, name: str, holder: str):
+        with self._atomic():
+            holders = self._holders(namespace, name)
+            if holders.pop(holder, None) is None:
+                return
+            if holders:
+                self._write(namespace, name, holders, max(holders.values()))
+            else:
+                self._remove(namespace, name)
+
+    def _holders(self, namespace: str, name: str) -> Dict[str, float]:
+        """The unexpired leases on ``name``'s slots, by holder."""
+        entry = self._read(namespace, name)
+        now = self.clock()
+        return {holder: expires_at for holder, expires_at in (entry[0] if entry else {}).items() if expires_at > now}
+
+
+class MemoryStateStore(StateStore):
+    """State in this process only."""
+
+    name = "memory"
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        super().__init__(clock)
+        self._namespaces: Dict[str, "OrderedDict[str, _Entry]"] = {}
+        self._lock = threading.RLock()
+
+    @contextmanager
+    def _atomic(self, write=True):
+        with self._lock:
+            yield
+
+    @staticmethod
+    def _copy(value):
+        # Round-tripped through JSON like the other backends, so callers never
+        # share mutable values with the store
+        return json.loads(json.dumps(value))
+
+    def _read(self, namespace, key):
+        entry = self._namespaces.get(namespace, {}).get(key)
+        return (self._copy(entry[0]), entry[1]) if entry is not None else None
+
+    def _write(self, namespace, key, value, expires_at):
+        entries = self._namespaces.setdefault(namespace, OrderedDict())
+        entries[key] = (self._copy(value), expires_at)
+        entries.move_to_end(key)
+
+    def _touch(self, namespace, key):
+        self._namespaces[namespace].move_to_end(key)
+
+    def _remove(self, namespace, key):
+        self._namespaces.get(namespace, {}).pop(key, None)
+
+    def _scan(self, namespace, prefix):
+        entries = self._namespaces.get(namespace, {})
+        return sorted((key, self._copy(value), expires_at) for key, (value, expires_at) in entries.items() if key.startswith(prefix))
+
+    def _trim(self, namespace, max_entries):
+        entries = self._namespaces.get(namespace, OrderedDict())
+        while len(entries) > max(max_entries, 0):
+            entries.popitem(last=False)
+
+    def _remove_namespace(self, namespace):
+        if namespace is None:
+            self._namespaces.clear()
+        else:
+            self._namespaces.pop(namespace, None)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires_at REAL,
+    used INTEGER NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS state_by_namespace_use ON state (namespace, used);
+CREATE INDEX IF NOT EXISTS state_by_use ON state (used);
+"""
+
+
+class SQLiteStateStore(StateStore):
+    """
+    State in one SQLite file, shared by every process that opens it.
+
+    ``used`` is a table-wide sequence number bumped on every write or touch,
+    which orders entries for least-recently-used trimming across processes.
+    """
+
+    name = "sqlite"
+    blocking = True
+
+    def __init__(self, path: str, clock: Callable[[], float] = time.time):
+        super().__init__(clock)
+        self.path = path
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            with self._lock:
+                if self._connection is None:
+                    # Workers wait on each other's write transactions rather than fail
+                    connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+                    connection.execute("PRAGMA journal_mode=WAL")
+                    connection.execute("PRAGMA synchronous=NORMAL")
+                    connection.executescript(SCHEMA)
+                    self._connection = connection
+        return self._connection
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    @contextmanager
+    def _atomic(self, write=True):
+        with self._lock:
+            connection = self.connection
+            if connection.in_transaction or not write:
+                # Nested units join the outer transaction; single reads need none
+                yield
+                return
+            # Taken up front, so a read-modify-write cannot interleave with another process
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+    def _next_use(self) -> int:
+        return self.connection.execute("SELECT COALESCE(MAX(used), 0) + 1 FROM state").fetchone()[0]
+
+    def _read(self, namespace, key):
+        row = self.connection.execute(
+            "SELECT value, expires_at FROM state WHERE namespace = ? AND key = ?", (namespace, key)
+        ).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def _write(self, namespace, key, value, expires_at):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO state (namespace, key, value, expires_at, used) VALUES (?, ?, ?, ?, ?)",
+            (namespace, key, json.dumps(value), expires_at, self._next_use()),
+        )
+
+    def _touch(self, namespace, key):
+        self.connection.execute("UPDATE state SET used = ? WHERE namespace = ? AND key = ?", (self._next_use(), namespace, key))
+
+    def _remove(self, namespace, key):
+        self.connection.execute("DELETE FROM state WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def _scan(self, namespace, prefix):
+        if prefix:
+            rows = self.connection.execute(
+                "SELECT key, value, expires_at FROM state WHERE namespace = ? AND key >= ? AND key < ? ORDER BY key",
+                (namespace, prefix, _prefix_end(prefix)),
+            )
+        else:
+            rows = self.connection.execute("SELECT key, value, expires_at FROM state WHERE namespace = ? ORDER BY key", (namespace,))
+        return [(key, json.loads(value), expires_at) for key, value, expires_at in rows]
+
+    def _trim(self, namespace, max_entries):
+        self.connection.execute(
+            "DELETE FROM state WHERE namespace = ? AND used NOT IN "
+            "(SELECT used FROM state WHERE namespace = ? ORDER BY used DESC LIMIT ?)",
+            (namespace, namespace, max(max_entries, 0)),
+        )
+
+    def _remove_namespace(self, namespace):
+        if namespace is None:
+            self.connection.execute("DELETE FROM state")
+        else:
+            self.connection.execute("DELETE FROM state WHERE namespace = ?", (namespace,))
+
+
+def create_state_store(backend: str, sqlite_path: str = "aegnt_state.db") -> StateStore:
+    """Builds the store selected by the STATE_STORE setting."""
+    backend = (backend or "memory").lower()
+    if backend == "memory":
+        return MemoryStateStore()
+    if backend == "sqlite":
+        return SQLiteStateStore(sqlite_path)
+    raise ValueError(f"Unknown STATE_STORE '{backend}', expected one of: {', '.join(STATE_STORES)}")
+
+
+state_store = create_state_store(config.STATE_STORE, config.STATE_DB_PATH)
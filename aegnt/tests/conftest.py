@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from google.adk.sessions import InMemorySessionService
+
+from sessions import SessionManager
+from tests.test_streaming import StreamingLlm
+
+
+@pytest.fixture
+def streaming_client(monkeypatch):
+    """A client of the agent app with fresh in-memory sessions and a model that answers "Hello, world"."""
+    import main_agent
+
+    session_service = InMemorySessionService()
+    monkeypatch.setattr(main_agent.runner, "session_service", session_service)
+    monkeypatch.setattr(main_agent, "session_manager", SessionManager(session_service, main_agent.runner.app_name))
+    monkeypatch.setattr(main_agent.root_agent, "model", StreamingLlm(model="streaming-test", chunks=["Hello", ", ", "world"]))
+    return TestClient(main_agent.app)
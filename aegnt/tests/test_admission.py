@@ -0,0 +1,201 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from admission import BACKGROUND, INTERACTIVE, AdmissionController, AdmissionRejected
+from state_store import SQLiteStateStore
+
+
+def controller(**limits):
+    settings = dict(
+        max_in_flight=2,
+        max_background_in_flight=1,
+        user_max_in_flight=1,
+        user_max_queued=1,
+        max_queue=8,
+        max_wait_seconds=30,
+        background_max_wait_seconds=60,
+        turn_seconds=1,
+    )
+    settings.update(limits)
+    return AdmissionController(**settings)
+
+
+async def started(task):
+    """Whether ``task`` has been admitted, after letting pending callbacks run."""
+    for _ in range(5):
+        await asyncio.sleep(0)
+    return task.done()
+
+
+def test_turns_beyond_the_cap_wait_for_a_slot():
+    async def scenario():
+        admission = controller()
+        first = await admission.acquire("user-1")
+        await admission.acquire("user-2")
+        third = asyncio.create_task(admission.acquire("user-3"))
+
+        assert not await started(third)
+        await admission.release(first)
+        assert await started(third)
+        return admission.status()
+
+    assert asyncio.run(scenario())["in_flight"] == 2
+
+
+def test_a_user_runs_one_turn_and_queues_a_limited_number():
+    async def scenario():
+        admission = controller()
+        await admission.acquire("user-1")
+        queued = asyncio.create_task(admission.acquire("user-1"))
+
+        assert not await started(queued)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await admission.acquire("user-1")
+        # Other users are not held up by user-1's backlog
+        await admission.acquire("user-2")
+        queued.cancel()
+        return rejected.value
+
+    assert asyncio.run(scenario()).reason == "user_limit"
+
+
+def test_background_turns_leave_room_for_interactive_ones():
+    async def scenario():
+        admission = controller(max_in_flight=3)
+        await admission.acquire("user-1", BACKGROUND)
+        waiting = asyncio.create_task(admission.acquire("user-2", BACKGROUND))
+
+        assert not await started(waiting)
+        await admission.acquire("user-3", INTERACTIVE)
+        waiting.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_interactive_turns_are_served_before_queued_background_ones():
+    async def scenario():
+        admission = controller(max_in_flight=1, max_background_in_flight=1)
+        running = await admission.acquire("user-1")
+        background = asyncio.create_task(admission.acquire("user-2", BACKGROUND))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(admission.acquire("user-3"))
+        await asyncio.sleep(0)
+
+        await admission.release(running)
+        assert await started(interactive) and not background.done()
+        background.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_turns_that_cannot_start_in_time_are_rejected_on_arrival():
+    async def scenario():
+        admission = controller(max_in_flight=1, max_wait_seconds=5, turn_seconds=10)
+        await admission.acquire("user-1")
+        with pytest.raises(AdmissionRejected) as rejected:
+            await admission.acquire("user-2")
+        return admission, rejected.value
+
+    admission, rejected = asyncio.run(scenario())
+    assert rejected.reason == "deadline"
+    assert rejected.retry_after_header == "10"
+    assert admission.status()["queued"] == 0
+
+
+def test_a_full_queue_sheds_background_turns_for_interactive_ones():
+    async def scenario():
+        admission = controller(max_in_flight=1, max_queue=1)
+        await admission.acquire("user-1")
+        background = asyncio.create_task(admission.acquire("user-2", BACKGROUND))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(admission.acquire("user-3"))
+
+        with pytest.raises(AdmissionRejected) as shed:
+            await background
+        assert not await started(interactive)
+        with pytest.raises(AdmissionRejected) as full:
+            await admission.acquire("user-4", BACKGROUND)
+        interactive.cancel()
+        return shed.value, full.value
+
+    shed, full = asyncio.run(scenario())
+    assert (shed.reason, full.reason) == ("shed", "queue_full")
+
+
+def test_cancelled_waiters_give_back_their_place():
+    async def scenario():
+        admission = controller(max_in_flight=1)
+        running = await admission.acquire("user-1")
+        waiting = asyncio.create_task(admission.acquire("user-2"))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        await started(waiting)
+        await admission.release(running)
+        return admission.status()
+
+    status = asyncio.run(scenario())
+    assert (status["in_flight"], status["queued"]) == (0, 0)
+
+
+def test_user_limits_are_shared_by_workers(tmp_path):
+    async def scenario():
+        workers = [controller(user_max_queued=0, store=SQLiteStateStore(str(tmp_path / "state.db"))) for _ in range(2)]
+        running = await workers[0].acquire("user-1")
+        with pytest.raises(AdmissionRejected) as rejected:
+            await workers[1].acquire("user-1")
+        await workers[0].release(running)
+        await workers[1].acquire("user-1")
+        return rejected.value
+
+    assert asyncio.run(scenario()).reason == "user_limit"
+
+
+def test_rejected_turns_give_back_their_user_slot():
+    async def scenario():
+        admission = controller(max_in_flight=1, max_wait_seconds=5, turn_seconds=10)
+        await admission.acquire("user-1")
+        for _ in range(3):
+            with pytest.raises(AdmissionRejected) as rejected:
+                await admission.acquire("user-2")
+            assert rejected.value.reason == "deadline"
+
+    asyncio.run(scenario())
+
+
+def test_deployment_limits_are_split_between_workers():
+    admission = controller(max_in_flight=8, max_background_in_flight=3, max_queue=8, workers=4)
+
+    assert (admission.max_in_flight, admission.max_background_in_flight, admission.max_queue) == (2, 1, 2)
+
+
+def test_busy_endpoints_answer_429_with_retry_after(streaming_client, monkeypatch):
+    import main_agent
+
+    admission = controller(max_in_flight=1, user_max_queued=0)
+    monkeypatch.setattr(main_agent, "admission_controller", admission)
+    asyncio.run(admission.acquire("user-1"))
+    payload = {"user_id": "user-1", "prompt": "hi", "id_token": "token"}
+
+    buffered = streaming_client.post("/invoke_agent", json=payload)
+    streamed = streaming_client.post("/invoke_agent/stream", json=payload)
+
+    assert [buffered.status_code, streamed.status_code] == [429, 429]
+    assert buffered.headers["Retry-After"] == streamed.headers["Retry-After"] == "1"
+
+
+def test_streamed_turns_release_their_slot(streaming_client, monkeypatch):
+    import main_agent
+
+    admission = controller()
+    monkeypatch.setattr(main_agent, "admission_controller", admission)
+
+    response = streaming_client.post("/invoke_agent/stream", json={"user_id": "user-1", "prompt": "hi", "id_token": "token"})
+
+    assert response.status_code == 200
+    assert admission.status()["in_flight"] == 0 and admission.admitted == 1
@@ -0,0 +1,146 @@
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from google.adk.sessions import InMemorySessionService
+
+from answer_cache import AnswerCache
+from sessions import SessionManager
+from state_store import SQLiteStateStore
+from tests.test_streaming import StreamingLlm
+
+ANSWER = [{"type": "text", "content": "Groceries are up 12%."}]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_are_keyed_on_the_data_version():
+    cache = AnswerCache(max_entries=10, ttl_seconds=60)
+    cache.put(cache.key("user-1", "Spending trends by category?", 3), ANSWER)
+
+    assert cache.get(cache.key("user-1", "  spending TRENDS by category ", 3)) == ANSWER
+    assert cache.get(cache.key("user-1", "spending trends by category", 4)) is None
+    assert cache.get(cache.key("user-2", "spending trends by category", 3)) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_least_recently_used_and_expired_entries_are_evicted():
+    clock = Clock()
+    cache = AnswerCache(max_entries=2, ttl_seconds=60, clock=clock)
+    for prompt in ("a", "b"):
+        cache.put(cache.key("user-1", prompt, 1), ANSWER)
+    cache.get(cache.key("user-1", "a", 1))
+    cache.put(cache.key("user-1", "c", 1), ANSWER)
+
+    assert cache.get(cache.key("user-1", "b", 1)) is None
+    clock.now = 61
+    assert cache.get(cache.key("user-1", "a", 1)) is None
+    # "c" was stored at the same time and has expired too
+    assert len(cache) == 0
+
+
+@pytest.mark.parametrize("prompt", ["And last month?", "what about food", "Why is that?", "show me the same for March"])
+def test_follow_ups_are_not_cached(prompt):
+    assert AnswerCache.key("user-1", prompt, 1) is None
+
+
+def test_unversioned_and_side_effect_turns_are_not_cached():
+    cache = AnswerCache(max_entries=10, ttl_seconds=60)
+    notified = [{"type": "function_call", "name": "notification_agent", "args": {}}, *ANSWER]
+    cache.put(cache.key("user-1", "remind me to pay rent", 1), notified)
+
+    assert AnswerCache.key("user-1", "spending trends", None) is None
+    assert len(cache) == 0
+
+
+@pytest.fixture
+def client(monkeypatch):
+    import main_agent
+
+    session_service = InMemorySessionService()
+    llm = StreamingLlm(model="streaming-test", chunks=["Groceries ", "are up 12%."])
+    calls = []
+    generate = StreamingLlm.generate_content_async
+
+    def counting(self, llm_request, stream=False):
+        calls.append(llm_request)
+        return generate(self, llm_request, stream)
+
+    monkeypatch.setattr(StreamingLlm, "generate_content_async", counting)
+    monkeypatch.setattr(main_agent.runner, "session_service", session_service)
+    monkeypatch.setattr(main_agent, "session_manager", SessionManager(session_service, main_agent.runner.app_name))
+    monkeypatch.setattr(main_agent.root_agent, "model", llm)
+    monkeypatch.setattr(main_agent.config, "FAST_PATH_ENABLED", False)
+    monkeypatch.setattr(main_agent, "answer_cache", AnswerCache(max_entries=10, ttl_seconds=60))
+    client = TestClient(main_agent.app)
+    client.llm_calls = calls
+    return client
+
+
+def ask(client, prompt, data_version, path="/invoke_agent"):
+    return client.post(path, json={"user_id": "user-1", "prompt": prompt, "id_token": "token", "data_version": data_version})
+
+
+def test_repeated_questions_skip_the_model_until_the_data_changes(client):
+    import main_agent
+
+    first = ask(client, "Spending trends by category", 7).json()
+    second = ask(client, "spending trends by category?", 7).json()
+    streamed = ask(client, "Spending trends by category", 7, path="/invoke_agent/stream")
+    assert first == second == {"parts": [{"type": "text", "content": "Groceries are up 12%."}]}
+    assert 'event: done\ndata: {"parts": [{"type": "text", "content": "Groceries are up 12%."}]}' in streamed.text
+    assert len(client.llm_calls) == 1
+
+    ask(client, "Spending trends by category", 8)
+    assert len(client.llm_calls) == 2
+    # Cached answers still become part of the conversation
+    [session] = main_agent.runner.session_service.sessions[main_agent.runner.app_name]["user-1"].values()
+    assert [event.author for event in session.events] == ["user", "Aegnt"] * 4
+
+
+def test_requests_without_a_data_version_always_run_the_agent(client):
+    ask(client, "Spending trends by category", None)
+    ask(client, "Spending trends by category", None)
+
+    assert len(client.llm_calls) == 2
+
+
+def test_cached_tool_calls_keep_no_credentials(monkeypatch, tmp_path):
+    import main_agent
+
+    store = SQLiteStateStore(str(tmp_path / "state.db"))
+    monkeypatch.setattr(main_agent, "answer_cache", AnswerCache(max_entries=10, ttl_seconds=60, store=store))
+
+    async def record_exchange(*args):
+        pass
+
+    monkeypatch.setattr(main_agent, "_record_exchange", record_exchange)
+    credentials = {"user_id": "user-1", "id_token": "secret-token-1"}
+    call = {"name": "get_spending_summary", "args": {"period": "month", **credentials}}
+    parts = [{"type": "function_call", "name": call["name"], "args": dict(call["args"]), "content": call}, *ANSWER]
+    key = AnswerCache.key("user-1", "Spending trends by category", 7)
+
+    asyncio.run(main_agent._cache_answer(key, parts))
+    request = main_agent.AegntRequest(user_id="user-1", prompt="Spending trends by category", id_token="secret-token-2", data_version=7)
+    answered = asyncio.run(main_agent._answer_without_agent(request, "session-1", key))
+
+    stored = json.dumps(main_agent.answer_cache.get(key))
+    store.close()
+    assert "secret-token" not in stored and "user-1" not in stored
+    assert b"secret-token" not in (tmp_path / "state.db").read_bytes()
+    # The answer carries the credentials of the request it answers
+    assert answered[0]["args"] == answered[0]["content"]["args"] == {"period": "month", "user_id": "user-1", "id_token": "secret-token-2"}
+    assert parts[0]["args"]["id_token"] == "secret-token-1"
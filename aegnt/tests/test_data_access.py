@@ -0,0 +1,111 @@
+import asyncio
+import os
+import sys
+from datetime import date, datetime
+
+import httpx
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import config
+import data_access
+import fast_path
+import tool_definitions
+
+data_access._import_backend()
+
+import main as backend_main
+from core import auth as backend_auth
+from core.container import ServiceContainer
+from services.firestore_service import FirestoreService
+from services.storage.memory_storage import MemoryStorage
+
+TOKENS = {"token-1": "user-1", "token-2": "user-2"}
+
+
+def fake_verify_id_token(token):
+    if token not in TOKENS:
+        raise backend_auth.auth.InvalidIdTokenError("bad token")
+    return {"uid": TOKENS[token], "email": f"{TOKENS[token]}@example.com", "exp": 2**40}
+
+
+def transaction(store_name, day, amount, category="Supermarket", item="Milk"):
+    return {
+        "user_id": "user-1",
+        "store_name": store_name,
+        "transaction_date": datetime(2024, 3, day, 10),
+        "items": [{"name": item, "price": amount, "category": "Dairy"}],
+        "total_amount": amount,
+        "category": category,
+    }
+
+
+@pytest.fixture
+def firestore_service(monkeypatch):
+    service = FirestoreService(storage=MemoryStorage())
+    for document in (
+        transaction("FreshMart", 2, 120.0),
+        transaction("Spice Route", 5, 450.0, category="Restaurant", item="Biryani"),
+        transaction("FreshMart", 9, 80.0),
+    ):
+        asyncio.run(service.add_transaction("user-1", document))
+    monkeypatch.setattr(config, "DATA_ACCESS_MODE", "direct")
+    monkeypatch.setattr(backend_auth, "verify_id_token", fake_verify_id_token)
+    monkeypatch.setattr(data_access, "_firestore_service", service)
+    monkeypatch.setattr(data_access, "_resolve_user", None)
+    return service
+
+
+def backend_get(firestore_service, path, params, token):
+    """The same request made over the backend's HTTP API."""
+    services = ServiceContainer()
+    services.firestore_service = firestore_service
+    backend_main.app.state.services = services
+
+    async def get():
+        transport = httpx.ASGITransport(app=backend_main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://backend") as client:
+            return await client.get(f"/api/v1{path}", params=params, headers={"Authorization": f"Bearer {token}"})
+
+    response = asyncio.run(get())
+    response.raise_for_status()
+    return response.json()
+
+
+def test_direct_reads_match_the_api(firestore_service):
+    direct = asyncio.run(tool_definitions.query_transactions("user-1", "token-1", "2024-03-01", "2024-03-31", store_name="FreshMart"))
+
+    assert [t["total_amount"] for t in direct] == [120.0, 80.0]
+    assert direct == backend_get(firestore_service, "/transactions", {"start_date": "2024-03-01", "end_date": "2024-03-31", "store_name": "FreshMart"}, "token-1")
+
+
+def test_user_comes_from_the_token_not_the_arguments(firestore_service):
+    # A caller naming another user still only sees the token owner's data
+    assert asyncio.run(tool_definitions.query_transactions("user-1", "token-2", "2024-03-01", "2024-03-31")) == []
+
+
+def test_invalid_tokens_resolve_like_the_api(firestore_service):
+    user_id = asyncio.run(data_access.get_user_id("not-a-token"))
+
+    assert user_id == backend_auth.user_for_token(None).uid
+
+
+def test_failures_come_back_as_tool_errors(firestore_service):
+    result = asyncio.run(tool_definitions.query_transactions("user-1", "token-1", "March", "2024-03-31"))
+
+    assert len(result) == 1 and result[0]["error"].startswith("Reading transactions failed")
+
+
+def test_fast_path_reads_the_summary_directly(firestore_service):
+    intent = fast_path.classify("Where did I spend the most in March 2024?", date(2024, 4, 2))
+
+    direct = asyncio.run(fast_path.fetch_summary(intent, "token-1"))
+
+    assert direct["by_store"][0]["store_name"] == "Spice Route"
+    assert direct == backend_get(firestore_service, "/transactions/summary", {"start_date": intent.start_date, "end_date": intent.end_date, "top": 3}, "token-1")
+
+
+def test_http_mode_is_the_default():
+    assert config.DATA_ACCESS_MODE == "http" and not data_access.enabled()
@@ -0,0 +1,85 @@
+import asyncio
+import os
+import sys
+from datetime import date
+
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import tool_definitions
+from date_ranges import parse_date_range
+
+TODAY = date(2024, 3, 14)
+
+
+@pytest.mark.parametrize("text, start, end", [
+    ("how much did I spend today", "2024-03-14", "2024-03-14"),
+    ("spending last week", "2024-03-04", "2024-03-10"),
+    ("how much at FreshMart in the last 3 weeks", "2024-02-23", "2024-03-14"),
+    ("my spending over the past two months", "2024-01-15", "2024-03-14"),
+    ("totals for the past quarter", "2023-10-01", "2023-12-31"),
+    ("this quarter so far", "2024-01-01", "2024-03-14"),
+    ("YTD spending by category", "2024-01-01", "2024-03-14"),
+    ("month-to-date groceries", "2024-03-01", "2024-03-14"),
+    ("What did I spend in December?", "2023-12-01", "2023-12-31"),
+    ("restaurants in Sept 2022", "2022-09-01", "2022-09-30"),
+    ("Q3 2023 electronics", "2023-07-01", "2023-09-30"),
+    ("the third quarter of 2021", "2021-07-01", "2021-09-30"),
+    ("Q4", "2023-10-01", "2023-12-31"),
+    ("everything in 2031", "2031-01-01", "2031-12-31"),
+    ("spending since last April", "2023-04-01", "2024-03-14"),
+    ("from March to May 2023", "2023-03-01", "2023-05-31"),
+    ("between 2021-02-03 and 2021-02-10", "2021-02-03", "2021-02-10"),
+    ("compare May and June", "2023-05-01", "2023-06-30"),
+    ("anything over 2000 in 2023", "2023-01-01", "2023-12-31"),
+    ("groceries during 2022", "2022-01-01", "2022-12-31"),
+    ("I may want to see 2025", "2025-01-01", "2025-12-31"),
+    ("what did I spend in may", "2023-05-01", "2023-05-31"),
+    ("spending on may 5th", "2023-05-01", "2023-05-31"),
+    ("spending in may 2022", "2022-05-01", "2022-05-31"),
+    ("May groceries", "2023-05-01", "2023-05-31"),
+])
+def test_periods_resolve_to_the_narrowest_range(text, start, end):
+    date_range = parse_date_range(text, TODAY)
+
+    assert (date_range.start.isoformat(), date_range.end.isoformat()) == (start, end)
+
+
+@pytest.mark.parametrize("text", [
+    "what are my spending trends by category",
+    "may I see my top stores",
+    "May I see my top stores",
+    "you may want to check my spending",
+    "which stores may have overcharged me",
+    "did I spend more than 2000 rupees on food",
+    "did I spend more than 2000 on food",
+    "purchases over 1999",
+    "anything under 2024 at FreshMart",
+    "how often have I spent 2000 or more",
+    "what did I buy on 2024-02-30",
+    "spending in the last 0 days",
+    "spending since 2031",
+    "from 2023-13-01 to 2024-01-31",
+])
+def test_text_without_a_period_has_no_range(text):
+    assert parse_date_range(text, TODAY) is None
+
+
+def test_analysis_only_fetches_the_period_asked_about(monkeypatch):
+    queries = []
+
+    async def query_transactions(**filters):
+        queries.append(filters)
+        return []
+
+    monkeypatch.setattr(tool_definitions, "query_transactions", query_transactions)
+    monkeypatch.setattr(tool_definitions, "parse_date_range", lambda text: parse_date_range(text, TODAY))
+
+    asyncio.run(tool_definitions.analyze_financial_data("user-1", "token", "What was my total spending at stores in Q1 2023?"))
+    asyncio.run(tool_definitions.analyze_financial_data("user-1", "token", "What are my spending trends by category?"))
+
+    assert (queries[0]["start_date"], queries[0]["end_date"]) == ("2023-01-01", "2023-03-31")
+    # Without a period, broad questions still cover the whole history
+    assert queries[1]["start_date"] == "2015-01-01"
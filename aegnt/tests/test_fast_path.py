@@ -0,0 +1,163 @@
+import json
+import os
+import sys
+from datetime import date
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from google.adk.sessions import InMemorySessionService
+
+import fast_path
+import http_client
+import tracing
+from sessions import SessionManager
+
+pytest_plugins = ("pytest_asyncio",)
+
+TODAY = date(2024, 3, 14)
+
+SUMMARY = {
+    "transaction_count": 3,
+    "totals": {"INR": 650.0},
+    "by_category": [
+        {"category": "Restaurant", "currency": "INR", "total": 450.0, "count": 1},
+        {"category": "Supermarket", "currency": "INR", "total": 200.0, "count": 2},
+    ],
+    "by_store": [
+        {"store_name": "Spice Route", "currency": "INR", "total": 450.0, "count": 1},
+        {"store_name": "FreshMart", "currency": "INR", "total": 200.0, "count": 2},
+    ],
+    "by_month": [],
+    "largest_transaction": {"id": "t3", "store_name": "Spice Route", "total_amount": 450.0, "currency": "INR", "transaction_date": "2024-01-31T18:30:00"},
+}
+
+
+@pytest.mark.parametrize("prompt, name, start, end", [
+    ("How much did I spend this month?", "total", "2024-03-01", "2024-03-14"),
+    ("what's my total spending last year", "total", "2023-01-01", "2023-12-31"),
+    ("Which store did I spend the most at in 2023?", "top_store", "2023-01-01", "2023-12-31"),
+    ("where did I spend the most over the last 2 weeks", "top_store", "2024-03-01", "2024-03-14"),
+    ("Give me a breakdown of my spending by category for last month", "category_breakdown", "2024-02-01", "2024-02-29"),
+    ("What did I spend on in December?", "category_breakdown", "2023-12-01", "2023-12-31"),
+    ("how much have I spent", "total", None, None),
+])
+def test_recognised_prompts(prompt, name, start, end):
+    intent = fast_path.classify(prompt, TODAY)
+
+    assert (intent.name, intent.start_date, intent.end_date) == (name, start, end)
+
+
+def test_categories_map_to_the_stored_merchant_categories():
+    intent = fast_path.classify("How much did I spend on groceries this week?", TODAY)
+
+    assert intent.category == "Grocery"
+    assert intent.categories == ["Supermarket", "Grocery Store"]
+    assert intent.start_date == "2024-03-11"
+
+
+def test_breakdowns_can_be_limited_to_a_category():
+    intent = fast_path.classify("break down my grocery spending by category", TODAY)
+
+    assert (intent.name, intent.category, intent.start_date) == ("category_breakdown", "Grocery", None)
+
+
+@pytest.mark.parametrize("prompt", [
+    "How much did I spend at FreshMart this month?",
+    "how much did I spend this month and last month",
+    "Compare my spending this month to last month",
+    "why did I spend so much on food",
+    "how much did I spend on food and electronics",
+    "What about groceries?",
+    "how much did I spend on 2024-02-30",
+    "how much did I spend in the last 0 days",
+    "hello",
+])
+def test_other_prompts_fall_through(prompt):
+    assert fast_path.classify(prompt, TODAY) is None
+
+
+def test_answers_are_rendered_from_the_summary():
+    total = fast_path.render_answer(fast_path.classify("how much did I spend last month", TODAY), SUMMARY)
+    top = fast_path.render_answer(fast_path.classify("which store did I spend the most at", TODAY), SUMMARY)
+    breakdown = fast_path.render_answer(fast_path.classify("spending by category", TODAY), SUMMARY)
+    empty = fast_path.render_answer(fast_path.classify("how much did I spend on food today", TODAY), {**SUMMARY, "transaction_count": 0})
+
+    assert total == "You spent INR 650.00 last month, across 3 transactions. The largest was INR 450.00 at Spice Route."
+    assert top == "You spent the most at Spice Route in total: INR 450.00 over 1 visit. Next were FreshMart (INR 200.00)."
+    assert breakdown.splitlines() == [
+        "Here is your spending by category in total (3 transactions):",
+        "- Restaurant: INR 450.00 (1)",
+        "- Supermarket: INR 200.00 (2)",
+    ]
+    assert empty == "I couldn't find any transactions on restaurant today."
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    """Routes fast-path summary requests to ``backend.handler``; records the requests it gets."""
+    state = type("Backend", (), {"requests": [], "handler": None})()
+
+    def handler(request):
+        state.requests.append(request)
+        return state.handler(request)
+
+    monkeypatch.setattr(http_client, "_new_client", lambda: tracing.async_backend_client(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(http_client, "_client", None)
+    monkeypatch.setattr(fast_path.config, "BACKEND_API_BASE_URL", "http://backend/api/v1")
+    return state
+
+
+@pytest.fixture
+def client(monkeypatch, backend):
+    import main_agent
+
+    session_service = InMemorySessionService()
+    monkeypatch.setattr(main_agent.runner, "session_service", session_service)
+    monkeypatch.setattr(main_agent, "session_manager", SessionManager(session_service, main_agent.runner.app_name))
+
+    async def no_agent(**kwargs):
+        raise AssertionError("the agent should not run")
+        yield
+
+    monkeypatch.setattr(main_agent.runner, "run_async", no_agent)
+    return TestClient(main_agent.app)
+
+
+def test_endpoint_answers_without_the_agent_and_records_the_turn(client, backend):
+    import main_agent
+
+    backend.handler = lambda request: httpx.Response(200, json=SUMMARY)
+
+    response = client.post("/invoke_agent", json={"user_id": "user-1", "prompt": "How much did I spend on food?", "id_token": "token"})
+
+    assert response.json()["parts"][0]["content"].startswith("You spent INR 650.00 on restaurant in total")
+    [request] = backend.requests
+    assert request.url.path == "/api/v1/transactions/summary"
+    assert request.url.params.get_list("category") == ["Restaurant", "Food & Dining"]
+    assert request.headers["Authorization"] == "Bearer token"
+    # Follow-ups to the agent see the exchange
+    [session] = main_agent.runner.session_service.sessions[main_agent.runner.app_name]["user-1"].values()
+    assert [event.author for event in session.events] == ["user", "Aegnt"]
+
+
+def test_streaming_endpoint_sends_the_answer_as_one_delta(client, backend):
+    backend.handler = lambda request: httpx.Response(200, json=SUMMARY)
+
+    response = client.post("/invoke_agent/stream", json={"user_id": "user-1", "prompt": "spending by category this year", "id_token": "token"})
+
+    names = [block.split("\n")[0] for block in response.text.strip().split("\n\n")]
+    assert names == ["event: text_delta", "event: done"]
+    done = json.loads(response.text.strip().split("\n\n")[-1].split("\n")[1].removeprefix("data: "))
+    assert done["parts"][0]["content"].startswith("Here is your spending by category this year")
+
+
+@pytest.mark.asyncio
+async def test_backend_errors_fall_back_to_the_agent(backend):
+    backend.handler = lambda request: httpx.Response(503)
+
+    assert await fast_path.try_answer("how much did I spend this month", "token") is None
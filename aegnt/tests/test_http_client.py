@@ -0,0 +1,70 @@
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import http_client
+import tool_definitions
+import tracing
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    """Answers tool requests after ``delay`` seconds; records them."""
+    state = type("Backend", (), {"requests": [], "delay": 0.0})()
+
+    async def handler(request):
+        state.requests.append(request)
+        await asyncio.sleep(state.delay)
+        return httpx.Response(200, json=[{"store_name": "FreshMart", "category": "Grocery Store", "items": [{"name": "Basmati Rice"}]}])
+
+    monkeypatch.setattr(http_client, "_new_client", lambda: tracing.async_backend_client(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(http_client, "_client", None)
+    monkeypatch.setattr(tool_definitions, "BACKEND_API_BASE_URL", "http://backend/api/v1")
+    return state
+
+
+def test_one_client_per_event_loop():
+    async def clients():
+        return http_client.get_client(), http_client.get_client()
+
+    first, again = asyncio.run(clients())
+    second, _ = asyncio.run(clients())
+
+    assert first is again
+    assert second is not first
+    asyncio.run(http_client.aclose())
+
+
+def test_tool_calls_do_not_block_each_other(backend):
+    backend.delay = 0.2
+
+    async def concurrent_users():
+        return await asyncio.gather(*(
+            tool_definitions.query_transactions(f"user-{index}", "token", "2024-01-01", "2024-01-31") for index in range(10)
+        ))
+
+    start = time.perf_counter()
+    results = asyncio.run(concurrent_users())
+
+    # Ten 200 ms calls overlap instead of taking two seconds in a row
+    assert time.perf_counter() - start < 1.0
+    assert all(result[0]["store_name"] == "FreshMart" for result in results)
+    assert backend.requests[0].headers["Authorization"] == "Bearer token"
+
+
+def test_virtual_pantry_fetches_its_lists_concurrently(backend):
+    backend.delay = 0.2
+
+    start = time.perf_counter()
+    pantry = asyncio.run(tool_definitions.get_virtual_pantry("user-1", "token", 30))
+
+    assert time.perf_counter() - start < 0.35
+    assert "rice" in pantry
+    assert [request.url.params.get("category") for request in backend.requests] == ["Grocery Store", None]
@@ -0,0 +1,127 @@
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import config
+import llm_usage
+import tool_definitions
+from llm_usage import usage_ledger
+
+ADMIN_TOKEN = "admin-secret"
+
+
+def usage(prompt, output, cached=0):
+    return SimpleNamespace(prompt_token_count=prompt, candidates_token_count=output, cached_content_token_count=cached, thoughts_token_count=None)
+
+
+@pytest.fixture(autouse=True)
+def ledger(monkeypatch):
+    monkeypatch.setattr(config, "LLM_DAILY_TOKEN_BUDGET", 0)
+    monkeypatch.setattr(config, "LLM_DAILY_COST_BUDGET_USD", 0.0)
+    monkeypatch.setattr(config, "LLM_USER_BUDGETS", "")
+    usage_ledger.clear()
+    token = llm_usage.current_user.set(None)
+    yield usage_ledger
+    llm_usage.current_user.reset(token)
+    usage_ledger.clear()
+
+
+@pytest.fixture
+def models(monkeypatch):
+    """Replaces google.generativeai in the tools; returns the model names used."""
+    used = []
+
+    def generative_model(model_name):
+        used.append(model_name)
+        async def generate_content_async(prompt):
+            return SimpleNamespace(text='{"summary": "ok"}', usage_metadata=usage(800, 200))
+
+        return SimpleNamespace(generate_content_async=generate_content_async)
+
+    monkeypatch.setattr(tool_definitions, "genai", SimpleNamespace(GenerativeModel=generative_model))
+    return used
+
+
+async def run_agent_turn(ledger, user_id, model="gemini-2.5-flash", invocation="inv-1"):
+    context = SimpleNamespace(user_id=user_id, agent_name="transaction_agent", invocation_id=invocation)
+    request = SimpleNamespace(model=model)
+    await ledger.before_model_callback(context, request)
+    await ledger.after_model_callback(context, SimpleNamespace(partial=False, usage_metadata=usage(3000, 500, cached=1000), model_version=request.model + "-001", error_code=None))
+    return request.model
+
+
+def agent_turn(ledger, user_id, model="gemini-2.5-flash", invocation="inv-1"):
+    return asyncio.run(run_agent_turn(ledger, user_id, model, invocation))
+
+
+def test_tool_calls_are_recorded_by_template(ledger, models):
+    asyncio.run(tool_definitions._generate("prompt", "generate_savings_plan", "savings_plan", "user-1"))
+
+    [template] = ledger.summary()["by_template"]
+    assert template["template"] == "savings_plan"
+    assert template["total_tokens"] == 1000
+    assert template["cost_usd"] == pytest.approx((800 * 0.30 + 200 * 2.50) / 1_000_000)
+    assert models == ["gemini-2.5-flash"]
+
+
+def test_tools_without_a_user_id_use_the_agent_turns_user(ledger, models):
+    async def turn_then_tool():
+        # The ADK callback runs before the model asks for the tool, in the same task
+        await run_agent_turn(ledger, "user-7")
+        await tool_definitions._generate("prompt", "summarize_transactions", "transaction_summary")
+
+    asyncio.run(turn_then_tool())
+
+    users = {entry["user_id"]: entry["calls"] for entry in ledger.summary()["by_user"]}
+    assert users == {"user-7": 2}
+
+
+def test_agent_turns_are_priced_by_requested_model(ledger):
+    agent_turn(ledger, "user-1")
+
+    [model] = ledger.summary()["by_model"]
+    assert model["model"] == "gemini-2.5-flash"
+    assert model["cached_tokens"] == 1000
+    assert model["cost_usd"] > 0
+
+
+def test_partial_responses_are_not_counted(ledger):
+    context = SimpleNamespace(user_id="user-1", agent_name="Aegnt", invocation_id="inv-1")
+    asyncio.run(ledger.before_model_callback(context, SimpleNamespace(model="gemini-2.5-flash")))
+    asyncio.run(ledger.after_model_callback(context, SimpleNamespace(partial=True, usage_metadata=usage(10, 10), model_version=None, error_code=None)))
+
+    assert ledger.summary()["by_user"] == []
+
+
+def test_over_budget_users_get_the_fallback_model(ledger, models, monkeypatch):
+    monkeypatch.setattr(config, "LLM_DAILY_TOKEN_BUDGET", 3000)
+
+    assert agent_turn(ledger, "user-1", invocation="inv-1") == "gemini-2.5-flash"
+    assert agent_turn(ledger, "user-1", invocation="inv-2") == config.LLM_FALLBACK_MODEL
+    asyncio.run(tool_definitions._generate("prompt", "generate_savings_plan", "savings_plan", "user-1"))
+    assert agent_turn(ledger, "user-2", invocation="inv-3") == "gemini-2.5-flash"
+
+    assert models == [config.LLM_FALLBACK_MODEL]
+    [user_1] = [entry for entry in ledger.summary()["by_user"] if entry["user_id"] == "user-1"]
+    assert user_1["over_budget"] is True
+    assert user_1["budget"] == {"tokens": 3000, "cost_usd": 0.0}
+
+
+def test_admin_endpoint_requires_the_token(ledger, monkeypatch):
+    import main_agent
+
+    monkeypatch.setattr(config, "ADMIN_API_TOKEN", ADMIN_TOKEN)
+    agent_turn(ledger, "user-1")
+    client = TestClient(main_agent.app)
+
+    assert client.get("/admin/llm_usage").status_code == 404
+    response = client.get("/admin/llm_usage", headers={llm_usage.ADMIN_HEADER: ADMIN_TOKEN})
+    assert response.status_code == 200
+    assert response.json()["by_user"][0]["user_id"] == "user-1"
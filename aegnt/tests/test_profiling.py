@@ -0,0 +1,49 @@
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+pytest.importorskip("pyinstrument")
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import config
+import profiling
+
+ADMIN_TOKEN = "profile-secret"
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    import main_agent
+
+    monkeypatch.setattr(config, "PROFILE_DIR", str(tmp_path / "profiles"))
+    monkeypatch.setattr(config, "PROFILE_ADMIN_TOKEN", ADMIN_TOKEN)
+    monkeypatch.setattr(config, "PROFILE_SAMPLE_RATE", 0.0)
+    return TestClient(main_agent.app)
+
+
+def invoke(client, headers):
+    # Rejected by the content-type check, which keeps the runner out of the test
+    return client.post("/invoke_agent", content="x", headers={"content-type": "text/plain", **headers})
+
+
+def test_profiles_are_named_after_the_backend_request_id(client):
+    response = invoke(client, {profiling.PROFILE_HEADER: ADMIN_TOKEN, profiling.REQUEST_ID_HEADER: "turn-1"})
+
+    profile_id = response.headers[profiling.PROFILE_HEADER]
+    assert profile_id != "turn-1"
+    profile = client.get(f"/debug/profiles/{profile_id}", headers={profiling.PROFILE_HEADER: ADMIN_TOKEN})
+    assert profile.status_code == 200
+    assert profile.json()["name"] == "POST /invoke_agent (turn-1)"
+
+
+def test_unprofiled_requests_leave_nothing_behind(client):
+    response = invoke(client, {profiling.REQUEST_ID_HEADER: "turn-2"})
+
+    assert response.headers[profiling.REQUEST_ID_HEADER] == "turn-2"
+    assert profiling.PROFILE_HEADER not in response.headers
+    assert profiling.list_profiles() == []
+    assert client.get("/debug/profiles").status_code == 404
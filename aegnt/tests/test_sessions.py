@@ -0,0 +1,165 @@
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from google.adk.events import Event
+from google.adk.sessions.sqlite_session_service import SqliteSessionService
+from google.genai.types import Content, FunctionCall, FunctionResponse, Part, UserContent
+
+from sessions import SessionManager
+from state_store import SQLiteStateStore
+
+pytest_plugins = ("pytest_asyncio",)
+
+APP_NAME = "aegnt"
+
+
+class Clock:
+    # Starts at the real time, which the session store stamps on its rows
+    def __init__(self):
+        self.now = time.time()
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def service(tmp_path):
+    return SqliteSessionService(str(tmp_path / "sessions.db"))
+
+
+def manager_for(service, **kwargs):
+    return SessionManager(service, APP_NAME, **{"idle_ttl_seconds": 60, "max_turns": 4, "keep_turns": 2, **kwargs})
+
+
+async def chat(manager, service, user_id, prompt):
+    """One turn the way the runner records it: prompt, tool call, tool result, answer."""
+    async with manager.turn(user_id) as session_id:
+        session = await service.get_session(app_name=APP_NAME, user_id=user_id, session_id=session_id)
+        for author, content in (
+            ("user", UserContent(parts=[Part(text=prompt)])),
+            ("Aegnt", Content(role="model", parts=[Part(function_call=FunctionCall(name="analyze_financial_data", args={"query_text": prompt}))])),
+            ("Aegnt", Content(role="user", parts=[Part(function_response=FunctionResponse(name="analyze_financial_data", response={"ok": True}))])),
+            ("Aegnt", Content(role="model", parts=[Part(text=f"answer to {prompt}")])),
+        ):
+            await service.append_event(session, Event(author=author, invocation_id=f"inv-{prompt}", content=content))
+        return session_id
+
+
+async def history(service, user_id, session_id):
+    session = await service.get_session(app_name=APP_NAME, user_id=user_id, session_id=session_id)
+    return [part.text for event in session.events if event.author == "user" for part in event.content.parts if part.text]
+
+
+@pytest.mark.asyncio
+async def test_turns_share_one_session_that_survives_restarts(service, tmp_path):
+    manager = manager_for(service)
+    first = await chat(manager, service, "user-1", "q1")
+    second = await chat(manager, service, "user-1", "q2")
+    other = await chat(manager, service, "user-2", "q1")
+
+    assert first == second != other
+    # A new process finds the conversation in the database
+    restarted = manager_for(SqliteSessionService(str(tmp_path / "sessions.db")))
+    third = await chat(restarted, restarted.session_service, "user-1", "q3")
+    assert third == first
+    assert await history(service, "user-1", first) == ["q1", "q2", "q3"]
+
+
+@pytest.mark.asyncio
+async def test_long_sessions_are_compacted_at_turn_boundaries(service):
+    manager = manager_for(service)
+    for index in range(5):
+        session_id = await chat(manager, service, "user-1", f"q{index}")
+
+    async with manager.turn("user-1") as compacted_id:
+        pass
+    assert compacted_id != session_id
+    session = await service.get_session(app_name=APP_NAME, user_id="user-1", session_id=compacted_id)
+    # The last two turns, each starting with the user's prompt and keeping its tool call and result
+    assert [event.author for event in session.events] == ["user", "Aegnt", "Aegnt", "Aegnt"] * 2
+    assert await history(service, "user-1", compacted_id) == ["q3", "q4"]
+    listed = await service.list_sessions(app_name=APP_NAME, user_id="user-1")
+    assert [session.id for session in listed.sessions] == [compacted_id]
+
+
+@pytest.mark.asyncio
+async def test_idle_sessions_are_evicted(service):
+    clock = Clock()
+    manager = manager_for(service, clock=clock)
+    first = await chat(manager, service, "user-1", "q1")
+
+    # Returning after the TTL starts a new conversation
+    clock.now += 61
+    second = await chat(manager, service, "user-1", "q2")
+    assert second != first
+    assert await history(service, "user-1", second) == ["q2"]
+
+    # The sweep removes sessions nobody came back to
+    await chat(manager, service, "user-2", "q1")
+    clock.now += 61
+    assert await manager.evict_idle() == 2
+    assert (await service.list_sessions(app_name=APP_NAME)).sessions == []
+
+
+@pytest.mark.asyncio
+async def test_failed_turns_drop_the_session(service):
+    manager = manager_for(service)
+    first = await chat(manager, service, "user-1", "q1")
+
+    with pytest.raises(RuntimeError):
+        async with manager.turn("user-1"):
+            raise RuntimeError("model error")
+
+    assert await service.get_session(app_name=APP_NAME, user_id="user-1", session_id=first) is None
+    assert await chat(manager, service, "user-1", "q2") != first
+
+
+@pytest.mark.asyncio
+async def test_turns_of_one_user_are_serialized(service):
+    manager = manager_for(service, max_turns=10)
+    order = []
+
+    async def turn(name):
+        async with manager.turn("user-1"):
+            order.append(f"{name} start")
+            await asyncio.sleep(0.01)
+            order.append(f"{name} end")
+
+    await asyncio.gather(turn("a"), turn("b"))
+
+    assert order == ["a start", "a end", "b start", "b end"]
+
+
+@pytest.mark.asyncio
+async def test_workers_sharing_a_store_share_sessions_and_turn_locks(tmp_path):
+    # Two worker processes: separate managers and connections, the same files
+    workers = []
+    for _ in range(2):
+        service = SqliteSessionService(str(tmp_path / "sessions.db"))
+        workers.append((manager_for(service, store=SQLiteStateStore(str(tmp_path / "state.db"))), service))
+    order = []
+
+    async def turn(name, manager):
+        async with manager.turn("user-1") as session_id:
+            order.append(f"{name} start")
+            await asyncio.sleep(0.1)
+            order.append(f"{name} end")
+            return session_id
+
+    first, second = await asyncio.gather(turn("a", workers[0][0]), turn("b", workers[1][0]))
+    assert order[:2] in (["a start", "a end"], ["b start", "b end"])
+    assert first == second
+
+    # A session compacted by one worker is continued by the other
+    for index in range(5):
+        manager, service = workers[index % 2]
+        session_id = await chat(manager, service, "user-1", f"q{index}")
+    assert session_id != first
+    assert await chat(workers[0][0], workers[0][1], "user-1", "q5") == session_id
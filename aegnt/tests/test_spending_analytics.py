@@ -0,0 +1,116 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import tool_definitions
+from spending_analytics import (
+    SpendingFrame,
+    anomaly_insights,
+    category_trend_insights,
+    merchant_insights,
+    seasonal_insights,
+    subscription_insights,
+)
+
+
+def transaction(store_name, day, amount, category="Supermarket"):
+    return {"store_name": store_name, "transaction_date": f"{day}T10:00:00", "total_amount": amount, "category": category}
+
+
+TRANSACTIONS = [
+    transaction("StreamFlix", "2024-01-05", 10.0, "Subscription"),
+    transaction("FreshMart", "2024-01-09", 40.0),
+    transaction("StreamFlix", "2024-02-05", 10.0, "Subscription"),
+    transaction("FreshMart", "2024-02-11", 60.0),
+    transaction("StreamFlix", "2024-03-05", 12.0, "Subscription"),
+    transaction("FreshMart", "2024-03-14", 80.0),
+    transaction("FreshMart", "2024-04-02", 90.0),
+    transaction("Gadget Hub", "2024-04-20", 900.0, "Electronics Store"),
+    {"store_name": "Corner Shop", "total_amount": 5.0, "category": None},
+    {"store_name": None, "total_amount": 7.0, "category": ""},
+]
+
+
+@pytest.fixture
+def frame():
+    return SpendingFrame.from_transactions(TRANSACTIONS)
+
+
+def test_frame_columns(frame):
+    assert len(frame) == 10
+    assert frame.merchants == ["StreamFlix", "FreshMart", "Gadget Hub", "Corner Shop", "Unknown"]
+    # Missing, None and empty names fall back as in the transaction digest
+    assert frame.categories == ["Subscription", "Supermarket", "Electronics Store", "General"]
+    assert frame.merchant_codes.tolist() == [0, 1, 0, 1, 0, 1, 1, 2, 3, 4]
+    assert frame.category_codes.tolist()[-2:] == [3, 3]
+    # The last transactions have no date and are left out of the time-based analyses
+    assert frame.dated.tolist() == [True] * 8 + [False, False]
+
+
+def test_recurring_charges_that_went_up(frame):
+    insights = subscription_insights(frame)
+
+    assert [(i["merchant"], i["old_amount"], i["new_amount"]) for i in insights] == [("StreamFlix", 10.0, 12.0), ("FreshMart", 40.0, 90.0)]
+    assert insights[0]["increase_percent"] == pytest.approx(20.0)
+
+
+def test_categories_trending_up(frame):
+    [insight] = category_trend_insights(frame)
+
+    # Supermarket: March and April average 85 against 50 in January and February
+    assert (insight["category"], insight["old_average"], insight["new_average"]) == ("Supermarket", 50.0, 85.0)
+
+
+def test_top_merchants_over_the_threshold(frame):
+    insights = merchant_insights(frame)
+
+    assert [(i["merchant"], i["total_spent"], i["transaction_count"]) for i in insights] == [("Gadget Hub", 900.0, 1), ("FreshMart", 270.0, 4)]
+
+
+def test_seasonal_highs(frame):
+    [insight] = seasonal_insights(frame)
+
+    assert (insight["month_name"], insight["average_spending"]) == ("Apr", 495.0)
+
+
+def test_outliers(frame):
+    [insight] = anomaly_insights(frame)
+
+    assert (insight["merchant"], insight["amount"], insight["date"]) == ("Gadget Hub", 900.0, "2024-04-20T10:00:00")
+
+
+def test_empty_and_undated_histories():
+    for transactions in ([], [{"store_name": "Corner Shop", "total_amount": 5.0}]):
+        frame = SpendingFrame.from_transactions(transactions)
+        assert category_trend_insights(frame) == seasonal_insights(frame) == subscription_insights(frame) == []
+
+
+def test_comprehensive_analysis_runs_every_detector(monkeypatch):
+    async def query_transactions(*args, **kwargs):
+        return TRANSACTIONS
+
+    async def get_spending_stats(*args):
+        return {"error": "HTTP error occurred: 404"}
+
+    monkeypatch.setattr(tool_definitions, "GEMINI_API_KEY", "key")
+    monkeypatch.setattr(tool_definitions, "query_transactions", query_transactions)
+    # Without spending stats the history is analyzed
+    monkeypatch.setattr(tool_definitions, "get_spending_stats", get_spending_stats)
+
+    result = asyncio.run(tool_definitions.run_comprehensive_proactive_analysis("user-1", "token", 120))
+
+    assert [insight["type"] for insight in result["insights"]] == [
+        "subscription_price_increase",
+        "subscription_price_increase",
+        "category_spending_increase",
+        "top_merchant",
+        "top_merchant",
+        "seasonal_high_spending",
+        "spending_anomaly",
+    ]
+    assert result["insight_count"] == 7 and result["total_transactions"] == 10
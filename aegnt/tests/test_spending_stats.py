@@ -0,0 +1,149 @@
+import asyncio
+import os
+import sys
+from datetime import date, datetime
+
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import config
+import data_access
+import spending_analytics
+import spending_stats
+import tool_definitions
+
+data_access._import_backend()
+
+from services.firestore_service import FirestoreService
+from services.storage.memory_storage import MemoryStorage
+
+
+def transaction(store_name, day, amount, category="Supermarket"):
+    return {
+        "user_id": "user-1",
+        "store_name": store_name,
+        "transaction_date": datetime.fromisoformat(f"{day}T10:00:00"),
+        "items": [],
+        "total_amount": amount,
+        "category": category,
+    }
+
+
+TRANSACTIONS = [
+    transaction("StreamFlix", "2024-01-05", 10.0, "Subscription"),
+    transaction("FreshMart", "2024-01-09", 40.0),
+    transaction("StreamFlix", "2024-02-05", 10.0, "Subscription"),
+    transaction("FreshMart", "2024-02-11", 60.0),
+    transaction("StreamFlix", "2024-03-05", 12.0, "Subscription"),
+    transaction("FreshMart", "2024-03-14", 80.0),
+    transaction("FreshMart", "2024-04-02", 90.0),
+    transaction("Gadget Hub", "2024-04-20", 900.0, "Electronics Store"),
+]
+
+# run_comprehensive_proactive_analysis windows covering all of TRANSACTIONS
+SINCE = date(2024, 1, 1)
+ANALYSIS_DAYS = (date.today() - SINCE).days
+
+
+@pytest.fixture
+def service(monkeypatch):
+    service = FirestoreService(storage=MemoryStorage())
+    for document in TRANSACTIONS:
+        asyncio.run(service.add_transaction("user-1", document))
+
+    async def user_id(id_token):
+        return "user-1"
+
+    monkeypatch.setattr(config, "DATA_ACCESS_MODE", "direct")
+    monkeypatch.setattr(data_access, "_firestore_service", service)
+    monkeypatch.setattr(data_access, "get_user_id", user_id)
+    monkeypatch.setattr(tool_definitions, "GEMINI_API_KEY", "key")
+    return service
+
+
+def stats_of(service) -> dict:
+    return asyncio.run(data_access.get_spending_stats("token"))
+
+
+def test_insights_match_the_history_detectors(service):
+    frame = spending_analytics.SpendingFrame.from_transactions(
+        [t.model_dump(mode="json") for t in asyncio.run(service.get_transactions("user-1", "2024-01-01", "2024-12-31"))]
+    )
+    stats = stats_of(service)
+
+    for name in ("subscription_insights", "category_trend_insights", "merchant_insights", "seasonal_insights"):
+        assert getattr(spending_stats, name)(stats, SINCE) == pytest.approx(getattr(spending_analytics, name)(frame)), name
+    [from_stats] = spending_stats.anomaly_insights(stats, SINCE)
+    [from_history] = spending_analytics.anomaly_insights(frame)
+    assert from_stats == from_history
+
+
+def test_windows_are_whole_months(service):
+    stats = stats_of(service)
+
+    assert spending_stats.transaction_count(stats, date(2024, 3, 31)) == 4
+    # FreshMart's and StreamFlix's charges before March are out of the window
+    assert spending_stats.subscription_insights(stats, date(2024, 3, 1)) == []
+    assert [i["merchant"] for i in spending_stats.merchant_insights(stats, date(2024, 4, 1))] == ["Gadget Hub"]
+
+
+def test_quantiles_from_the_histogram(service):
+    q1, q3 = spending_stats.amount_quantiles(stats_of(service), 0.25, 0.75)
+
+    # Exactly 12 and 90; histogram buckets are about 9% wide
+    assert q1 == pytest.approx(12, rel=0.05) and q3 == pytest.approx(90, rel=0.05)
+
+
+def test_comprehensive_analysis_reads_the_stats_not_the_history(service, monkeypatch):
+    async def query_transactions(*args, **kwargs):
+        raise AssertionError("the history should not be read")
+
+    monkeypatch.setattr(tool_definitions, "query_transactions", query_transactions)
+
+    result = asyncio.run(tool_definitions.run_comprehensive_proactive_analysis("user-1", "token", ANALYSIS_DAYS))
+    assert result["total_transactions"] == 8
+    assert [insight["type"] for insight in result["insights"]] == [
+        "subscription_price_increase",
+        "subscription_price_increase",
+        "category_spending_increase",
+        "top_merchant",
+        "top_merchant",
+        "seasonal_high_spending",
+        "spending_anomaly",
+    ]
+
+    # Later writes show up in the next analysis
+    asyncio.run(service.add_transaction("user-1", transaction("StreamFlix", "2024-04-05", 18.0, "Subscription")))
+    result = asyncio.run(tool_definitions.run_comprehensive_proactive_analysis("user-1", "token", ANALYSIS_DAYS))
+    assert result["total_transactions"] == 9
+    assert (result["insights"][0]["merchant"], result["insights"][0]["new_amount"]) == ("StreamFlix", 18.0)
+
+
+def test_proactive_analysis_prompts_with_the_latest_periods(service, monkeypatch):
+    prompts = []
+
+    async def generate(prompt, tool, template, user_id=None):
+        prompts.append(prompt)
+        return type("Response", (), {"text": '{"insight_found": false}'})()
+
+    monkeypatch.setattr(tool_definitions, "_generate", generate)
+    monkeypatch.setattr(spending_stats, "PERIOD_MONTHS", (1, 3, 6, 12, 24, 600))
+
+    result = asyncio.run(tool_definitions.run_proactive_analysis("user-1", "token"))
+
+    [prompt] = prompts
+    assert result["transaction_count"] == 8
+    assert "statistics" in prompt and '"merchant": "Gadget Hub"' in prompt and "user_id" not in prompt
+
+
+def test_recent_periods():
+    stats = {"months": {"2024-02": {"count": 2, "total": 30.0}, "2024-04": {"count": 1, "total": 5.0}}, "categories": {}, "merchants": {}}
+
+    current, previous = spending_stats.recent_periods(stats, date(2024, 5, 10))
+
+    # May has nothing, so the three months to May are compared with the three before
+    assert (current["period"], current["transaction_count"], current["total"]) == ("2024-03 to 2024-05", 1, 5.0)
+    assert (previous["period"], previous["transaction_count"]) == ("2023-12 to 2024-02", 2)
+    assert spending_stats.recent_periods(stats, date(2027, 1, 1)) is None
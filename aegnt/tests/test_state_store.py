@@ -0,0 +1,153 @@
+import asyncio
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from answer_cache import AnswerCache
+from llm_usage import UsageLedger
+from state_store import MemoryStateStore, SQLiteStateStore, create_state_store
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    def make(clock=None):
+        kwargs = {"clock": clock} if clock else {}
+        if request.param == "memory":
+            return MemoryStateStore(**kwargs)
+        return SQLiteStateStore(str(tmp_path / "state.db"), **kwargs)
+    return make
+
+
+def test_documents_expire_and_are_trimmed_least_recently_used_first(make_store):
+    clock = Clock()
+    store = make_store(clock)
+    store.put("answers", "a", {"n": 1})
+    store.put("answers", "b", {"n": 2}, ttl_seconds=60)
+    store.put("answers", "c", {"n": 3})
+    store.get("answers", "a", touch=True)
+    store.trim("answers", 2)
+
+    assert store.items("answers") == [("a", {"n": 1}), ("c", {"n": 3})]
+    store.put("answers", "d", [1, 2], ttl_seconds=60)
+    clock.now += 61
+    assert store.get("answers", "d") is None
+    assert store.items("answers", prefix="c") == [("c", {"n": 3})]
+
+
+def test_values_are_copies(make_store):
+    store = make_store()
+    value = {"parts": [1]}
+    store.put("answers", "a", value)
+    value["parts"].append(2)
+    store.get("answers", "a")["parts"].append(3)
+
+    assert store.get("answers", "a") == {"parts": [1]}
+
+
+def test_counters_add_and_keep_maxima(make_store):
+    store = make_store()
+    store.add("usage", "k", {"calls": 1, "cost": 0.5}, maxima={"max_seconds": 2.0})
+    totals = store.add("usage", "k", {"calls": 1, "cost": 0.25}, maxima={"max_seconds": 1.0})
+
+    assert totals == {"calls": 2, "cost": 0.75, "max_seconds": 2.0}
+
+
+def test_locks_have_one_owner_until_released_or_expired(make_store):
+    clock = Clock()
+    store = make_store(clock)
+
+    assert store.acquire("turn:user-1", "worker-a", ttl_seconds=10)
+    assert not store.acquire("turn:user-1", "worker-b", ttl_seconds=10)
+    store.release("turn:user-1", "worker-b")
+    assert store.is_locked("turn:user-1")
+    store.release("turn:user-1", "worker-a")
+    assert store.acquire("turn:user-1", "worker-b", ttl_seconds=10)
+    # A worker that died holding the lock loses it after the TTL
+    clock.now += 11
+    assert store.acquire("turn:user-1", "worker-c", ttl_seconds=10)
+
+
+RECORD_CALLS = """
+import sys
+from llm_usage import UsageLedger
+from state_store import SQLiteStateStore
+ledger = UsageLedger(SQLiteStateStore(sys.argv[1]))
+for _ in range(50):
+    ledger.record("user-1", "analyze_financial_data", "analysis", "gemini-2.5-flash", seconds=0.01)
+"""
+
+
+def test_slots_are_leased_up_to_their_limit(make_store):
+    clock = Clock()
+    store = make_store(clock)
+
+    assert store.take_slot("slots", "user-1", "a", 2, ttl_seconds=10)
+    assert store.take_slot("slots", "user-1", "b", 2, ttl_seconds=60)
+    assert not store.take_slot("slots", "user-1", "c", 2, ttl_seconds=10)
+    assert store.take_slot("slots", "user-2", "c", 2, ttl_seconds=10)
+    store.release_slot("slots", "user-1", "b")
+    assert store.take_slot("slots", "user-1", "c", 2, ttl_seconds=10)
+    # A slot whose holder never released it lapses
+    clock.now += 11
+    assert store.take_slot("slots", "user-1", "d", 2, ttl_seconds=10)
+    assert store.take_slot("slots", "user-1", "e", 2, ttl_seconds=10)
+
+
+def test_waiting_on_another_workers_write_lock_leaves_the_event_loop_free(tmp_path):
+    path = str(tmp_path / "state.db")
+    store = SQLiteStateStore(path)
+    store.put("answers", "a", 1)
+    other_worker = sqlite3.connect(path, isolation_level=None)
+    other_worker.execute("BEGIN IMMEDIATE")
+
+    async def main():
+        ticks = 0
+        acquiring = asyncio.create_task(store.run(store.acquire, "turn:user-1", "owner", 30))
+        while ticks < 5:
+            await asyncio.sleep(0.01)
+            ticks += 1
+        assert not acquiring.done()
+        other_worker.execute("COMMIT")
+        return await acquiring
+
+    assert asyncio.run(main())
+    other_worker.close()
+
+
+def test_workers_share_usage_totals(tmp_path):
+    path = str(tmp_path / "state.db")
+    aegnt_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    workers = [subprocess.Popen([sys.executable, "-c", RECORD_CALLS, path], cwd=aegnt_dir) for _ in range(4)]
+
+    assert [worker.wait(timeout=60) for worker in workers] == [0] * 4
+    summary = UsageLedger(SQLiteStateStore(path)).summary()
+    assert summary["by_user"][0]["calls"] == 200
+
+
+def test_workers_share_cached_answers(tmp_path):
+    path = str(tmp_path / "state.db")
+    first = AnswerCache(max_entries=10, ttl_seconds=60, store=SQLiteStateStore(path))
+    second = AnswerCache(max_entries=10, ttl_seconds=60, store=SQLiteStateStore(path))
+    key = AnswerCache.key("user-1", "spending trends by category", 3)
+    first.put(key, [{"type": "text", "content": "Groceries are up 12%."}])
+
+    assert second.get(key) == [{"type": "text", "content": "Groceries are up 12%."}]
+
+
+def test_unknown_backends_are_rejected():
+    with pytest.raises(ValueError):
+        create_state_store("redis")
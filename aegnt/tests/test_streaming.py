@@ -0,0 +1,60 @@
+import json
+import os
+import sys
+from typing import AsyncGenerator
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+
+class StreamingLlm(BaseLlm):
+    """Answers with ``chunks``, as partial responses when streaming and then as one final response."""
+
+    chunks: list = []
+
+    async def generate_content_async(self, llm_request: LlmRequest, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        if stream:
+            for chunk in self.chunks:
+                yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=chunk)]), partial=True)
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text="".join(self.chunks))]))
+
+
+def events(response):
+    parsed = []
+    for block in response.text.strip().split("\n\n"):
+        name, data = block.split("\n")
+        parsed.append((name.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return parsed
+
+
+def test_text_is_streamed_as_deltas_then_done(streaming_client):
+    response = streaming_client.post("/invoke_agent/stream", json={"user_id": "user-1", "prompt": "hi", "id_token": "token"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    received = events(response)
+    assert [data["content"] for name, data in received if name == "text_delta"] == ["Hello", ", ", "world"]
+    # The final event carries what /invoke_agent would have returned
+    assert received[-1] == ("done", {"parts": [{"type": "text", "content": "Hello, world"}]})
+
+
+def test_streamed_turns_share_the_session_with_buffered_ones(streaming_client):
+    import main_agent
+
+    streaming_client.post("/invoke_agent", json={"user_id": "user-1", "prompt": "first", "id_token": "token"})
+    streaming_client.post("/invoke_agent/stream", json={"user_id": "user-1", "prompt": "second", "id_token": "token"})
+
+    [session] = main_agent.runner.session_service.sessions[main_agent.runner.app_name]["user-1"].values()
+    # Partial events are not stored; each turn is its prompt and one answer
+    assert [event.author for event in session.events] == ["user", "Aegnt", "user", "Aegnt"]
+
+
+def test_empty_prompts_are_rejected(streaming_client):
+    response = streaming_client.post("/invoke_agent/stream", json={"user_id": "user-1", "prompt": " ", "id_token": "token"})
+
+    assert response.status_code == 400
@@ -0,0 +1,55 @@
+import asyncio
+import os
+import sys
+
+import httpx
+from opentelemetry import trace
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import tracing
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_SPAN_ID = "00f067aa0ba902b7"
+TRACEPARENT = f"00-{TRACE_ID}-{PARENT_SPAN_ID}-01"
+
+exporter = InMemorySpanExporter()
+_provider = TracerProvider()
+_provider.add_span_processor(SimpleSpanProcessor(exporter))
+trace.set_tracer_provider(_provider)
+
+
+def test_backend_calls_continue_the_incoming_trace():
+    seen = []
+    transport = httpx.MockTransport(lambda request: seen.append(request.headers.get("traceparent")) or httpx.Response(200, json=[]))
+
+    async def call_backend():
+        async with tracing.async_backend_client(transport=transport) as client:
+            await client.get("http://backend/api/v1/transactions")
+
+    with tracing.server_span("POST /invoke_agent", {"traceparent": TRACEPARENT}):
+        with tracing.gemini_span("analyze_financial_data") as gemini:
+            asyncio.run(call_backend())
+
+    _, trace_id, span_id, _ = seen[0].split("-")
+    assert trace_id == TRACE_ID
+    assert int(span_id, 16) == gemini.get_span_context().span_id
+
+
+def test_invoke_agent_requests_are_traced():
+    from fastapi.testclient import TestClient
+    import main_agent
+
+    exporter.clear()
+    # Rejected by the content-type check before the runner is involved
+    response = TestClient(main_agent.app).post("/invoke_agent", content="x", headers={"traceparent": TRACEPARENT, "content-type": "text/plain"})
+
+    assert response.status_code == 400
+    span = exporter.get_finished_spans()[-1]
+    assert span.name == "POST /invoke_agent"
+    assert format(span.parent.span_id, "016x") == PARENT_SPAN_ID
+    assert span.attributes["http.response.status_code"] == 400
@@ -0,0 +1,82 @@
+import asyncio
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+
+# Add the project root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import tool_definitions
+from transaction_digest import digest_transactions
+
+STORES = ["FreshMart", "Spice Route", "QuickMart", "Metro Cafe", "Pharma Plus"]
+
+
+def history(count, start=datetime(2020, 1, 1)):
+    """``count`` transactions, one a day, cycling through a few stores."""
+    return [
+        {
+            "id": f"t{i}",
+            "store_name": STORES[i % len(STORES)],
+            "transaction_date": (start + timedelta(days=i)).isoformat(),
+            "items": [
+                {"name": "Milk", "price": 2.5, "quantity": 2, "category": "Dairy"},
+                {"name": "Bread", "price": float(i % 7), "quantity": 1, "category": "Bakery"},
+            ],
+            "total_amount": 5.0 + i % 7,
+            "currency": "INR",
+            "category": "Restaurant" if i % len(STORES) == 1 else "Supermarket",
+        }
+        for i in range(count)
+    ]
+
+
+def test_totals_are_exact():
+    transactions = history(100)
+    transactions.append({**transactions[0], "id": "usd", "currency": "USD", "total_amount": 40.0})
+
+    digest = digest_transactions(transactions)
+
+    assert digest["transaction_count"] == 101 and digest["item_count"] == 202
+    assert digest["totals"] == {"INR": round(sum(t["total_amount"] for t in transactions[:100]), 2), "USD": 40.0}
+    restaurant = [group for group in digest["by_category"] if group["category"] == "Restaurant"][0]
+    assert restaurant["count"] == 20
+    assert restaurant["total"] == sum(t["total_amount"] for t in transactions[:100] if t["category"] == "Restaurant")
+    assert digest["by_item_category"][0] == {"item_category": "Dairy", "currency": "INR", "total": 500.0, "count": 100}
+    assert digest["largest_transactions"][0]["total_amount"] == 40.0
+    assert sorted((group["year"], group["currency"]) for group in digest["by_year"]) == [("2020", "INR"), ("2020", "USD")]
+
+
+def test_size_does_not_grow_with_history():
+    small = json.dumps(digest_transactions(history(400)))
+    digest = digest_transactions(history(4000))
+    large = json.dumps(digest)
+
+    assert len(digest["by_month"]) == 24 and digest["groups_omitted"] == {"months": 108}
+    assert len(digest["largest_transactions"]) == len(digest["recent_transactions"]) == 10
+    assert len(large) < 1.5 * len(small)
+
+
+def test_analysis_prompt_carries_the_digest_not_the_transactions(monkeypatch):
+    transactions = history(2000)
+    prompts = []
+
+    async def query_transactions(**filters):
+        return transactions
+
+    async def generate(prompt, tool, template, user_id=None):
+        prompts.append(prompt)
+        return type("Response", (), {"text": '{"natural_language_answer": "ok", "structured_data": {}}'})()
+
+    monkeypatch.setattr(tool_definitions, "GEMINI_API_KEY", "key")
+    monkeypatch.setattr(tool_definitions, "query_transactions", query_transactions)
+    monkeypatch.setattr(tool_definitions, "_generate", generate)
+
+    result = asyncio.run(tool_definitions.analyze_financial_data("user-1", "token", "spending trends by category"))
+
+    [prompt] = prompts
+    assert len(prompt) < 20_000
+    assert "all 2000 matching transactions" in prompt
+    assert result["data_count"] == 2000 and "transactions" not in result
+    assert result["summary"]["totals"] == digest_transactions(transactions)["totals"]
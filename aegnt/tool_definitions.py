@@ -6,20 +6,50 @@ These functions are responsible for interacting with the backend API and other
 services as required.
 """
 
+import asyncio
 import httpx
 import json
 import re
 import base64
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import google.generativeai as genai
 from config import BACKEND_API_BASE_URL, GEMINI_API_KEY, BACKEND_API_TOKEN
+import data_access
+import http_client
+import spending_analytics
+import spending_stats
+from transaction_digest import digest_transactions
+from date_ranges import parse_date_range
+from tracing import gemini_span
+from llm_usage import current_user, usage_ledger
 from typing import Optional, List, Dict, Any
 import random
+import time
 
 # Configure the Gemini API key
 if GEMINI_API_KEY:
     genai.configure(api_key=GEMINI_API_KEY)
 
+
+async def _generate(prompt: str, tool: str, template: str, user_id: Optional[str] = None, model_name: str = 'gemini-2.5-flash'):
+    """
+    Calls Gemini for a tool and records the call's tokens, latency and cost
+    against the user (see llm_usage.py). Users over their daily budget get the
+    cheaper fallback model.
+    """
+    user_id = user_id or current_user.get()
+    store = usage_ledger.store
+    model_name = await store.run(usage_ledger.model_for, user_id, model_name)
+    started = time.perf_counter()
+    try:
+        with gemini_span(tool, model_name):
+            response = await genai.GenerativeModel(model_name).generate_content_async(prompt)
+    except Exception:
+        await store.run(usage_ledger.record, user_id, tool, template, model_name, seconds=time.perf_counter() - started, failed=True)
+        raise
+    await store.run(usage_ledger.record, user_id, tool, template, model_name, getattr(response, "usage_metadata", None), time.perf_counter() - started)
+    return response
+
 def get_basic_financial_insight() -> dict:
     """
     Provides basic financial insights and tips when transaction data is not available.
@@ -63,7 +93,7 @@ def get_basic_financial_insight() -> dict:
         **selected_insight
     }
 
-def process_receipt(file_data_base64: str, file_type: str, user_id: str, id_token: str) -> dict:
+async def process_receipt(file_data_base64: str, file_type: str, user_id: str, id_token: str) -> dict:
     """
     Initiates the processing of a new receipt. This tool takes the base64-encoded file data
     and the user's ID and sends it to the backend for the entire ingestion
@@ -71,84 +101,86 @@ def process_receipt(file_data_base64: str, file_type: str, user_id: str, id_toke
     """
     import base64
     file_data = base64.b64decode(file_data_base64)
-    with httpx.Client() as client:
-        files = {'file': (f'receipt.{file_type.split("/")[-1]}', file_data, file_type)}
-        data = {'user_id': user_id}
-        headers = {'Authorization': f'Bearer {id_token}'}
-        
-        try:
-            response = client.post(
-                f"{BACKEND_API_BASE_URL}/transactions/process",
-                files=files,
-                data=data,
-                headers=headers
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            return {"error": f"HTTP error occurred: {e.response.status_code} - {e.response.text}"}
-        except httpx.RequestError as e:
-            return {"error": f"An error occurred while requesting the backend: {e}"}
+    client = http_client.get_client()
+    files = {'file': (f'receipt.{file_type.split("/")[-1]}', file_data, file_type)}
+    data = {'user_id': user_id}
+    headers = {'Authorization': f'Bearer {id_token}'}
+
+    try:
+        # OCR, categorization and the Wallet pass take a while on the backend
+        response = await client.post(
+            f"{BACKEND_API_BASE_URL}/transactions/process",
+            files=files,
+            data=data,
+            headers=headers,
+            timeout=120.0
+        )
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as e:
+        return {"error": f"HTTP error occurred: {e.response.status_code} - {e.response.text}"}
+    except httpx.RequestError as e:
+        return {"error": f"An error occurred while requesting the backend: {e}"}
 
 
-def create_wallet_pass(pass_type: str, pass_data: dict, id_token: str) -> dict:
+async def create_wallet_pass(pass_type: str, pass_data: dict, id_token: str) -> dict:
     """
     Generates a Google Wallet pass by sending structured data to the backend.
     Use this for creating shopping lists or dynamic budget/warranty trackers
     based on a user's request.
     """
-    with httpx.Client() as client:
-        headers = {'Authorization': f'Bearer {id_token}'}
+    client = http_client.get_client()
+    headers = {'Authorization': f'Bearer {id_token}'}
 
-        try:
-            response = client.post(
-                f"{BACKEND_API_BASE_URL}/wallet/pass",
-                json={"pass_type": pass_type, "pass_data": pass_data},
-                headers=headers
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            return {"error": f"HTTP error occurred: {e.response.status_code} - {e.response.text}"}
-        except httpx.RequestError as e:
-            return {"error": f"An error occurred while requesting the backend: {e}"}
+    try:
+        response = await client.post(
+            f"{BACKEND_API_BASE_URL}/wallet/pass",
+            json={"pass_type": pass_type, "pass_data": pass_data},
+            headers=headers
+        )
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as e:
+        return {"error": f"HTTP error occurred: {e.response.status_code} - {e.response.text}"}
+    except httpx.RequestError as e:
+        return {"error": f"An error occurred while requesting the backend: {e}"}
 
 
-def create_calendar_event(event_data: dict, id_token: str) -> dict:
+async def create_calendar_event(event_data: dict, id_token: str) -> dict:
     """
     Creates a Google Calendar event for a warranty expiration or a return
     deadline by calling the backend service.
     """
-    with httpx.Client() as client:
-        headers = {'Authorization': f'Bearer {id_token}'}
+    client = http_client.get_client()
+    headers = {'Authorization': f'Bearer {id_token}'}
 
-        try:
-            response = client.post(
-                f"{BACKEND_API_BASE_URL}/calendar/event",
-                json=event_data,
-                headers=headers
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            return {"error": f"HTTP error occurred: {e.response.status_code} - {e.response.text}"}
-        except httpx.RequestError as e:
-            return {"error": f"An error occurred while requesting the backend: {e}"}
+    try:
+        response = await client.post(
+            f"{BACKEND_API_BASE_URL}/calendar/event",
+            json=event_data,
+            headers=headers
+        )
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as e:
+        return {"error": f"HTTP error occurred: {e.response.status_code} - {e.response.text}"}
+    except httpx.RequestError as e:
+        return {"error": f"An error occurred while requesting the backend: {e}"}
 
 
-def query_transactions(
+async def query_transactions(
     user_id: str,
     id_token: str,
     start_date: Optional[str],
     end_date: Optional[str],
-    category: Optional[str],
-    store_name: Optional[str],
-    item_name: Optional[str],
-    currency: Optional[str],
-    city: Optional[str],
-    state: Optional[str],
-    country: Optional[str],
-    postal_code: Optional[str],
+    category: Optional[str] = None,
+    store_name: Optional[str] = None,
+    item_name: Optional[str] = None,
+    currency: Optional[str] = None,
+    city: Optional[str] = None,
+    state: Optional[str] = None,
+    country: Optional[str] = None,
+    postal_code: Optional[str] = None,
 ) -> list:
     """
     Helper function to retrieve transaction data from the backend database.
@@ -162,46 +194,78 @@ def query_transactions(
         start_date = start_date_obj.strftime('%Y-%m-%d')
         end_date = end_date_obj.strftime('%Y-%m-%d')
 
-    with httpx.Client() as client:
-        params = {}
-        if start_date:
-            params["start_date"] = start_date
-        if end_date:
-            params["end_date"] = end_date
-        if category:
-            params["category"] = category
-        if store_name:
-            params["store_name"] = store_name
-        if item_name:
-            params["item_name"] = item_name
-        if currency:
-            params["currency"] = currency
-        if city:
-            params["city"] = city
-        if state:
-            params["state"] = state
-        if country:
-            params["country"] = country
-        if postal_code:
-            params["postal_code"] = postal_code
-        
-        headers = {'Authorization': f'Bearer {id_token}'}
+    if data_access.enabled():
+        # Co-located with the backend: read its storage in process. The
+        # location and currency filters are ignored by the API as well.
+        try:
+            return await data_access.get_transactions(id_token, start_date, end_date, category, store_name, item_name)
+        except data_access.DataAccessError as e:
+            return [{"error": f"Reading transactions failed: {e}"}]
+
+    client = http_client.get_client()
+    params = {}
+    if start_date:
+        params["start_date"] = start_date
+    if end_date:
+        params["end_date"] = end_date
+    if category:
+        params["category"] = category
+    if store_name:
+        params["store_name"] = store_name
+    if item_name:
+        params["item_name"] = item_name
+    if currency:
+        params["currency"] = currency
+    if city:
+        params["city"] = city
+    if state:
+        params["state"] = state
+    if country:
+        params["country"] = country
+    if postal_code:
+        params["postal_code"] = postal_code
+    
+    headers = {'Authorization': f'Bearer {id_token}'}
+
+    try:
+        response = await client.get(
+            f"{BACKEND_API_BASE_URL}/transactions",
+            params=params,
+            headers=headers
+        )
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as e:
+        return [{"error": f"HTTP error occurred: {e.response.status_code} - {e.response.text}"}]
+    except httpx.RequestError as e:
+        return [{"error": f"An error occurred while requesting the backend: {e}"}]
+
 
+async def get_spending_stats(user_id: str, id_token: str) -> dict:
+    """
+    The user's running spending statistics (GET /transactions/stats), kept up
+    to date by the backend at every write. See spending_stats.py.
+    """
+    if data_access.enabled():
         try:
-            response = client.get(
-                f"{BACKEND_API_BASE_URL}/transactions",
-                params=params,
-                headers=headers
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            return [{"error": f"HTTP error occurred: {e.response.status_code} - {e.response.text}"}]
-        except httpx.RequestError as e:
-            return [{"error": f"An error occurred while requesting the backend: {e}"}]
+            return await data_access.get_spending_stats(id_token)
+        except data_access.DataAccessError as e:
+            return {"error": f"Reading spending stats failed: {e}"}
+
+    try:
+        response = await http_client.get_client().get(
+            f"{BACKEND_API_BASE_URL}/transactions/stats",
+            headers={'Authorization': f'Bearer {id_token}'}
+        )
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as e:
+        return {"error": f"HTTP error occurred: {e.response.status_code} - {e.response.text}"}
+    except httpx.RequestError as e:
+        return {"error": f"An error occurred while requesting the backend: {e}"}
 
 
-def analyze_financial_data(
+async def analyze_financial_data(
     user_id: str,
     id_token: str,
     query_text: str
@@ -235,45 +299,20 @@ def analyze_financial_data(
     
     # Smart date range detection based on query text
     query_lower = query_text.lower()
-    
-    # For broad analytical queries, use a wider date range to capture all available data
-    if any(phrase in query_lower for phrase in [
+    date_range = parse_date_range(query_text)
+    if date_range:
+        # Only the period asked about (see date_ranges.py)
+        start_date = date_range.start.isoformat()
+        end_date = date_range.end.isoformat()
+    elif any(phrase in query_lower for phrase in [
         "trends", "category", "categories", "most", "total", "all time", 
         "overall", "spending patterns", "store", "stores", "breakdown",
         "summary", "analysis", "compare", "comparison"
     ]):
-        # Use a very wide date range to capture all historical data
-        start_date = "2015-01-01"  # Go back far enough to capture all data
+        # No period named: broad analytical queries cover all historical data
+        start_date = "2015-01-01"
         end_date = datetime.now().strftime('%Y-%m-%d')
     
-    # Handle specific time period queries
-    elif "last month" in query_lower:
-        end_date_obj = datetime.now().replace(day=1) - timedelta(days=1)  # Last day of previous month
-        start_date_obj = end_date_obj.replace(day=1)  # First day of previous month
-        start_date = start_date_obj.strftime('%Y-%m-%d')
-        end_date = end_date_obj.strftime('%Y-%m-%d')
-    elif "this month" in query_lower:
-        start_date_obj = datetime.now().replace(day=1)
-        end_date_obj = datetime.now()
-        start_date = start_date_obj.strftime('%Y-%m-%d')
-        end_date = end_date_obj.strftime('%Y-%m-%d')
-    elif any(year in query_lower for year in ["2017", "2018", "2019", "2020", "2021", "2022", "2023", "2024", "2025"]):
-        # Extract year from query
-        import re
-        year_match = re.search(r'\b(20\d{2})\b', query_lower)
-        if year_match:
-            year = year_match.group(1)
-            start_date = f"{year}-01-01"
-            end_date = f"{year}-12-31"
-    
-    # Extract date ranges from natural language if present
-    if "since" in query_lower:
-        import re
-        date_match = re.search(r'since (\d{4})', query_lower)
-        if date_match:
-            start_date = f"{date_match.group(1)}-01-01"
-            end_date = datetime.now().strftime('%Y-%m-%d')
-    
     # Smart category detection
     if any(word in query_lower for word in ["restaurant", "food", "dining", "eating"]):
         category = "Restaurant"
@@ -283,7 +322,7 @@ def analyze_financial_data(
         category = "Electronics Store"
     
     # Step 1: Retrieve transaction data from database
-    transactions = query_transactions(
+    transactions = await query_transactions(
         user_id=user_id,
         id_token=id_token,
         start_date=start_date,
@@ -323,11 +362,15 @@ def analyze_financial_data(
             "data_count": 0
         }
     
-    # Step 3: Perform analysis using Gemini with strict instructions
+    # Step 3: Aggregate locally; the model explains exact numbers instead of
+    # adding up raw transactions (see transaction_digest.py)
+    summary = digest_transactions(transactions)
+
+    # Step 4: Perform analysis using Gemini with strict instructions
     if not GEMINI_API_KEY:
         return {
             "error": "GEMINI_API_KEY is not configured.",
-            "transactions": transactions,
+            "summary": summary,
             "analysis": {
                 "natural_language_answer": "I found your transaction data but cannot perform AI analysis due to configuration issues.",
                 "structured_data": {}
@@ -336,37 +379,36 @@ def analyze_financial_data(
             "data_count": len(transactions)
         }
 
-    model = genai.GenerativeModel('gemini-2.5-flash')
-    
     # Enhanced prompt with better analysis instructions
     prompt = f"""You are a financial analyst. The user wants to know: '{query_text}'.
 
 STRICT INSTRUCTIONS:
-- ONLY analyze the provided transaction data below
-- DO NOT make up or estimate any numbers
-- Calculate exact amounts from the provided data
+- ONLY analyze the provided summary below. It was computed exactly from all {len(transactions)} matching transactions
+- DO NOT make up or estimate any numbers, and do not re-add amounts: quote the computed totals and counts
 - Always specify the currency and time period of the data you're analyzing
-- Provide specific transaction details when relevant
-- For "most" queries (like "what store did I spend the most at"), analyze ALL transactions and find the actual maximum
-- For "trends" or "category" queries, group and analyze the data by categories
-- For "total" queries, sum up all relevant transactions
+- Amounts in different currencies are listed separately; never add them together
+- Provide specific transaction details when relevant, from largest_transactions and recent_transactions
+- For "most" queries (like "what store did I spend the most at"), use the first entry of the relevant by_* list
+- For "trends" or "category" queries, use by_category, by_item_category, by_month and by_year
+- For "total" queries, use totals
+- Lists are ordered largest first and may be cut off; groups_omitted says how many groups were left out
 
-Analyze the following ACTUAL transaction data (in JSON format): {json.dumps(transactions, indent=2)}
+Summary of the user's ACTUAL transactions (in JSON format): {json.dumps(summary)}
 
 Based ONLY on this real data, provide:
 1. A comprehensive natural language answer that directly addresses the user's question with specific amounts, dates, and details from the data
-2. Structured data for visualization (charts, graphs) based on the actual transactions
+2. Structured data for visualization (charts, graphs) based on the computed totals
 
 For example:
-- If asked about "spending trends by category", group transactions by category and show totals
-- If asked "what store did I spend the most at", find the store with highest total spending
-- If asked about a specific time period, only include transactions from that period
+- If asked about "spending trends by category", show the by_category totals
+- If asked "what store did I spend the most at", name the top store in by_store with its total
+- If asked about a specific time period, use by_month or by_year
 - Always include actual numbers, dates, and store names from the data
 
 Respond with a JSON object containing 'natural_language_answer' and 'structured_data'."""
 
     try:
-        response = model.generate_content(prompt)
+        response = await _generate(prompt, "analyze_financial_data", "financial_analysis", user_id)
         
         # Clean up the response text to ensure it's valid JSON
         response_text = response.text.strip()
@@ -394,9 +436,9 @@ Respond with a JSON object containing 'natural_language_answer' and 'structured_
                 "structured_data": {"transaction_count": len(transactions)}
             }
         
-        # Step 4: Return combined result with actual data
+        # Step 5: Return the analysis with the exact aggregates behind it
         return {
-            "transactions": transactions,
+            "summary": summary,
             "analysis": analysis_result,
             "query": query_text,
             "data_count": len(transactions),
@@ -418,9 +460,9 @@ Respond with a JSON object containing 'natural_language_answer' and 'structured_
     except Exception as e:
         return {
             "error": f"Analysis error: {e}",
-            "transactions": transactions,
+            "summary": summary,
             "analysis": {
-                "natural_language_answer": f"I found {len(transactions)} transactions from {transactions[0].get('transaction_date', 'N/A') if transactions else 'N/A'} to {transactions[-1].get('transaction_date', 'N/A') if transactions else 'N/A'}, but couldn't complete the AI analysis due to a technical error.",
+                "natural_language_answer": f"I found {len(transactions)} transactions from {summary['first_transaction_date'] or 'N/A'} to {summary['last_transaction_date'] or 'N/A'}, but couldn't complete the AI analysis due to a technical error.",
                 "structured_data": {"transaction_count": len(transactions)}
             },
             "query": query_text,
@@ -428,7 +470,7 @@ Respond with a JSON object containing 'natural_language_answer' and 'structured_
         }
 
 
-def summarize_transactions(transactions: list, query_text: str) -> dict:
+async def summarize_transactions(transactions: list, query_text: str) -> dict:
     """
     Analyzes financial transaction data to answer user questions.
     
@@ -442,11 +484,10 @@ def summarize_transactions(transactions: list, query_text: str) -> dict:
     if not GEMINI_API_KEY:
         return {"error": "GEMINI_API_KEY is not configured."}
 
-    model = genai.GenerativeModel('gemini-2.5-flash')
     prompt = f"You are a financial analyst. The user wants to know: '{query_text}'.                Analyze the following transaction data (in JSON format): {json.dumps(transactions)}.                Provide a natural language answer summarizing the relevant information                and a structured data object for charting. For example, if the user asks to compare                spending in May and June, you should compare the provided transactions for each                month and then compare the results. Respond with a JSON object containing                'natural_language_answer' and 'structured_data'."
 
     try:
-        response = model.generate_content(prompt)
+        response = await _generate(prompt, "summarize_transactions", "transaction_summary")
         summary = json.loads(response.text)
         return summary
     except Exception as e:
@@ -455,7 +496,7 @@ def summarize_transactions(transactions: list, query_text: str) -> dict:
 
 from config import SPOONACULAR_API_KEY
 
-def get_virtual_pantry(user_id: str, id_token: str, days_back: int) -> list[str]:
+async def get_virtual_pantry(user_id: str, id_token: str, days_back: int) -> list[str]:
     """
     Automatically extracts pantry items from recent grocery and food purchases.
     
@@ -473,9 +514,9 @@ def get_virtual_pantry(user_id: str, id_token: str, days_back: int) -> list[str]
     
     pantry_items = set()
     
-    # Try to get grocery transactions first
-    try:
-        grocery_transactions = query_transactions(
+    # The grocery and the full transaction lists are fetched concurrently
+    grocery_result, all_result = await asyncio.gather(
+        query_transactions(
             user_id=user_id,
             id_token=id_token,
             start_date=start_date,
@@ -488,7 +529,21 @@ def get_virtual_pantry(user_id: str, id_token: str, days_back: int) -> list[str]
             state=None,
             country=None,
             postal_code=None
-        )
+        ),
+        query_transactions(
+            user_id=user_id,
+            id_token=id_token,
+            start_date=start_date,
+            end_date=end_date
+        ),
+        return_exceptions=True,
+    )
+
+    # Try to get grocery transactions first
+    try:
+        if isinstance(grocery_result, Exception):
+            raise grocery_result
+        grocery_transactions = grocery_result
         
         # Extract ingredients from grocery transactions
         if grocery_transactions and not (len(grocery_transactions) > 0 and "error" in grocery_transactions[0]):
@@ -503,12 +558,9 @@ def get_virtual_pantry(user_id: str, id_token: str, days_back: int) -> list[str]
     
     # Also try to get all transactions and filter for food-related ones
     try:
-        all_transactions = query_transactions(
-            user_id=user_id,
-            id_token=id_token,
-            start_date=start_date,
-            end_date=end_date
-        )
+        if isinstance(all_result, Exception):
+            raise all_result
+        all_transactions = all_result
         
         if all_transactions and not (len(all_transactions) > 0 and "error" in all_transactions[0]):
             for transaction in all_transactions:
@@ -535,7 +587,7 @@ def get_virtual_pantry(user_id: str, id_token: str, days_back: int) -> list[str]
     # If still no pantry items found, try restaurant transactions for inspiration
     if not pantry_items:
         try:
-            food_transactions = query_transactions(
+            food_transactions = await query_transactions(
                 user_id=user_id,
                 id_token=id_token,
                 start_date=start_date,
@@ -628,7 +680,7 @@ def extract_ingredients_from_item_name(item_name: str) -> set[str]:
     return ingredients
 
 
-def generate_recipe_suggestion(user_id: str, id_token: str, user_preferences: Optional[str], pantry_items: Optional[list[str]]) -> dict:
+async def generate_recipe_suggestion(user_id: str, id_token: str, user_preferences: Optional[str], pantry_items: Optional[list[str]]) -> dict:
     """
     Provides recipe ideas based on the items currently available in the user's
     Virtual Pantry (automatically detected from recent purchases).
@@ -645,7 +697,7 @@ def generate_recipe_suggestion(user_id: str, id_token: str, user_preferences: Op
     
     # Auto-detect pantry items from recent purchases if not provided
     if not pantry_items:
-        pantry_items = get_virtual_pantry(user_id, id_token, 30)
+        pantry_items = await get_virtual_pantry(user_id, id_token, 30)
         
     if not pantry_items:
         return {
@@ -656,7 +708,7 @@ def generate_recipe_suggestion(user_id: str, id_token: str, user_preferences: Op
 
     # Use Gemini AI for recipe suggestions if Spoonacular API is not available
     if not SPOONACULAR_API_KEY:
-        return generate_ai_recipe_suggestions(pantry_items, user_preferences)
+        return await generate_ai_recipe_suggestions(pantry_items, user_preferences)
     
     # Try Spoonacular API first, fall back to AI if it fails
     try:
@@ -672,7 +724,7 @@ def generate_recipe_suggestion(user_id: str, id_token: str, user_preferences: Op
             "apiKey": SPOONACULAR_API_KEY
         }
 
-        response = httpx.get("https://api.spoonacular.com/recipes/findByIngredients", params=params)
+        response = await http_client.get_client().get("https://api.spoonacular.com/recipes/findByIngredients", params=params)
         response.raise_for_status()  # Raise an exception for HTTP errors
         recipes_data = response.json()
 
@@ -700,10 +752,10 @@ def generate_recipe_suggestion(user_id: str, id_token: str, user_preferences: Op
     except Exception as e:
         # Fall back to AI-generated recipes if Spoonacular fails
         print(f"Spoonacular API failed, falling back to AI: {e}")
-        return generate_ai_recipe_suggestions(pantry_items, user_preferences)
+        return await generate_ai_recipe_suggestions(pantry_items, user_preferences)
 
 
-def generate_ai_recipe_suggestions(pantry_items: list[str], user_preferences: Optional[str]) -> dict:
+async def generate_ai_recipe_suggestions(pantry_items: list[str], user_preferences: Optional[str]) -> dict:
     """
     Generate recipe suggestions using Gemini AI when Spoonacular API is not available.
     """
@@ -715,8 +767,6 @@ def generate_ai_recipe_suggestions(pantry_items: list[str], user_preferences: Op
         }
     
     try:
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        
         ingredients_text = ", ".join(pantry_items)
         preferences_text = f" with preferences: {user_preferences}" if user_preferences else ""
         
@@ -733,7 +783,7 @@ Make the recipes practical and achievable for home cooking. Focus on using as ma
 
 Format your response clearly and engagingly."""
 
-        response = model.generate_content(prompt)
+        response = await _generate(prompt, "generate_ai_recipe_suggestions", "recipe_suggestions")
         
         return {
             "recipes": [response.text],
@@ -751,7 +801,7 @@ Format your response clearly and engagingly."""
         }
 
 
-def run_proactive_analysis(user_id: str, id_token: str) -> dict:
+async def run_proactive_analysis(user_id: str, id_token: str) -> dict:
     """
     Analyzes a user's recent spending to detect trends, identify subscription
     price hikes, unusual spending patterns, or find upcoming warranty expirations. 
@@ -760,6 +810,48 @@ def run_proactive_analysis(user_id: str, id_token: str) -> dict:
     if not GEMINI_API_KEY:
         return {"insight_found": False, "insight_message": "GEMINI_API_KEY is not configured."}
 
+    # The backend keeps running spending statistics up to date at every write,
+    # so the recent and previous periods are read from them rather than from
+    # the transactions themselves
+    stats = await get_spending_stats(user_id, id_token)
+    periods = spending_stats.recent_periods(stats, date.today()) if "error" not in stats else None
+    if periods is None:
+        if "error" in stats:
+            print(f"Spending stats unavailable, reading the transactions instead: {stats['error']}")
+        return await _proactive_analysis_from_history(user_id, id_token)
+
+    current, previous = periods
+    transaction_count = current["transaction_count"]
+    if transaction_count < 3:
+        return _too_little_data_insight(transaction_count)
+
+    print(f"Proceeding with analysis of {transaction_count} transactions ({current['period']}) from spending stats")
+    prompt = _proactive_analysis_prompt(
+        f"Current Period ({current['period']}) statistics", json.dumps(current, indent=2),
+        f"Previous Period ({previous['period']}) statistics", json.dumps(previous, indent=2),
+    )
+    return await _proactive_insight(
+        user_id, id_token, prompt, transaction_count,
+        lambda: _fallback_proactive_analysis(spending_stats.charges(current), [], current["total"], previous["total"]),
+    )
+
+
+def _too_little_data_insight(transaction_count: int) -> dict:
+    """A general tip, for users with fewer than three transactions to analyze."""
+    basic_insight = get_basic_financial_insight()
+    if not transaction_count:
+        # If we can't get any transaction data, provide basic financial insights
+        basic_insight["insight_message"] = "I couldn't find transaction data to analyze, but here's a helpful financial tip: " + basic_insight["insight_message"]
+        basic_insight["action_recommended"] = "Upload some receipts using the receipt scanner to get personalized insights based on your spending data."
+    else:
+        # If we have very little transaction data, still provide helpful insights with the data we have
+        basic_insight["insight_message"] = f"I found {transaction_count} transaction(s) but need more for detailed analysis. Here's a helpful tip: " + basic_insight["insight_message"]
+        basic_insight["action_recommended"] = "Upload more receipts to get detailed spending insights and trend analysis."
+    return basic_insight
+
+
+async def _proactive_analysis_from_history(user_id: str, id_token: str) -> dict:
+    """run_proactive_analysis on the transactions, for when the spending stats can't be read."""
     # Try to get transaction data using a smart approach - start recent and expand if needed
     recent_transactions = None
     previous_transactions = None
@@ -783,47 +875,18 @@ def run_proactive_analysis(user_id: str, id_token: str) -> dict:
             try:
                 print(f"Attempting to query transactions for {period_description} from {start_date} to {end_date}")
                 
-                # Add timeout protection for the query_transactions call
-                with httpx.Client(timeout=10.0) as temp_client:
-                    # Construct the URL directly to test
-                    test_url = f"{BACKEND_API_BASE_URL}/transactions"
-                    test_params = {"start_date": start_date, "end_date": end_date}
-                    test_headers = {'Authorization': f'Bearer {id_token}'}
-                    
-                    try:
-                        test_response = temp_client.get(test_url, params=test_params, headers=test_headers)
-                        if test_response.status_code == 200:
-                            transactions = test_response.json()
-                        else:
-                            print(f"HTTP error {test_response.status_code}: {test_response.text}")
-                            transactions = [{"error": f"HTTP {test_response.status_code}: {test_response.text}"}]
-                    except httpx.TimeoutException:
-                        print(f"Timeout querying transactions for {period_description}")
-                        transactions = [{"error": f"Timeout querying transactions for {period_description}"}]
-                    except Exception as query_error:
-                        print(f"Error in direct transaction query: {query_error}")
-                        transactions = [{"error": f"Query error: {str(query_error)}"}]
+                transactions = await query_transactions(user_id, id_token, start_date, end_date)
                 
-                date_ranges_tried.append(f"{period_description}: {len(transactions) if transactions and not isinstance(transactions, list) or not transactions or "error" not in str(transactions[0]) else 'error'} transactions")
+                date_ranges_tried.append(f"{period_description}: {len(transactions) if transactions and not isinstance(transactions, list) or not transactions or 'error' not in str(transactions[0]) else 'error'} transactions")
                 
                 if transactions and len(transactions) > 0 and not "error" in str(transactions[0]):
                     recent_transactions = transactions
                     # For comparison, try to get data from an earlier period
                     prev_end_date = start_date
                     prev_start_date = (datetime.now() - timedelta(days=days_back * 2)).strftime('%Y-%m-%d')
-                    try:
-                        # Try to get previous transactions with timeout protection too
-                        with httpx.Client(timeout=5.0) as prev_client:
-                            prev_url = f"{BACKEND_API_BASE_URL}/transactions"
-                            prev_params = {"start_date": prev_start_date, "end_date": prev_end_date}
-                            prev_headers = {'Authorization': f'Bearer {id_token}'}
-                            prev_response = prev_client.get(prev_url, params=prev_params, headers=prev_headers)
-                            if prev_response.status_code == 200:
-                                previous_transactions = prev_response.json()
-                            else:
-                                previous_transactions = []
-                    except Exception as prev_error:
-                        print(f"Could not get previous transactions: {prev_error}")
+                    previous_transactions = await query_transactions(user_id, id_token, prev_start_date, prev_end_date)
+                    if previous_transactions and "error" in previous_transactions[0]:
+                        print(f"Could not get previous transactions: {previous_transactions[0]['error']}")
                         previous_transactions = []
                     
                     print(f"Found {len(recent_transactions)} transactions in {period_description}")
@@ -841,28 +904,26 @@ def run_proactive_analysis(user_id: str, id_token: str) -> dict:
     # If still no data, try using analyze_financial_data with a broad query
     if not recent_transactions or len(recent_transactions) == 0:
         try:
-            # Use analyze_financial_data with a very broad date range
-            analysis_result = analyze_financial_data(
+            # Use analyze_financial_data, which picks a very broad date range for this query
+            analysis_result = await analyze_financial_data(
                 user_id=user_id,
                 id_token=id_token,
-                query_text="Show me all my spending patterns and transaction history for analysis",
-                start_date="2020-01-01",  # Very broad range
-                end_date=datetime.now().strftime('%Y-%m-%d')
+                query_text="Show me all my spending patterns and transaction history for analysis"
             )
             
-            if analysis_result and not analysis_result.get("error") and analysis_result.get("transactions"):
-                recent_transactions = analysis_result["transactions"]
+            if analysis_result and not analysis_result.get("error") and analysis_result.get("data_count"):
+                transaction_count = analysis_result["data_count"]
                 analysis_text = analysis_result.get("analysis", {}).get("natural_language_answer", "")
                 
-                if analysis_text and len(recent_transactions) > 0:
+                if analysis_text:
                     return {
                         "insight_found": True,
                         "insight_message": f"Based on your transaction history: {analysis_text[:120]}...",
                         "insight_type": "historical_analysis",
                         "details": {
                             "analysis": analysis_text,
-                            "transaction_count": len(recent_transactions),
-                            "period": f"All available data ({len(recent_transactions)} transactions)"
+                            "transaction_count": transaction_count,
+                            "period": f"All available data ({transaction_count} transactions)"
                         },
                         "action_recommended": "Consider uploading more recent receipts to get up-to-date spending insights."
                     }
@@ -871,19 +932,8 @@ def run_proactive_analysis(user_id: str, id_token: str) -> dict:
             print(f"Error using analyze_financial_data fallback: {e}")
     
     # Validate transaction data
-    if not recent_transactions or len(recent_transactions) == 0:
-        # If we can't get any transaction data, provide basic financial insights
-        basic_insight = get_basic_financial_insight()
-        basic_insight["insight_message"] = "I couldn't find transaction data to analyze, but here's a helpful financial tip: " + basic_insight["insight_message"]
-        basic_insight["action_recommended"] = "Upload some receipts using the receipt scanner to get personalized insights based on your spending data."
-        return basic_insight
-    
-    if len(recent_transactions) < 3:
-        # If we have very little transaction data, still provide helpful insights with the data we have
-        basic_insight = get_basic_financial_insight()
-        basic_insight["insight_message"] = f"I found {len(recent_transactions)} transaction(s) but need more for detailed analysis. Here's a helpful tip: " + basic_insight["insight_message"]
-        basic_insight["action_recommended"] = "Upload more receipts to get detailed spending insights and trend analysis."
-        return basic_insight
+    if not recent_transactions or len(recent_transactions) < 3:
+        return _too_little_data_insight(len(recent_transactions or []))
 
     # If we have good transaction data, proceed with detailed analysis
     print(f"Proceeding with analysis of {len(recent_transactions)} transactions")
@@ -903,20 +953,25 @@ def run_proactive_analysis(user_id: str, id_token: str) -> dict:
             analysis_period = f"{start_date_for_analysis} to {end_date_for_analysis}"
 
     # Prepare analysis data for detailed AI analysis
-    analysis_data = {
-        "recent_transactions": recent_transactions,
-        "previous_transactions": previous_transactions if previous_transactions and not (isinstance(previous_transactions, list) and len(previous_transactions) > 0 and "error" in str(previous_transactions[0])) else [],
-        "analysis_period": analysis_period
-    }
+    previous_transactions = previous_transactions if previous_transactions and not (isinstance(previous_transactions, list) and len(previous_transactions) > 0 and "error" in str(previous_transactions[0])) else []
 
-    model = genai.GenerativeModel('gemini-2.5-flash')
-    
+    prompt = _proactive_analysis_prompt(
+        f"Current Period ({analysis_period})", json.dumps(recent_transactions, indent=2),
+        "Previous Period Transactions", json.dumps(previous_transactions, indent=2),
+    )
+    return await _proactive_insight(
+        user_id, id_token, prompt, len(recent_transactions),
+        lambda: _fallback_proactive_analysis(recent_transactions, previous_transactions),
+    )
+
+
+def _proactive_analysis_prompt(current_label: str, current_data: str, previous_label: str, previous_data: str) -> str:
     # Enhanced prompt for better insights
-    prompt = f"""You are an expert financial analyst specializing in proactive spending insights.
+    return f"""You are an expert financial analyst specializing in proactive spending insights.
 
 ANALYSIS DATA:
-Current Period ({analysis_period}): {json.dumps(recent_transactions, indent=2)}
-Previous Period Transactions: {json.dumps(analysis_data["previous_transactions"], indent=2)}
+{current_label}: {current_data}
+{previous_label}: {previous_data}
 
 ANALYSIS TASKS:
 1. **Subscription Analysis**: Look for recurring payments and identify any price increases
@@ -944,8 +999,11 @@ CRITERIA FOR SIGNIFICANT INSIGHTS:
 
 Only report ONE most significant insight. If no significant insights found, return insight_found: false."""
 
+
+async def _proactive_insight(user_id: str, id_token: str, prompt: str, transaction_count: int, fallback) -> dict:
+    """Asks the model for run_proactive_analysis's one insight, and notifies the user of it."""
     try:
-        response = model.generate_content(prompt)
+        response = await _generate(prompt, "run_proactive_analysis", "proactive_insight", user_id)
         response_text = response.text.strip()
         
         # Clean up response for JSON parsing
@@ -961,23 +1019,23 @@ Only report ONE most significant insight. If no significant insights found, retu
             insight = json.loads(response_text)
         except json.JSONDecodeError:
             # Fallback analysis if JSON parsing fails
-            return _fallback_proactive_analysis(recent_transactions, previous_transactions)
+            return fallback()
         
         # Validate response structure
         if not isinstance(insight, dict) or "insight_found" not in insight:
-            return _fallback_proactive_analysis(recent_transactions, previous_transactions)
+            return fallback()
         
         # Send notification if insight found
         if insight.get("insight_found", False):
             try:
-                notification_result = send_push_notification(user_id, insight.get("insight_message", "New financial insight available"), id_token)
+                notification_result = await send_push_notification(user_id, insight.get("insight_message", "New financial insight available"), id_token)
                 insight["notification_sent"] = notification_result.get("success", False)
             except:
                 insight["notification_sent"] = False
             
             # Add metadata
             insight["analysis_timestamp"] = datetime.now().isoformat()
-            insight["transaction_count"] = len(recent_transactions)
+            insight["transaction_count"] = transaction_count
             
             return insight
         else:
@@ -985,23 +1043,28 @@ Only report ONE most significant insight. If no significant insights found, retu
                 "insight_found": False, 
                 "insight_message": "No significant insights found in recent spending patterns.",
                 "analysis_timestamp": datetime.now().isoformat(),
-                "transaction_count": len(recent_transactions)
+                "transaction_count": transaction_count
             }
 
     except Exception as e:
         return {"insight_found": False, "insight_message": f"Analysis error: {str(e)[:100]}..."}
 
 
-def _fallback_proactive_analysis(recent_transactions: list, previous_transactions: list) -> dict:
+def _fallback_proactive_analysis(recent_transactions: list, previous_transactions: list, recent_total: Optional[float] = None, previous_total: Optional[float] = None) -> dict:
     """
     Fallback analysis when AI response parsing fails.
     Performs basic rule-based analysis to find obvious insights.
+
+    ``recent_total`` and ``previous_total`` are the periods' totals when the
+    transactions given are only some of them (e.g. from the spending stats).
     """
     try:
         # Basic spending comparison
-        if previous_transactions:
-            recent_total = sum(float(t.get("total_amount", 0)) for t in recent_transactions)
-            previous_total = sum(float(t.get("total_amount", 0)) for t in previous_transactions)
+        if previous_transactions or previous_total:
+            if recent_total is None:
+                recent_total = sum(float(t.get("total_amount", 0)) for t in recent_transactions)
+            if previous_total is None:
+                previous_total = sum(float(t.get("total_amount", 0)) for t in previous_transactions)
             
             if previous_total > 0:
                 increase_percent = ((recent_total - previous_total) / previous_total) * 100
@@ -1052,7 +1115,7 @@ def _fallback_proactive_analysis(recent_transactions: list, previous_transaction
         return {"insight_found": False, "insight_message": f"Fallback analysis failed: {str(e)}"}
 
 
-def run_comprehensive_proactive_analysis(user_id: str, id_token: str, analysis_days: int) -> dict:
+async def run_comprehensive_proactive_analysis(user_id: str, id_token: str, analysis_days: int) -> dict:
     """
     Runs a comprehensive proactive analysis over a longer period to identify
     more complex patterns and trends.
@@ -1068,11 +1131,25 @@ def run_comprehensive_proactive_analysis(user_id: str, id_token: str, analysis_d
     if not GEMINI_API_KEY:
         return {"error": "GEMINI_API_KEY is not configured."}
     
-    # Get extended transaction history
     end_date = datetime.now().strftime('%Y-%m-%d')
     start_date = (datetime.now() - timedelta(days=analysis_days)).strftime('%Y-%m-%d')
-    
-    all_transactions = query_transactions(user_id, id_token, start_date=start_date, end_date=end_date)
+
+    # The running spending statistics cover the period without fetching it
+    stats = await get_spending_stats(user_id, id_token)
+    if "error" not in stats:
+        since = date.fromisoformat(start_date)
+        insights = {
+            "analysis_period": f"{start_date} to {end_date}",
+            "total_transactions": spending_stats.transaction_count(stats, since),
+            "insights": spending_stats.insights(stats, since)
+        }
+        insights["insight_count"] = len(insights["insights"])
+        insights["analysis_timestamp"] = datetime.now().isoformat()
+        return insights
+    print(f"Spending stats unavailable, reading the transactions instead: {stats['error']}")
+
+    # Get extended transaction history
+    all_transactions = await query_transactions(user_id, id_token, start_date=start_date, end_date=end_date)
     
     if not all_transactions or (isinstance(all_transactions, list) and len(all_transactions) > 0 and "error" in all_transactions[0]):
         return {"error": "Could not retrieve transaction history for comprehensive analysis."}
@@ -1083,30 +1160,23 @@ def run_comprehensive_proactive_analysis(user_id: str, id_token: str, analysis_d
         "insights": []
     }
     
+    # Read the transactions into columns once; every analysis below runs on them
+    frame = spending_analytics.SpendingFrame.from_transactions(all_transactions)
+    
     # 1. Subscription Analysis
-    subscription_insights = _analyze_subscriptions(all_transactions)
-    if subscription_insights:
-        insights["insights"].extend(subscription_insights)
+    insights["insights"].extend(spending_analytics.subscription_insights(frame))
     
     # 2. Category Trend Analysis  
-    category_insights = _analyze_category_trends(all_transactions)
-    if category_insights:
-        insights["insights"].extend(category_insights)
+    insights["insights"].extend(spending_analytics.category_trend_insights(frame))
     
     # 3. Merchant Analysis
-    merchant_insights = _analyze_merchant_patterns(all_transactions)
-    if merchant_insights:
-        insights["insights"].extend(merchant_insights)
+    insights["insights"].extend(spending_analytics.merchant_insights(frame))
     
     # 4. Seasonal Analysis
-    seasonal_insights = _analyze_seasonal_patterns(all_transactions)
-    if seasonal_insights:
-        insights["insights"].extend(seasonal_insights)
+    insights["insights"].extend(spending_analytics.seasonal_insights(frame))
     
     # 5. Anomaly Detection
-    anomaly_insights = _detect_spending_anomalies(all_transactions)
-    if anomaly_insights:
-        insights["insights"].extend(anomaly_insights)
+    insights["insights"].extend(spending_analytics.anomaly_insights(frame))
     
     insights["insight_count"] = len(insights["insights"])
     insights["analysis_timestamp"] = datetime.now().isoformat()
@@ -1114,220 +1184,14 @@ def run_comprehensive_proactive_analysis(user_id: str, id_token: str, analysis_d
     return insights
 
 
-def _analyze_subscriptions(transactions: list) -> list:
-    """Analyze transactions for subscription patterns and price changes."""
-    insights = []
-    
-    # Group transactions by merchant and amount
-    merchant_amounts = {}
-    for transaction in transactions:
-        merchant = transaction.get("store_name", "")
-        amount = float(transaction.get("total_amount", 0))
-        date = transaction.get("transaction_date", "")
-        
-        if merchant not in merchant_amounts:
-            merchant_amounts[merchant] = []
-        merchant_amounts[merchant].append({"amount": amount, "date": date})
-    
-    # Look for recurring patterns
-    for merchant, transactions_list in merchant_amounts.items():
-        if len(transactions_list) >= 3:  # At least 3 transactions to detect pattern
-            amounts = [t["amount"] for t in transactions_list]
-            dates = [t["date"] for t in transactions_list]
-            
-            # Check for amount variations (potential price increases)
-            unique_amounts = list(set(amounts))
-            if len(unique_amounts) > 1:
-                min_amount = min(unique_amounts)
-                max_amount = max(unique_amounts)
-                
-                if max_amount > min_amount * 1.1:  # 10% increase threshold
-                    insights.append({
-                        "type": "subscription_price_increase",
-                        "merchant": merchant,
-                        "old_amount": min_amount,
-                        "new_amount": max_amount,
-                        "increase_percent": ((max_amount - min_amount) / min_amount) * 100,
-                        "message": f"{merchant} subscription increased from ${min_amount:.2f} to ${max_amount:.2f}"
-                    })
-    
-    return insights
-
-
-def _analyze_category_trends(transactions: list) -> list:
-    """Analyze spending trends by category over time."""
-    insights = []
-    
-    # Group by category and month
-    from collections import defaultdict
-    monthly_category_spending = defaultdict(lambda: defaultdict(float))
-    
-    for transaction in transactions:
-        category = transaction.get("category", "Other")
-        amount = float(transaction.get("total_amount", 0))
-        date = transaction.get("transaction_date", "")
-        
-        if date:
-            try:
-                month = date[:7]  # YYYY-MM format
-                monthly_category_spending[category][month] += amount
-            except:
-                continue
-    
-    # Analyze trends for each category
-    for category, monthly_data in monthly_category_spending.items():
-        if len(monthly_data) >= 2:
-            months = sorted(monthly_data.keys())
-            amounts = [monthly_data[month] for month in months]
-            
-            # Calculate trend
-            if len(amounts) >= 2:
-                recent_avg = sum(amounts[-2:]) / 2
-                older_avg = sum(amounts[:-2]) / max(1, len(amounts) - 2) if len(amounts) > 2 else amounts[0]
-                
-                if recent_avg > older_avg * 1.25:  # 25% increase
-                    insights.append({
-                        "type": "category_spending_increase",
-                        "category": category,
-                        "old_average": older_avg,
-                        "new_average": recent_avg,
-                        "increase_percent": ((recent_avg - older_avg) / older_avg) * 100,
-                        "message": f"{category} spending increased {((recent_avg - older_avg) / older_avg) * 100:.0f}%"
-                    })
-    
-    return insights
-
-
-def _analyze_merchant_patterns(transactions: list) -> list:
-    """Analyze merchant spending patterns."""
-    insights = []
-    
-    merchant_spending = {}
-    for transaction in transactions:
-        merchant = transaction.get("store_name", "")
-        amount = float(transaction.get("total_amount", 0))
-        
-        if merchant not in merchant_spending:
-            merchant_spending[merchant] = {"total": 0, "count": 0, "amounts": []}
-        
-        merchant_spending[merchant]["total"] += amount
-        merchant_spending[merchant]["count"] += 1
-        merchant_spending[merchant]["amounts"].append(amount)
-    
-    # Find top spending merchants
-    top_merchants = sorted(merchant_spending.items(), key=lambda x: x[1]["total"], reverse=True)[:5]
-    
-    for merchant, data in top_merchants:
-        if data["total"] > 200:  # Significant spending threshold
-            avg_transaction = data["total"] / data["count"]
-            insights.append({
-                "type": "top_merchant",
-                "merchant": merchant,
-                "total_spent": data["total"],
-                "transaction_count": data["count"],
-                "average_transaction": avg_transaction,
-                "message": f"Top spending: ${data['total']:.2f} at {merchant} ({data['count']} transactions)"
-            })
-    
-    return insights
-
-
-def _analyze_seasonal_patterns(transactions: list) -> list:
-    """Analyze seasonal spending patterns."""
-    insights = []
-    
-    # This is a simplified seasonal analysis
-    # In a real implementation, you'd want more sophisticated time series analysis
-    monthly_spending = {}
-    
-    for transaction in transactions:
-        date = transaction.get("transaction_date", "")
-        amount = float(transaction.get("total_amount", 0))
-        
-        if date:
-            try:
-                month = int(date.split("-")[1])
-                if month not in monthly_spending:
-                    monthly_spending[month] = []
-                monthly_spending[month].append(amount)
-            except:
-                continue
-    
-    # Calculate average spending by month
-    monthly_averages = {}
-    for month, amounts in monthly_spending.items():
-        monthly_averages[month] = sum(amounts) / len(amounts)
-    
-    if len(monthly_averages) >= 3:
-        overall_avg = sum(monthly_averages.values()) / len(monthly_averages)
-        
-        for month, avg in monthly_averages.items():
-            if avg > overall_avg * 1.3:  # 30% above average
-                month_names = ["", "Jan", "Feb", "Mar", "Apr", "May", "Jun", 
-                              "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
-                insights.append({
-                    "type": "seasonal_high_spending",
-                    "month": month,
-                    "month_name": month_names[month],
-                    "average_spending": avg,
-                    "overall_average": overall_avg,
-                    "message": f"High spending in {month_names[month]}: ${avg:.2f} vs ${overall_avg:.2f} average"
-                })
-    
-    return insights
-
-
-def _detect_spending_anomalies(transactions: list) -> list:
-    """Detect unusual spending patterns or anomalies."""
-    insights = []
-    
-    amounts = [float(t.get("total_amount", 0)) for t in transactions]
-    
-    if amounts:
-        # Calculate statistics
-        avg_amount = sum(amounts) / len(amounts)
-        sorted_amounts = sorted(amounts)
-        
-        # Find outliers (simple method)
-        q1_index = len(sorted_amounts) // 4
-        q3_index = 3 * len(sorted_amounts) // 4
-        
-        if q1_index < len(sorted_amounts) and q3_index < len(sorted_amounts):
-            q1 = sorted_amounts[q1_index]
-            q3 = sorted_amounts[q3_index]
-            iqr = q3 - q1
-            
-            upper_bound = q3 + 1.5 * iqr
-            
-            # Find anomalous transactions
-            anomalous_transactions = [t for t in transactions if float(t.get("total_amount", 0)) > upper_bound]
-            
-            if anomalous_transactions:
-                for transaction in anomalous_transactions[:3]:  # Limit to top 3 anomalies
-                    amount = float(transaction.get("total_amount", 0))
-                    merchant = transaction.get("store_name", "Unknown")
-                    date = transaction.get("transaction_date", "")
-                    
-                    insights.append({
-                        "type": "spending_anomaly",
-                        "amount": amount,
-                        "merchant": merchant,
-                        "date": date,
-                        "average_amount": avg_amount,
-                        "message": f"Unusual transaction: ${amount:.2f} at {merchant} (avg: ${avg_amount:.2f})"
-                    })
-    
-    return insights
-
-
-def generate_savings_plan(user_id: str, goal_amount: float, time_frame: str, id_token: str) -> dict:
+async def generate_savings_plan(user_id: str, goal_amount: float, time_frame: str, id_token: str) -> dict:
     """
     Helps users with forward-looking problems by creating a personalized savings
     plan based on their spending history.
     """
     end_date = datetime.now().strftime('%Y-%m-%d')
     start_date = (datetime.now() - timedelta(days=90)).strftime('%Y-%m-%d')
-    spending_history = query_transactions(user_id, id_token, start_date=start_date, end_date=end_date)
+    spending_history = await query_transactions(user_id, id_token, start_date=start_date, end_date=end_date)
 
     if not spending_history or "error" in spending_history[0]:
         return {"error": "Could not retrieve spending history."}
@@ -1335,7 +1199,6 @@ def generate_savings_plan(user_id: str, goal_amount: float, time_frame: str, id_
     if not GEMINI_API_KEY:
         return {"error": "GEMINI_API_KEY is not configured."}
 
-    model = genai.GenerativeModel('gemini-2.5-flash')
     prompt = f"You are a financial advisor. A user wants to save ${goal_amount} in {time_frame}. \
                Their spending history for the last 90 days is as follows (in JSON format): \
                {json.dumps(spending_history)}. \
@@ -1344,64 +1207,64 @@ def generate_savings_plan(user_id: str, goal_amount: float, time_frame: str, id_
                suggestions. Respond with a JSON object containing 'summary' and 'suggestions'."
 
     try:
-        response = model.generate_content(prompt)
+        response = await _generate(prompt, "generate_savings_plan", "savings_plan", user_id)
         plan = json.loads(response.text)
         return plan
     except Exception as e:
         return {"error": f"An error occurred while generating the savings plan: {e}"}
 
 
-def manage_savings_challenge(user_id: str, challenge_type: str, action: str, id_token: str) -> dict:
+async def manage_savings_challenge(user_id: str, challenge_type: str, action: str, id_token: str) -> dict:
     """
     Manages opt-in gamified savings challenges by interacting with the backend.
     """
-    with httpx.Client() as client:
-        headers = {'Authorization': f'Bearer {id_token}'}
+    client = http_client.get_client()
+    headers = {'Authorization': f'Bearer {id_token}'}
 
-        try:
-            if action == "start":
-                response = client.post(
-                    f"{BACKEND_API_BASE_URL}/challenges",
-                    json={"user_id": user_id, "challenge_type": challenge_type},
-                    headers=headers
-                )
-            else: # check_progress or complete
-                response = client.get(
-                    f"{BACKEND_API_BASE_URL}/challenges",
-                    params={"user_id": user_id, "action": action},
-                    headers=headers
-                )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            return {"error": f"HTTP error occurred: {e.response.status_code} - {e.response.text}"}
-        except httpx.RequestError as e:
-            return {"error": f"An error occurred while requesting the backend: {e}"}
-
-
-def send_push_notification(user_id: str, message: str, id_token: str) -> dict:
+    try:
+        if action == "start":
+            response = await client.post(
+                f"{BACKEND_API_BASE_URL}/challenges",
+                json={"user_id": user_id, "challenge_type": challenge_type},
+                headers=headers
+            )
+        else: # check_progress or complete
+            response = await client.get(
+                f"{BACKEND_API_BASE_URL}/challenges",
+                params={"user_id": user_id, "action": action},
+                headers=headers
+            )
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as e:
+        return {"error": f"HTTP error occurred: {e.response.status_code} - {e.response.text}"}
+    except httpx.RequestError as e:
+        return {"error": f"An error occurred while requesting the backend: {e}"}
+
+
+async def send_push_notification(user_id: str, message: str, id_token: str) -> dict:
     """
     Sends a timely alert or insight to the user's device by calling the
     backend's notification service.
     """
-    with httpx.Client() as client:
-        headers = {'Authorization': f'Bearer {id_token}'}
+    client = http_client.get_client()
+    headers = {'Authorization': f'Bearer {id_token}'}
 
-        try:
-            response = client.post(
-                f"{BACKEND_API_BASE_URL}/notifications/send",
-                json={"user_id": user_id, "message": message},
-                headers=headers
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            return {"error": f"HTTP error occurred: {e.response.status_code} - {e.response.text}"}
-        except httpx.RequestError as e:
-            return {"error": f"An error occurred while requesting the backend: {e}"}
+    try:
+        response = await client.post(
+            f"{BACKEND_API_BASE_URL}/notifications/send",
+            json={"user_id": user_id, "message": message},
+            headers=headers
+        )
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as e:
+        return {"error": f"HTTP error occurred: {e.response.status_code} - {e.response.text}"}
+    except httpx.RequestError as e:
+        return {"error": f"An error occurred while requesting the backend: {e}"}
 
 
-def schedule_proactive_insights(user_id: str, id_token: str, frequency: str) -> dict:
+async def schedule_proactive_insights(user_id: str, id_token: str, frequency: str) -> dict:
     """
     Schedules proactive insight analysis for a user.
     
@@ -1413,28 +1276,28 @@ def schedule_proactive_insights(user_id: str, id_token: str, frequency: str) ->
     Returns:
         Dictionary with scheduling result
     """
-    with httpx.Client() as client:
-        headers = {'Authorization': f'Bearer {id_token}'}
-        
-        try:
-            response = client.post(
-                f"{BACKEND_API_BASE_URL}/insights/schedule",
-                json={
-                    "user_id": user_id,
-                    "frequency": frequency,
-                    "analysis_type": "proactive"
-                },
-                headers=headers
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            return {"error": f"HTTP error occurred: {e.response.status_code} - {e.response.text}"}
-        except httpx.RequestError as e:
-            return {"error": f"An error occurred while requesting the backend: {e}"}
+    client = http_client.get_client()
+    headers = {'Authorization': f'Bearer {id_token}'}
 
+    try:
+        response = await client.post(
+            f"{BACKEND_API_BASE_URL}/insights/schedule",
+            json={
+                "user_id": user_id,
+                "frequency": frequency,
+                "analysis_type": "proactive"
+            },
+            headers=headers
+        )
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as e:
+        return {"error": f"HTTP error occurred: {e.response.status_code} - {e.response.text}"}
+    except httpx.RequestError as e:
+        return {"error": f"An error occurred while requesting the backend: {e}"}
 
-def get_user_insights_history(user_id: str, id_token: str, days_back: int) -> dict:
+
+async def get_user_insights_history(user_id: str, id_token: str, days_back: int) -> dict:
     """
     Retrieves the history of insights generated for a user.
     
@@ -1446,25 +1309,25 @@ def get_user_insights_history(user_id: str, id_token: str, days_back: int) -> di
     Returns:
         Dictionary with insights history
     """
-    with httpx.Client() as client:
-        headers = {'Authorization': f'Bearer {id_token}'}
-        params = {"days_back": days_back}
-        
-        try:
-            response = client.get(
-                f"{BACKEND_API_BASE_URL}/insights/history",
-                params=params,
-                headers=headers
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as e:
-            return {"error": f"HTTP error occurred: {e.response.status_code} - {e.response.text}"}
-        except httpx.RequestError as e:
-            return {"error": f"An error occurred while requesting the backend: {e}"}
+    client = http_client.get_client()
+    headers = {'Authorization': f'Bearer {id_token}'}
+    params = {"days_back": days_back}
+
+    try:
+        response = await client.get(
+            f"{BACKEND_API_BASE_URL}/insights/history",
+            params=params,
+            headers=headers
+        )
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as e:
+        return {"error": f"HTTP error occurred: {e.response.status_code} - {e.response.text}"}
+    except httpx.RequestError as e:
+        return {"error": f"An error occurred while requesting the backend: {e}"}
 
 
-def run_batch_proactive_analysis(user_ids: list, batch_size: int) -> dict:
+async def run_batch_proactive_analysis(user_ids: list, batch_size: int) -> dict:
     """
     Runs proactive analysis for multiple users in batches.
     This would typically be called by a background scheduler.
@@ -1493,7 +1356,7 @@ def run_batch_proactive_analysis(user_ids: list, batch_size: int) -> dict:
             try:
                 # Note: In a real implementation, you'd need to get the id_token for each user
                 # This is a simplified version
-                insight_result = run_proactive_analysis(user_id, "system_token")
+                insight_result = await run_proactive_analysis(user_id, "system_token")
                 
                 batch_result["users"].append({
                     "user_id": user_id,
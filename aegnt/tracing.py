@@ -0,0 +1,83 @@
+"""
+W3C trace-context propagation for the agent.
+
+ADK already records OpenTelemetry spans for agent invocations, LLM calls and
+tool executions. This module connects them to the caller: the incoming
+``traceparent`` from the backend becomes the parent of the agent's spans, and
+every tool request back to the backend carries the current span's context.
+
+Spans are exported over OTLP/HTTP when ``OTEL_EXPORTER_OTLP_ENDPOINT`` (or
+``OTEL_EXPORTER_OTLP_TRACES_ENDPOINT``) is set and
+``opentelemetry-exporter-otlp-proto-http`` is installed.
+"""
+
+import logging
+import os
+from contextlib import contextmanager
+from typing import Mapping, Optional
+
+import httpx
+from opentelemetry import propagate, trace
+from opentelemetry.trace import SpanKind, Status, StatusCode
+
+logger = logging.getLogger(__name__)
+
+TRACER_NAME = "aegis.aegnt"
+GEMINI_MODEL = "gemini-2.5-flash"
+
+
+def configure_tracing(service_name: str) -> bool:
+    """Installs an OTLP-exporting tracer provider when an endpoint is configured."""
+    if not (os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT") or os.getenv("OTEL_EXPORTER_OTLP_TRACES_ENDPOINT")):
+        return False
+    try:
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError as e:
+        logger.warning(f"OTLP endpoint configured but tracing packages are missing: {str(e)}")
+        return False
+
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    trace.set_tracer_provider(provider)
+    return True
+
+
+def shutdown_tracing():
+    provider = trace.get_tracer_provider()
+    if hasattr(provider, "shutdown"):
+        provider.shutdown()
+
+
+@contextmanager
+def server_span(name: str, headers: Mapping[str, str], attributes: Optional[dict] = None):
+    """Span for an incoming request, continuing the caller's trace from its ``traceparent``."""
+    tracer = trace.get_tracer(TRACER_NAME)
+    with tracer.start_as_current_span(name, context=propagate.extract(headers), kind=SpanKind.SERVER, attributes=attributes) as span:
+        yield span
+
+
+def set_status_code(span, status_code: int):
+    span.set_attribute("http.response.status_code", status_code)
+    if status_code >= 500:
+        span.set_status(Status(StatusCode.ERROR))
+
+
+@contextmanager
+def gemini_span(operation: str, model: str = GEMINI_MODEL):
+    """Client span around a direct google.generativeai call made by a tool."""
+    tracer = trace.get_tracer(TRACER_NAME)
+    attributes = {"gen_ai.system": "gemini", "gen_ai.request.model": model, "aegis.operation": operation}
+    with tracer.start_as_current_span(f"gemini {operation}", kind=SpanKind.CLIENT, attributes=attributes) as span:
+        yield span
+
+
+async def _inject_trace_headers(request: httpx.Request):
+    propagate.inject(request.headers)
+
+
+def async_backend_client(**kwargs) -> httpx.AsyncClient:
+    """httpx.AsyncClient for calls to the backend that propagates the current trace."""
+    return httpx.AsyncClient(event_hooks={"request": [_inject_trace_headers]}, **kwargs)
@@ -0,0 +1,123 @@
+"""
+Compact, exact digests of transaction lists for analysis prompts.
+
+analyze_financial_data used to paste every matching transaction, items and
+all, into its Gemini prompt as indented JSON. Broad questions match the whole
+history, so the prompt, its latency and its cost grew with every receipt until
+it overflowed the context window, and the model was left adding up hundreds
+of amounts itself. The tool now digests the transactions here first: totals
+by currency, merchant category, item category, store, month and year, the
+largest transactions and the most recent ones, computed exactly in Python.
+The model is given the digest, whose size is bounded however long the
+history is, and only has to explain the numbers.
+
+Groups are keyed by (name, currency) so amounts in different currencies are
+never added together, as in the backend's /transactions/summary.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+_GroupKey = Tuple[str, str]
+
+# Bounds on each part of the digest, so its size does not depend on the
+# number of transactions
+MAX_GROUPS = 15
+MAX_MONTHS = 24
+SAMPLE_ROWS = 10
+ITEMS_PER_ROW = 5
+
+
+def _add(totals: Dict[_GroupKey, list], key: _GroupKey, amount: float):
+    entry = totals.get(key)
+    if entry is None:
+        totals[key] = [amount, 1]
+    else:
+        entry[0] += amount
+        entry[1] += 1
+
+
+def _grouped(totals: Dict[_GroupKey, list], name_field: str, limit: Optional[int] = None) -> List[dict]:
+    groups = [
+        {name_field: name, "currency": currency, "total": round(total, 2), "count": count}
+        for (name, currency), (total, count) in totals.items()
+    ]
+    groups.sort(key=lambda group: group["total"], reverse=True)
+    return groups[:limit] if limit else groups
+
+
+def _row(transaction: dict) -> dict:
+    """A transaction with only the fields an answer would quote."""
+    items = transaction.get("items") or []
+    row = {
+        "date": str(transaction.get("transaction_date") or "")[:10],
+        "store_name": transaction.get("store_name") or "Unknown",
+        "total_amount": transaction.get("total_amount") or 0.0,
+        "currency": transaction.get("currency") or "INR",
+        "category": transaction.get("category") or "General",
+        "items": [f"{item.get('name')} ({item.get('price')})" for item in items[:ITEMS_PER_ROW]],
+    }
+    if len(items) > ITEMS_PER_ROW:
+        row["more_items"] = len(items) - ITEMS_PER_ROW
+    return row
+
+
+def digest_transactions(transactions: List[dict], max_groups: int = MAX_GROUPS, max_months: int = MAX_MONTHS, sample_rows: int = SAMPLE_ROWS) -> dict:
+    """
+    Exact aggregates of ``transactions`` (as returned by query_transactions)
+    plus a bounded sample of rows.
+
+    Store, category and item category lists keep their ``max_groups`` largest
+    groups and ``by_month`` its latest ``max_months`` months; each notes how
+    many groups it left out, and ``by_year`` always covers the whole range.
+    """
+    totals: Dict[str, float] = {}
+    by_category: Dict[_GroupKey, list] = {}
+    by_item_category: Dict[_GroupKey, list] = {}
+    by_store: Dict[_GroupKey, list] = {}
+    by_month: Dict[_GroupKey, list] = {}
+    by_year: Dict[_GroupKey, list] = {}
+    item_count = 0
+
+    for transaction in transactions:
+        amount = transaction.get("total_amount") or 0.0
+        currency = transaction.get("currency") or "INR"
+        date = str(transaction.get("transaction_date") or "")
+        totals[currency] = totals.get(currency, 0.0) + amount
+        _add(by_category, (transaction.get("category") or "General", currency), amount)
+        _add(by_store, (transaction.get("store_name") or "Unknown", currency), amount)
+        _add(by_month, (date[:7], currency), amount)
+        _add(by_year, (date[:4], currency), amount)
+        for item in transaction.get("items") or []:
+            item_count += 1
+            price = (item.get("price") or 0.0) * (item.get("quantity") or 1.0)
+            _add(by_item_category, (item.get("category") or "Other", currency), price)
+
+    dates = sorted(str(t["transaction_date"]) for t in transactions if t.get("transaction_date"))
+    months = sorted(_grouped(by_month, "month"), key=lambda group: group["month"])
+    largest = sorted(transactions, key=lambda t: t.get("total_amount") or 0.0, reverse=True)[:sample_rows]
+    recent = sorted(transactions, key=lambda t: str(t.get("transaction_date") or ""), reverse=True)[:sample_rows]
+
+    digest = {
+        "transaction_count": len(transactions),
+        "item_count": item_count,
+        "first_transaction_date": dates[0][:10] if dates else None,
+        "last_transaction_date": dates[-1][:10] if dates else None,
+        "totals": {currency: round(total, 2) for currency, total in totals.items()},
+        "by_category": _grouped(by_category, "category", max_groups),
+        "by_item_category": _grouped(by_item_category, "item_category", max_groups),
+        "by_store": _grouped(by_store, "store_name", max_groups),
+        "by_month": months[-max_months:],
+        "by_year": sorted(_grouped(by_year, "year"), key=lambda group: group["year"]),
+        "largest_transactions": [_row(t) for t in largest],
+        "recent_transactions": [_row(t) for t in recent],
+    }
+    omitted = {
+        "categories": len(by_category) - len(digest["by_category"]),
+        "item_categories": len(by_item_category) - len(digest["by_item_category"]),
+        "stores": len(by_store) - len(digest["by_store"]),
+        "months": len(months) - len(digest["by_month"]),
+    }
+    omitted = {name: count for name, count in omitted.items() if count > 0}
+    if omitted:
+        digest["groups_omitted"] = omitted
+    return digest
@@ -1,26 +1,219 @@
 
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Optional
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from firebase_admin import auth, credentials
 import firebase_admin
 from core.config import settings
+from core.metrics import record_stage
 from models.user import User
 
-# Initialize Firebase Admin SDK
-# It's recommended to load credentials from a secure source, not hardcode them.
-cred = credentials.Certificate(settings.GOOGLE_APPLICATION_CREDENTIALS)
-firebase_admin.initialize_app(cred)
+logger = logging.getLogger(__name__)
 
 security = HTTPBearer(auto_error=False)
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> User:
+# Where Firebase publishes the public keys that ID tokens are signed with
+ID_TOKEN_CERT_URL = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+
+_firebase_app = None
+_firebase_app_lock = threading.Lock()
+
+def get_firebase_app() -> firebase_admin.App:
+    """
+    Initializes the Firebase Admin SDK on first use.
+
+    Deferring this keeps module import free of file and network access, so the
+    app starts even when credentials are not mounted yet.
+    """
+    global _firebase_app
+    if _firebase_app is None:
+        with _firebase_app_lock:
+            if _firebase_app is None:
+                # It's recommended to load credentials from a secure source, not hardcode them.
+                cred = credentials.Certificate(settings.GOOGLE_APPLICATION_CREDENTIALS)
+                _firebase_app = firebase_admin.initialize_app(cred)
+    return _firebase_app
+
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU of decoded ID tokens, keyed by the SHA-256 of the token.
+
+    An entry is served only until the token's own ``exp`` claim, so a cached
+    token is never accepted after Firebase would have rejected it. Raw tokens
+    are never kept in memory.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self._key(token)
+        with self._lock:
+            decoded = self._entries.get(key)
+            if decoded is None:
+                return None
+            if decoded.get("exp", 0) <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return decoded
+
+    def put(self, token: str, decoded: dict):
+        if self.max_size <= 0:
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = decoded
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class TokenVerificationStats:
+    """Counters and timings for ID token verification and certificate refreshes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.cache_hits = 0
+            self.verifications = 0
+            self.failures = 0
+            self.verify_seconds_total = 0.0
+            self.verify_seconds_max = 0.0
+            self.cert_refreshes = 0
+            self.cert_refresh_failures = 0
+            self.last_cert_refresh: Optional[str] = None
+
+    def record_hit(self):
+        with self._lock:
+            self.cache_hits += 1
+
+    def record_verification(self, seconds: float, failed: bool = False):
+        with self._lock:
+            self.verifications += 1
+            self.failures += int(failed)
+            self.verify_seconds_total += seconds
+            self.verify_seconds_max = max(self.verify_seconds_max, seconds)
+
+    def record_cert_refresh(self, failed: bool = False):
+        with self._lock:
+            if failed:
+                self.cert_refresh_failures += 1
+            else:
+                self.cert_refreshes += 1
+                self.last_cert_refresh = datetime.now(timezone.utc).isoformat()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            lookups = self.cache_hits + self.verifications
+            return {
+                "cache_hits": self.cache_hits,
+                "cache_hit_ratio": round(self.cache_hits / lookups, 4) if lookups else None,
+                "verifications": self.verifications,
+                "verification_failures": self.failures,
+                "verify_ms_mean": round(self.verify_seconds_total / self.verifications * 1000, 3) if self.verifications else None,
+                "verify_ms_max": round(self.verify_seconds_max * 1000, 3),
+                "cert_refreshes": self.cert_refreshes,
+                "cert_refresh_failures": self.cert_refresh_failures,
+                "last_cert_refresh": self.last_cert_refresh,
+            }
+
+
+token_cache = VerifiedTokenCache(settings.AUTH_TOKEN_CACHE_SIZE)
+token_stats = TokenVerificationStats()
+
+def token_verification_status() -> dict:
+    return {"cache_size": len(token_cache), **token_stats.snapshot()}
+
+def verify_id_token(token: str) -> dict:
+    """
+    auth.verify_id_token with a cache in front of it.
+
+    Repeat calls with the same (unexpired) token skip the RSA verification. Like
+    the default verify_id_token call, this does not check for revocation.
+    """
+    decoded = token_cache.get(token)
+    if decoded is not None:
+        token_stats.record_hit()
+        return decoded
+    start = time.perf_counter()
+    try:
+        decoded = auth.verify_id_token(token, app=get_firebase_app())
+    except Exception:
+        token_stats.record_verification(time.perf_counter() - start, failed=True)
+        raise
+    elapsed = time.perf_counter() - start
+    token_stats.record_verification(elapsed)
+    record_stage("firebase_auth", "verify_id_token", elapsed)
+    token_cache.put(token, decoded)
+    return decoded
+
+def refresh_public_certificates():
+    """
+    Re-downloads the token signing certificates into firebase_admin's HTTP cache.
+
+    The verifier fetches certificates lazily when its cached copy expires, which
+    stalls whichever request happens to need them; refreshing ahead of expiry
+    keeps that off the request path. Blocking.
+    """
+    client = auth._get_client(get_firebase_app())
+    # firebase_admin keeps its cache-control aware transport on the token verifier
+    request = client._token_verifier.request
+    response = request(url=ID_TOKEN_CERT_URL, headers={"Cache-Control": "no-cache"})
+    if response.status != 200:
+        raise RuntimeError(f"Certificate refresh returned HTTP {response.status}")
+
+async def refresh_public_certificates_periodically(interval_seconds: float):
+    """Background task started by the app lifespan."""
+    while True:
+        try:
+            await run_in_threadpool(refresh_public_certificates)
+            token_stats.record_cert_refresh()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            token_stats.record_cert_refresh(failed=True)
+            logger.warning(f"Refreshing Firebase public certificates failed: {str(e)}")
+        await asyncio.sleep(interval_seconds)
+
+def user_for_token(token: Optional[str]) -> User:
+    """
+    The user an ID token belongs to, as authenticated by the API routes.
+
+    Shared with aegnt's in-process data access so both paths accept the same
+    tokens. Blocking on a cache miss (certificate fetch, RSA verification).
+    """
     # TEMPORARY HACKATHON FIX: Skip authentication validation
     # In production, you should validate the Firebase ID token properly
     
-    if credentials:
+    if token:
         try:
-            token = credentials.credentials
-            decoded_token = auth.verify_id_token(token)
+            decoded_token = verify_id_token(token)
             return User(
                 uid=decoded_token['uid'],
                 email=decoded_token['email'],
@@ -38,3 +231,6 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
         display_name="Test User",
         id_token="hackathon_bypass_token"
     )
+
+def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> User:
+    return user_for_token(credentials.credentials if credentials else None)
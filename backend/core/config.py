@@ -20,6 +20,33 @@ class Settings(BaseSettings):
     GOOGLE_WALLET_SERVICE_ACCOUNT_KEY_FILE: str = os.getenv("GOOGLE_WALLET_SERVICE_ACCOUNT_KEY_FILE", "<your_google_wallet_service_account_key_file>")
     GOOGLE_CALENDAR_SERVICE_ACCOUNT_KEY_FILE: str = os.getenv("GOOGLE_CALENDAR_SERVICE_ACCOUNT_KEY_FILE", "<your_google_calendar_service_account_key_file>")
     AGENT_ID: str = os.getenv("AGENT_ID", "<your_agent_id>")
+    # Storage backend behind FirestoreService: "firestore", "memory" or "sqlite"
+    STORAGE_BACKEND: str = os.getenv("STORAGE_BACKEND", "firestore")
+    SQLITE_DB_PATH: str = os.getenv("SQLITE_DB_PATH", "aegis.db")
+    # Verified ID tokens kept in memory (0 disables the cache) and how often the
+    # token signing certificates are re-fetched in the background.
+    AUTH_TOKEN_CACHE_SIZE: int = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))
+    AUTH_CERT_REFRESH_SECONDS: int = int(os.getenv("AUTH_CERT_REFRESH_SECONDS", "3600"))
+    # Per-request profiling (core/profiling.py): requests sending X-Aegis-Profile
+    # with this token are profiled, plus a random fraction of all requests.
+    # Both off by default.
+    PROFILE_ADMIN_TOKEN: str = os.getenv("PROFILE_ADMIN_TOKEN", "")
+    PROFILE_SAMPLE_RATE: float = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+    PROFILE_INTERVAL_MS: float = float(os.getenv("PROFILE_INTERVAL_MS", "1"))
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", "profiles")
+    PROFILE_MAX_FILES: int = int(os.getenv("PROFILE_MAX_FILES", "200"))
+    # LLM usage accounting (core/llm_usage.py). Daily per-user budgets, 0 means
+    # unlimited; LLM_USER_BUDGETS overrides them per user as JSON, e.g.
+    # {"<uid>": {"tokens": 200000, "cost_usd": 0.25}}. Users over budget are
+    # served by LLM_FALLBACK_MODEL for the rest of the day.
+    LLM_DAILY_TOKEN_BUDGET: int = int(os.getenv("LLM_DAILY_TOKEN_BUDGET", "0"))
+    LLM_DAILY_COST_BUDGET_USD: float = float(os.getenv("LLM_DAILY_COST_BUDGET_USD", "0"))
+    LLM_USER_BUDGETS: str = os.getenv("LLM_USER_BUDGETS", "")
+    LLM_FALLBACK_MODEL: str = os.getenv("LLM_FALLBACK_MODEL", "gemini-2.5-flash-lite")
+    # Per-model prices as JSON, merged over the defaults in core/llm_usage.py
+    LLM_PRICES: str = os.getenv("LLM_PRICES", "")
+    # Token required in the X-Aegis-Admin header by /admin endpoints (disabled when empty)
+    ADMIN_API_TOKEN: str = os.getenv("ADMIN_API_TOKEN", "")
 
     class Config:
         case_sensitive = True
@@ -0,0 +1,121 @@
+import logging
+import threading
+import time
+from fastapi import Depends, Request
+from fastapi.concurrency import run_in_threadpool
+from core.auth import get_firebase_app
+from core.config import settings
+from services.aegnt_service import AegntService
+from services.firebase_notification_service import FirebaseNotificationService
+from services.firestore_service import FirestoreService
+from services.gemini_service import GeminiService
+from services.google_calendar_service import GoogleCalendarService
+from services.google_wallet_service import GoogleWalletService
+
+logger = logging.getLogger(__name__)
+
+# Dependencies warmed in the background after startup. /ready reports 503 until
+# all of them have initialized.
+WARM_UP_DEPENDENCIES = ("firebase_auth", "storage", "gemini")
+
+
+class ServiceContainer:
+    """
+    Owns one instance of every backend service for the lifetime of the app.
+
+    Built by the FastAPI lifespan handler in main.py and exposed to routes through
+    the ``get_*`` dependencies below, so all routers share the same Firestore
+    storage backend, httpx connection pool and Google API clients.
+
+    Construction is cheap and offline: heavy SDK clients are created either by
+    ``warm_up`` (core dependencies) or on first use (rarely used ones), and the
+    time each took is recorded in ``dependency_status`` for the readiness probe.
+    """
+
+    def __init__(self):
+        self.firestore_service = FirestoreService()
+        self.gemini_service = GeminiService()
+        self.google_wallet_service = GoogleWalletService()
+        self.google_calendar_service = GoogleCalendarService()
+        self.firebase_notification_service = FirebaseNotificationService(self.firestore_service)
+        self.aegnt_service = AegntService()
+        self._gmaps = None
+        self._gmaps_lock = threading.Lock()
+        self.dependency_status = {name: {"ready": False} for name in WARM_UP_DEPENDENCIES}
+
+    @property
+    def gmaps(self):
+        """googlemaps client, only needed when a receipt has no address to geocode."""
+        if self._gmaps is None:
+            with self._gmaps_lock:
+                if self._gmaps is None:
+                    import googlemaps
+                    self._gmaps = self._timed_init("gmaps", lambda: googlemaps.Client(key=settings.GOOGLE_MAPS_API_KEY))
+        return self._gmaps
+
+    def _timed_init(self, name: str, factory):
+        start = time.perf_counter()
+        try:
+            result = factory()
+        except Exception as e:
+            self.dependency_status[name] = {"ready": False, "error": str(e), "seconds": round(time.perf_counter() - start, 4)}
+            raise
+        self.dependency_status[name] = {"ready": True, "seconds": round(time.perf_counter() - start, 4)}
+        return result
+
+    async def warm_up(self):
+        """Initializes the core SDK clients off the event loop, one at a time."""
+        warmers = {
+            "firebase_auth": get_firebase_app,
+            "storage": self.firestore_service.warm_up,
+            "gemini": lambda: self.gemini_service.model,
+        }
+        for name, factory in warmers.items():
+            try:
+                await run_in_threadpool(self._timed_init, name, factory)
+            except Exception as e:
+                logger.error(f"Warm-up of {name} failed: {str(e)}")
+
+    def is_ready(self) -> bool:
+        return all(self.dependency_status[name].get("ready") for name in WARM_UP_DEPENDENCIES)
+
+    async def aclose(self):
+        """Releases network resources held by the services."""
+        try:
+            await self.aegnt_service.aclose()
+        except Exception as e:
+            logger.error(f"Error closing AegntService: {str(e)}")
+        try:
+            await self.firestore_service.aclose()
+        except Exception as e:
+            logger.error(f"Error closing FirestoreService: {str(e)}")
+        if self._gmaps is not None:
+            self._gmaps.session.close()
+
+
+def get_services(request: Request) -> ServiceContainer:
+    return request.app.state.services
+
+
+def get_firestore_service(services: ServiceContainer = Depends(get_services)) -> FirestoreService:
+    return services.firestore_service
+
+
+def get_gemini_service(services: ServiceContainer = Depends(get_services)) -> GeminiService:
+    return services.gemini_service
+
+
+def get_google_wallet_service(services: ServiceContainer = Depends(get_services)) -> GoogleWalletService:
+    return services.google_wallet_service
+
+
+def get_google_calendar_service(services: ServiceContainer = Depends(get_services)) -> GoogleCalendarService:
+    return services.google_calendar_service
+
+
+def get_firebase_notification_service(services: ServiceContainer = Depends(get_services)) -> FirebaseNotificationService:
+    return services.firebase_notification_service
+
+
+def get_aegnt_service(services: ServiceContainer = Depends(get_services)) -> AegntService:
+    return services.aegnt_service
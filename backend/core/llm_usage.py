@@ -0,0 +1,182 @@
+"""
+Token and cost accounting for the backend's Gemini calls.
+
+GeminiService records every receipt extraction and item categorisation here:
+the user, the tool and prompt template, the model, the prompt/output/cached
+token counts from ``usage_metadata``, latency and estimated cost. Totals are
+kept in memory per UTC day. aegnt keeps the same ledger for the agent's calls
+(aegnt/llm_usage.py), and ``GET /admin/llm_usage`` reports both.
+
+Budgets (``LLM_DAILY_TOKEN_BUDGET``, ``LLM_DAILY_COST_BUDGET_USD``, per-user
+overrides in ``LLM_USER_BUDGETS``) never reject a request. A user over budget
+is switched to ``LLM_FALLBACK_MODEL`` for the rest of the day. Totals are per
+process, so with several workers each enforces the budget on its own share.
+"""
+
+import hmac
+import json
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Mapping, Optional, Tuple
+from core.config import settings
+
+# USD per million tokens. Thinking tokens are billed as output.
+DEFAULT_PRICES = {
+    "gemini-2.5-pro": {"input": 1.25, "output": 10.00, "cached": 0.31},
+    "gemini-2.5-flash": {"input": 0.30, "output": 2.50, "cached": 0.075},
+    "gemini-2.5-flash-lite": {"input": 0.10, "output": 0.40, "cached": 0.025},
+}
+
+ADMIN_HEADER = "X-Aegis-Admin"
+
+# Days of per-user totals kept in memory
+RETENTION_DAYS = 7
+
+_FIELDS = ("calls", "errors", "prompt_tokens", "output_tokens", "cached_tokens", "total_tokens", "cost_usd", "seconds")
+
+
+def _today() -> str:
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+def _usage_counts(usage) -> Tuple[int, int, int]:
+    """(prompt, output, cached) tokens from a response's usage_metadata."""
+    if usage is None:
+        return 0, 0, 0
+    prompt = getattr(usage, "prompt_token_count", 0) or 0
+    output = (getattr(usage, "candidates_token_count", 0) or 0) + (getattr(usage, "thoughts_token_count", 0) or 0)
+    cached = getattr(usage, "cached_content_token_count", 0) or 0
+    return prompt, output, cached
+
+
+def _json_setting(raw: str, cache: dict) -> dict:
+    # Settings can be changed at runtime (and are, in tests), so parse lazily
+    if raw not in cache:
+        cache.clear()
+        cache[raw] = json.loads(raw) if raw else {}
+    return cache[raw]
+
+
+_parsed_prices: dict = {}
+_parsed_user_budgets: dict = {}
+
+
+def estimate_cost(model: str, prompt_tokens: int, output_tokens: int, cached_tokens: int) -> float:
+    prices = _json_setting(settings.LLM_PRICES, _parsed_prices).get(model) or DEFAULT_PRICES.get(model)
+    if prices is None:
+        return 0.0
+    uncached = max(0, prompt_tokens - cached_tokens)
+    return (uncached * prices["input"] + cached_tokens * prices["cached"] + output_tokens * prices["output"]) / 1_000_000
+
+
+def user_budget(user_id: str) -> dict:
+    """A user's daily budget; 0 means unlimited."""
+    override = _json_setting(settings.LLM_USER_BUDGETS, _parsed_user_budgets).get(user_id, {})
+    return {
+        "tokens": int(override.get("tokens", settings.LLM_DAILY_TOKEN_BUDGET)),
+        "cost_usd": float(override.get("cost_usd", settings.LLM_DAILY_COST_BUDGET_USD)),
+    }
+
+
+def is_admin(headers: Mapping[str, str]) -> bool:
+    token = settings.ADMIN_API_TOKEN
+    value = headers.get(ADMIN_HEADER)
+    return bool(token) and value is not None and hmac.compare_digest(value.encode(), token.encode())
+
+
+class UsageLedger:
+    """Thread-safe daily totals keyed by (day, user, tool, template, model)."""
+
+    def __init__(self):
+        self._totals: Dict[Tuple[str, str, str, str, str], dict] = {}
+        self._lock = threading.Lock()
+
+    def record(self, user_id: Optional[str], tool: str, template: str, model: str, usage=None, seconds: float = 0.0, failed: bool = False):
+        prompt, output, cached = _usage_counts(usage)
+        key = (_today(), user_id or "unknown", tool, template, model)
+        with self._lock:
+            totals = self._totals.get(key)
+            if totals is None:
+                totals = self._totals[key] = {**dict.fromkeys(_FIELDS, 0), "max_seconds": 0.0}
+                self._prune()
+            totals["calls"] += 1
+            totals["errors"] += int(failed)
+            totals["prompt_tokens"] += prompt
+            totals["output_tokens"] += output
+            totals["cached_tokens"] += cached
+            totals["total_tokens"] += prompt + output
+            totals["cost_usd"] += estimate_cost(model, prompt, output, cached)
+            totals["seconds"] += seconds
+            totals["max_seconds"] = max(totals["max_seconds"], seconds)
+
+    def _prune(self):
+        oldest = sorted({key[0] for key in self._totals})[:-RETENTION_DAYS]
+        for key in [key for key in self._totals if key[0] in oldest]:
+            del self._totals[key]
+
+    def clear(self):
+        with self._lock:
+            self._totals.clear()
+
+    def user_spend(self, user_id: str, day: Optional[str] = None) -> dict:
+        day = day or _today()
+        tokens, cost = 0, 0.0
+        with self._lock:
+            for key, totals in self._totals.items():
+                if key[0] == day and key[1] == user_id:
+                    tokens += totals["total_tokens"]
+                    cost += totals["cost_usd"]
+        return {"tokens": tokens, "cost_usd": cost}
+
+    def over_budget(self, user_id: Optional[str]) -> bool:
+        if not user_id:
+            return False
+        budget = user_budget(user_id)
+        if not budget["tokens"] and not budget["cost_usd"]:
+            return False
+        spend = self.user_spend(user_id)
+        return bool(
+            (budget["tokens"] and spend["tokens"] >= budget["tokens"])
+            or (budget["cost_usd"] and spend["cost_usd"] >= budget["cost_usd"])
+        )
+
+    def model_for(self, user_id: Optional[str], model: str) -> str:
+        """The model to call for this user: ``model``, or the fallback once they are over budget."""
+        if settings.LLM_FALLBACK_MODEL and self.over_budget(user_id):
+            return settings.LLM_FALLBACK_MODEL
+        return model
+
+    def summary(self, day: Optional[str] = None) -> dict:
+        """Totals for one day grouped by user, tool, template and model, most expensive first."""
+        day = day or _today()
+        groups = {"by_user": {}, "by_tool": {}, "by_template": {}, "by_model": {}}
+        with self._lock:
+            rows = [(key, dict(totals)) for key, totals in self._totals.items() if key[0] == day]
+        for (_, user_id, tool, template, model), totals in rows:
+            for group, name in (("by_user", user_id), ("by_tool", tool), ("by_template", template), ("by_model", model)):
+                merged = groups[group].setdefault(name, {**dict.fromkeys(_FIELDS, 0), "max_seconds": 0.0})
+                for field in _FIELDS:
+                    merged[field] += totals[field]
+                merged["max_seconds"] = max(merged["max_seconds"], totals["max_seconds"])
+
+        def rendered(entries: dict, key_name: str):
+            return [
+                {key_name: name, **totals, "cost_usd": round(totals["cost_usd"], 6), "mean_seconds": round(totals["seconds"] / totals["calls"], 4) if totals["calls"] else 0.0}
+                for name, totals in sorted(entries.items(), key=lambda item: -item[1]["cost_usd"])
+            ]
+
+        by_user = rendered(groups["by_user"], "user_id")
+        for entry in by_user:
+            entry["budget"] = user_budget(entry["user_id"])
+            entry["over_budget"] = self.over_budget(entry["user_id"])
+        return {
+            "day": day,
+            "fallback_model": settings.LLM_FALLBACK_MODEL,
+            "by_user": by_user,
+            "by_tool": rendered(groups["by_tool"], "tool"),
+            "by_template": rendered(groups["by_template"], "template"),
+            "by_model": rendered(groups["by_model"], "model"),
+        }
+
+
+usage_ledger = UsageLedger()
@@ -0,0 +1,169 @@
+import asyncio
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Tuple
+from core.tracing import start_span
+
+# Upper bounds in seconds. The Prometheus defaults, stretched for Gemini and
+# agent turns that routinely take tens of seconds.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """
+    A labelled latency histogram rendered in the Prometheus text format.
+
+    Thread-safe: stages are observed both on the event loop and from the
+    threadpool the blocking SDK calls run in.
+    """
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...], buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (non-cumulative, last is +Inf), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, *label_values: str):
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def count(self, *label_values: str) -> int:
+        with self._lock:
+            series = self._series.get(label_values)
+            return series[2] if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((labels, (list(counts), total, count)) for labels, (counts, total, count) in self._series.items())
+        for label_values, (counts, total, count) in series:
+            labels = [f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, label_values)]
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = ",".join(labels + [f'le="{le}"'])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {cumulative}")
+            suffix = "{" + ",".join(labels) + "}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {total}")
+            lines.append(f"{self.name}_count{suffix} {count}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+# Time spent in each external dependency, e.g. stage="gemini", operation="extract_from_receipt"
+STAGE_DURATION = Histogram(
+    "aegis_stage_duration_seconds",
+    "Time spent in calls to external dependencies.",
+    ("stage", "operation"),
+)
+# End-to-end request time per endpoint (the route's name, e.g. "get_transactions")
+REQUEST_DURATION = Histogram(
+    "aegis_http_request_duration_seconds",
+    "HTTP request handling time.",
+    ("method", "handler", "status"),
+)
+
+# Per-request stage totals for the Server-Timing header: stage -> [seconds, calls].
+# The dict is created by the request middleware; contexts copied into the
+# threadpool or into tasks share it, so stages timed there are still counted.
+_request_stages: ContextVar[Optional[Dict[str, list]]] = ContextVar("request_stages", default=None)
+
+
+def record_stage(stage: str, operation: str, seconds: float):
+    STAGE_DURATION.observe(seconds, stage, operation)
+    stages = _request_stages.get()
+    if stages is not None:
+        totals = stages.setdefault(stage, [0.0, 0])
+        totals[0] += seconds
+        totals[1] += 1
+
+
+@contextmanager
+def stage_timer(stage: str, operation: str):
+    """
+    Times the enclosed block as one call to ``stage``, including when it raises.
+
+    The block also runs in a tracing span named "<stage> <operation>".
+    """
+    start = time.perf_counter()
+    try:
+        with start_span(f"{stage} {operation}", {"aegis.stage": stage}, kind="client"):
+            yield
+    finally:
+        record_stage(stage, operation, time.perf_counter() - start)
+
+
+def timed_stage(stage: str, operation: Optional[str] = None):
+    """Decorator version of ``stage_timer`` for sync and async service methods."""
+    def decorator(func):
+        name = operation or func.__name__
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with stage_timer(stage, name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage_timer(stage, name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def start_request_timing() -> Dict[str, list]:
+    """Begins collecting stage totals for the current request."""
+    stages: Dict[str, list] = {}
+    _request_stages.set(stages)
+    return stages
+
+
+def server_timing_header(stages: Dict[str, list], total_seconds: float) -> str:
+    """Formats stage totals as a Server-Timing header value (durations in milliseconds)."""
+    entries = [
+        f'{stage};dur={seconds * 1000:.1f};desc="{calls} call{"s" if calls != 1 else ""}"'
+        for stage, (seconds, calls) in sorted(stages.items(), key=lambda item: -item[1][0])
+    ]
+    entries.append(f"total;dur={total_seconds * 1000:.1f}")
+    return ", ".join(entries)
+
+
+def _counter(name: str, documentation: str, value: float, metric_type: str = "counter") -> List[str]:
+    return [f"# HELP {name} {documentation}", f"# TYPE {name} {metric_type}", f"{name} {value}"]
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format, for GET /metrics."""
+    from core.auth import token_verification_status
+
+    lines = STAGE_DURATION.render() + REQUEST_DURATION.render()
+    auth_status = token_verification_status()
+    lines += _counter("aegis_auth_token_cache_hits_total", "ID tokens answered from the verified token cache.", auth_status["cache_hits"])
+    lines += _counter("aegis_auth_token_verifications_total", "ID tokens verified against Firebase's certificates.", auth_status["verifications"])
+    lines += _counter("aegis_auth_token_verification_failures_total", "ID tokens that failed verification.", auth_status["verification_failures"])
+    lines += _counter("aegis_auth_token_cache_size", "Entries in the verified token cache.", auth_status["cache_size"], "gauge")
+    lines += _counter("aegis_auth_cert_refreshes_total", "Background refreshes of the token signing certificates.", auth_status["cert_refreshes"])
+    lines += _counter("aegis_auth_cert_refresh_failures_total", "Failed background certificate refreshes.", auth_status["cert_refresh_failures"])
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,148 @@
+"""
+Opt-in statistical profiling of single requests.
+
+A request is profiled when it carries ``X-Aegis-Profile: <PROFILE_ADMIN_TOKEN>``
+or is picked by ``PROFILE_SAMPLE_RATE``. pyinstrument samples the event loop
+thread while the request runs, and the result is written to ``PROFILE_DIR`` as
+``<profile id>.speedscope.json``, named after the request id. Open it in https://www.speedscope.app for a
+flamegraph. Work handed to the threadpool (the Gemini/Maps/Wallet SDK calls)
+shows up as time spent awaiting it, not as its own frames.
+
+pyinstrument is optional. With both triggers off, the per-request cost is a
+couple of attribute reads.
+"""
+
+import hmac
+import json
+import logging
+import os
+import random
+import re
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import List, Mapping, Optional
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-Aegis-Profile"
+REQUEST_ID_HEADER = "X-Request-ID"
+PROFILE_SUFFIX = ".speedscope.json"
+# Fetching a profile with the admin header should not produce another one
+PROFILES_PATH = "/debug/profiles"
+
+# Caller-supplied request ids are echoed in headers and logs, so only these are kept
+_REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+# Profiles are stored under ids of our own, so no caller can overwrite one
+_PROFILE_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+_missing_profiler_logged = False
+
+# Headers forwarded to aegnt for the current request, so its profile (if any)
+# is named after the same request id
+_forwarded_headers: ContextVar[dict] = ContextVar("profiling_forwarded_headers", default={})
+
+
+def request_id_for(headers: Mapping[str, str]) -> str:
+    """The caller's X-Request-ID if it is safe to use as a key, otherwise a new one."""
+    request_id = headers.get(REQUEST_ID_HEADER)
+    if request_id and _REQUEST_ID_PATTERN.match(request_id):
+        return request_id
+    return uuid.uuid4().hex
+
+
+def is_admin(headers: Mapping[str, str]) -> bool:
+    token = settings.PROFILE_ADMIN_TOKEN
+    value = headers.get(PROFILE_HEADER)
+    return bool(token) and value is not None and hmac.compare_digest(value.encode(), token.encode())
+
+
+def begin_request(request_id: str, headers: Mapping[str, str]):
+    forwarded = {REQUEST_ID_HEADER: request_id}
+    if is_admin(headers):
+        # An admin profiling a chat turn wants the agent's side as well
+        forwarded[PROFILE_HEADER] = headers[PROFILE_HEADER]
+    _forwarded_headers.set(forwarded)
+
+
+async def forward_request_headers(request):
+    """httpx AsyncClient request hook for calls to aegnt."""
+    request.headers.update(_forwarded_headers.get())
+
+
+def should_profile(path: str, headers: Mapping[str, str]) -> bool:
+    if path.startswith(PROFILES_PATH):
+        return False
+    if is_admin(headers):
+        return True
+    return settings.PROFILE_SAMPLE_RATE > 0 and random.random() < settings.PROFILE_SAMPLE_RATE
+
+
+def start_profiler():
+    """Starts a pyinstrument profiler for the current task, or returns None if it isn't installed."""
+    global _missing_profiler_logged
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        if not _missing_profiler_logged:
+            logger.warning("Request profiling was requested but pyinstrument is not installed")
+            _missing_profiler_logged = True
+        return None
+    profiler = Profiler(interval=settings.PROFILE_INTERVAL_MS / 1000, async_mode="enabled")
+    profiler.start()
+    return profiler
+
+
+def save_profile(request_id: str, profiler, description: str) -> str:
+    """
+    Writes a stopped profiler's session in speedscope format, prunes old
+    profiles and returns the new profile's id.
+
+    Blocking; the middleware calls it from the threadpool.
+    """
+    from pyinstrument.renderers import SpeedscopeRenderer
+
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    document = json.loads(profiler.output(SpeedscopeRenderer()))
+    document["name"] = f"{description} ({request_id})"
+    profile_id = uuid.uuid4().hex
+    path = os.path.join(settings.PROFILE_DIR, profile_id + PROFILE_SUFFIX)
+    with open(path, "w") as f:
+        json.dump(document, f)
+    _prune(settings.PROFILE_MAX_FILES)
+    return profile_id
+
+
+def _prune(max_files: int):
+    profiles = sorted(
+        (entry for entry in os.scandir(settings.PROFILE_DIR) if entry.name.endswith(PROFILE_SUFFIX)),
+        key=lambda entry: entry.stat().st_mtime,
+    )
+    for entry in profiles[:max(0, len(profiles) - max_files)]:
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+
+
+def list_profiles() -> List[dict]:
+    """Stored profiles, newest first."""
+    if not os.path.isdir(settings.PROFILE_DIR):
+        return []
+    profiles = []
+    for entry in os.scandir(settings.PROFILE_DIR):
+        if entry.name.endswith(PROFILE_SUFFIX):
+            stat = entry.stat()
+            profiles.append({
+                "profile_id": entry.name[:-len(PROFILE_SUFFIX)],
+                "created": datetime.fromtimestamp(stat.st_mtime, timezone.utc).isoformat(),
+                "bytes": stat.st_size,
+            })
+    return sorted(profiles, key=lambda profile: profile["created"], reverse=True)
+
+
+def profile_path(profile_id: str) -> Optional[str]:
+    if not _PROFILE_ID_PATTERN.match(profile_id):
+        return None
+    path = os.path.join(settings.PROFILE_DIR, profile_id + PROFILE_SUFFIX)
+    return path if os.path.exists(path) else None
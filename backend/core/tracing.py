@@ -0,0 +1,105 @@
+"""
+W3C trace-context propagation and OpenTelemetry spans for the backend.
+
+OpenTelemetry is optional: without ``opentelemetry-api`` installed every helper
+here is a no-op. Spans are exported only when ``configure_tracing`` finds an
+OTLP endpoint (``OTEL_EXPORTER_OTLP_ENDPOINT`` or
+``OTEL_EXPORTER_OTLP_TRACES_ENDPOINT``) and the SDK and OTLP/HTTP exporter are
+installed. The incoming ``traceparent`` is still forwarded to aegnt without
+them, so a trace started upstream stays connected.
+"""
+
+import logging
+import os
+from contextlib import contextmanager
+from typing import Mapping, Optional
+
+try:
+    from opentelemetry import propagate, trace
+    from opentelemetry.trace import SpanKind, Status, StatusCode
+except ImportError:  # pragma: no cover - exercised only without the optional dependency
+    propagate = trace = None
+
+logger = logging.getLogger(__name__)
+
+TRACER_NAME = "aegis.backend"
+
+
+def configure_tracing(service_name: str) -> bool:
+    """
+    Installs an OTLP-exporting tracer provider when an endpoint is configured.
+
+    Returns whether spans will be exported. Safe to call more than once; only
+    the first provider is kept.
+    """
+    if trace is None:
+        return False
+    if not (os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT") or os.getenv("OTEL_EXPORTER_OTLP_TRACES_ENDPOINT")):
+        return False
+    try:
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError as e:
+        logger.warning(f"OTLP endpoint configured but tracing packages are missing: {str(e)}")
+        return False
+
+    # OTEL_SERVICE_NAME / OTEL_RESOURCE_ATTRIBUTES still take precedence
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    # The exporter reads the endpoint, headers and timeout from the OTEL_* variables
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    trace.set_tracer_provider(provider)
+    return True
+
+
+def shutdown_tracing():
+    """Flushes buffered spans. Called from the app's lifespan shutdown."""
+    if trace is None:
+        return
+    provider = trace.get_tracer_provider()
+    if hasattr(provider, "shutdown"):
+        provider.shutdown()
+
+
+@contextmanager
+def start_span(name: str, attributes: Optional[dict] = None, kind: str = "internal"):
+    """Runs the block inside a child span of the current one; errors are recorded on it."""
+    if trace is None:
+        yield None
+        return
+    tracer = trace.get_tracer(TRACER_NAME)
+    with tracer.start_as_current_span(name, kind=getattr(SpanKind, kind.upper()), attributes=attributes) as span:
+        yield span
+
+
+@contextmanager
+def server_span(name: str, headers: Mapping[str, str], attributes: Optional[dict] = None):
+    """Span for an incoming request, continuing the caller's trace from its ``traceparent``."""
+    if trace is None:
+        yield None
+        return
+    tracer = trace.get_tracer(TRACER_NAME)
+    parent = propagate.extract(headers)
+    with tracer.start_as_current_span(name, context=parent, kind=SpanKind.SERVER, attributes=attributes) as span:
+        yield span
+
+
+def set_status_code(span, status_code: int):
+    if span is None:
+        return
+    span.set_attribute("http.response.status_code", status_code)
+    if status_code >= 500:
+        span.set_status(Status(StatusCode.ERROR))
+
+
+def inject_trace_context(headers: dict) -> dict:
+    """Adds ``traceparent`` / ``tracestate`` for the current span to outgoing headers."""
+    if propagate is not None:
+        propagate.inject(headers)
+    return headers
+
+
+async def inject_trace_headers(request):
+    """httpx AsyncClient request hook that propagates the current trace."""
+    inject_trace_context(request.headers)
@@ -1,19 +1,49 @@
 
+import asyncio
 import logging
 import time
-from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
+from core.auth import refresh_public_certificates_periodically, token_verification_status
 from core.config import settings
+from core import llm_usage, profiling
+from core.container import ServiceContainer
+from core.metrics import REQUEST_DURATION, render_metrics, server_timing_header, start_request_timing
+from core.tracing import configure_tracing, server_span, set_status_code, shutdown_tracing
 from routers import users, transactions, integrations, challenges, tasks
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Export spans when an OTLP endpoint is configured (see core/tracing.py)
+configure_tracing("aegis-backend")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One set of service clients (and connection pools) shared by every router
+    app.state.services = ServiceContainer()
+    # Warm the SDK clients in the background so the server accepts connections
+    # immediately; /ready reports when (and how quickly) they came up.
+    warm_up_task = asyncio.create_task(app.state.services.warm_up())
+    # Keep the ID token signing certificates fresh so no request pays for the fetch
+    cert_refresh_task = asyncio.create_task(refresh_public_certificates_periodically(settings.AUTH_CERT_REFRESH_SECONDS))
+    try:
+        yield
+    finally:
+        warm_up_task.cancel()
+        cert_refresh_task.cancel()
+        await app.state.services.aclose()
+        shutdown_tracing()
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -27,14 +57,40 @@ app.add_middleware(
 
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    start_time = time.time()
+    start_time = time.perf_counter()
+    # Services record the time spent in Gemini, Firestore, Maps, etc. here; it is
+    # returned to the client as a Server-Timing header.
+    stages = start_request_timing()
+    request_id = profiling.request_id_for(request.headers)
+    profiling.begin_request(request_id, request.headers)
+    profiler = profiling.start_profiler() if profiling.should_profile(request.url.path, request.headers) else None
     logger.info(f"Incoming request: {request.method} {request.url}")
     try:
-        response = await call_next(request)
-    except Exception as e:
-        logger.exception(f"Error processing request: {request.method} {request.url}")
-        return JSONResponse(status_code=500, content={"detail": "Internal Server Error"})
-    process_time = time.time() - start_time
+        # Continues the caller's trace (e.g. an aegnt tool call) when it sends a traceparent
+        with server_span(request.method, request.headers, {"http.request.method": request.method, "url.path": request.url.path}) as span:
+            try:
+                response = await call_next(request)
+            except Exception as e:
+                logger.exception(f"Error processing request: {request.method} {request.url}")
+                response = JSONResponse(status_code=500, content={"detail": "Internal Server Error"})
+            # Name by endpoint rather than URL so path parameters don't create new series
+            handler = getattr(request.scope.get("route"), "name", "unmatched")
+            if span is not None:
+                span.update_name(f"{request.method} {handler}")
+            set_status_code(span, response.status_code)
+    finally:
+        if profiler is not None:
+            profiler.stop()
+    process_time = time.perf_counter() - start_time
+    REQUEST_DURATION.observe(process_time, request.method, handler, str(response.status_code))
+    response.headers["Server-Timing"] = server_timing_header(stages, process_time)
+    response.headers[profiling.REQUEST_ID_HEADER] = request_id
+    if profiler is not None:
+        try:
+            profile_id = await run_in_threadpool(profiling.save_profile, request_id, profiler, f"{request.method} {request.url.path}")
+            response.headers[profiling.PROFILE_HEADER] = profile_id
+        except Exception as e:
+            logger.error(f"Saving profile for request {request_id} failed: {str(e)}")
     logger.info(f"Response status: {response.status_code} for {request.method} {request.url} in {process_time:.4f} seconds")
     return response
 
@@ -47,3 +103,61 @@ app.include_router(tasks.router, prefix=settings.API_V1_STR, tags=["tasks"])
 @app.get("/")
 def read_root():
     return {"message": "Welcome to Project Aegis Backend"}
+
+@app.get("/ready")
+def readiness(request: Request):
+    """
+    Readiness probe. Returns 503 until the core dependencies have warmed up, and
+    reports how long each dependency took to initialize along with ID token
+    cache and verification timings.
+    """
+    services = request.app.state.services
+    ready = services.is_ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, "dependencies": services.dependency_status, "auth": token_verification_status()}
+    )
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """
+    Prometheus scrape endpoint: latency histograms per external dependency
+    (stage) and per route, plus ID token verification counters.
+    """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+def require_profile_admin(request: Request):
+    # Hidden entirely unless an admin token is configured
+    if not profiling.is_admin(request.headers):
+        raise HTTPException(status_code=404)
+
+@app.get(profiling.PROFILES_PATH)
+def list_request_profiles(request: Request):
+    """Profiles stored by the request middleware, newest first. Requires the X-Aegis-Profile admin header."""
+    require_profile_admin(request)
+    return {"profiles": profiling.list_profiles()}
+
+@app.get(profiling.PROFILES_PATH + "/{profile_id}")
+def get_request_profile(profile_id: str, request: Request):
+    """One request's profile in speedscope format. Requires the X-Aegis-Profile admin header."""
+    require_profile_admin(request)
+    path = profiling.profile_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/json", filename=f"{profile_id}.speedscope.json")
+
+@app.get("/admin/llm_usage")
+async def get_llm_usage(request: Request, day: Optional[str] = None):
+    """
+    Gemini tokens and estimated cost for today (or ``day``, YYYY-MM-DD) by user,
+    tool, prompt template and model, for the backend and for aegnt. Requires the
+    X-Aegis-Admin header.
+    """
+    if not llm_usage.is_admin(request.headers):
+        raise HTTPException(status_code=404)
+    try:
+        aegnt = await request.app.state.services.aegnt_service.get_llm_usage(request.headers[llm_usage.ADMIN_HEADER], day)
+    except Exception as e:
+        logger.warning(f"Fetching aegnt LLM usage failed: {e}")
+        aegnt = {"error": str(e)}
+    return {"backend": llm_usage.usage_ledger.summary(day), "aegnt": aegnt}
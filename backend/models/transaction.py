@@ -1,7 +1,7 @@
 
 from pydantic import BaseModel
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 class Item(BaseModel):
     name: str
@@ -26,3 +26,72 @@ class Transaction(BaseModel):
     tax_amount: Optional[float] = None
     discount_amount: Optional[float] = None
     receipt_image_url: Optional[str] = None
+
+class TransactionImportResult(BaseModel):
+    status: str
+    format: str
+    imported: int
+    failed: int = 0
+    skipped: int = 0
+    errors: List[dict] = []  # First rejected rows, e.g. {"row": 12, "error": "..."}
+    months: List[str] = []  # YYYY-MM rollups touched by the import
+
+class CategoryTotal(BaseModel):
+    category: str
+    currency: str
+    total: float
+    count: int
+
+class StoreTotal(BaseModel):
+    store_name: str
+    currency: str
+    total: float
+    count: int
+
+class MonthTotal(BaseModel):
+    month: str  # YYYY-MM
+    currency: str
+    total: float
+    count: int
+
+class LargestTransaction(BaseModel):
+    id: str
+    store_name: str
+    total_amount: float
+    currency: str
+    transaction_date: datetime
+
+class TransactionSummary(BaseModel):
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    category: Optional[List[str]] = None
+    store_name: Optional[str] = None
+    transaction_count: int
+    first_transaction_date: Optional[datetime] = None
+    last_transaction_date: Optional[datetime] = None
+    totals: Dict[str, float]  # per currency
+    by_category: List[CategoryTotal]
+    by_store: List[StoreTotal]  # highest first, limited to `top`
+    by_month: List[MonthTotal]
+    largest_transaction: Optional[LargestTransaction] = None
+
+class MonthTally(BaseModel):
+    count: int
+    total: float
+
+class RecentCharge(BaseModel):
+    id: str
+    amount: float
+    date: datetime
+
+class MerchantStats(BaseModel):
+    months: Dict[str, MonthTally]  # YYYY-MM -> tally
+    recent: List[RecentCharge]  # latest charges, oldest first
+
+class SpendingStats(BaseModel):
+    transaction_count: int
+    totals: Dict[str, float]  # per currency
+    months: Dict[str, MonthTally]
+    categories: Dict[str, Dict[str, MonthTally]]  # category -> YYYY-MM -> tally
+    merchants: Dict[str, MerchantStats]
+    amount_buckets: Dict[str, int]  # log-scale amount histogram (services.spending_stats)
@@ -4,7 +4,7 @@ from firebase_admin import auth
 from pydantic import BaseModel
 
 from models.user import User
-from core.auth import get_current_user
+from core.auth import get_current_user, verify_id_token
 
 router = APIRouter()
 
@@ -23,7 +23,7 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
     try:
         # The form_data.username is the ID token from the client
         id_token = form_data.password
-        decoded_token = auth.verify_id_token(id_token)
+        decoded_token = verify_id_token(id_token)
         return {"access_token": id_token, "token_type": "bearer"}
     except auth.InvalidIdTokenError:
         raise HTTPException(
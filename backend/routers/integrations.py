@@ -6,15 +6,12 @@ from core.auth import get_current_user
 from services.google_wallet_service import GoogleWalletService
 from services.google_calendar_service import GoogleCalendarService
 from services.firebase_notification_service import FirebaseNotificationService
+from core.container import get_google_wallet_service, get_google_calendar_service, get_firebase_notification_service
 
 router = APIRouter()
 
-google_wallet_service = GoogleWalletService()
-google_calendar_service = GoogleCalendarService()
-firebase_notification_service = FirebaseNotificationService()
-
 @router.post("/integrations/wallet/pass")
-def create_wallet_pass(request: WalletPassRequest, current_user: User = Depends(get_current_user)):
+def create_wallet_pass(request: WalletPassRequest, current_user: User = Depends(get_current_user), google_wallet_service: GoogleWalletService = Depends(get_google_wallet_service)):
     """
     Creates a Google Wallet pass.
     """
@@ -22,7 +19,7 @@ def create_wallet_pass(request: WalletPassRequest, current_user: User = Depends(
     return {"status": "success", "pass_url": pass_url}
 
 @router.post("/integrations/calendar/event")
-def create_calendar_event(request: CalendarEventRequest, current_user: User = Depends(get_current_user)):
+def create_calendar_event(request: CalendarEventRequest, current_user: User = Depends(get_current_user), google_calendar_service: GoogleCalendarService = Depends(get_google_calendar_service)):
     """
     Creates a Google Calendar event for warranty or return reminders.
     """
@@ -30,9 +27,9 @@ def create_calendar_event(request: CalendarEventRequest, current_user: User = De
     return {"status": "success", "event_id": event_id}
 
 @router.post("/integrations/notifications/send")
-def send_notification(request: NotificationRequest, current_user: User = Depends(get_current_user)):
+async def send_notification(request: NotificationRequest, current_user: User = Depends(get_current_user), firebase_notification_service: FirebaseNotificationService = Depends(get_firebase_notification_service)):
     """
     Sends a push notification to a user's device via a service like Firebase Cloud Messaging (FCM).
     """
-    firebase_notification_service.send_notification(request.user_id, request.message)
+    await firebase_notification_service.send_notification(request.user_id, request.message)
     return {"status": "success"}
@@ -3,14 +3,13 @@ from fastapi import APIRouter, Depends
 from models.tasks import ProactiveAnalysisRequest
 from models.user import User
 from core.auth import get_current_user
+from core.container import get_aegnt_service
 from services.aegnt_service import AegntService
 
 router = APIRouter()
 
-aegnt_service = AegntService()
-
 @router.post("/tasks/proactive_analysis")
-def trigger_proactive_analysis(request: ProactiveAnalysisRequest, current_user: User = Depends(get_current_user)):
+def trigger_proactive_analysis(request: ProactiveAnalysisRequest, current_user: User = Depends(get_current_user), aegnt_service: AegntService = Depends(get_aegnt_service)):
     """
     An endpoint designed to be called by a scheduler.
     """
@@ -1,33 +1,40 @@
 
-from fastapi import APIRouter, Depends, UploadFile, File
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from models.user import User
 from core.auth import get_current_user
+from core.metrics import stage_timer
+from core.container import ServiceContainer, get_services, get_firestore_service, get_gemini_service, get_google_wallet_service
 from services.gemini_service import GeminiService
 from services.firestore_service import FirestoreService
 from services.google_wallet_service import GoogleWalletService
-import googlemaps
-from models.transaction import Transaction
-from typing import List
+from services import statement_import, transaction_export
+from models.transaction import SpendingStats, Transaction, TransactionImportResult, TransactionSummary
+from typing import List, Optional
 from datetime import datetime
-from core.config import settings
 
 router = APIRouter()
 
-gemini_service = GeminiService()
-firestore_service = FirestoreService()
-google_wallet_service = GoogleWalletService()
-gmaps = googlemaps.Client(key=settings.GOOGLE_MAPS_API_KEY)
-
 @router.post("/transactions/process")
-def process_transaction(file: UploadFile = File(...), current_user: User = Depends(get_current_user)):
+async def process_transaction(
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_user),
+    gemini_service: GeminiService = Depends(get_gemini_service),
+    firestore_service: FirestoreService = Depends(get_firestore_service),
+    google_wallet_service: GoogleWalletService = Depends(get_google_wallet_service),
+    services: ServiceContainer = Depends(get_services)
+):
     """
     Receives a file (image, pdf) from the client, orchestrates the entire ingestion pipeline.
     """
+    # The Gemini, Maps and Wallet SDKs are blocking, so they run in the threadpool
+    # while Firestore calls stay on the event loop.
     # 1. Call Gemini Pro Vision for OCR and data extraction
-    receipt_data = gemini_service.extract_from_receipt(file.file.read())
+    receipt_data = await run_in_threadpool(gemini_service.extract_from_receipt, await file.read(), current_user.uid)
 
     # 2. Perform reasoning to categorize items
-    categorized_items = gemini_service.categorize_items(receipt_data.get("items", []))
+    categorized_items = await run_in_threadpool(gemini_service.categorize_items, receipt_data.get("items", []), current_user.uid)
     receipt_data["items"] = categorized_items
 
     # 3. Save the structured data to Firestore
@@ -129,17 +136,18 @@ def process_transaction(file: UploadFile = File(...), current_user: User = Depen
             "transaction_data": transaction_data
         }
     
-    transaction_id = firestore_service.add_transaction(current_user.uid, transaction.model_dump())
+    transaction_id = await firestore_service.add_transaction(current_user.uid, transaction.model_dump())
 
     # 4. Enrich the data (e.g., with Google Maps location data)
     store_name = transaction_data.get("store_name")
     if store_name and not transaction_data.get("location"):  # Only lookup if we don't have a location
-        geocode_result = gmaps.geocode(store_name)
+        with stage_timer("gmaps", "geocode"):
+            geocode_result = await run_in_threadpool(services.gmaps.geocode, store_name)
         if geocode_result:
             location = geocode_result[0]['formatted_address']
             transaction_data["location"] = location
             # Update the transaction in Firestore with the enriched location data
-            firestore_service.update_transaction(current_user.uid, transaction_id, {"location": location})
+            await firestore_service.update_transaction(current_user.uid, transaction_id, {"location": location})
 
     # 5. Trigger the creation of a Google Wallet pass with ALL parsed data
     wallet_pass_url = None
@@ -169,7 +177,8 @@ def process_transaction(file: UploadFile = File(...), current_user: User = Depen
         }
         
         # Create the wallet pass with explicit pass type
-        wallet_pass_url = google_wallet_service.create_pass(
+        wallet_pass_url = await run_in_threadpool(
+            google_wallet_service.create_pass,
             pass_type="transaction",
             pass_data=wallet_pass_data
         )
@@ -188,18 +197,19 @@ def process_transaction(file: UploadFile = File(...), current_user: User = Depen
     return response_data
 
 @router.get("/transactions", response_model=List[Transaction])
-def get_transactions(
+async def get_transactions(
     start_date: str,
     end_date: str,
     category: str = None,
     store_name: str = None,
     item_name: str = None,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    firestore_service: FirestoreService = Depends(get_firestore_service)
 ):
     """
     Retrieves transaction data for the authenticated user.
     """
-    return firestore_service.get_transactions(
+    return await firestore_service.get_transactions(
         user_id=current_user.uid,
         start_date=start_date,
         end_date=end_date,
@@ -207,3 +217,117 @@ def get_transactions(
         store_name=store_name,
         item_name=item_name
     )
+
+@router.get("/transactions/summary", response_model=TransactionSummary)
+async def get_transaction_summary(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    category: Optional[List[str]] = Query(None),
+    store_name: Optional[str] = None,
+    top: int = Query(5, ge=1, le=50),
+    current_user: User = Depends(get_current_user),
+    firestore_service: FirestoreService = Depends(get_firestore_service)
+):
+    """
+    Aggregates the authenticated user's transactions in a date range: totals per
+    currency, per merchant category, per store (top ``top``) and per month, and
+    the largest transaction. Both dates are optional and inclusive; an
+    ``end_date`` without a time covers that whole day. ``category`` (repeatable;
+    any of them matches) and ``store_name`` match the transaction's own fields,
+    case-insensitively.
+
+    Lets the agent answer totals and "where did I spend the most" questions
+    without downloading the transactions themselves.
+    """
+    return await firestore_service.get_transaction_summary(current_user.uid, start_date, end_date, category, store_name, top)
+
+@router.get("/transactions/stats", response_model=SpendingStats)
+async def get_spending_stats(
+    current_user: User = Depends(get_current_user),
+    firestore_service: FirestoreService = Depends(get_firestore_service)
+):
+    """
+    The authenticated user's running spending statistics: counts and totals,
+    monthly series overall, per category and per merchant, each merchant's
+    latest charges and a histogram of amounts.
+
+    They are updated by every transaction write, so proactive analysis reads
+    them instead of the transactions themselves.
+    """
+    return await firestore_service.get_spending_stats(current_user.uid)
+
+@router.post("/transactions/import", response_model=TransactionImportResult)
+async def import_transactions(
+    file: UploadFile = File(...),
+    format: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    firestore_service: FirestoreService = Depends(get_firestore_service)
+):
+    """
+    Bulk-imports historical transactions from a CSV or OFX/QFX bank statement.
+
+    The statement is streamed, validated against the Transaction model in chunks
+    and written in Firestore batch commits. No LLM calls are made.
+    """
+    try:
+        statement_format = statement_import.detect_format(file.filename, format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if statement_format == "ofx":
+        rows = statement_import.iter_ofx_rows(file.file)
+    else:
+        rows = statement_import.iter_csv_rows(file.file)
+
+    report = {"skipped": 0, "errors": []}
+    chunks = statement_import.iter_validated_chunks(current_user.uid, rows, report)
+    try:
+        result = await firestore_service.bulk_add_transactions(current_user.uid, chunks)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Could not read statement: {e}")
+
+    return TransactionImportResult(
+        status="success" if not result["failed"] else "partial",
+        format=statement_format,
+        imported=result["written"],
+        failed=result["failed"],
+        skipped=report["skipped"],
+        errors=report["errors"],
+        months=result["months"]
+    )
+
+@router.get("/transactions/export")
+async def export_transactions(
+    format: str = "csv",
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    firestore_service: FirestoreService = Depends(get_firestore_service)
+):
+    """
+    Streams the authenticated user's transaction history as CSV or Parquet.
+
+    Line items are flattened into one row each. Documents are read from Firestore
+    a page at a time and written out incrementally (one Parquet row group per page).
+    Both dates are optional and inclusive; an ``end_date`` without a time covers
+    that whole day.
+    """
+    format = format.lower()
+    if format not in transaction_export.EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="format must be 'csv' or 'parquet'")
+
+    try:
+        pages = firestore_service.iter_transaction_pages(current_user.uid, start_date, end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid date: {e}")
+    if format == "parquet":
+        body = transaction_export.stream_parquet(pages)
+    else:
+        body = transaction_export.stream_csv(pages)
+
+    filename = f"transactions_{datetime.now().strftime('%Y%m%d')}.{format}"
+    return StreamingResponse(
+        body,
+        media_type=transaction_export.EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
@@ -1,18 +1,27 @@
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import httpx
 import logging
 from models.user import User
 from core.auth import get_current_user
+from core.container import get_firestore_service, get_aegnt_service
 from services.firestore_service import FirestoreService
 from services.aegnt_service import AegntService
+from typing import Optional
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
-firestore_service = FirestoreService()
-aegnt_service = AegntService()
+
+async def _data_version(firestore_service: FirestoreService, user_id: str) -> Optional[int]:
+    """The user's data version for aegnt's answer cache; None (no caching) if it can't be read."""
+    try:
+        return await firestore_service.get_data_version(user_id)
+    except Exception as e:
+        logger.warning(f"Could not read data version for user {user_id}: {str(e)}")
+        return None
 
 class AegntPrompt(BaseModel):
     prompt: str
@@ -28,24 +37,47 @@ def read_users_me(current_user: User = Depends(get_current_user)):
     return current_user
 
 @router.post("/users/me/fcm_token")
-def update_fcm_token(fcm_token_update: FCMTokenUpdate, current_user: User = Depends(get_current_user)):
+async def update_fcm_token(fcm_token_update: FCMTokenUpdate, current_user: User = Depends(get_current_user), firestore_service: FirestoreService = Depends(get_firestore_service)):
     """
     Updates the FCM token for the currently authenticated user.
     """
-    firestore_service.update_user_fcm_token(current_user.uid, fcm_token_update.fcm_token)
+    await firestore_service.update_user_fcm_token(current_user.uid, fcm_token_update.fcm_token)
     return {"message": "FCM token updated successfully"}
 
+def _raise_if_busy(e: httpx.HTTPError):
+    """Passes on aegnt's 429 (admission control) with its Retry-After, so clients back off."""
+    if isinstance(e, httpx.HTTPStatusError) and e.response.status_code == 429:
+        raise HTTPException(
+            status_code=429,
+            detail="The agent is busy. Please try again shortly.",
+            headers={"Retry-After": e.response.headers.get("Retry-After", "1")}
+        )
+
 @router.post("/users/me/agent/invoke")
-async def invoke_agent_endpoint(prompt: AegntPrompt, current_user: User = Depends(get_current_user)):
+async def invoke_agent_endpoint(prompt: AegntPrompt, request: Request, stream: bool = False, current_user: User = Depends(get_current_user), aegnt_service: AegntService = Depends(get_aegnt_service), firestore_service: FirestoreService = Depends(get_firestore_service)):
     """
     Invokes the Aegnt agent with a prompt from the user.
+
+    With ``?stream=true`` or ``Accept: text/event-stream`` the turn is relayed as
+    server-sent events while it runs: ``text_delta`` events as the answer is
+    written, ``function_call``/``function_response`` as tools run, and a final
+    ``done`` event with the same parts the JSON response carries (or ``error``).
     """
     try:
         logger.info(f"Invoking agent for user {current_user.uid} with prompt: {prompt.prompt}")
-        response = await aegnt_service.invoke_agent(current_user.uid, prompt.prompt, current_user.id_token)
+        data_version = await _data_version(firestore_service, current_user.uid)
+        if stream or "text/event-stream" in request.headers.get("accept", ""):
+            events = await aegnt_service.stream_agent(current_user.uid, prompt.prompt, current_user.id_token, data_version)
+            return StreamingResponse(
+                events,
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
+        response = await aegnt_service.invoke_agent(current_user.uid, prompt.prompt, current_user.id_token, data_version)
         logger.info("Successfully received response from agent")
         return response
     except httpx.HTTPError as e:
+        _raise_if_busy(e)
         logger.error(f"HTTP error communicating with Aegnt service: {str(e)}")
         print(e)
         raise HTTPException(
@@ -63,7 +95,7 @@ async def invoke_agent_endpoint(prompt: AegntPrompt, current_user: User = Depend
         )
 
 @router.post("/users/me/insights/proactive")
-async def get_proactive_insights(current_user: User = Depends(get_current_user)):
+async def get_proactive_insights(current_user: User = Depends(get_current_user), aegnt_service: AegntService = Depends(get_aegnt_service), firestore_service: FirestoreService = Depends(get_firestore_service)):
     """
     Generates proactive insights for the current user by calling the agent's proactive analysis.
     This endpoint should be called by the backend scheduler or user interface, not directly by the agent.
@@ -75,12 +107,15 @@ async def get_proactive_insights(current_user: User = Depends(get_current_user))
         response = await aegnt_service.invoke_agent(
             current_user.uid, 
             "Give me proactive insights about my spending patterns and financial behavior. Use the proactive analysis tool only.", 
-            current_user.id_token
+            current_user.id_token,
+            await _data_version(firestore_service, current_user.uid),
+            priority="background"
         )
         
         logger.info("Successfully received proactive insights from agent")
         return response
     except httpx.HTTPError as e:
+        _raise_if_busy(e)
         logger.error(f"HTTP error communicating with Aegnt service for proactive insights: {str(e)}")
         raise HTTPException(
             status_code=503,
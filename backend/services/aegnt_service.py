@@ -1,8 +1,14 @@
 
 import os
 import asyncio
+import time
 import httpx
+from typing import AsyncIterator, Optional
 from core.config import settings
+from core.llm_usage import ADMIN_HEADER
+from core.metrics import record_stage, timed_stage
+from core.profiling import forward_request_headers
+from core.tracing import inject_trace_headers
 import logging
 import json
 
@@ -16,20 +22,39 @@ class AegntService:
             if not self.aegnt_url:
                 raise ValueError("AEGNT_API_URL is not configured")
                 
-            # Initialize httpx client for making requests to aegnt
-            self.client = httpx.AsyncClient(base_url=self.aegnt_url)
+            # Initialize httpx client for making requests to aegnt. Requests carry
+            # the current trace context so the agent's spans join the caller's
+            # trace, and the request id so profiles of one turn share a key.
+            self.client = httpx.AsyncClient(
+                base_url=self.aegnt_url,
+                event_hooks={"request": [inject_trace_headers, forward_request_headers]}
+            )
             
         except Exception as e:
             logger.error(f"Error initializing AegntService: {str(e)}")
             raise
 
-    async def invoke_agent(self, user_id: str, prompt: str, id_token: str):
+    @staticmethod
+    def _payload(user_id: str, prompt: str, id_token: str, data_version: Optional[int], priority: Optional[str] = None) -> dict:
+        payload = {"user_id": user_id, "prompt": prompt, "id_token": id_token}
+        if data_version is not None:
+            payload["data_version"] = data_version
+        if priority is not None:
+            payload["priority"] = priority
+        return payload
+
+    @timed_stage("aegnt")
+    async def invoke_agent(self, user_id: str, prompt: str, id_token: str, data_version: Optional[int] = None, priority: Optional[str] = None):
         """
         Invokes the aegnt with a given prompt.
         
         Args:
             user_id: The ID of the user making the request
             prompt: The prompt to send to the agent
+            data_version: The user's data version; lets aegnt reuse answers
+                computed over the same data (see aegnt/answer_cache.py)
+            priority: "background" for turns nobody is waiting on, which
+                yield to chat when aegnt is busy (see aegnt/admission.py)
             
         Returns:
             dict: The processed response from the agent
@@ -38,11 +63,7 @@ class AegntService:
             logger.info(f"Sending request to aegnt at {self.aegnt_url}")
             
             # Send the message to aegnt
-            response = await self.client.post("/invoke_agent", json={
-                "user_id": user_id,
-                "prompt": prompt,
-                "id_token": id_token,
-            }, timeout=120.0)  # Add timeout
+            response = await self.client.post("/invoke_agent", json=self._payload(user_id, prompt, id_token, data_version, priority), timeout=120.0)  # Add timeout
             
             # Log the response status
             logger.info(f"Received response from aegnt with status {response.status_code}")
@@ -103,7 +124,44 @@ class AegntService:
             logger.error(f"Error invoking aegnt: {str(e)}")
             raise
             
-    async def __del__(self):
-        """Cleanup method to close the HTTP client"""
-        if hasattr(self, 'client'):
-            await self.client.aclose()
+    async def stream_agent(self, user_id: str, prompt: str, id_token: str, data_version: Optional[int] = None) -> AsyncIterator[bytes]:
+        """
+        Starts a streaming turn on aegnt and returns its server-sent events as
+        they arrive (see aegnt's /invoke_agent/stream).
+
+        Connection and HTTP errors are raised here, before anything has been
+        sent to the client; the returned iterator closes the upstream response
+        when it finishes or is abandoned.
+        """
+        start = time.perf_counter()
+        logger.info(f"Streaming request to aegnt at {self.aegnt_url}")
+        request = self.client.build_request(
+            "POST", "/invoke_agent/stream", json=self._payload(user_id, prompt, id_token, data_version),
+            timeout=httpx.Timeout(10.0, read=120.0)
+        )
+        response = await self.client.send(request, stream=True)
+        try:
+            response.raise_for_status()
+        except httpx.HTTPError:
+            await response.aclose()
+            raise
+        return self._relay(response, start)
+
+    async def _relay(self, response: httpx.Response, start: float) -> AsyncIterator[bytes]:
+        try:
+            async for chunk in response.aiter_bytes():
+                yield chunk
+        finally:
+            await response.aclose()
+            record_stage("aegnt", "stream_agent", time.perf_counter() - start)
+
+    async def get_llm_usage(self, admin_token: str, day: Optional[str] = None) -> dict:
+        """aegnt's LLM usage summary (see aegnt/llm_usage.py)."""
+        params = {"day": day} if day else {}
+        response = await self.client.get("/admin/llm_usage", params=params, headers={ADMIN_HEADER: admin_token}, timeout=10.0)
+        response.raise_for_status()
+        return response.json()
+
+    async def aclose(self):
+        """Closes the shared HTTP client. Called from the app's lifespan shutdown."""
+        await self.client.aclose()
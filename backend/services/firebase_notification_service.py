@@ -1,21 +1,25 @@
 
-from firebase_admin import messaging
+from fastapi.concurrency import run_in_threadpool
+from core.auth import get_firebase_app
+from core.metrics import stage_timer
 from services.firestore_service import FirestoreService
 
 class FirebaseNotificationService:
-    def __init__(self):
-        self.firestore_service = FirestoreService()
+    def __init__(self, firestore_service: FirestoreService):
+        self.firestore_service = firestore_service
 
-    def send_notification(self, user_id: str, message: str):
+    async def send_notification(self, user_id: str, message: str):
         """
         Sends a push notification to a user's device.
         """
-        registration_token = self.firestore_service.get_user_fcm_token(user_id)
+        registration_token = await self.firestore_service.get_user_fcm_token(user_id)
 
         if not registration_token:
             print(f"No FCM token found for user {user_id}. Notification not sent.")
             return
 
+        from firebase_admin import messaging
+
         message = messaging.Message(
             notification=messaging.Notification(
                 title='Aegis Notification',
@@ -25,7 +29,8 @@ class FirebaseNotificationService:
         )
 
         try:
-            response = messaging.send(message)
+            with stage_timer("fcm", "send"):
+                response = await run_in_threadpool(messaging.send, message, app=get_firebase_app())
             print('Successfully sent message:', response)
         except Exception as e:
             print('Error sending message:', e)
@@ -1,73 +1,158 @@
-from google.cloud import firestore
-from models.transaction import Transaction
-from typing import List
+from core.config import settings
+from core.metrics import timed_stage
+from models.transaction import SpendingStats, Transaction, TransactionSummary
+from services import spending_stats
+from services.storage import EXPORT_PAGE_SIZE, Document, StorageBackend, create_storage_backend
+from services.transaction_summary import summarize_transaction_pages
+from typing import AsyncIterator, Iterable, List, Optional
 from datetime import datetime
 
+
+def _whole_day(end_date: str) -> str:
+    """Extends a date-only range end (YYYY-MM-DD) to the end of that day."""
+    return f"{end_date}T23:59:59.999999" if len(end_date) == 10 else end_date
+
+
 class FirestoreService:
-    def __init__(self):
-        # The client library will automatically find your credentials if you've set up
-        # the GOOGLE_APPLICATION_CREDENTIALS environment variable.
-        self.db = firestore.Client()
-
-    def add_transaction(self, user_id: str, transaction_data: dict) -> str:
-        """Adds a new transaction to a user's subcollection in Firestore."""
-        _, doc_ref = self.db.collection('users', user_id, 'transactions').add(transaction_data)
-        return doc_ref.id
-
-    def get_transactions(self, user_id: str, start_date: str, end_date: str, category: str = None, store_name: str = None, item_name: str = None) -> List[Transaction]:
-        """Queries transactions for a user based on filters."""
+    """
+    Data access for users, transactions and challenges.
+
+    Storage is delegated to a StorageBackend chosen by the STORAGE_BACKEND setting:
+    Cloud Firestore in production, or the in-memory / SQLite backends for tests,
+    benchmarks and single-node deployments.
+    """
+
+    def __init__(self, storage: Optional[StorageBackend] = None):
+        self.storage = storage or create_storage_backend(settings.STORAGE_BACKEND, settings.SQLITE_DB_PATH)
+
+    def warm_up(self):
+        """Opens the backend's client or connection. Blocking."""
+        self.storage.warm_up()
+
+    def close(self):
+        self.storage.close()
+
+    async def aclose(self):
+        await self.storage.aclose()
+
+    @timed_stage("firestore")
+    async def add_transaction(self, user_id: str, transaction_data: dict) -> str:
+        """Adds a new transaction to a user's subcollection and updates the monthly rollups and spending stats."""
+        return await self.storage.add_transaction(user_id, transaction_data)
+
+    @timed_stage("firestore")
+    async def bulk_add_transactions(self, user_id: str, chunks: Iterable[List[dict]]) -> dict:
+        """
+        Writes chunks of validated transaction documents, plus their rollups.
+
+        ``chunks`` may be a lazy generator (e.g. a statement being parsed). On
+        Firestore each chunk is written in batch commits of up to 500 writes.
+        """
+        return await self.storage.bulk_add_transactions(user_id, chunks)
+
+    @timed_stage("firestore")
+    async def get_transactions(self, user_id: str, start_date: str, end_date: str, category: str = None, store_name: str = None, item_name: str = None) -> List[Transaction]:
+        """
+        Queries transactions for a user based on filters. An ``end_date``
+        without a time covers that whole day.
+        """
         # Convert string dates to datetime objects
         start_datetime = datetime.fromisoformat(start_date)
-        end_datetime = datetime.fromisoformat(end_date)
+        end_datetime = datetime.fromisoformat(_whole_day(end_date))
         
         # Ensure user document exists
-        user_ref = self.db.collection('users').document(user_id)
-        user_ref.set({}, merge=True)  # Create if not exists
-        
-        query = self.db.collection('users', user_id, 'transactions')\
-            .where('transaction_date', '>=', start_datetime)\
-            .where('transaction_date', '<=', end_datetime)
+        await self.storage.ensure_user(user_id)
 
-        # Note: When filtering by category, a composite index is required on ['items.category', 'transaction_date']
-        if category:
-            query = query.where('items.category', '==', category)
-        if store_name:
-            query = query.where('store_name', '==', store_name)
-
-        results = query.stream()
+        documents = await self.storage.query_transactions(user_id, start_datetime, end_datetime, category, store_name)
         transactions = []
-        for doc in results:
-            data = doc.to_dict()
+        for doc_id, data in documents:
             if 'id' in data:
                 del data['id']  # Remove 'id' if it exists in the document data
-            transactions.append(Transaction(id=doc.id, **data))
+            transactions.append(Transaction(id=doc_id, **data))
 
         if item_name:
             transactions = [t for t in transactions if any(item.name == item_name for item in t.items)]
 
         return transactions
 
-    def add_challenge(self, user_id: str, challenge_data: dict) -> str:
+    def iter_transaction_pages(self, user_id: str, start_date: Optional[str] = None, end_date: Optional[str] = None, page_size: int = EXPORT_PAGE_SIZE) -> AsyncIterator[List[Document]]:
+        """
+        Yields a user's transactions as pages of (id, data) pairs ordered by date.
+        An ``end_date`` without a time covers that whole day; malformed dates
+        raise ValueError before any page is read.
+
+        Only one page is held in memory at a time, regardless of how long the
+        history is.
+        """
+        return self.storage.iter_transaction_pages(
+            user_id,
+            datetime.fromisoformat(start_date) if start_date else None,
+            datetime.fromisoformat(_whole_day(end_date)) if end_date else None,
+            page_size
+        )
+
+    @timed_stage("firestore", "summarize_transactions")
+    async def get_transaction_summary(self, user_id: str, start_date: Optional[str] = None, end_date: Optional[str] = None, categories: Optional[List[str]] = None, store_name: Optional[str] = None, top: int = 5) -> TransactionSummary:
+        """
+        Aggregates a user's transactions in a date range without loading them
+        all at once (see summarize_transaction_pages). An ``end_date`` without a
+        time covers that whole day.
+        """
+        pages = self.iter_transaction_pages(user_id, start_date, end_date)
+        summary = await summarize_transaction_pages(pages, categories, store_name, top)
+        return TransactionSummary(start_date=start_date, end_date=end_date, category=categories, store_name=store_name, **summary)
+
+    @timed_stage("firestore")
+    async def get_spending_stats(self, user_id: str) -> SpendingStats:
+        """
+        The user's spending stats (see services.spending_stats), kept up to date
+        by every transaction write. They are built from the history, a page at
+        a time, the first time they are read.
+        """
+        stats = await self.storage.get_spending_stats(user_id)
+        if stats is None:
+            data_version = ((await self.storage.get_user(user_id)) or {}).get('data_version', 0)
+            stats = spending_stats.empty_stats()
+            async for page in self.storage.iter_transaction_pages(user_id):
+                spending_stats.add_transactions(stats, page)
+            # Not stored if a write landed meanwhile; the next read builds them again
+            await self.storage.save_spending_stats(user_id, stats, data_version)
+        return SpendingStats(**stats)
+
+    @timed_stage("firestore")
+    async def add_challenge(self, user_id: str, challenge_data: dict) -> str:
         """Adds a new challenge to a user's subcollection in Firestore."""
-        _, doc_ref = self.db.collection('users', user_id, 'challenges').add(challenge_data)
-        return doc_ref.id
+        return await self.storage.add_challenge(user_id, challenge_data)
 
-    def get_challenges(self, user_id: str) -> List[dict]:
+    @timed_stage("firestore")
+    async def get_challenges(self, user_id: str) -> List[dict]:
         """Retrieves all challenges for a user."""
-        query = self.db.collection('users', user_id, 'challenges').stream()
-        return [{**doc.to_dict(), "id": doc.id} for doc in query]
+        return [{**data, "id": doc_id} for doc_id, data in await self.storage.get_challenges(user_id)]
 
-    def update_transaction(self, user_id: str, transaction_id: str, data: dict):
+    @timed_stage("firestore")
+    async def update_transaction(self, user_id: str, transaction_id: str, data: dict):
         """Updates an existing transaction in Firestore."""
-        self.db.collection('users', user_id, 'transactions').document(transaction_id).update(data)
+        await self.storage.update_transaction(user_id, transaction_id, data)
 
-    def update_user_fcm_token(self, user_id: str, fcm_token: str):
+    @timed_stage("firestore")
+    async def update_user_fcm_token(self, user_id: str, fcm_token: str):
         """Updates a user's FCM token in Firestore."""
-        self.db.collection('users').document(user_id).update({'fcm_token': fcm_token})
+        await self.storage.update_user(user_id, {'fcm_token': fcm_token})
+
+    @timed_stage("firestore")
+    async def get_data_version(self, user_id: str) -> int:
+        """
+        A counter bumped by every write to the user's transactions or challenges.
+
+        Answers computed from the user's data stay valid while it is unchanged.
+        """
+        user_data = await self.storage.get_user(user_id)
+        return (user_data or {}).get('data_version', 0)
 
-    def get_user_fcm_token(self, user_id: str) -> str | None:
+    @timed_stage("firestore")
+    async def get_user_fcm_token(self, user_id: str) -> str | None:
         """Retrieves a user's FCM token from Firestore."""
-        user_doc = self.db.collection('users').document(user_id).get()
-        if user_doc.exists:
-            return user_doc.to_dict().get('fcm_token')
+        user_data = await self.storage.get_user(user_id)
+        if user_data is not None:
+            return user_data.get('fcm_token')
         return None
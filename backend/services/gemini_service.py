@@ -1,20 +1,68 @@
 
-import google.generativeai as genai
+from typing import Optional
 from core.config import settings
-from PIL import Image
+from core.llm_usage import usage_ledger
+from core.metrics import stage_timer
 import io
 import json
+import threading
+import time
 
-genai.configure(api_key=settings.GEMINI_API_KEY)
+GEMINI_MODEL = 'gemini-2.5-flash'
 
 class GeminiService:
     def __init__(self):
-        self.model = genai.GenerativeModel('gemini-2.5-flash')
+        # google.generativeai is slow to import, so the model is created on first
+        # use (or by the startup warm-up) rather than at import time.
+        self._model = None
+        # Other models, e.g. the fallback for users over their LLM budget
+        self._models = {}
+        # The warm-up thread and the first request may both ask for a model
+        self._lock = threading.Lock()
 
-    def extract_from_receipt(self, receipt_image: bytes) -> dict:
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    import google.generativeai as genai
+                    genai.configure(api_key=settings.GEMINI_API_KEY)
+                    self._model = genai.GenerativeModel(GEMINI_MODEL)
+        return self._model
+
+    def _model_named(self, model_name: str):
+        if model_name == GEMINI_MODEL:
+            return self.model
+        if model_name not in self._models:
+            with self._lock:
+                if model_name not in self._models:
+                    import google.generativeai as genai
+                    genai.configure(api_key=settings.GEMINI_API_KEY)
+                    self._models[model_name] = genai.GenerativeModel(model_name)
+        return self._models[model_name]
+
+    def _generate(self, contents, operation: str, user_id: Optional[str]):
+        """
+        Calls Gemini and records the call's tokens, latency and cost against the
+        user (core/llm_usage.py). Users over their daily budget get the fallback model.
+        """
+        model_name = usage_ledger.model_for(user_id, GEMINI_MODEL)
+        started = time.perf_counter()
+        try:
+            with stage_timer("gemini", operation):
+                response = self._model_named(model_name).generate_content(contents)
+        except Exception:
+            usage_ledger.record(user_id, "receipt_ingestion", operation, model_name, seconds=time.perf_counter() - started, failed=True)
+            raise
+        usage_ledger.record(user_id, "receipt_ingestion", operation, model_name, getattr(response, "usage_metadata", None), time.perf_counter() - started)
+        return response
+
+    def extract_from_receipt(self, receipt_image: bytes, user_id: Optional[str] = None) -> dict:
         """
         Uses Gemini Pro Vision to extract structured data from a receipt image.
         """
+        from PIL import Image
+
         image = Image.open(io.BytesIO(receipt_image))
         prompt = """Extract the following information from the receipt as a JSON object:
         {
@@ -65,7 +113,7 @@ class GeminiService:
            - Use standard country codes (e.g., US, UK, CA)
            - Format phone numbers consistently with country conventions
         """
-        response = self.model.generate_content([prompt, image])
+        response = self._generate([prompt, image], "extract_from_receipt", user_id)
         # Assuming the model returns a valid JSON string
         try:
             # Clean up the response text by removing markdown code block formatting
@@ -110,7 +158,7 @@ class GeminiService:
                 "total_amount": 0.0
             }
 
-    def categorize_items(self, items: list) -> list:
+    def categorize_items(self, items: list, user_id: Optional[str] = None) -> list:
         """
         Uses Gemini Pro to categorize items from a receipt.
         """
@@ -167,7 +215,7 @@ class GeminiService:
         """
 
         try:
-            response = self.model.generate_content(prompt)
+            response = self._generate(prompt, "categorize_items", user_id)
             if not response.text:
                 print("Warning: Empty response from Gemini API")
                 return items
@@ -1,16 +1,28 @@
-
-from googleapiclient.discovery import build
+import threading
 from google.oauth2 import service_account
 from core.config import settings
+from core.metrics import timed_stage
+from services.google_discovery import build_client
 
 class GoogleCalendarService:
     def __init__(self):
-        creds = service_account.Credentials.from_service_account_file(
-            settings.GOOGLE_CALENDAR_SERVICE_ACCOUNT_KEY_FILE,
-            scopes=['https://www.googleapis.com/auth/calendar']
-        )
-        self.service = build('calendar', 'v3', credentials=creds)
+        # The API client is built on first use; most processes never create events
+        self._service = None
+        self._lock = threading.Lock()
+
+    @property
+    def service(self):
+        if self._service is None:
+            with self._lock:
+                if self._service is None:
+                    creds = service_account.Credentials.from_service_account_file(
+                        settings.GOOGLE_CALENDAR_SERVICE_ACCOUNT_KEY_FILE,
+                        scopes=['https://www.googleapis.com/auth/calendar']
+                    )
+                    self._service = build_client('calendar', 'v3', creds)
+        return self._service
 
+    @timed_stage("calendar")
     def create_event(self, event_data: dict) -> str:
         """
         Creates a Google Calendar event and returns the event ID.
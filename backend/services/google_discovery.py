@@ -0,0 +1,20 @@
+from functools import lru_cache
+from pathlib import Path
+
+# Discovery documents are bundled with the backend so building an API client
+# never needs a network round-trip (and works offline). Refresh them by copying
+# newer versions from googleapiclient's discovery_cache/documents.
+DISCOVERY_DIR = Path(__file__).resolve().parent.parent / "discovery"
+
+
+@lru_cache(maxsize=None)
+def load_discovery_document(api: str, version: str) -> str:
+    """Returns the bundled discovery document for an API, e.g. ('calendar', 'v3')."""
+    return (DISCOVERY_DIR / f"{api}.{version}.json").read_text(encoding="utf-8")
+
+
+def build_client(api: str, version: str, credentials):
+    """Builds a googleapiclient Resource from the bundled discovery document."""
+    from googleapiclient.discovery import build_from_document
+
+    return build_from_document(load_discovery_document(api, version), credentials=credentials)
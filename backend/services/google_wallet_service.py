@@ -1,28 +1,60 @@
 
 from core.config import settings
+from core.metrics import timed_stage
 import json
+import threading
 from datetime import datetime, timezone
 from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
 from google.auth import jwt, crypt
+from services.google_discovery import build_client
 import logging
 
 logger = logging.getLogger(__name__)
 
 class GoogleWalletService:
     def __init__(self):
-        """Initialize the Google Wallet service with service account credentials."""
-        try:
-            self.credentials = Credentials.from_service_account_file(
-                settings.GOOGLE_WALLET_SERVICE_ACCOUNT_KEY_FILE,
-                scopes=['https://www.googleapis.com/auth/wallet_object.issuer']
-            )
-            self.client = build('walletobjects', 'v1', credentials=self.credentials)
-        except Exception as e:
-            logger.error(f"Error initializing Google Wallet service: {str(e)}")
-            raise
+        """Initialize the Google Wallet service. Credentials and the API client load on first use."""
+        self._credentials = None
+        self._signer = None
+        self._client = None
+        # Requests run in the threadpool and may ask for these concurrently
+        self._lock = threading.Lock()
+
+    @property
+    def credentials(self) -> Credentials:
+        if self._credentials is None:
+            with self._lock:
+                if self._credentials is None:
+                    try:
+                        self._credentials = Credentials.from_service_account_file(
+                            settings.GOOGLE_WALLET_SERVICE_ACCOUNT_KEY_FILE,
+                            scopes=['https://www.googleapis.com/auth/wallet_object.issuer']
+                        )
+                    except Exception as e:
+                        logger.error(f"Error initializing Google Wallet service: {str(e)}")
+                        raise
+        return self._credentials
+
+    @property
+    def signer(self) -> crypt.RSASigner:
+        if self._signer is None:
+            with self._lock:
+                if self._signer is None:
+                    self._signer = crypt.RSASigner.from_service_account_file(settings.GOOGLE_WALLET_SERVICE_ACCOUNT_KEY_FILE)
+        return self._signer
+
+    @property
+    def client(self):
+        """walletobjects API client, built from the bundled discovery document."""
+        if self._client is None:
+            # Loaded before taking the lock, which the credentials property also takes
+            credentials = self.credentials
+            with self._lock:
+                if self._client is None:
+                    self._client = build_client('walletobjects', 'v1', credentials)
+        return self._client
 
+    @timed_stage("wallet")
     def create_pass(self, pass_type: str, pass_data: dict) -> str:
         """
         Creates a Google Wallet pass for the given type and data.
@@ -148,8 +180,7 @@ class GoogleWalletService:
                 "exp": int(datetime.now(timezone.utc).timestamp() + 3600)  # Token expires in 1 hour
             }
 
-            signer = crypt.RSASigner.from_service_account_file(settings.GOOGLE_WALLET_SERVICE_ACCOUNT_KEY_FILE)
-            token = jwt.encode(signer, claims)
+            token = jwt.encode(self.signer, claims)
             
             # Ensure token is a string, not bytes
             if isinstance(token, bytes):
@@ -0,0 +1,119 @@
+import math
+from datetime import datetime, timezone
+from typing import Iterable, List
+
+from services.storage.base import Document
+
+# The stats document lives at users/{uid}/stats/spending.
+STATS_COLLECTION = "stats"
+STATS_DOCUMENT = "spending"
+
+# Latest charges kept per merchant, for price-change and outlier checks.
+RECENT_CHARGES = 6
+
+# Amount histogram resolution: bucket edges are 2 ** (1 / 8) (about 9%) apart.
+BUCKETS_PER_DOUBLING = 8
+
+# Histogram bucket of zero (and refunded, negative) amounts.
+ZERO_BUCKET = "zero"
+
+
+def empty_stats() -> dict:
+    """
+    Statistics of a user without transactions.
+
+    - ``transaction_count`` and ``totals`` (per currency) are running sums.
+    - ``months``: {YYYY-MM: tally}; ``categories``: {category: {YYYY-MM: tally}};
+      a tally is {"count", "total"}.
+    - ``merchants``: {store name: {"months": {YYYY-MM: tally}, "recent": [...]}},
+      ``recent`` being the merchant's latest RECENT_CHARGES charges as
+      {"id", "amount", "date"}, oldest first.
+    - ``amount_buckets``: {bucket: count}, a log-scale histogram of amounts
+      from which quartiles are estimated.
+
+    Series add up amounts regardless of currency, like the analyses reading them.
+    Stored stats also record ``built_from_version``, the user's data_version
+    when they were built from the history.
+    """
+    return {"transaction_count": 0, "totals": {}, "months": {}, "categories": {}, "merchants": {}, "amount_buckets": {}}
+
+
+def amount_bucket(amount: float) -> str:
+    if amount <= 0:
+        return ZERO_BUCKET
+    return str(math.floor(math.log2(amount) * BUCKETS_PER_DOUBLING))
+
+
+def _utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _tally(groups: dict, key: str, amount: float, sign: int):
+    entry = groups.setdefault(key, {"count": 0, "total": 0.0})
+    entry["count"] += sign
+    entry["total"] += sign * amount
+    if entry["count"] <= 0:
+        del groups[key]
+
+
+def _newest(charges: List[dict]) -> List[dict]:
+    return sorted(charges, key=lambda charge: charge["date"])[-RECENT_CHARGES:]
+
+
+def add_transactions(stats: dict, documents: Iterable[Document], sign: int = 1) -> dict:
+    """
+    Applies (id, data) transaction documents to ``stats`` in place and returns
+    it. With ``sign=-1`` the documents are taken back out, e.g. the old version
+    of an updated transaction.
+
+    A charge taken out of a merchant's recent list is not replaced by the one
+    before it, which only the history has; the list refills with new charges.
+    """
+    for doc_id, data in documents:
+        amount = data.get("total_amount") or 0.0
+        date = data["transaction_date"]
+        month = date.strftime("%Y-%m")
+        currency = data.get("currency") or "INR"
+        category = data.get("category") or "General"
+        store = data.get("store_name") or "Unknown"
+
+        stats["transaction_count"] += sign
+        stats["totals"][currency] = stats["totals"].get(currency, 0.0) + sign * amount
+        _tally(stats["months"], month, amount, sign)
+        series = stats["categories"].setdefault(category, {})
+        _tally(series, month, amount, sign)
+        if not series:
+            del stats["categories"][category]
+
+        merchant = stats["merchants"].setdefault(store, {"months": {}, "recent": []})
+        _tally(merchant["months"], month, amount, sign)
+        charges = [charge for charge in merchant["recent"] if charge["id"] != doc_id]
+        if sign > 0:
+            charges.append({"id": doc_id, "amount": amount, "date": _utc(date)})
+        merchant["recent"] = _newest(charges)
+        if not merchant["months"]:
+            del stats["merchants"][store]
+
+        bucket = amount_bucket(amount)
+        stats["amount_buckets"][bucket] = stats["amount_buckets"].get(bucket, 0) + sign
+        if stats["amount_buckets"][bucket] <= 0:
+            del stats["amount_buckets"][bucket]
+    return stats
+
+
+def merge_stats(stats: dict, delta: dict) -> dict:
+    """
+    Adds ``delta`` (the stats of further transactions, e.g. an imported
+    statement) into ``stats`` in place: sums and counts add up, recent charges
+    are the newest of both.
+    """
+    for key, value in delta.items():
+        if isinstance(value, dict):
+            merge_stats(stats.setdefault(key, {}), value)
+        elif isinstance(value, list):
+            stats[key] = _newest(stats.get(key, []) + value)
+        else:
+            stats[key] = stats.get(key, 0) + value
+    return stats
@@ -0,0 +1,231 @@
+import csv
+import io
+import re
+from datetime import datetime
+from typing import IO, Dict, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from models.transaction import Transaction
+
+# Rows are validated and written in chunks so memory stays bounded no matter how
+# large the uploaded statement is.
+IMPORT_CHUNK_SIZE = 500
+
+# Maximum number of row errors echoed back to the client.
+MAX_REPORTED_ERRORS = 50
+
+# Accepted CSV header aliases for each Transaction field (compared lower-cased).
+CSV_COLUMN_ALIASES = {
+    "transaction_date": ["transaction_date", "date", "posted_date", "posting date", "transaction date", "value date"],
+    "store_name": ["store_name", "merchant", "payee", "description", "name", "narration"],
+    "total_amount": ["total_amount", "amount", "debit", "withdrawal", "value"],
+    "currency": ["currency", "ccy"],
+    "category": ["category", "transaction_category"],
+    "payment_method": ["payment_method", "method", "type"],
+    "location": ["location", "city"],
+}
+
+# How each amount column's values read (others, e.g. total_amount from our own
+# export, hold spending as positive amounts):
+# - "signed": money out is negative and money in positive, as OFX's TRNAMT;
+# - "debit": only money out, as a positive amount; credit rows leave it blank.
+CSV_AMOUNT_CONVENTIONS = {"amount": "signed", "value": "signed", "debit": "debit", "withdrawal": "debit"}
+
+DATE_FORMATS = ["%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y", "%Y/%m/%d", "%d-%m-%Y", "%d %b %Y", "%b %d, %Y"]
+
+# OFX transaction types that are money coming in rather than spending.
+OFX_CREDIT_TYPES = {"CREDIT", "DEP", "INT", "DIV", "DIRECTDEP"}
+
+OFX_TAG_RE = re.compile(r"<(/?)([A-Z0-9.]+)>([^<\r\n]*)")
+
+
+class ImportRowError(ValueError):
+    """Raised when a statement row cannot be mapped to a Transaction."""
+
+
+def detect_format(filename: Optional[str], requested: Optional[str] = None) -> str:
+    """Returns 'csv' or 'ofx' from an explicit format or the uploaded file name."""
+    if requested:
+        requested = requested.lower()
+        if requested not in ("csv", "ofx"):
+            raise ValueError(f"Unsupported import format: {requested}")
+        return requested
+    if filename and filename.lower().endswith((".ofx", ".qfx")):
+        return "ofx"
+    return "csv"
+
+
+def parse_date(value: str) -> datetime:
+    """Parses the date formats commonly found in bank CSV and OFX exports."""
+    value = (value or "").strip()
+    if not value:
+        raise ImportRowError("missing transaction date")
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    raise ImportRowError(f"unrecognised date '{value}'")
+
+
+def parse_amount(value) -> float:
+    """Parses an amount such as '1,234.50', '-1,234.50' or '(12.00)' (negative) into a float."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = (value or "").strip().replace(",", "")
+    text = re.sub(r"[^\d.\-()]", "", text)
+    sign = 1.0
+    if text.startswith("(") and text.endswith(")"):
+        text, sign = text[1:-1], -1.0
+    if not text:
+        raise ImportRowError("missing amount")
+    try:
+        return sign * float(text)
+    except ValueError:
+        raise ImportRowError(f"unrecognised amount '{value}'")
+
+
+def spend_amount(row: dict) -> float:
+    """
+    The amount spent in a statement row, following its amount convention
+    (CSV_AMOUNT_CONVENTIONS); money coming in is skipped, as OFX credits are.
+    """
+    convention = row.get("_amounts")
+    if convention == "debit" and not (row.get("total_amount") or "").strip():
+        raise ImportRowError("skipped credit (no debit amount)")
+    amount = parse_amount(row.get("total_amount"))
+    if convention == "signed":
+        if amount >= 0:
+            raise ImportRowError("skipped credit (not spending)")
+        return -amount
+    if amount < 0:
+        raise ImportRowError("skipped negative amount (not spending)")
+    return amount
+
+
+def _resolve_columns(fieldnames: List[str]) -> Dict[str, str]:
+    lowered = {name.strip().lower(): name for name in fieldnames if name}
+    columns = {}
+    for field, aliases in CSV_COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in lowered:
+                columns[field] = lowered[alias]
+                break
+    missing = [field for field in ("transaction_date", "total_amount") if field not in columns]
+    if missing:
+        raise ValueError(f"CSV is missing required column(s): {', '.join(missing)}")
+    return columns
+
+
+def iter_csv_rows(stream: IO[bytes]) -> Iterator[Tuple[int, dict]]:
+    """Streams a CSV statement as (row_number, normalised_row) pairs."""
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+    columns = _resolve_columns(reader.fieldnames or [])
+    convention = CSV_AMOUNT_CONVENTIONS.get(columns["total_amount"].strip().lower())
+    for row_number, row in enumerate(reader, start=2):  # Row 1 is the header
+        yield row_number, {**{field: row.get(column) for field, column in columns.items()}, "_amounts": convention}
+
+
+def iter_ofx_rows(stream: IO[bytes]) -> Iterator[Tuple[int, dict]]:
+    """Streams <STMTTRN> records out of an OFX/QFX statement (SGML or XML flavour)."""
+    currency = None
+    current = None
+    index = 0
+    for raw_line in io.TextIOWrapper(stream, encoding="utf-8-sig", errors="replace"):
+        for closing, tag, value in OFX_TAG_RE.findall(raw_line):
+            value = value.strip()
+            if tag == "CURDEF" and value:
+                currency = value
+            elif tag == "STMTTRN":
+                if closing and current is not None:
+                    index += 1
+                    yield index, _ofx_record_to_row(current, currency)
+                    current = None
+                elif not closing:
+                    current = {}
+            elif current is not None and not closing and value:
+                current[tag] = value
+
+
+def _ofx_record_to_row(record: dict, currency: Optional[str]) -> dict:
+    date_value = record.get("DTPOSTED", "")[:8]
+    return {
+        "transaction_date": f"{date_value[:4]}-{date_value[4:6]}-{date_value[6:8]}" if len(date_value) == 8 else "",
+        "store_name": record.get("NAME") or record.get("MEMO"),
+        "total_amount": record.get("TRNAMT"),
+        "currency": record.get("CURRENCY") or currency,
+        "payment_method": record.get("TRNTYPE"),
+        "_trntype": (record.get("TRNTYPE") or "").upper(),
+        "_amounts": "signed",
+    }
+
+
+def row_to_transaction_data(user_id: str, row: dict) -> dict:
+    """Maps a normalised statement row onto the Transaction document shape."""
+    if row.get("_trntype") in OFX_CREDIT_TYPES:
+        raise ImportRowError(f"skipped {row['_trntype'].lower()} (not spending)")
+    amount = spend_amount(row)
+    store_name = (row.get("store_name") or "").strip() or "Unknown Merchant"
+    category = (row.get("category") or "").strip() or "General"
+    return {
+        "user_id": user_id,
+        "store_name": store_name,
+        "transaction_date": parse_date(row.get("transaction_date")),
+        "items": [{
+            "name": store_name,
+            "price": amount,
+            "quantity": 1.0,
+            "unit": None,
+            "category": category,
+            "original_price": None,
+            "discount": None
+        }],
+        "total_amount": amount,
+        "currency": (row.get("currency") or "").strip().upper() or "INR",
+        "payment_method": (row.get("payment_method") or "").strip() or "Bank Statement",
+        "category": category,
+        "location": (row.get("location") or "").strip() or None,
+    }
+
+
+def iter_validated_chunks(user_id: str, rows: Iterator[Tuple[int, dict]], report: dict, chunk_size: int = IMPORT_CHUNK_SIZE) -> Iterator[List[dict]]:
+    """
+    Validates rows against the Transaction model and yields them in chunks.
+
+    Rejected rows are counted in ``report["skipped"]`` and the first
+    MAX_REPORTED_ERRORS of them are listed in ``report["errors"]``.
+    """
+    chunk = []
+    for row_number, row in rows:
+        try:
+            transaction = Transaction(**row_to_transaction_data(user_id, row))
+        except (ImportRowError, ValidationError) as e:
+            report["skipped"] += 1
+            if len(report["errors"]) < MAX_REPORTED_ERRORS:
+                report["errors"].append({"row": row_number, "error": str(e)})
+            continue
+        chunk.append(transaction.model_dump(exclude={"id"}))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def build_rollup_deltas(transactions: List[dict]) -> Dict[str, dict]:
+    """Aggregates per-month totals for a chunk so rollups cost one write per month."""
+    deltas: Dict[str, dict] = {}
+    for transaction in transactions:
+        month = transaction["transaction_date"].strftime("%Y-%m")
+        delta = deltas.setdefault(month, {"transaction_count": 0, "totals": {}, "categories": {}})
+        delta["transaction_count"] += 1
+        currency = transaction.get("currency") or "INR"
+        delta["totals"][currency] = delta["totals"].get(currency, 0.0) + transaction["total_amount"]
+        category = transaction.get("category") or "General"
+        delta["categories"][category] = delta["categories"].get(category, 0.0) + transaction["total_amount"]
+    return deltas
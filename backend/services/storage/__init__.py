@@ -0,0 +1,28 @@
+from services.storage.base import EXPORT_PAGE_SIZE, Document, DocumentNotFoundError, StorageBackend
+
+STORAGE_BACKENDS = ("firestore", "memory", "sqlite")
+
+
+def create_storage_backend(backend: str, sqlite_path: str = "aegis.db") -> StorageBackend:
+    """Builds the storage backend selected by the STORAGE_BACKEND setting."""
+    backend = (backend or "firestore").lower()
+    if backend == "firestore":
+        from services.storage.firestore_storage import FirestoreStorage
+        return FirestoreStorage()
+    if backend == "memory":
+        from services.storage.memory_storage import MemoryStorage
+        return MemoryStorage()
+    if backend == "sqlite":
+        from services.storage.sqlite_storage import SQLiteStorage
+        return SQLiteStorage(sqlite_path)
+    raise ValueError(f"Unknown STORAGE_BACKEND '{backend}', expected one of: {', '.join(STORAGE_BACKENDS)}")
+
+
+__all__ = [
+    "EXPORT_PAGE_SIZE",
+    "Document",
+    "DocumentNotFoundError",
+    "StorageBackend",
+    "STORAGE_BACKENDS",
+    "create_storage_backend",
+]
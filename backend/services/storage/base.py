@@ -0,0 +1,99 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import AsyncIterator, Iterable, List, Optional, Tuple
+
+# Documents fetched per round-trip when streaming a user's full history.
+EXPORT_PAGE_SIZE = 500
+
+# A stored document: (document id, document data)
+Document = Tuple[str, dict]
+
+
+class DocumentNotFoundError(LookupError):
+    """Raised when updating a document that does not exist."""
+
+
+class StorageBackend(ABC):
+    """
+    Persistence for users, transactions, challenges, rollups and spending stats.
+
+    Implementations must give the same answers as Firestore for the same data:
+    transaction date bounds are inclusive, results are returned in
+    ``transaction_date`` order, and ``update_user`` fails for a missing user.
+
+    Every write to a user's transactions or challenges also increments the
+    ``data_version`` field of the user document, in the same atomic unit, so
+    caches of answers derived from that data can tell when it changed.
+
+    Writes to transactions likewise apply them to the user's spending stats
+    (services.spending_stats), when the user has a stats document yet; the
+    first read builds it from the history (FirestoreService.get_spending_stats).
+    """
+
+    name = "base"
+
+    def warm_up(self):
+        """Opens clients/connections ahead of the first request. Blocking."""
+
+    def close(self):
+        """Releases clients/connections."""
+
+    async def aclose(self):
+        """Releases clients/connections from async code, e.g. at app shutdown."""
+        self.close()
+
+    @abstractmethod
+    async def ensure_user(self, user_id: str):
+        """Creates an empty user document if it does not exist."""
+
+    @abstractmethod
+    async def get_user(self, user_id: str) -> Optional[dict]:
+        """Returns the user document, or None."""
+
+    @abstractmethod
+    async def update_user(self, user_id: str, data: dict):
+        """Updates fields on an existing user document (raises if missing)."""
+
+    @abstractmethod
+    async def add_transaction(self, user_id: str, transaction_data: dict) -> str:
+        """Stores a transaction and applies it to the monthly rollups and spending stats atomically."""
+
+    @abstractmethod
+    async def bulk_add_transactions(self, user_id: str, chunks: Iterable[List[dict]]) -> dict:
+        """
+        Stores chunks of validated transactions, their rollups and spending stats.
+
+        Returns {"written": int, "failed": int, "months": [YYYY-MM, ...]}.
+        """
+
+    @abstractmethod
+    async def query_transactions(self, user_id: str, start: datetime, end: datetime, category: Optional[str] = None, store_name: Optional[str] = None) -> List[Document]:
+        """Returns transactions with start <= transaction_date <= end matching the filters."""
+
+    @abstractmethod
+    def iter_transaction_pages(self, user_id: str, start: Optional[datetime] = None, end: Optional[datetime] = None, page_size: int = EXPORT_PAGE_SIZE) -> AsyncIterator[List[Document]]:
+        """Yields transactions in date order, ``page_size`` documents at a time."""
+
+    @abstractmethod
+    async def update_transaction(self, user_id: str, transaction_id: str, data: dict):
+        """Updates fields on an existing transaction and its spending stats (raises if missing)."""
+
+    @abstractmethod
+    async def add_challenge(self, user_id: str, challenge_data: dict) -> str:
+        """Stores a challenge and returns its id."""
+
+    @abstractmethod
+    async def get_challenges(self, user_id: str) -> List[Document]:
+        """Returns all of a user's challenges."""
+
+    @abstractmethod
+    async def get_spending_stats(self, user_id: str) -> Optional[dict]:
+        """Returns the user's spending stats document, or None if it was never built."""
+
+    @abstractmethod
+    async def save_spending_stats(self, user_id: str, stats: dict, data_version: int) -> bool:
+        """
+        Stores spending stats built from the history while the user's
+        ``data_version`` was ``data_version``. Returns False, storing nothing,
+        if the data has changed since or another build was stored first.
+        """
@@ -0,0 +1,251 @@
+import threading
+from datetime import datetime
+from typing import AsyncIterator, Iterable, List, Optional
+
+from google.api_core.exceptions import GoogleAPICallError, NotFound
+from google.cloud import firestore
+
+from services import spending_stats
+from services.statement_import import build_rollup_deltas
+from services.storage.base import EXPORT_PAGE_SIZE, Document, DocumentNotFoundError, StorageBackend
+from services.storage.local import apply_update, copy_document
+
+# Firestore's limit on writes in one batch commit.
+MAX_BATCH_WRITES = 500
+
+
+class FirestoreStorage(StorageBackend):
+    """Production backend on Cloud Firestore (users/{uid}/... subcollections)."""
+
+    name = "firestore"
+
+    DATA_VERSION_INCREMENT = {"data_version": firestore.Increment(1)}
+
+    def __init__(self):
+        self._db = None
+        # The warm-up thread and the first request may both ask for the client
+        self._db_lock = threading.Lock()
+
+    @property
+    def db(self) -> firestore.AsyncClient:
+        if self._db is None:
+            with self._db_lock:
+                if self._db is None:
+                    # The client library will automatically find your credentials if you've set up
+                    # the GOOGLE_APPLICATION_CREDENTIALS environment variable.
+                    # AsyncClient keeps route handlers on the event loop instead of tying up a
+                    # threadpool worker for every Firestore round-trip.
+                    self._db = firestore.AsyncClient()
+        return self._db
+
+    def warm_up(self):
+        self.db
+
+    async def aclose(self):
+        """Closes the client's gRPC channel, which AsyncClient.close leaves open."""
+        if self._db is not None:
+            await self._db._firestore_api.transport.close()
+            self._db = None
+
+    async def ensure_user(self, user_id: str):
+        await self.db.collection('users').document(user_id).set({}, merge=True)
+
+    async def get_user(self, user_id: str) -> Optional[dict]:
+        user_doc = await self.db.collection('users').document(user_id).get()
+        return user_doc.to_dict() if user_doc.exists else None
+
+    async def update_user(self, user_id: str, data: dict):
+        try:
+            await self.db.collection('users').document(user_id).update(data)
+        except NotFound as e:
+            raise DocumentNotFoundError(str(e)) from e
+
+    async def add_transaction(self, user_id: str, transaction_data: dict) -> str:
+        doc_ref = self.db.collection('users', user_id, 'transactions').document()
+
+        @firestore.async_transactional
+        async def write(transaction):
+            stats = await self._read_stats(transaction, user_id)
+            transaction.set(doc_ref, transaction_data)
+            # Keep the monthly rollups and spending stats in step with the write, atomically
+            for month, delta in build_rollup_deltas([transaction_data]).items():
+                transaction.set(self._rollup_ref(user_id, month), self._rollup_increments(month, delta), merge=True)
+            if stats is not None:
+                transaction.set(self._stats_ref(user_id), spending_stats.add_transactions(stats, [(doc_ref.id, transaction_data)]))
+            transaction.set(self._user_ref(user_id), self.DATA_VERSION_INCREMENT, merge=True)
+
+        await write(self.db.transaction())
+        return doc_ref.id
+
+    async def bulk_add_transactions(self, user_id: str, chunks: Iterable[List[dict]]) -> dict:
+        """
+        Writes each chunk in batch commits of up to MAX_BATCH_WRITES writes: a
+        slice of the transactions together with their rollups and the
+        data_version bump, so a failed commit writes nothing and the rollups
+        and stats only ever count transactions that were stored.
+        """
+        data_version = ((await self.get_user(user_id)) or {}).get('data_version', 0)
+        collection = self.db.collection('users', user_id, 'transactions')
+
+        written = 0
+        failed = 0
+        months = set()
+        stats = spending_stats.empty_stats()
+        for chunk in chunks:
+            for documents in self._batches([(collection.document(), transaction_data) for transaction_data in chunk]):
+                transactions = [transaction_data for _, transaction_data in documents]
+                deltas = build_rollup_deltas(transactions)
+                batch = self.db.batch()
+                for doc_ref, transaction_data in documents:
+                    batch.create(doc_ref, transaction_data)
+                for month, delta in deltas.items():
+                    batch.set(self._rollup_ref(user_id, month), self._rollup_increments(month, delta), merge=True)
+                batch.set(self._user_ref(user_id), self.DATA_VERSION_INCREMENT, merge=True)
+                try:
+                    await batch.commit()
+                except GoogleAPICallError as e:
+                    print(f"Import batch of {len(documents)} transactions failed: {e}")
+                    failed += len(documents)
+                    continue
+                written += len(documents)
+                months.update(deltas)
+                spending_stats.add_transactions(stats, [(doc_ref.id, transaction_data) for doc_ref, transaction_data in documents])
+
+        await self._apply_import_to_stats(user_id, stats, data_version)
+        return {"written": written, "failed": failed, "months": sorted(months)}
+
+    @staticmethod
+    def _batches(documents: list) -> Iterable[list]:
+        """Splits documents so each slice, its rollups and the data_version bump fit in one commit."""
+        batch, months = [], set()
+        for doc_ref, transaction_data in documents:
+            month = transaction_data["transaction_date"].strftime("%Y-%m")
+            if batch and len(batch) + 1 + len(months | {month}) + 1 > MAX_BATCH_WRITES:
+                yield batch
+                batch, months = [], set()
+            batch.append((doc_ref, transaction_data))
+            months.add(month)
+        if batch:
+            yield batch
+
+    async def _apply_import_to_stats(self, user_id: str, delta: dict, data_version: int):
+        """
+        Adds an import's stats to the user's once its batches are committed.
+        ``data_version`` is the user's when the import started. Stats built
+        since then may hold some of its batches but not others, so they are
+        deleted and the next read rebuilds them from the history.
+        """
+        stats_ref = self._stats_ref(user_id)
+
+        @firestore.async_transactional
+        async def write(transaction):
+            stats = await self._read_stats(transaction, user_id)
+            if stats is None:
+                return
+            if stats.get("built_from_version", 0) <= data_version:
+                transaction.set(stats_ref, spending_stats.merge_stats(stats, delta))
+            else:
+                transaction.delete(stats_ref)
+
+        await write(self.db.transaction())
+
+    def _user_ref(self, user_id: str):
+        return self.db.collection('users').document(user_id)
+
+    def _rollup_ref(self, user_id: str, month: str):
+        return self.db.collection('users', user_id, 'rollups').document(month)
+
+    def _stats_ref(self, user_id: str):
+        return self.db.collection('users', user_id, spending_stats.STATS_COLLECTION).document(spending_stats.STATS_DOCUMENT)
+
+    async def _read_stats(self, transaction, user_id: str) -> Optional[dict]:
+        snapshot = await self._stats_ref(user_id).get(transaction=transaction)
+        return snapshot.to_dict() if snapshot.exists else None
+
+    @staticmethod
+    def _rollup_increments(month: str, delta: dict) -> dict:
+        return {
+            "month": month,
+            "transaction_count": firestore.Increment(delta["transaction_count"]),
+            "totals": {currency: firestore.Increment(amount) for currency, amount in delta["totals"].items()},
+            "categories": {category: firestore.Increment(amount) for category, amount in delta["categories"].items()},
+        }
+
+    async def query_transactions(self, user_id: str, start: datetime, end: datetime, category: Optional[str] = None, store_name: Optional[str] = None) -> List[Document]:
+        query = self.db.collection('users', user_id, 'transactions')\
+            .where('transaction_date', '>=', start)\
+            .where('transaction_date', '<=', end)
+
+        # Note: When filtering by category, a composite index is required on ['items.category', 'transaction_date']
+        if category:
+            query = query.where('items.category', '==', category)
+        if store_name:
+            query = query.where('store_name', '==', store_name)
+
+        return [(doc.id, doc.to_dict()) async for doc in query.stream()]
+
+    async def iter_transaction_pages(self, user_id: str, start: Optional[datetime] = None, end: Optional[datetime] = None, page_size: int = EXPORT_PAGE_SIZE) -> AsyncIterator[List[Document]]:
+        # Cursor-based pagination keeps one page in memory at a time
+        query = self.db.collection('users', user_id, 'transactions')
+        if start:
+            query = query.where('transaction_date', '>=', start)
+        if end:
+            query = query.where('transaction_date', '<=', end)
+        query = query.order_by('transaction_date').limit(page_size)
+
+        last_doc = None
+        while True:
+            page_query = query.start_after(last_doc) if last_doc else query
+            docs = [doc async for doc in page_query.stream()]
+            if not docs:
+                return
+            yield [(doc.id, doc.to_dict()) for doc in docs]
+            if len(docs) < page_size:
+                return
+            last_doc = docs[-1]
+
+    async def update_transaction(self, user_id: str, transaction_id: str, data: dict):
+        doc_ref = self.db.collection('users', user_id, 'transactions').document(transaction_id)
+
+        @firestore.async_transactional
+        async def write(transaction):
+            snapshot = await doc_ref.get(transaction=transaction)
+            if not snapshot.exists:
+                raise DocumentNotFoundError(f"No document to update: {doc_ref.path}")
+            stats = await self._read_stats(transaction, user_id)
+            transaction.update(doc_ref, data)
+            if stats is not None:
+                existing = snapshot.to_dict()
+                updated = apply_update(copy_document(existing), data)
+                spending_stats.add_transactions(stats, [(transaction_id, existing)], sign=-1)
+                transaction.set(self._stats_ref(user_id), spending_stats.add_transactions(stats, [(transaction_id, updated)]))
+            transaction.set(self._user_ref(user_id), self.DATA_VERSION_INCREMENT, merge=True)
+
+        await write(self.db.transaction())
+
+    async def get_spending_stats(self, user_id: str) -> Optional[dict]:
+        snapshot = await self._stats_ref(user_id).get()
+        return snapshot.to_dict() if snapshot.exists else None
+
+    async def save_spending_stats(self, user_id: str, stats: dict, data_version: int) -> bool:
+        @firestore.async_transactional
+        async def write(transaction) -> bool:
+            user = await self._user_ref(user_id).get(transaction=transaction)
+            current_version = (user.to_dict() or {}).get('data_version', 0) if user.exists else 0
+            if current_version != data_version or await self._read_stats(transaction, user_id) is not None:
+                return False
+            transaction.set(self._stats_ref(user_id), {**stats, "built_from_version": data_version})
+            return True
+
+        return await write(self.db.transaction())
+
+    async def add_challenge(self, user_id: str, challenge_data: dict) -> str:
+        doc_ref = self.db.collection('users', user_id, 'challenges').document()
+        batch = self.db.batch()
+        batch.set(doc_ref, challenge_data)
+        batch.set(self._user_ref(user_id), self.DATA_VERSION_INCREMENT, merge=True)
+        await batch.commit()
+        return doc_ref.id
+
+    async def get_challenges(self, user_id: str) -> List[Document]:
+        return [(doc.id, doc.to_dict()) async for doc in self.db.collection('users', user_id, 'challenges').stream()]
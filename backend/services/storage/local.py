@@ -0,0 +1,300 @@
+import threading
+import uuid
+from abc import abstractmethod
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import AsyncIterator, Iterable, List, Optional, Tuple
+
+from services import spending_stats
+from services.statement_import import build_rollup_deltas
+from services.storage.base import EXPORT_PAGE_SIZE, Document, DocumentNotFoundError, StorageBackend
+
+# Collections whose documents are ordered by transaction_date, like Firestore's
+# implicit ordering on a range-filtered field.
+DATE_ORDERED_COLLECTIONS = ("transactions",)
+
+_MISSING = object()
+
+
+def to_utc(value: datetime) -> datetime:
+    """Firestore treats naive datetimes as UTC and always returns aware ones."""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def sort_key(value: Optional[datetime]) -> str:
+    """Lexicographically sortable UTC timestamp used for date range scans."""
+    if value is None:
+        return ""
+    return to_utc(value).strftime("%Y-%m-%dT%H:%M:%S.%f")
+
+
+def normalize_document(value):
+    """Copies a document, converting datetimes the way Firestore stores them."""
+    if isinstance(value, dict):
+        return {key: normalize_document(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize_document(item) for item in value]
+    if isinstance(value, datetime):
+        return to_utc(value)
+    return value
+
+
+def copy_document(value):
+    """Cheap structural copy (dicts and lists only) so callers can't mutate stored data."""
+    if isinstance(value, dict):
+        return {key: copy_document(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [copy_document(item) for item in value]
+    return value
+
+
+def field_value(data: dict, field_path: str):
+    """
+    Resolves a dotted field path the way Firestore does.
+
+    Only maps are traversed, so a path through an array (e.g. 'items.category'
+    on a list of items) resolves to nothing, exactly as in Firestore.
+    """
+    value = data
+    for part in field_path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def apply_update(data: dict, updates: dict) -> dict:
+    """Applies Firestore-style update() semantics, including dotted field paths."""
+    for field_path, value in updates.items():
+        target = data
+        parts = field_path.split(".")
+        for part in parts[:-1]:
+            if not isinstance(target.get(part), dict):
+                target[part] = {}
+            target = target[part]
+        target[parts[-1]] = normalize_document(value)
+    return data
+
+
+def new_document_id() -> str:
+    return uuid.uuid4().hex[:20]
+
+
+class LocalDocumentStorage(StorageBackend):
+    """
+    Shared query semantics for the in-process backends.
+
+    Subclasses provide a handful of synchronous document primitives; this class
+    builds the StorageBackend API on top of them. Documents live in collections
+    named like Firestore paths, e.g. 'users', 'users/{uid}/transactions'.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+
+    # --- primitives -------------------------------------------------------
+
+    @abstractmethod
+    def _get(self, collection: str, doc_id: str) -> Optional[dict]:
+        """Returns a copy of the stored document, or None."""
+
+    @abstractmethod
+    def _put(self, collection: str, doc_id: str, data: dict):
+        """Creates or replaces a document (already normalized)."""
+
+    @abstractmethod
+    def _list(self, collection: str) -> List[Document]:
+        """Returns every document in a collection."""
+
+    @abstractmethod
+    def _range(self, collection: str, start_key: str, end_key: Optional[str], after: Optional[Tuple[str, str]] = None, limit: Optional[int] = None) -> List[Document]:
+        """Returns date-ordered documents with start_key <= sort key <= end_key."""
+
+    @contextmanager
+    def _transaction(self):
+        """Groups primitives into one atomic unit."""
+        with self._lock:
+            yield
+
+    async def _call(self, fn, *args):
+        """Runs a synchronous operation; backends doing blocking I/O override this."""
+        return fn(*args)
+
+    # --- helpers ----------------------------------------------------------
+
+    @staticmethod
+    def _user_collection(user_id: str, name: str) -> str:
+        return f"users/{user_id}/{name}"
+
+    def _ensure_user_sync(self, user_id: str):
+        if self._get("users", user_id) is None:
+            self._put("users", user_id, {})
+
+    def _bump_data_version_sync(self, user_id: str):
+        user = self._get("users", user_id) or {}
+        user["data_version"] = user.get("data_version", 0) + 1
+        self._put("users", user_id, user)
+
+    def _apply_rollups_sync(self, user_id: str, transactions: List[dict]) -> List[str]:
+        collection = self._user_collection(user_id, "rollups")
+        deltas = build_rollup_deltas(transactions)
+        for month, delta in deltas.items():
+            rollup = self._get(collection, month) or {"month": month, "transaction_count": 0, "totals": {}, "categories": {}}
+            rollup["transaction_count"] = rollup.get("transaction_count", 0) + delta["transaction_count"]
+            for field in ("totals", "categories"):
+                values = rollup.setdefault(field, {})
+                for key, amount in delta[field].items():
+                    values[key] = values.get(key, 0) + amount
+            self._put(collection, month, rollup)
+        return list(deltas)
+
+    def _stats_collection(self, user_id: str) -> str:
+        return self._user_collection(user_id, spending_stats.STATS_COLLECTION)
+
+    def _apply_stats_sync(self, user_id: str, added: List[Document], removed: List[Document] = ()):
+        collection = self._stats_collection(user_id)
+        stats = self._get(collection, spending_stats.STATS_DOCUMENT)
+        if stats is None:
+            # Not built yet; the first read builds it from the history
+            return
+        spending_stats.add_transactions(stats, removed, sign=-1)
+        spending_stats.add_transactions(stats, added)
+        self._put(collection, spending_stats.STATS_DOCUMENT, stats)
+
+    def _add_transactions_sync(self, user_id: str, transactions: List[dict]) -> List[str]:
+        collection = self._user_collection(user_id, "transactions")
+        normalized = [normalize_document(data) for data in transactions]
+        documents = [(new_document_id(), data) for data in normalized]
+        with self._transaction():
+            for doc_id, data in documents:
+                self._put(collection, doc_id, data)
+            self._apply_rollups_sync(user_id, normalized)
+            self._apply_stats_sync(user_id, documents)
+            self._bump_data_version_sync(user_id)
+        return [doc_id for doc_id, _ in documents]
+
+    def _bulk_add_sync(self, user_id: str, chunks: Iterable[List[dict]]) -> dict:
+        with self._transaction():
+            self._ensure_user_sync(user_id)
+        written = 0
+        months = set()
+        for chunk in chunks:
+            self._add_transactions_sync(user_id, chunk)
+            months.update(build_rollup_deltas(chunk))
+            written += len(chunk)
+        return {"written": written, "failed": 0, "months": sorted(months)}
+
+    def _update_sync(self, collection: str, doc_id: str, data: dict):
+        with self._transaction():
+            existing = self._get(collection, doc_id)
+            if existing is None:
+                raise DocumentNotFoundError(f"No document to update: {collection}/{doc_id}")
+            self._put(collection, doc_id, apply_update(existing, data))
+
+    def _update_transaction_sync(self, user_id: str, transaction_id: str, data: dict):
+        collection = self._user_collection(user_id, "transactions")
+        with self._transaction():
+            existing = self._get(collection, transaction_id)
+            if existing is None:
+                raise DocumentNotFoundError(f"No document to update: {collection}/{transaction_id}")
+            updated = apply_update(copy_document(existing), data)
+            self._put(collection, transaction_id, updated)
+            self._apply_stats_sync(user_id, [(transaction_id, updated)], removed=[(transaction_id, existing)])
+            self._bump_data_version_sync(user_id)
+
+    def _get_stats_sync(self, user_id: str) -> Optional[dict]:
+        with self._transaction():
+            return self._get(self._stats_collection(user_id), spending_stats.STATS_DOCUMENT)
+
+    def _save_stats_sync(self, user_id: str, stats: dict, data_version: int) -> bool:
+        collection = self._stats_collection(user_id)
+        with self._transaction():
+            user = self._get("users", user_id) or {}
+            if user.get("data_version", 0) != data_version or self._get(collection, spending_stats.STATS_DOCUMENT) is not None:
+                return False
+            self._put(collection, spending_stats.STATS_DOCUMENT, normalize_document({**stats, "built_from_version": data_version}))
+        return True
+
+    def _query_sync(self, user_id: str, start: datetime, end: datetime, category: Optional[str], store_name: Optional[str]) -> List[Document]:
+        with self._transaction():
+            documents = self._range(self._user_collection(user_id, "transactions"), sort_key(start), sort_key(end))
+        if category:
+            documents = [(doc_id, data) for doc_id, data in documents if field_value(data, "items.category") == category]
+        if store_name:
+            documents = [(doc_id, data) for doc_id, data in documents if data.get("store_name") == store_name]
+        return documents
+
+    def _page_sync(self, user_id: str, start_key: str, end_key: Optional[str], after: Optional[Tuple[str, str]], page_size: int) -> List[Document]:
+        with self._transaction():
+            return self._range(self._user_collection(user_id, "transactions"), start_key, end_key, after, page_size)
+
+    def _add_challenge_sync(self, user_id: str, challenge_data: dict) -> str:
+        doc_id = new_document_id()
+        with self._transaction():
+            self._put(self._user_collection(user_id, "challenges"), doc_id, normalize_document(challenge_data))
+            self._bump_data_version_sync(user_id)
+        return doc_id
+
+    def _get_user_sync(self, user_id: str) -> Optional[dict]:
+        with self._transaction():
+            return self._get("users", user_id)
+
+    def _get_challenges_sync(self, user_id: str) -> List[Document]:
+        with self._transaction():
+            return self._list(self._user_collection(user_id, "challenges"))
+
+    def _ensure_user_locked(self, user_id: str):
+        with self._transaction():
+            self._ensure_user_sync(user_id)
+
+    # --- StorageBackend ---------------------------------------------------
+
+    async def ensure_user(self, user_id: str):
+        await self._call(self._ensure_user_locked, user_id)
+
+    async def get_user(self, user_id: str) -> Optional[dict]:
+        return await self._call(self._get_user_sync, user_id)
+
+    async def update_user(self, user_id: str, data: dict):
+        await self._call(self._update_sync, "users", user_id, data)
+
+    async def add_transaction(self, user_id: str, transaction_data: dict) -> str:
+        doc_ids = await self._call(self._add_transactions_sync, user_id, [transaction_data])
+        return doc_ids[0]
+
+    async def bulk_add_transactions(self, user_id: str, chunks: Iterable[List[dict]]) -> dict:
+        return await self._call(self._bulk_add_sync, user_id, chunks)
+
+    async def query_transactions(self, user_id: str, start: datetime, end: datetime, category: Optional[str] = None, store_name: Optional[str] = None) -> List[Document]:
+        return await self._call(self._query_sync, user_id, start, end, category, store_name)
+
+    async def iter_transaction_pages(self, user_id: str, start: Optional[datetime] = None, end: Optional[datetime] = None, page_size: int = EXPORT_PAGE_SIZE) -> AsyncIterator[List[Document]]:
+        start_key = sort_key(start)
+        end_key = sort_key(end) if end else None
+        after = None
+        while True:
+            page = await self._call(self._page_sync, user_id, start_key, end_key, after, page_size)
+            if not page:
+                return
+            yield page
+            if len(page) < page_size:
+                return
+            last_id, last_data = page[-1]
+            after = (sort_key(last_data.get("transaction_date")), last_id)
+
+    async def update_transaction(self, user_id: str, transaction_id: str, data: dict):
+        await self._call(self._update_transaction_sync, user_id, transaction_id, data)
+
+    async def get_spending_stats(self, user_id: str) -> Optional[dict]:
+        return await self._call(self._get_stats_sync, user_id)
+
+    async def save_spending_stats(self, user_id: str, stats: dict, data_version: int) -> bool:
+        return await self._call(self._save_stats_sync, user_id, stats, data_version)
+
+    async def add_challenge(self, user_id: str, challenge_data: dict) -> str:
+        return await self._call(self._add_challenge_sync, user_id, challenge_data)
+
+    async def get_challenges(self, user_id: str) -> List[Document]:
+        return await self._call(self._get_challenges_sync, user_id)
@@ -0,0 +1,59 @@
+import bisect
+from typing import Dict, List, Optional, Tuple
+
+from services.storage.base import Document
+from services.storage.local import DATE_ORDERED_COLLECTIONS, LocalDocumentStorage, copy_document, sort_key
+
+
+class MemoryStorage(LocalDocumentStorage):
+    """
+    In-process backend for tests, CI and load benchmarks.
+
+    Date-ordered collections keep a sorted (sort key, id) index so range scans
+    are O(log n + k) like an indexed Firestore query. Data is lost on restart.
+    """
+
+    name = "memory"
+
+    def __init__(self):
+        super().__init__()
+        self._collections: Dict[str, Dict[str, dict]] = {}
+        self._indexes: Dict[str, List[Tuple[str, str]]] = {}
+
+    @staticmethod
+    def _is_date_ordered(collection: str) -> bool:
+        return collection.rsplit("/", 1)[-1] in DATE_ORDERED_COLLECTIONS
+
+    def _get(self, collection: str, doc_id: str) -> Optional[dict]:
+        data = self._collections.get(collection, {}).get(doc_id)
+        return copy_document(data) if data is not None else None
+
+    def _put(self, collection: str, doc_id: str, data: dict):
+        documents = self._collections.setdefault(collection, {})
+        if self._is_date_ordered(collection):
+            index = self._indexes.setdefault(collection, [])
+            if doc_id in documents:
+                old_entry = (sort_key(documents[doc_id].get("transaction_date")), doc_id)
+                position = bisect.bisect_left(index, old_entry)
+                if position < len(index) and index[position] == old_entry:
+                    del index[position]
+            bisect.insort(index, (sort_key(data.get("transaction_date")), doc_id))
+        documents[doc_id] = copy_document(data)
+
+    def _list(self, collection: str) -> List[Document]:
+        return [(doc_id, copy_document(data)) for doc_id, data in self._collections.get(collection, {}).items()]
+
+    def _range(self, collection: str, start_key: str, end_key: Optional[str], after: Optional[Tuple[str, str]] = None, limit: Optional[int] = None) -> List[Document]:
+        index = self._indexes.get(collection, [])
+        documents = self._collections.get(collection, {})
+        position = bisect.bisect_left(index, (start_key, ""))
+        if after is not None:
+            position = max(position, bisect.bisect_right(index, after))
+        results = []
+        for key, doc_id in index[position:]:
+            if end_key is not None and key > end_key:
+                break
+            results.append((doc_id, copy_document(documents[doc_id])))
+            if limit is not None and len(results) >= limit:
+                break
+        return results
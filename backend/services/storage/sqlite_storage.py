@@ -0,0 +1,124 @@
+import json
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from services.storage.base import Document
+from services.storage.local import DATE_ORDERED_COLLECTIONS, LocalDocumentStorage, sort_key
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    collection TEXT NOT NULL,
+    doc_id TEXT NOT NULL,
+    sort_key TEXT NOT NULL DEFAULT '',
+    data TEXT NOT NULL,
+    PRIMARY KEY (collection, doc_id)
+);
+CREATE INDEX IF NOT EXISTS documents_by_date ON documents (collection, sort_key, doc_id);
+"""
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    raise TypeError(f"Cannot store {type(value).__name__} in SQLite document")
+
+
+def _decode(obj: dict):
+    if "__datetime__" in obj and len(obj) == 1:
+        return datetime.fromisoformat(obj["__datetime__"])
+    return obj
+
+
+class SQLiteStorage(LocalDocumentStorage):
+    """
+    Single-file backend for CI and single-node on-prem deployments.
+
+    Documents are stored as JSON keyed by (collection, id), with an indexed sort
+    key on transaction_date for range scans. Calls run in the threadpool so the
+    event loop never waits on disk I/O.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self._connection: Optional[sqlite3.Connection] = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            with self._lock:
+                if self._connection is None:
+                    connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+                    connection.execute("PRAGMA journal_mode=WAL")
+                    connection.execute("PRAGMA synchronous=NORMAL")
+                    connection.executescript(SCHEMA)
+                    self._connection = connection
+        return self._connection
+
+    def warm_up(self):
+        self.connection
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            connection = self.connection
+            if connection.in_transaction:
+                # Nested use (e.g. rollups inside an add) joins the outer transaction
+                yield
+                return
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+    async def _call(self, fn, *args):
+        return await run_in_threadpool(fn, *args)
+
+    def _get(self, collection: str, doc_id: str) -> Optional[dict]:
+        row = self.connection.execute(
+            "SELECT data FROM documents WHERE collection = ? AND doc_id = ?", (collection, doc_id)
+        ).fetchone()
+        return json.loads(row[0], object_hook=_decode) if row else None
+
+    def _put(self, collection: str, doc_id: str, data: dict):
+        key = sort_key(data.get("transaction_date")) if collection.rsplit("/", 1)[-1] in DATE_ORDERED_COLLECTIONS else ""
+        self.connection.execute(
+            "INSERT OR REPLACE INTO documents (collection, doc_id, sort_key, data) VALUES (?, ?, ?, ?)",
+            (collection, doc_id, key, json.dumps(data, default=_encode))
+        )
+
+    def _list(self, collection: str) -> List[Document]:
+        rows = self.connection.execute(
+            "SELECT doc_id, data FROM documents WHERE collection = ?", (collection,)
+        ).fetchall()
+        return [(doc_id, json.loads(data, object_hook=_decode)) for doc_id, data in rows]
+
+    def _range(self, collection: str, start_key: str, end_key: Optional[str], after: Optional[Tuple[str, str]] = None, limit: Optional[int] = None) -> List[Document]:
+        sql = "SELECT doc_id, data FROM documents WHERE collection = ? AND sort_key >= ?"
+        params = [collection, start_key]
+        if end_key is not None:
+            sql += " AND sort_key <= ?"
+            params.append(end_key)
+        if after is not None:
+            sql += " AND (sort_key, doc_id) > (?, ?)"
+            params.extend(after)
+        sql += " ORDER BY sort_key, doc_id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        rows = self.connection.execute(sql, params).fetchall()
+        return [(doc_id, json.loads(data, object_hook=_decode)) for doc_id, data in rows]
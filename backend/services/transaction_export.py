@@ -0,0 +1,142 @@
+import csv
+import io
+from datetime import datetime
+from typing import AsyncIterator, Iterator, List, Tuple
+
+# One row per line item, with the parent transaction's fields repeated so the
+# export loads straight into a spreadsheet or dataframe.
+EXPORT_COLUMNS = [
+    "transaction_id", "transaction_date", "store_name", "category", "total_amount",
+    "currency", "payment_method", "location", "tax_amount", "discount_amount",
+    "item_index", "item_name", "item_category", "item_price", "item_quantity",
+    "item_unit", "item_discount", "item_original_price",
+]
+
+TRANSACTION_FIELDS = [
+    "transaction_date", "store_name", "category", "total_amount", "currency",
+    "payment_method", "location", "tax_amount", "discount_amount",
+]
+
+ITEM_FIELDS = {
+    "item_name": "name",
+    "item_category": "category",
+    "item_price": "price",
+    "item_quantity": "quantity",
+    "item_unit": "unit",
+    "item_discount": "discount",
+    "item_original_price": "original_price",
+}
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def flatten_transaction(transaction_id: str, data: dict) -> Iterator[dict]:
+    """Yields one export row per line item (or a single row if there are none)."""
+    base = {"transaction_id": transaction_id}
+    for field in TRANSACTION_FIELDS:
+        base[field] = data.get(field)
+    items = data.get("items") or [None]
+    for index, item in enumerate(items):
+        row = dict(base)
+        row["item_index"] = index if item is not None else None
+        for column, field in ITEM_FIELDS.items():
+            row[column] = item.get(field) if item else None
+        yield row
+
+
+def _flatten_page(page: List[Tuple[str, dict]]) -> List[dict]:
+    return [row for transaction_id, data in page for row in flatten_transaction(transaction_id, data)]
+
+
+async def stream_csv(pages: AsyncIterator[List[Tuple[str, dict]]]) -> AsyncIterator[bytes]:
+    """Encodes pages of (id, document) pairs as CSV, one chunk per page."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS, extrasaction="ignore")
+    writer.writeheader()
+    yield buffer.getvalue().encode("utf-8")
+    async for page in pages:
+        buffer.seek(0)
+        buffer.truncate()
+        for row in _flatten_page(page):
+            if isinstance(row["transaction_date"], datetime):
+                row["transaction_date"] = row["transaction_date"].isoformat()
+            writer.writerow(row)
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _DrainableSink(io.RawIOBase):
+    """
+    Write-only file object that hands written bytes back to the caller.
+
+    ParquetWriter records absolute offsets in the footer, so ``tell`` keeps
+    counting bytes even after they have been drained and sent to the client.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _parquet_schema(pa):
+    return pa.schema([
+        ("transaction_id", pa.string()),
+        ("transaction_date", pa.timestamp("us", tz="UTC")),
+        ("store_name", pa.string()),
+        ("category", pa.string()),
+        ("total_amount", pa.float64()),
+        ("currency", pa.string()),
+        ("payment_method", pa.string()),
+        ("location", pa.string()),
+        ("tax_amount", pa.float64()),
+        ("discount_amount", pa.float64()),
+        ("item_index", pa.int32()),
+        ("item_name", pa.string()),
+        ("item_category", pa.string()),
+        ("item_price", pa.float64()),
+        ("item_quantity", pa.float64()),
+        ("item_unit", pa.string()),
+        ("item_discount", pa.float64()),
+        ("item_original_price", pa.float64()),
+    ])
+
+
+async def stream_parquet(pages: AsyncIterator[List[Tuple[str, dict]]]) -> AsyncIterator[bytes]:
+    """Encodes pages of (id, document) pairs as Parquet, one row group per page."""
+    # pyarrow is only needed for this export format, so it is imported on use
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _parquet_schema(pa)
+    sink = _DrainableSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema, compression="snappy")
+    try:
+        async for page in pages:
+            rows = _flatten_page(page)
+            if rows:
+                writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
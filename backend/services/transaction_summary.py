@@ -0,0 +1,82 @@
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+# Groups are keyed by (name, currency) so amounts in different currencies are
+# never added together.
+_GroupKey = Tuple[str, str]
+
+
+def _grouped(totals: Dict[_GroupKey, list], name_field: str, limit: Optional[int] = None) -> List[dict]:
+    groups = [
+        {name_field: name, "currency": currency, "total": round(total, 2), "count": count}
+        for (name, currency), (total, count) in totals.items()
+    ]
+    groups.sort(key=lambda group: group["total"], reverse=True)
+    return groups[:limit] if limit else groups
+
+
+def _add(totals: Dict[_GroupKey, list], key: _GroupKey, amount: float):
+    entry = totals.get(key)
+    if entry is None:
+        totals[key] = [amount, 1]
+    else:
+        entry[0] += amount
+        entry[1] += 1
+
+
+async def summarize_transaction_pages(
+    pages: AsyncIterator[List[Tuple[str, dict]]],
+    categories: Optional[List[str]] = None,
+    store_name: Optional[str] = None,
+    top: int = 5,
+) -> dict:
+    """
+    Aggregates pages of (id, document) pairs into totals per currency, merchant
+    category, store and month, plus the largest transaction.
+
+    ``categories`` (any of them) and ``store_name`` match the transaction's own
+    fields, case-insensitively. Only one page is held in memory at a time.
+    """
+    categories = {category.lower() for category in categories} if categories else None
+    store_name = store_name.lower() if store_name else None
+    totals: Dict[str, float] = {}
+    by_category: Dict[_GroupKey, list] = {}
+    by_store: Dict[_GroupKey, list] = {}
+    by_month: Dict[_GroupKey, list] = {}
+    count = 0
+    largest = None
+    first_date: Optional[datetime] = None
+    last_date: Optional[datetime] = None
+
+    async for page in pages:
+        for transaction_id, data in page:
+            transaction_category = data.get("category") or "General"
+            store = data.get("store_name") or "Unknown"
+            if categories and transaction_category.lower() not in categories:
+                continue
+            if store_name and store.lower() != store_name:
+                continue
+            amount = data.get("total_amount") or 0.0
+            currency = data.get("currency") or "INR"
+            date = data["transaction_date"]
+
+            count += 1
+            totals[currency] = totals.get(currency, 0.0) + amount
+            _add(by_category, (transaction_category, currency), amount)
+            _add(by_store, (store, currency), amount)
+            _add(by_month, (date.strftime("%Y-%m"), currency), amount)
+            if largest is None or amount > largest["total_amount"]:
+                largest = {"id": transaction_id, "store_name": store, "total_amount": amount, "currency": currency, "transaction_date": date}
+            first_date = date if first_date is None else min(first_date, date)
+            last_date = date if last_date is None else max(last_date, date)
+
+    return {
+        "transaction_count": count,
+        "first_transaction_date": first_date,
+        "last_transaction_date": last_date,
+        "totals": {currency: round(total, 2) for currency, total in totals.items()},
+        "by_category": _grouped(by_category, "category"),
+        "by_store": _grouped(by_store, "store_name", top),
+        "by_month": sorted(_grouped(by_month, "month"), key=lambda group: group["month"]),
+        "largest_transaction": largest,
+    }
@@ -0,0 +1,113 @@
+import asyncio
+import json
+import os
+import sys
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+# Add the backend root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.auth import get_current_user
+from core.config import settings
+from core.container import ServiceContainer
+from models.user import User
+from services.firestore_service import FirestoreService
+from services.storage.memory_storage import MemoryStorage
+
+STREAM = (
+    b'event: text_delta\ndata: {"author": "Aegnt", "content": "Hello"}\n\n'
+    b'event: done\ndata: {"parts": [{"type": "text", "content": "Hello"}]}\n\n'
+)
+
+
+@pytest.fixture
+def aegnt(monkeypatch):
+    """Routes the app's aegnt client to ``aegnt.handler``; records the requests it gets."""
+    import main
+
+    monkeypatch.setattr(settings, "AEGNT_API_URL", "http://aegnt")
+    state = type("Aegnt", (), {"requests": [], "handler": None})()
+
+    def handler(request):
+        state.requests.append(request)
+        return state.handler(request)
+
+    services = ServiceContainer()
+    services.firestore_service = FirestoreService(storage=MemoryStorage())
+    services.aegnt_service.client._transport = httpx.MockTransport(handler)
+    main.app.state.services = services
+    main.app.dependency_overrides[get_current_user] = lambda: User(uid="user-1", email="user@example.com", id_token="token")
+    state.client = TestClient(main.app)
+    yield state
+    main.app.dependency_overrides.clear()
+
+
+def test_stream_query_relays_aegnt_events(aegnt):
+    aegnt.handler = lambda request: httpx.Response(200, content=STREAM, headers={"content-type": "text/event-stream"})
+
+    response = aegnt.client.post("/api/v1/users/me/agent/invoke?stream=true", json={"prompt": "hi"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.content == STREAM
+    [request] = aegnt.requests
+    assert request.url.path == "/invoke_agent/stream"
+
+
+def test_accept_header_selects_streaming(aegnt):
+    aegnt.handler = lambda request: httpx.Response(200, content=STREAM)
+
+    response = aegnt.client.post("/api/v1/users/me/agent/invoke", json={"prompt": "hi"}, headers={"Accept": "text/event-stream"})
+
+    assert response.content == STREAM
+
+
+def test_aegnt_errors_before_streaming_return_503(aegnt):
+    aegnt.handler = lambda request: httpx.Response(502)
+
+    response = aegnt.client.post("/api/v1/users/me/agent/invoke?stream=true", json={"prompt": "hi"})
+
+    assert response.status_code == 503
+
+
+def test_buffered_mode_is_unchanged(aegnt):
+    aegnt.handler = lambda request: httpx.Response(200, json={"parts": [{"type": "text", "content": "Hello"}]})
+
+    response = aegnt.client.post("/api/v1/users/me/agent/invoke", json={"prompt": "hi"})
+
+    assert response.json() == {"parts": [{"type": "text", "content": "Hello"}]}
+    assert aegnt.requests[0].url.path == "/invoke_agent"
+
+
+def test_turns_carry_the_users_data_version(aegnt):
+    import main
+
+    aegnt.handler = lambda request: httpx.Response(200, json={"parts": []})
+    asyncio.run(main.app.state.services.firestore_service.add_challenge("user-1", {"challenge_type": "no_spend"}))
+
+    aegnt.client.post("/api/v1/users/me/agent/invoke", json={"prompt": "hi"})
+    aegnt.client.post("/api/v1/users/me/agent/invoke?stream=true", json={"prompt": "hi"})
+
+    assert [json.loads(request.content)["data_version"] for request in aegnt.requests] == [1, 1]
+
+
+def test_aegnt_busy_responses_pass_through_with_retry_after(aegnt):
+    aegnt.handler = lambda request: httpx.Response(429, json={"detail": "busy"}, headers={"Retry-After": "7"})
+
+    buffered = aegnt.client.post("/api/v1/users/me/agent/invoke", json={"prompt": "hi"})
+    streamed = aegnt.client.post("/api/v1/users/me/agent/invoke?stream=true", json={"prompt": "hi"})
+
+    assert [buffered.status_code, streamed.status_code] == [429, 429]
+    assert buffered.headers["Retry-After"] == streamed.headers["Retry-After"] == "7"
+
+
+def test_proactive_insights_run_as_background_turns(aegnt):
+    aegnt.handler = lambda request: httpx.Response(200, json={"parts": []})
+
+    aegnt.client.post("/api/v1/users/me/insights/proactive")
+    aegnt.client.post("/api/v1/users/me/agent/invoke", json={"prompt": "hi"})
+
+    assert [json.loads(request.content).get("priority") for request in aegnt.requests] == ["background", None]
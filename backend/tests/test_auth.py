@@ -0,0 +1,97 @@
+import os
+import sys
+import time
+
+import pytest
+from fastapi.security import HTTPAuthorizationCredentials
+from firebase_admin import auth
+
+# Add the backend root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core import auth as core_auth
+from core.auth import VerifiedTokenCache, get_current_user
+
+
+def decoded_token(uid: str = "user-1", expires_in: float = 3600) -> dict:
+    return {"uid": uid, "email": f"{uid}@example.com", "name": "Test", "exp": time.time() + expires_in}
+
+
+@pytest.fixture
+def verifier(monkeypatch):
+    """Counts calls to the real SDK verifier and answers from ``tokens``."""
+    calls = []
+    tokens = {}
+
+    def fake_verify(token, app=None):
+        calls.append(token)
+        if token not in tokens:
+            raise auth.InvalidIdTokenError("bad token")
+        return dict(tokens[token])
+
+    monkeypatch.setattr(core_auth.auth, "verify_id_token", fake_verify)
+    monkeypatch.setattr(core_auth, "get_firebase_app", lambda: None)
+    core_auth.token_cache.clear()
+    core_auth.token_stats.reset()
+    yield tokens, calls
+    core_auth.token_cache.clear()
+
+
+def bearer(token: str) -> HTTPAuthorizationCredentials:
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+
+def test_repeated_calls_skip_verification(verifier):
+    tokens, calls = verifier
+    tokens["token-a"] = decoded_token("alice")
+
+    users = [get_current_user(bearer("token-a")) for _ in range(5)]
+
+    assert [user.uid for user in users] == ["alice"] * 5
+    assert calls == ["token-a"]
+    status = core_auth.token_verification_status()
+    assert status["cache_hits"] == 4
+    assert status["verifications"] == 1
+    assert status["cache_size"] == 1
+
+
+def test_expired_entries_are_verified_again(verifier):
+    tokens, calls = verifier
+    tokens["token-a"] = decoded_token("alice", expires_in=-1)
+
+    get_current_user(bearer("token-a"))
+    get_current_user(bearer("token-a"))
+
+    assert calls == ["token-a", "token-a"]
+
+
+def test_invalid_tokens_are_not_cached(verifier):
+    _, calls = verifier
+
+    first = get_current_user(bearer("forged"))
+    get_current_user(bearer("forged"))
+
+    # Falls back to the default user, and every attempt is checked
+    assert first.uid == "vg21F4xzYJdg5yikFrEDAotLqli1"
+    assert calls == ["forged", "forged"]
+    assert core_auth.token_stats.snapshot()["verification_failures"] == 2
+
+
+def test_cache_evicts_least_recently_used():
+    cache = VerifiedTokenCache(max_size=2)
+    cache.put("a", decoded_token("a"))
+    cache.put("b", decoded_token("b"))
+    cache.get("a")
+    cache.put("c", decoded_token("c"))
+
+    assert cache.get("b") is None
+    assert cache.get("a")["uid"] == "a"
+    assert cache.get("c")["uid"] == "c"
+    assert len(cache) == 2
+
+
+def test_cache_does_not_keep_raw_tokens():
+    cache = VerifiedTokenCache(max_size=2)
+    cache.put("secret-token", decoded_token())
+
+    assert "secret-token" not in cache._entries
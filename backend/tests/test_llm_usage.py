@@ -0,0 +1,128 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+# Add the backend root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core import llm_usage
+from core.config import settings
+from core.container import ServiceContainer
+from core.llm_usage import usage_ledger
+from services.gemini_service import GEMINI_MODEL, GeminiService
+
+ADMIN_TOKEN = "admin-secret"
+
+
+def usage(prompt, output, cached=0, thoughts=0):
+    return SimpleNamespace(prompt_token_count=prompt, candidates_token_count=output, cached_content_token_count=cached, thoughts_token_count=thoughts)
+
+
+class FakeModel:
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+
+    def generate_content(self, contents):
+        self.calls += 1
+        return SimpleNamespace(text='[{"name": "Milk", "category": "Dairy"}]', usage_metadata=usage(1000, 200, cached=400))
+
+
+@pytest.fixture(autouse=True)
+def ledger(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_DAILY_TOKEN_BUDGET", 0)
+    monkeypatch.setattr(settings, "LLM_DAILY_COST_BUDGET_USD", 0.0)
+    monkeypatch.setattr(settings, "LLM_USER_BUDGETS", "")
+    usage_ledger.clear()
+    yield usage_ledger
+    usage_ledger.clear()
+
+
+@pytest.fixture
+def gemini():
+    service = GeminiService()
+    service._model = FakeModel(GEMINI_MODEL)
+    service._models["gemini-2.5-flash-lite"] = FakeModel("gemini-2.5-flash-lite")
+    return service
+
+
+def test_cost_counts_cached_and_thinking_tokens():
+    # 600 uncached and 400 cached prompt tokens, 200 output + 100 thinking
+    cost = llm_usage.estimate_cost("gemini-2.5-flash", 1000, 300, 400)
+
+    assert cost == pytest.approx((600 * 0.30 + 400 * 0.075 + 300 * 2.50) / 1_000_000)
+    assert llm_usage.estimate_cost("unpriced-model", 1000, 300, 0) == 0.0
+
+
+def test_gemini_calls_are_recorded_per_user_and_template(gemini, ledger):
+    gemini.categorize_items([{"name": "Milk"}], "user-1")
+    gemini.categorize_items([{"name": "Milk"}], "user-1")
+
+    summary = ledger.summary()
+    [user] = summary["by_user"]
+    assert user["user_id"] == "user-1"
+    assert user["calls"] == 2
+    assert user["prompt_tokens"] == 2000
+    assert user["cached_tokens"] == 800
+    assert user["total_tokens"] == 2400
+    assert user["over_budget"] is False
+    assert [entry["template"] for entry in summary["by_template"]] == ["categorize_items"]
+    assert [entry["tool"] for entry in summary["by_tool"]] == ["receipt_ingestion"]
+
+
+def test_users_over_budget_fall_back_to_the_cheaper_model(gemini, ledger, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_USER_BUDGETS", '{"user-1": {"tokens": 1000}}')
+
+    gemini.categorize_items([{"name": "Milk"}], "user-1")
+    gemini.categorize_items([{"name": "Milk"}], "user-1")
+    gemini.categorize_items([{"name": "Milk"}], "user-2")
+
+    assert gemini._model.calls == 2
+    assert gemini._models["gemini-2.5-flash-lite"].calls == 1
+    assert ledger.over_budget("user-1")
+    assert not ledger.over_budget("user-2")
+    models = {entry["model"]: entry["calls"] for entry in ledger.summary()["by_model"]}
+    assert models == {GEMINI_MODEL: 2, "gemini-2.5-flash-lite": 1}
+
+
+def test_failed_calls_are_counted(gemini, ledger):
+    def fail(contents):
+        raise RuntimeError("quota exceeded")
+    gemini._model.generate_content = fail
+
+    assert gemini.categorize_items([{"name": "Milk"}], "user-1") == [{"name": "Milk"}]
+
+    [template] = ledger.summary()["by_template"]
+    assert (template["calls"], template["errors"], template["total_tokens"]) == (1, 1, 0)
+
+
+def test_admin_endpoint_merges_aegnt_usage(ledger, monkeypatch):
+    import main
+
+    monkeypatch.setattr(settings, "ADMIN_API_TOKEN", ADMIN_TOKEN)
+    monkeypatch.setattr(settings, "AEGNT_API_URL", "http://aegnt")
+    seen = {}
+
+    def handler(request):
+        seen.update(request.headers)
+        return httpx.Response(200, json={"by_user": [{"user_id": "user-1", "calls": 3}]})
+
+    services = ServiceContainer()
+    services.aegnt_service.client._transport = httpx.MockTransport(handler)
+    main.app.state.services = services
+    ledger.record("user-1", "receipt_ingestion", "extract_from_receipt", GEMINI_MODEL, usage(500, 100))
+    client = TestClient(main.app)
+
+    assert client.get("/admin/llm_usage").status_code == 404
+    assert client.get("/admin/llm_usage", headers={llm_usage.ADMIN_HEADER: "wrong"}).status_code == 404
+    response = client.get("/admin/llm_usage", headers={llm_usage.ADMIN_HEADER: ADMIN_TOKEN})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["backend"]["by_user"][0]["total_tokens"] == 600
+    assert body["aegnt"]["by_user"][0]["calls"] == 3
+    assert seen["x-aegis-admin"] == ADMIN_TOKEN
@@ -0,0 +1,86 @@
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Add the backend root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core import metrics
+from core.auth import get_current_user
+from core.container import ServiceContainer
+from core.metrics import Histogram, server_timing_header, stage_timer, start_request_timing, timed_stage
+from models.user import User
+from services.firestore_service import FirestoreService
+from services.storage.memory_storage import MemoryStorage
+
+
+@pytest.fixture
+def client():
+    import main
+
+    services = ServiceContainer()
+    services.firestore_service = FirestoreService(storage=MemoryStorage())
+    # TestClient is used without its context manager, so the lifespan (and its
+    # network-bound warm-up) does not run
+    main.app.state.services = services
+    main.app.dependency_overrides[get_current_user] = lambda: User(uid="user-1", email="user@example.com", id_token="token")
+    metrics.STAGE_DURATION.clear()
+    metrics.REQUEST_DURATION.clear()
+    yield TestClient(main.app)
+    main.app.dependency_overrides.clear()
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("test_seconds", "Test.", ("stage",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, "a")
+    histogram.observe(0.5, "a")
+    histogram.observe(5, "a")
+
+    lines = histogram.render()
+
+    assert 'test_seconds_bucket{stage="a",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{stage="a",le="1.0"} 2' in lines
+    assert 'test_seconds_bucket{stage="a",le="+Inf"} 3' in lines
+    assert 'test_seconds_count{stage="a"} 3' in lines
+
+
+def test_stages_are_totalled_per_request():
+    stages = start_request_timing()
+
+    @timed_stage("gemini")
+    def extract():
+        return "ok"
+
+    extract()
+    extract()
+    with pytest.raises(ValueError):
+        with stage_timer("gmaps", "geocode"):
+            raise ValueError("quota")
+
+    assert stages["gemini"][1] == 2
+    assert stages["gmaps"][1] == 1
+    assert metrics.STAGE_DURATION.count("gemini", "extract") >= 2
+    header = server_timing_header(stages, 0.25)
+    assert 'gemini;dur=' in header and 'desc="2 calls"' in header
+    assert header.endswith("total;dur=250.0")
+
+
+def test_responses_carry_server_timing(client):
+    response = client.get("/api/v1/transactions", params={"start_date": "2024-01-01", "end_date": "2024-01-31"})
+
+    assert response.status_code == 200
+    header = response.headers["Server-Timing"]
+    assert header.startswith("firestore;dur=")
+    assert "total;dur=" in header
+
+
+def test_metrics_endpoint_exposes_stage_and_route_histograms(client):
+    client.get("/api/v1/transactions", params={"start_date": "2024-01-01", "end_date": "2024-01-31"})
+
+    body = client.get("/metrics").text
+
+    assert 'aegis_stage_duration_seconds_count{stage="firestore",operation="get_transactions"} 1' in body
+    assert 'aegis_http_request_duration_seconds_count{method="GET",handler="get_transactions",status="200"} 1' in body
+    assert "aegis_auth_token_cache_hits_total" in body
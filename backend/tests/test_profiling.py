@@ -0,0 +1,138 @@
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+# pyinstrument is an optional dependency of the backend
+pytest.importorskip("pyinstrument")
+
+# Add the backend root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core import profiling
+from core.auth import get_current_user
+from core.config import settings
+from core.container import ServiceContainer
+from models.user import User
+from services.firestore_service import FirestoreService
+from services.storage.memory_storage import MemoryStorage
+
+pytest_plugins = ("pytest_asyncio",)
+
+ADMIN_TOKEN = "profile-secret"
+TRANSACTIONS = ("/api/v1/transactions", {"start_date": "2024-01-01", "end_date": "2024-01-31"})
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    import main
+
+    monkeypatch.setattr(settings, "PROFILE_DIR", str(tmp_path / "profiles"))
+    monkeypatch.setattr(settings, "PROFILE_ADMIN_TOKEN", ADMIN_TOKEN)
+    monkeypatch.setattr(settings, "PROFILE_SAMPLE_RATE", 0.0)
+    services = ServiceContainer()
+    services.firestore_service = FirestoreService(storage=MemoryStorage())
+    main.app.state.services = services
+    main.app.dependency_overrides[get_current_user] = lambda: User(uid="user-1", email="user@example.com", id_token="token")
+    yield TestClient(main.app)
+    main.app.dependency_overrides.clear()
+
+
+def get_transactions(client, headers=None):
+    path, params = TRANSACTIONS
+    return client.get(path, params=params, headers=headers or {})
+
+
+def test_admin_header_profiles_the_request(client):
+    response = get_transactions(client, {profiling.PROFILE_HEADER: ADMIN_TOKEN, profiling.REQUEST_ID_HEADER: "slow-request-1"})
+
+    assert response.status_code == 200
+    profile_id = response.headers[profiling.PROFILE_HEADER]
+    profile = client.get(f"/debug/profiles/{profile_id}", headers={profiling.PROFILE_HEADER: ADMIN_TOKEN})
+    assert profile.status_code == 200
+    document = profile.json()
+    assert document["$schema"].startswith("https://www.speedscope.app")
+    assert document["name"] == "GET /api/v1/transactions (slow-request-1)"
+    listed = client.get("/debug/profiles", headers={profiling.PROFILE_HEADER: ADMIN_TOKEN}).json()["profiles"]
+    assert [entry["profile_id"] for entry in listed] == [profile_id]
+
+
+def test_callers_cannot_overwrite_a_stored_profile(client):
+    headers = {profiling.PROFILE_HEADER: ADMIN_TOKEN, profiling.REQUEST_ID_HEADER: "slow-request-1"}
+    first = get_transactions(client, headers).headers[profiling.PROFILE_HEADER]
+    second = get_transactions(client, headers).headers[profiling.PROFILE_HEADER]
+
+    assert first != second
+    assert profiling.profile_path(first) is not None and profiling.profile_path(second) is not None
+    assert profiling.profile_path("slow-request-1") is None
+
+
+def test_requests_are_not_profiled_by_default(client, monkeypatch):
+    monkeypatch.setattr(profiling, "start_profiler", lambda: pytest.fail("profiler started"))
+
+    response = get_transactions(client, {profiling.PROFILE_HEADER: "wrong-token"})
+
+    assert response.status_code == 200
+    assert profiling.PROFILE_HEADER not in response.headers
+    # Every response still gets a request id
+    assert len(response.headers[profiling.REQUEST_ID_HEADER]) == 32
+
+
+def test_sampled_requests_are_profiled(client, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILE_SAMPLE_RATE", 1.0)
+
+    response = get_transactions(client)
+
+    profile_id = response.headers[profiling.PROFILE_HEADER]
+    assert profiling.profile_path(profile_id) is not None
+
+
+def test_profiles_require_the_admin_token(client):
+    response = get_transactions(client, {profiling.PROFILE_HEADER: ADMIN_TOKEN, profiling.REQUEST_ID_HEADER: "req-1"})
+
+    assert client.get(f"/debug/profiles/{response.headers[profiling.PROFILE_HEADER]}").status_code == 404
+    assert client.get("/debug/profiles", headers={profiling.PROFILE_HEADER: "nope"}).status_code == 404
+
+
+def test_unsafe_request_ids_are_replaced(client):
+    response = get_transactions(client, {profiling.PROFILE_HEADER: ADMIN_TOKEN, profiling.REQUEST_ID_HEADER: "../../etc/passwd"})
+
+    assert response.headers[profiling.REQUEST_ID_HEADER] != "../../etc/passwd"
+    assert os.path.dirname(profiling.profile_path(response.headers[profiling.PROFILE_HEADER])) == settings.PROFILE_DIR
+    assert profiling.profile_path("../../etc/passwd") is None
+
+
+def test_old_profiles_are_pruned(client, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILE_MAX_FILES", 2)
+
+    profile_ids = [
+        get_transactions(client, {profiling.PROFILE_HEADER: ADMIN_TOKEN, profiling.REQUEST_ID_HEADER: f"req-{index}"}).headers[profiling.PROFILE_HEADER]
+        for index in range(4)
+    ]
+
+    assert len(profiling.list_profiles()) == 2
+    assert profiling.profile_path(profile_ids[-1]) is not None
+
+
+@pytest.mark.asyncio
+async def test_request_id_and_admin_profiling_are_forwarded_to_aegnt(monkeypatch):
+    import httpx
+    from services.aegnt_service import AegntService
+
+    monkeypatch.setattr(settings, "AEGNT_API_URL", "http://aegnt")
+    monkeypatch.setattr(settings, "PROFILE_ADMIN_TOKEN", ADMIN_TOKEN)
+    seen = {}
+
+    def handler(request):
+        seen.update(request.headers)
+        return httpx.Response(200, json={"parts": []})
+
+    service = AegntService()
+    service.client._transport = httpx.MockTransport(handler)
+    profiling.begin_request("turn-1", {profiling.PROFILE_HEADER: ADMIN_TOKEN})
+    await service.invoke_agent("user-1", "hello", "token")
+    await service.aclose()
+
+    assert seen["x-request-id"] == "turn-1"
+    assert seen["x-aegis-profile"] == ADMIN_TOKEN
@@ -0,0 +1,95 @@
+import io
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+# Add the backend root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services import statement_import
+
+OFX_STATEMENT = b"""OFXHEADER:100
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><CURDEF>USD
+<BANKTRANLIST>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20240105120000<TRNAMT>-42.50<NAME>Corner Shop</STMTTRN>
+<STMTTRN><TRNTYPE>DIRECTDEP<DTPOSTED>20240106<TRNAMT>2500.00<NAME>Payroll</STMTTRN>
+<STMTTRN><TRNTYPE>XFER<DTPOSTED>20240107<TRNAMT>10.00<NAME>Refund</STMTTRN>
+<STMTTRN><TRNTYPE>POS<DTPOSTED>20240208<TRNAMT>-9.99<MEMO>Streaming</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+
+def import_rows(rows, chunk_size=statement_import.IMPORT_CHUNK_SIZE):
+    report = {"skipped": 0, "errors": []}
+    chunks = list(statement_import.iter_validated_chunks("user-1", rows, report, chunk_size))
+    return chunks, report
+
+
+def csv_rows(text: str):
+    return statement_import.iter_csv_rows(io.BytesIO(text.encode("utf-8")))
+
+
+def test_column_aliases_are_detected_case_insensitively():
+    columns = statement_import._resolve_columns(["Posting Date", " Payee ", "Debit", "CCY", "Category"])
+
+    assert columns == {
+        "transaction_date": "Posting Date",
+        "store_name": " Payee ",
+        "total_amount": "Debit",
+        "currency": "CCY",
+        "category": "Category",
+    }
+    with pytest.raises(ValueError, match="total_amount"):
+        statement_import._resolve_columns(["Date", "Payee"])
+
+
+def test_signed_csv_amounts_skip_credits():
+    rows = csv_rows("Date,Description,Amount\n2024-01-05,Corner Shop,-1.00\n05/01/2024,Salary,\"2,500.00\"\n2024-01-07,Cafe,(4.50)\n")
+
+    chunks, report = import_rows(rows)
+
+    assert [(t["store_name"], t["total_amount"]) for t in chunks[0]] == [("Corner Shop", 1.0), ("Cafe", 4.5)]
+    assert report == {"skipped": 1, "errors": [{"row": 3, "error": "skipped credit (not spending)"}]}
+
+
+def test_debit_csv_columns_skip_credit_rows():
+    rows = csv_rows("Value Date,Narration,Withdrawal,Deposit\n2024-01-05,Corner Shop,\"1,234.50\",\n2024-01-06,Salary,,2500\n")
+
+    chunks, report = import_rows(rows)
+
+    assert [t["total_amount"] for t in chunks[0]] == [1234.5]
+    assert chunks[0][0]["transaction_date"] == datetime(2024, 1, 5)
+    assert report["errors"] == [{"row": 3, "error": "skipped credit (no debit amount)"}]
+
+
+def test_spend_csv_amounts_skip_negative_rows():
+    rows = csv_rows("transaction_date,store_name,total_amount,currency,category\n2024-01-05,Corner Shop,12.00,usd,Groceries\n2024-01-06,Corner Shop,-3.00,usd,Groceries\n2024-13-01,Cafe,5,usd,\n")
+
+    chunks, report = import_rows(rows)
+
+    assert [(t["total_amount"], t["currency"], t["category"]) for t in chunks[0]] == [(12.0, "USD", "Groceries")]
+    assert [error["error"] for error in report["errors"]] == ["skipped negative amount (not spending)", "unrecognised date '2024-13-01'"]
+
+
+def test_ofx_statement_imports_debits_only():
+    chunks, report = import_rows(statement_import.iter_ofx_rows(io.BytesIO(OFX_STATEMENT)), chunk_size=1)
+
+    assert [[(t["store_name"], t["total_amount"], t["currency"], t["payment_method"]) for t in chunk] for chunk in chunks] == [
+        [("Corner Shop", 42.5, "USD", "DEBIT")],
+        [("Streaming", 9.99, "USD", "POS")],
+    ]
+    assert [error["error"] for error in report["errors"]] == ["skipped directdep (not spending)", "skipped credit (not spending)"]
+
+
+def test_rollup_deltas_group_by_month():
+    rows = csv_rows("Date,Payee,Debit,Currency,Category\n2024-01-05,A,10,INR,Food\n2024-01-20,B,5,USD,\n2024-02-01,A,2.5,INR,Food\n")
+    chunks, _ = import_rows(rows)
+
+    deltas = statement_import.build_rollup_deltas(chunks[0])
+
+    assert deltas == {
+        "2024-01": {"transaction_count": 2, "totals": {"INR": 10.0, "USD": 5.0}, "categories": {"Food": 10.0, "General": 5.0}},
+        "2024-02": {"transaction_count": 1, "totals": {"INR": 2.5}, "categories": {"Food": 2.5}},
+    }
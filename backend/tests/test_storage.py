@@ -0,0 +1,372 @@
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+import pytest
+from google.api_core.exceptions import ServiceUnavailable
+from google.cloud import firestore
+
+# Add the backend root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services import spending_stats
+from services.firestore_service import FirestoreService
+from services.storage import DocumentNotFoundError
+from services.storage.firestore_storage import FirestoreStorage
+from services.storage.memory_storage import MemoryStorage
+from services.storage.sqlite_storage import SQLiteStorage
+
+pytest_plugins = ("pytest_asyncio",)
+
+
+def make_transaction(day: int, store: str = "Store A", amount: float = 10.0, category: str = "Grocery Store") -> dict:
+    return {
+        "user_id": "user-1",
+        "store_name": store,
+        "transaction_date": datetime(2024, 1, day, 12, 0),
+        "items": [{"name": "Milk", "price": amount, "quantity": 1.0, "category": "Dairy"}],
+        "total_amount": amount,
+        "currency": "INR",
+        "category": category,
+    }
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def service(request, tmp_path):
+    if request.param == "memory":
+        storage = MemoryStorage()
+    else:
+        storage = SQLiteStorage(str(tmp_path / "aegis.db"))
+    service = FirestoreService(storage=storage)
+    yield service
+    service.close()
+
+
+@pytest.mark.asyncio
+async def test_date_range_is_inclusive_and_ordered(service):
+    for day in (20, 5, 10, 1):
+        await service.add_transaction("user-1", make_transaction(day))
+
+    transactions = await service.get_transactions("user-1", "2024-01-05T12:00:00", "2024-01-20T12:00:00")
+
+    assert [t.transaction_date.day for t in transactions] == [5, 10, 20]
+    assert all(t.transaction_date.tzinfo is not None for t in transactions)
+
+
+@pytest.mark.asyncio
+async def test_filters_match_firestore_semantics(service):
+    await service.add_transaction("user-1", make_transaction(2, store="Store A"))
+    await service.add_transaction("user-1", make_transaction(3, store="Store B"))
+
+    by_store = await service.get_transactions("user-1", "2024-01-01", "2024-02-01", store_name="Store B")
+    by_item = await service.get_transactions("user-1", "2024-01-01", "2024-02-01", item_name="Milk")
+    # 'items' is an array, so the items.category path never matches (as in Firestore)
+    by_item_category = await service.get_transactions("user-1", "2024-01-01", "2024-02-01", category="Dairy")
+
+    assert [t.store_name for t in by_store] == ["Store B"]
+    assert len(by_item) == 2
+    assert by_item_category == []
+
+
+@pytest.mark.asyncio
+async def test_pages_cover_history_once(service):
+    await service.bulk_add_transactions("user-1", [[make_transaction(day) for day in range(1, 16)], [make_transaction(day) for day in range(16, 29)]])
+
+    pages = [page async for page in service.iter_transaction_pages("user-1", page_size=4)]
+    ids = [doc_id for page in pages for doc_id, _ in page]
+
+    assert [len(page) for page in pages] == [4] * 7
+    assert len(set(ids)) == 28
+    dates = [data["transaction_date"] for page in pages for _, data in page]
+    assert dates == sorted(dates)
+
+
+@pytest.mark.asyncio
+async def test_user_documents_and_challenges(service):
+    with pytest.raises(DocumentNotFoundError):
+        await service.update_user_fcm_token("user-1", "token")
+
+    await service.get_transactions("user-1", "2024-01-01", "2024-01-02")  # creates the user document
+    await service.update_user_fcm_token("user-1", "token")
+    challenge_id = await service.add_challenge("user-1", {"challenge_type": "no_spend", "details": {}})
+
+    assert await service.get_user_fcm_token("user-1") == "token"
+    assert await service.get_user_fcm_token("missing") is None
+    assert await service.get_challenges("user-1") == [{"challenge_type": "no_spend", "details": {}, "id": challenge_id}]
+
+
+@pytest.mark.asyncio
+async def test_rollups_follow_writes(service):
+    await service.add_transaction("user-1", make_transaction(2, amount=5.0))
+    await service.bulk_add_transactions("user-1", [[make_transaction(3, amount=7.5)]])
+
+    rollup = service.storage._get("users/user-1/rollups", "2024-01")
+
+    assert rollup["transaction_count"] == 2
+    assert rollup["totals"] == {"INR": 12.5}
+
+
+@pytest.mark.asyncio
+async def test_data_version_counts_writes_to_user_data(service):
+    assert await service.get_data_version("user-1") == 0
+
+    transaction_id = await service.add_transaction("user-1", make_transaction(2))
+    await service.bulk_add_transactions("user-1", [[make_transaction(3)], [make_transaction(4)]])
+    await service.update_transaction("user-1", transaction_id, {"store_name": "Store B"})
+    await service.add_challenge("user-1", {"challenge_type": "no_spend", "details": {}})
+    await service.update_user_fcm_token("user-1", "token")
+
+    # One bump per write or import chunk; the profile update is not user data
+    assert await service.get_data_version("user-1") == 5
+    assert await service.get_data_version("user-2") == 0
+
+
+@pytest.mark.asyncio
+async def test_spending_stats_follow_writes(service):
+    await service.add_transaction("user-1", make_transaction(2, amount=5.0))
+    # Built from the history on first read, then kept up to date by writes
+    assert (await service.get_spending_stats("user-1")).transaction_count == 1
+
+    transaction_id = await service.add_transaction("user-1", make_transaction(3, store="Store B", amount=7.5))
+    await service.bulk_add_transactions("user-1", [[make_transaction(day, amount=float(day)) for day in range(4, 12)]])
+    await service.update_transaction("user-1", transaction_id, {"store_name": "Store C", "total_amount": 9.0})
+
+    stats = (await service.get_spending_stats("user-1")).model_dump()
+    assert stats["transaction_count"] == 10
+    assert stats["totals"] == {"INR": 5.0 + 9.0 + sum(range(4, 12))}
+    assert stats["categories"]["Grocery Store"]["2024-01"] == {"count": 10, "total": 74.0}
+    assert set(stats["merchants"]) == {"Store A", "Store C"}
+    assert [charge["amount"] for charge in stats["merchants"]["Store A"]["recent"]] == [6.0, 7.0, 8.0, 9.0, 10.0, 11.0]
+    assert stats["merchants"]["Store C"]["months"] == {"2024-01": {"count": 1, "total": 9.0}}
+
+    # The same as building them again from the history
+    rebuilt = spending_stats.empty_stats()
+    async for page in service.iter_transaction_pages("user-1"):
+        spending_stats.add_transactions(rebuilt, page)
+    assert {key: stats[key] for key in ("transaction_count", "totals", "months", "categories", "amount_buckets")} == \
+        {key: rebuilt[key] for key in ("transaction_count", "totals", "months", "categories", "amount_buckets")}
+
+
+@pytest.mark.asyncio
+async def test_spending_stats_built_during_a_write_are_not_stored(service):
+    await service.add_transaction("user-1", make_transaction(2))
+
+    assert not await service.storage.save_spending_stats("user-1", spending_stats.empty_stats(), data_version=0)
+    assert await service.storage.get_spending_stats("user-1") is None
+    assert await service.storage.save_spending_stats("user-1", spending_stats.empty_stats(), data_version=1)
+    # Only the first build is kept
+    assert not await service.storage.save_spending_stats("user-1", spending_stats.empty_stats(), data_version=1)
+
+
+def apply_write(documents: dict, path: str, data, merge: bool = False):
+    """Applies a set to the stub's documents, resolving Increment transforms."""
+    if data is None:
+        documents.pop(path, None)
+        return
+    document = dict(documents.get(path, {})) if merge else {}
+    for field, value in data.items():
+        if isinstance(value, firestore.Increment):
+            value = document.get(field, 0) + value._value
+        document[field] = value
+    documents[path] = document
+
+
+class StubDocument:
+    def __init__(self, client, path: str):
+        self.client = client
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    async def get(self, transaction=None):
+        return StubSnapshot(self.client.documents.get(self.path))
+
+
+class StubSnapshot:
+    def __init__(self, data):
+        self.data = data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return dict(self.data) if self.data is not None else None
+
+
+class StubCollection:
+    def __init__(self, client, path: str):
+        self.client = client
+        self.path = path
+
+    def document(self, doc_id: str = None):
+        if doc_id is None:
+            self.client.generated += 1
+            doc_id = f"doc-{self.client.generated}"
+        return StubDocument(self.client, f"{self.path}/{doc_id}")
+
+
+class StubBatch:
+    def __init__(self, client):
+        self.client = client
+        self.writes = []
+        self.operations = []
+
+    def create(self, ref, data):
+        self.writes.append(("create", ref.path))
+        self.operations.append((ref.path, data, False))
+
+    def set(self, ref, data, merge=False):
+        self.writes.append(("set", ref.path))
+        self.operations.append((ref.path, data, merge))
+
+    async def commit(self):
+        if len(self.writes) > 500:
+            raise AssertionError("a batch holds at most 500 writes")
+        if len(self.client.commits) in self.client.failing_commits:
+            self.client.commits.append(None)
+            raise ServiceUnavailable("unavailable")
+        for path, data, merge in self.operations:
+            apply_write(self.client.documents, path, data, merge)
+        self.client.commits.append(self.writes)
+        if self.client.after_commit:
+            await self.client.after_commit(len(self.client.commits))
+
+
+class StubTransaction:
+    """Applies writes as they are made; the stub has no concurrent writers to retry against."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def set(self, ref, data, merge=False):
+        apply_write(self.client.documents, ref.path, data, merge)
+
+    def delete(self, ref):
+        apply_write(self.client.documents, ref.path, None)
+
+
+class StubAsyncClient:
+    """The parts of firestore.AsyncClient an import uses; commits are awaited."""
+
+    def __init__(self, failing_commits=(), after_commit=None):
+        self.generated = 0
+        self.commits = []
+        self.documents = {}
+        self.failing_commits = set(failing_commits)
+        self.after_commit = after_commit
+
+    def collection(self, *path: str):
+        return StubCollection(self, "/".join(path))
+
+    def batch(self):
+        return StubBatch(self)
+
+    def transaction(self):
+        return StubTransaction(self)
+
+
+@pytest.mark.asyncio
+async def test_firestore_import_commits_awaited_batches(monkeypatch):
+    storage = FirestoreStorage()
+    storage._db = StubAsyncClient(failing_commits={1})
+    imported = []
+
+    async def apply_import_to_stats(user_id, delta, data_version):
+        imported.append((delta, data_version))
+
+    monkeypatch.setattr(storage, "_apply_import_to_stats", apply_import_to_stats)
+    chunks = [[make_transaction(day % 28 + 1) for day in range(500)], [make_transaction(2)]]
+
+    result = await storage.bulk_add_transactions("user-1", iter(chunks))
+
+    commits = storage._db.commits
+    # 500 transactions, one rollup and the data_version bump do not fit in one commit
+    assert [len(writes) if writes else None for writes in commits] == [500, None, 3]
+    assert commits[0][-2:] == [("set", "users/user-1/rollups/2024-01"), ("set", "users/user-1")]
+    assert result == {"written": 499, "failed": 2, "months": ["2024-01"]}
+    delta, data_version = imported[0]
+    assert data_version == 0
+    # The stats delta counts only the committed transactions
+    assert delta["transaction_count"] == 499
+
+
+@pytest.mark.asyncio
+async def test_firestore_close_closes_the_grpc_channel():
+    import grpc
+    from google.auth.credentials import AnonymousCredentials
+    from google.cloud import firestore
+
+    storage = FirestoreStorage()
+    storage._db = firestore.AsyncClient(project="aegis-test", credentials=AnonymousCredentials())
+    channel = storage._db._firestore_api.transport.grpc_channel
+
+    await storage.aclose()
+
+    assert storage._db is None
+    assert channel.get_state() == grpc.ChannelConnectivity.SHUTDOWN
+
+
+@pytest.fixture
+def stub_firestore(monkeypatch):
+    """A FirestoreStorage on StubAsyncClient, whose transactions run once, as written."""
+    from services.storage import firestore_storage
+
+    monkeypatch.setattr(firestore_storage.firestore, "async_transactional", lambda write: write)
+    storage = FirestoreStorage()
+    storage._db = StubAsyncClient()
+    return storage
+
+
+def stored_transactions(client: StubAsyncClient) -> list:
+    prefix = "users/user-1/transactions/"
+    return [(path[len(prefix):], data) for path, data in client.documents.items() if path.startswith(prefix)]
+
+
+@pytest.mark.asyncio
+async def test_firestore_import_adds_to_stats_built_before_it(stub_firestore):
+    await stub_firestore.save_spending_stats("user-1", spending_stats.empty_stats(), 0)
+
+    await stub_firestore.bulk_add_transactions("user-1", iter([[make_transaction(1)], [make_transaction(2, amount=5.0)]]))
+
+    stats = await stub_firestore.get_spending_stats("user-1")
+    assert stats["transaction_count"] == 2 and stats["totals"] == {"INR": 15.0}
+
+
+@pytest.mark.asyncio
+async def test_firestore_stats_saved_between_import_batches_are_rebuilt(stub_firestore):
+    client = stub_firestore.db
+
+    async def build_stats(commits):
+        # A first read of the stats, building them from the history so far
+        if commits == 1:
+            user = client.documents["users/user-1"]
+            stats = spending_stats.add_transactions(spending_stats.empty_stats(), stored_transactions(client))
+            assert await stub_firestore.save_spending_stats("user-1", stats, user["data_version"])
+
+    client.after_commit = build_stats
+    result = await stub_firestore.bulk_add_transactions("user-1", iter([[make_transaction(1)], [make_transaction(2)]]))
+
+    assert result["written"] == 2
+    # The stats hold the first batch only; the next read rebuilds them
+    assert await stub_firestore.get_spending_stats("user-1") is None
+
+
+def test_firestore_client_is_created_once_across_threads(monkeypatch):
+    from services.storage import firestore_storage
+
+    created = []
+
+    def slow_client():
+        time.sleep(0.05)
+        created.append(object())
+        return created[-1]
+
+    monkeypatch.setattr(firestore_storage.firestore, "AsyncClient", slow_client)
+    storage = FirestoreStorage()
+    # The startup warm-up thread racing the first request
+    threads = [threading.Thread(target=storage.warm_up) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(created) == 1 and storage.db is created[0]
@@ -0,0 +1,98 @@
+import os
+import sys
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+# OpenTelemetry is an optional dependency of the backend
+pytest.importorskip("opentelemetry.sdk")
+
+from opentelemetry import trace
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+# Add the backend root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.auth import get_current_user
+from core.config import settings
+from core.container import ServiceContainer
+from core.tracing import start_span
+from models.user import User
+from services.aegnt_service import AegntService
+from services.firestore_service import FirestoreService
+from services.storage.memory_storage import MemoryStorage
+
+pytest_plugins = ("pytest_asyncio",)
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_SPAN_ID = "00f067aa0ba902b7"
+
+exporter = InMemorySpanExporter()
+# The global provider can only be set once per process
+_provider = TracerProvider()
+_provider.add_span_processor(SimpleSpanProcessor(exporter))
+trace.set_tracer_provider(_provider)
+
+
+@pytest.fixture(autouse=True)
+def clear_spans():
+    exporter.clear()
+    yield
+
+
+@pytest.fixture
+def client():
+    import main
+
+    services = ServiceContainer()
+    services.firestore_service = FirestoreService(storage=MemoryStorage())
+    main.app.state.services = services
+    main.app.dependency_overrides[get_current_user] = lambda: User(uid="user-1", email="user@example.com", id_token="token")
+    yield TestClient(main.app)
+    main.app.dependency_overrides.clear()
+
+
+def spans_by_name():
+    return {span.name: span for span in exporter.get_finished_spans()}
+
+
+def test_requests_continue_the_callers_trace(client):
+    response = client.get(
+        "/api/v1/transactions",
+        params={"start_date": "2024-01-01", "end_date": "2024-01-31"},
+        headers={"traceparent": f"00-{TRACE_ID}-{PARENT_SPAN_ID}-01"},
+    )
+
+    assert response.status_code == 200
+    spans = spans_by_name()
+    server = spans["GET get_transactions"]
+    stage = spans["firestore get_transactions"]
+    assert format(server.context.trace_id, "032x") == TRACE_ID
+    assert format(server.parent.span_id, "016x") == PARENT_SPAN_ID
+    assert stage.parent.span_id == server.context.span_id
+    assert server.attributes["http.response.status_code"] == 200
+
+
+@pytest.mark.asyncio
+async def test_aegnt_requests_carry_traceparent(monkeypatch):
+    monkeypatch.setattr(settings, "AEGNT_API_URL", "http://aegnt")
+    seen = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen["traceparent"] = request.headers.get("traceparent")
+        return httpx.Response(200, json={"parts": [{"type": "text", "content": "hi"}]})
+
+    service = AegntService()
+    service.client._transport = httpx.MockTransport(handler)
+    with start_span("chat turn") as parent:
+        await service.invoke_agent("user-1", "hello", "token")
+    await service.aclose()
+
+    aegnt_span = spans_by_name()["aegnt invoke_agent"]
+    _, trace_id, span_id, _ = seen["traceparent"].split("-")
+    assert int(trace_id, 16) == parent.get_span_context().trace_id
+    # The agent's spans hang off the client span for the call
+    assert int(span_id, 16) == aegnt_span.context.span_id
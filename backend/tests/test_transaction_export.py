@@ -0,0 +1,82 @@
+import asyncio
+import csv
+import io
+import os
+import sys
+from datetime import datetime, timezone
+
+import pytest
+
+# Add the backend root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services import transaction_export
+
+RECEIPT = {
+    "store_name": "FreshMart",
+    "transaction_date": datetime(2024, 1, 5, 18, 30, tzinfo=timezone.utc),
+    "category": "Supermarket",
+    "total_amount": 6.0,
+    "currency": "INR",
+    "items": [
+        {"name": "Milk", "price": 2.5, "quantity": 1.0, "category": "Dairy"},
+        {"name": "Bread", "price": 3.5, "quantity": 1.0, "category": "Bakery", "discount": 0.5},
+    ],
+}
+STATEMENT_LINE = {
+    "store_name": "Spice Route",
+    "transaction_date": datetime(2024, 2, 1, tzinfo=timezone.utc),
+    "total_amount": 450.0,
+    "currency": "INR",
+    "items": [],
+}
+
+
+async def pages(*pages):
+    for page in pages:
+        yield page
+
+
+async def collect_chunks(stream) -> list:
+    return [chunk async for chunk in stream]
+
+
+def test_line_items_are_flattened_into_rows():
+    rows = list(transaction_export.flatten_transaction("t1", RECEIPT))
+
+    assert [(row["transaction_id"], row["item_index"], row["item_name"], row["item_discount"]) for row in rows] == [
+        ("t1", 0, "Milk", None),
+        ("t1", 1, "Bread", 0.5),
+    ]
+    assert all(row["store_name"] == "FreshMart" and row["total_amount"] == 6.0 for row in rows)
+    assert set(rows[0]) == set(transaction_export.EXPORT_COLUMNS)
+
+
+def test_transactions_without_items_export_one_row():
+    (row,) = transaction_export.flatten_transaction("t2", STATEMENT_LINE)
+
+    assert row["item_index"] is None and row["item_name"] is None
+    assert row["category"] is None
+
+
+def test_csv_streams_a_header_then_one_chunk_per_page():
+    stream = transaction_export.stream_csv(pages([("t1", RECEIPT)], [("t2", STATEMENT_LINE)]))
+    chunks = asyncio.run(collect_chunks(stream))
+
+    assert len(chunks) == 3
+    rows = list(csv.DictReader(io.StringIO(b"".join(chunks).decode("utf-8"))))
+    assert [(row["transaction_id"], row["item_name"]) for row in rows] == [("t1", "Milk"), ("t1", "Bread"), ("t2", "")]
+    assert rows[0]["transaction_date"] == "2024-01-05T18:30:00+00:00"
+
+
+def test_parquet_writes_one_row_group_per_page():
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    data = b"".join(asyncio.run(collect_chunks(transaction_export.stream_parquet(pages([("t1", RECEIPT)], [], [("t2", STATEMENT_LINE)])))))
+
+    parquet_file = pq.ParquetFile(io.BytesIO(data))
+    assert parquet_file.metadata.num_row_groups == 2
+    table = parquet_file.read()
+    assert table.column_names == transaction_export.EXPORT_COLUMNS
+    assert table.column("item_name").to_pylist() == ["Milk", "Bread", None]
+    assert table.column("transaction_date").to_pylist()[2] == datetime(2024, 2, 1, tzinfo=timezone.utc)
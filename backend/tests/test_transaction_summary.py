@@ -0,0 +1,119 @@
+import asyncio
+import csv
+import io
+import os
+import sys
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Add the backend root to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from core.auth import get_current_user
+from core.container import ServiceContainer
+from models.user import User
+from services.firestore_service import FirestoreService
+from services.storage.memory_storage import MemoryStorage
+
+pytest_plugins = ("pytest_asyncio",)
+
+
+def make_transaction(month: int, day: int, store: str, amount: float, category: str, currency: str = "INR") -> dict:
+    return {
+        "user_id": "user-1",
+        "store_name": store,
+        "transaction_date": datetime(2024, month, day, 18, 30),
+        "items": [],
+        "total_amount": amount,
+        "currency": currency,
+        "category": category,
+    }
+
+
+@pytest.fixture
+def client():
+    import main
+
+    services = ServiceContainer()
+    services.firestore_service = FirestoreService(storage=MemoryStorage())
+    main.app.state.services = services
+    main.app.dependency_overrides[get_current_user] = lambda: User(uid="user-1", email="user@example.com", id_token="token")
+    for transaction in (
+        make_transaction(1, 5, "FreshMart", 120.0, "Supermarket"),
+        make_transaction(1, 20, "FreshMart", 80.0, "Supermarket"),
+        make_transaction(1, 31, "Spice Route", 450.0, "Restaurant"),
+        make_transaction(2, 2, "Gadget Hub", 2000.0, "Electronics Store"),
+        make_transaction(2, 3, "Airport Cafe", 12.5, "Restaurant", currency="USD"),
+    ):
+        asyncio.run(services.firestore_service.add_transaction("user-1", transaction))
+    yield TestClient(main.app)
+    main.app.dependency_overrides.clear()
+
+
+def test_summary_aggregates_per_currency_category_store_and_month(client):
+    response = client.get("/api/v1/transactions/summary")
+
+    assert response.status_code == 200
+    summary = response.json()
+    assert summary["transaction_count"] == 5
+    assert summary["totals"] == {"INR": 2650.0, "USD": 12.5}
+    assert summary["by_category"][0] == {"category": "Electronics Store", "currency": "INR", "total": 2000.0, "count": 1}
+    assert {"category": "Restaurant", "currency": "USD", "total": 12.5, "count": 1} in summary["by_category"]
+    assert [(month["month"], month["currency"], month["total"]) for month in summary["by_month"]] == [
+        ("2024-01", "INR", 650.0), ("2024-02", "INR", 2000.0), ("2024-02", "USD", 12.5),
+    ]
+    assert summary["largest_transaction"]["store_name"] == "Gadget Hub"
+
+
+def test_filters_and_date_only_end_dates(client):
+    # The end date covers the whole day, so the 18:30 purchase on the 31st counts
+    response = client.get("/api/v1/transactions/summary", params={
+        "start_date": "2024-01-01", "end_date": "2024-01-31", "category": ["supermarket", "Restaurant"], "top": 1,
+    })
+
+    summary = response.json()
+    assert summary["transaction_count"] == 3
+    assert summary["totals"] == {"INR": 650.0}
+    assert summary["by_store"] == [{"store_name": "Spice Route", "currency": "INR", "total": 450.0, "count": 1}]
+    assert summary["end_date"] == "2024-01-31"
+
+
+def test_empty_range(client):
+    summary = client.get("/api/v1/transactions/summary", params={"start_date": "2023-01-01", "end_date": "2023-12-31"}).json()
+
+    assert summary["transaction_count"] == 0
+    assert summary["totals"] == {}
+    assert summary["largest_transaction"] is None
+
+
+def test_transaction_lists_include_the_whole_end_date(client):
+    response = client.get("/api/v1/transactions", params={"start_date": "2024-01-31", "end_date": "2024-01-31"})
+
+    assert [t["store_name"] for t in response.json()] == ["Spice Route"]
+
+
+def test_spending_stats(client):
+    stats = client.get("/api/v1/transactions/stats").json()
+
+    assert stats["transaction_count"] == 5
+    assert stats["totals"] == {"INR": 2650.0, "USD": 12.5}
+    assert stats["months"] == {"2024-01": {"count": 3, "total": 650.0}, "2024-02": {"count": 2, "total": 2012.5}}
+    assert stats["categories"]["Restaurant"] == {"2024-01": {"count": 1, "total": 450.0}, "2024-02": {"count": 1, "total": 12.5}}
+    assert [charge["amount"] for charge in stats["merchants"]["FreshMart"]["recent"]] == [120.0, 80.0]
+
+
+def test_export_includes_the_whole_end_date(client):
+    response = client.get("/api/v1/transactions/export", params={"start_date": "2024-01-20", "end_date": "2024-01-31"})
+
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["store_name"] for row in rows] == ["FreshMart", "Spice Route"]
+
+
+@pytest.mark.parametrize("params", [{"start_date": "2024-13-01"}, {"end_date": "31/01/2024"}])
+def test_export_rejects_malformed_dates(client, params):
+    response = client.get("/api/v1/transactions/export", params=params)
+
+    assert response.status_code == 400
@@ -0,0 +1,84 @@
+"""
+Compares two benchmark result files, e.g. from the base and head of a branch.
+
+    python benchmarks/compare.py base.json head.json --threshold 0.10
+
+Prints every latency percentile and throughput figure side by side and exits
+with status 1 when any of them regressed by more than the threshold.
+"""
+
+import argparse
+import json
+import sys
+from typing import Dict, Tuple
+
+# Latency statistics that count towards a regression (lower is better)
+LATENCY_KEYS = ("p50_ms", "p90_ms", "p95_ms", "p99_ms")
+# Figures where higher is better
+THROUGHPUT_KEYS = ("throughput_rps",)
+
+
+def flatten(results: dict, prefix: str = "") -> Dict[str, float]:
+    metrics = {}
+    for key, value in results.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            metrics.update(flatten(value, path))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            metrics[path] = value
+    return metrics
+
+
+def direction(path: str) -> int:
+    """1 if higher is better, -1 if lower is better, 0 for informational figures."""
+    leaf = path.rsplit(".", 1)[-1]
+    if leaf in THROUGHPUT_KEYS:
+        return 1
+    if leaf in LATENCY_KEYS:
+        return -1
+    return 0
+
+
+def compare(base: dict, head: dict, threshold: float) -> Tuple[list, list]:
+    base_metrics = flatten(base.get("scenarios", {}))
+    head_metrics = flatten(head.get("scenarios", {}))
+    rows, regressions = [], []
+    for path in sorted(base_metrics.keys() & head_metrics.keys()):
+        better = direction(path)
+        if not better:
+            continue
+        old, new = base_metrics[path], head_metrics[path]
+        change = (new - old) / old if old else 0.0
+        regressed = change * better < -threshold
+        rows.append((path, old, new, change, regressed))
+        if regressed:
+            regressions.append(path)
+    return rows, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative slowdown before failing (0.10 = 10%%)")
+    args = parser.parse_args(argv)
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+
+    print(f"base: {base['meta'].get('commit')}  head: {head['meta'].get('commit')}")
+    rows, regressions = compare(base, head, args.threshold)
+    width = max((len(row[0]) for row in rows), default=10)
+    for path, old, new, change, regressed in rows:
+        marker = "  REGRESSED" if regressed else ""
+        print(f"{path:<{width}}  {old:>12.3f}  {new:>12.3f}  {change:>+8.1%}{marker}")
+
+    if regressions:
+        print(f"\n{len(regressions)} metric(s) regressed by more than {args.threshold:.0%}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
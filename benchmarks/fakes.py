@@ -0,0 +1,215 @@
+"""
+Deterministic stand-ins for the external services used by the backend and aegnt.
+
+Each fake replaces only the network call at the edge of a service: the Gemini
+model, the Maps client, the Wallet signer and the ADK agent model. Everything
+between the HTTP request and that call (routing, image decoding, JSON cleanup,
+validation, storage, JWT signing, tool code) still runs, so the numbers reflect
+the code under test rather than the fakes.
+
+Responses are replayed from ``recordings/receipts.json``, keyed by the file name
+of each image in ``sample_reciepts/``.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from types import SimpleNamespace
+from typing import AsyncGenerator, Dict, List, Optional
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.auth import crypt
+from google.genai import types
+
+from services.gemini_service import GeminiService
+from services.google_wallet_service import GoogleWalletService
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+RECORDINGS_FILE = os.path.join(BENCHMARK_DIR, "recordings", "receipts.json")
+SAMPLE_RECEIPTS_DIR = os.path.join(os.path.dirname(BENCHMARK_DIR), "sample_reciepts")
+
+
+class ReceiptRecordings:
+    """Recorded Gemini/Maps answers for the sample receipts, indexed by image content."""
+
+    def __init__(self, recordings_file: str = RECORDINGS_FILE, receipts_dir: str = SAMPLE_RECEIPTS_DIR):
+        with open(recordings_file) as f:
+            self.by_name: Dict[str, dict] = json.load(f)
+        self.images: Dict[str, bytes] = {}
+        self._by_digest: Dict[str, dict] = {}
+        for name, recording in sorted(self.by_name.items()):
+            with open(os.path.join(receipts_dir, name), "rb") as f:
+                image = f.read()
+            self.images[name] = image
+            self._by_digest[hashlib.sha256(image).hexdigest()] = recording
+
+    def for_image(self, image: bytes) -> dict:
+        digest = hashlib.sha256(image).hexdigest()
+        if digest not in self._by_digest:
+            raise KeyError(f"No recording for receipt image {digest[:12]}")
+        return self._by_digest[digest]
+
+    def geocode_answers(self) -> Dict[str, Optional[str]]:
+        """Maps the store name each receipt ends up with to its recorded geocode result."""
+        answers = {}
+        for recording in self.by_name.values():
+            if "geocode" in recording:
+                store_name = recording["extraction"].get("store_name") or "Unknown Merchant"
+                answers[store_name] = recording["geocode"]
+        return answers
+
+
+def _simulate_latency(latency_ms: float):
+    if latency_ms:
+        time.sleep(latency_ms / 1000)
+
+
+class ReplayReceiptModel:
+    """
+    Replaces ``genai.GenerativeModel`` inside GeminiService.
+
+    ``generate_content`` is called from threadpool workers, so the receipt being
+    processed is tracked per thread.
+    """
+
+    def __init__(self, latency_ms: float = 0):
+        self.latency_ms = latency_ms
+        self._current = threading.local()
+        self.calls = 0
+
+    def use_recording(self, recording: dict):
+        self._current.recording = recording
+
+    def generate_content(self, contents):
+        _simulate_latency(self.latency_ms)
+        self.calls += 1
+        recording = self._current.recording
+        if isinstance(contents, list):
+            # Extraction: [prompt, PIL image]. Replay the way Gemini answers, in a fenced block.
+            text = "```json\n" + json.dumps(recording["extraction"], indent=2) + "\n```"
+        else:
+            items = recording["extraction"].get("items", [])
+            text = json.dumps([
+                {"name": item.get("name"), "category": category}
+                for item, category in zip(items, recording["categories"])
+            ])
+        return SimpleNamespace(text=text)
+
+
+class ReplayGeminiService(GeminiService):
+    """GeminiService whose model replays recorded answers for the sample receipts."""
+
+    def __init__(self, recordings: ReceiptRecordings, latency_ms: float = 0):
+        super().__init__()
+        self.recordings = recordings
+        self._model = ReplayReceiptModel(latency_ms)
+
+    def extract_from_receipt(self, receipt_image: bytes, user_id: Optional[str] = None) -> dict:
+        self._model.use_recording(self.recordings.for_image(receipt_image))
+        return super().extract_from_receipt(receipt_image, user_id)
+
+
+class FakeMapsClient:
+    """googlemaps.Client stand-in answering ``geocode`` from the recordings."""
+
+    def __init__(self, answers: Dict[str, Optional[str]], latency_ms: float = 0):
+        self.answers = answers
+        self.latency_ms = latency_ms
+        self.session = SimpleNamespace(close=lambda: None)
+        self.calls = 0
+
+    def geocode(self, address: str) -> List[dict]:
+        _simulate_latency(self.latency_ms)
+        self.calls += 1
+        formatted_address = self.answers.get(address)
+        return [{"formatted_address": formatted_address}] if formatted_address else []
+
+
+class LocalKeyWalletService(GoogleWalletService):
+    """
+    GoogleWalletService signing with a throwaway RSA key instead of the service account.
+
+    Pass construction and JWT signing are real; only the key material is local.
+    """
+
+    def __init__(self, latency_ms: float = 0):
+        super().__init__()
+        self.latency_ms = latency_ms
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        pem = key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+        self._signer = crypt.RSASigner.from_string(pem, key_id="benchmark")
+        self._credentials = SimpleNamespace(service_account_email="benchmark@aegis.iam.gserviceaccount.com")
+
+    def create_pass(self, pass_type: str, pass_data: dict) -> str:
+        _simulate_latency(self.latency_ms)
+        return super().create_pass(pass_type, pass_data)
+
+
+class FakeAnalysisModel:
+    """Replaces ``genai.GenerativeModel`` in aegnt's tools with a fixed analysis answer."""
+
+    def __init__(self, model_name: str = "gemini-2.5-flash", latency_ms: float = 0):
+        self.model_name = model_name
+        self.latency_ms = latency_ms
+
+    async def generate_content_async(self, prompt):
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        return SimpleNamespace(text=json.dumps({
+            "natural_language_answer": f"Analyzed {len(prompt)} characters of transaction data.",
+            "structured_data": {"prompt_characters": len(prompt)},
+        }))
+
+
+def fake_genai_module(latency_ms: float = 0) -> SimpleNamespace:
+    """A ``google.generativeai`` look-alike exposing only GenerativeModel."""
+    return SimpleNamespace(
+        GenerativeModel=lambda model_name, **kwargs: FakeAnalysisModel(model_name, latency_ms),
+        configure=lambda **kwargs: None,
+    )
+
+
+class ScriptedAgentLlm(BaseLlm):
+    """
+    ADK model that answers every turn with one tool call and then a summary.
+
+    The first model call of a turn asks for ``tool_name`` with the user's prompt;
+    once the tool result is in the request, the model replies with text built
+    from it. This exercises the runner, tool dispatch and the tool itself
+    without a Gemini round-trip.
+    """
+
+    tool_name: str = "analyze_financial_data"
+    user_id: str = ""
+    id_token: str = ""
+    latency_ms: float = 0
+
+    async def generate_content_async(self, llm_request: LlmRequest, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+
+        last_parts = llm_request.contents[-1].parts if llm_request.contents else []
+        tool_result = next((part.function_response for part in last_parts if part.function_response), None)
+        if tool_result is not None:
+            answer = (tool_result.response or {}).get("analysis", {}).get("natural_language_answer", "No analysis available.")
+            yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=answer)]))
+            return
+
+        prompt = next((part.text for part in last_parts if part.text), "")
+        yield LlmResponse(content=types.Content(role="model", parts=[types.Part(
+            function_call=types.FunctionCall(
+                name=self.tool_name,
+                args={"user_id": self.user_id, "id_token": self.id_token, "query_text": prompt},
+            )
+        )]))
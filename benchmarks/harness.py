@@ -0,0 +1,190 @@
+"""
+Shared plumbing for the benchmark scenarios: environment, in-process apps and statistics.
+
+The backend and aegnt are imported from their source directories (they use
+top-level imports such as ``core.config`` and ``tool_definitions``), so
+``configure_environment`` must run before anything from them is imported.
+"""
+
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(REPO_ROOT, "backend")
+AEGNT_DIR = os.path.join(REPO_ROOT, "aegnt")
+
+BENCHMARK_USER_ID = "benchmark-user"
+BENCHMARK_ID_TOKEN = "benchmark-token"
+
+
+
+def add_source_paths():
+    """Makes the backend and aegnt packages importable."""
+    for path in (BACKEND_DIR, AEGNT_DIR):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+
+def configure_environment(storage_backend: str, sqlite_path: str):
+    """Points the backend at a local storage backend and makes both apps importable."""
+    os.environ["STORAGE_BACKEND"] = storage_backend
+    os.environ["SQLITE_DB_PATH"] = sqlite_path
+    os.environ.setdefault("GOOGLE_WALLET_ISSUER_ID", "3388000000000000000")
+    add_source_paths()
+
+
+def run_metadata(args) -> dict:
+    """Describes the code and machine a result file came from, for comparing across commits."""
+    def git(*command):
+        try:
+            return subprocess.run(["git", *command], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    return {
+        "commit": git("rev-parse", "HEAD"),
+        "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "storage_backend": args.storage,
+        "data_access": args.data_access,
+        "upstream_latency_ms": args.upstream_latency_ms,
+    }
+
+
+# --- statistics -----------------------------------------------------------
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize_latencies(seconds: List[float]) -> dict:
+    """Latency distribution in milliseconds."""
+    values = sorted(value * 1000 for value in seconds)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values), 3),
+        "min_ms": round(values[0], 3),
+        "p50_ms": round(percentile(values, 0.50), 3),
+        "p90_ms": round(percentile(values, 0.90), 3),
+        "p95_ms": round(percentile(values, 0.95), 3),
+        "p99_ms": round(percentile(values, 0.99), 3),
+        "max_ms": round(values[-1], 3),
+    }
+
+
+# --- synthetic data -------------------------------------------------------
+
+def chunked(iterable, size: int) -> Iterator[List[dict]]:
+    chunk = []
+    for value in iterable:
+        chunk.append(value)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# --- backend --------------------------------------------------------------
+
+class BenchmarkBackend:
+    """
+    The backend FastAPI app with fakes installed in its service container.
+
+    Requests are authenticated as ``user_id`` (switchable between scenarios)
+    without touching Firebase.
+    """
+
+    def __init__(self, recordings, upstream_latency_ms: float = 0):
+        import main
+        from core.auth import get_current_user
+        from core.container import ServiceContainer
+        from models.user import User
+        from fakes import FakeMapsClient, LocalKeyWalletService, ReplayGeminiService
+
+        self.app = main.app
+        self.user_id = BENCHMARK_USER_ID
+        self.services = ServiceContainer()
+        self.services.gemini_service = ReplayGeminiService(recordings, upstream_latency_ms)
+        self.services.google_wallet_service = LocalKeyWalletService(upstream_latency_ms)
+        self.services._gmaps = FakeMapsClient(recordings.geocode_answers(), upstream_latency_ms)
+        # Lifespan does not run under ASGITransport (and is disabled for uvicorn
+        # below), so the container is installed directly.
+        self.app.state.services = self.services
+        self.app.dependency_overrides[get_current_user] = lambda: User(
+            uid=self.user_id,
+            email="benchmark@example.com",
+            display_name="Benchmark",
+            id_token=BENCHMARK_ID_TOKEN,
+        )
+        self._server = None
+        self._thread: Optional[threading.Thread] = None
+        self.api_base_url: Optional[str] = None
+
+    def client(self):
+        import httpx
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=self.app), base_url="http://backend", timeout=None)
+
+    async def seed_history(self, user_id: str, config) -> dict:
+        """Bulk-writes one user's synthetic history (see synthetic_history.HistoryConfig)."""
+        from synthetic_history import generate_user_history, transaction_chunks
+
+        start = time.perf_counter()
+        result = await self.services.firestore_service.bulk_add_transactions(
+            user_id, transaction_chunks(generate_user_history(user_id, config))
+        )
+        return {"transactions": result["written"], "seconds": round(time.perf_counter() - start, 4)}
+
+    def serve(self) -> str:
+        """Starts the backend on a loopback port (for aegnt's HTTP tools) and returns its API base URL."""
+        if self._server is not None:
+            return self.api_base_url
+        import uvicorn
+
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        self._server = uvicorn.Server(uvicorn.Config(self.app, host="127.0.0.1", port=port, lifespan="off", log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("Backend did not start for the agent benchmark")
+            time.sleep(0.01)
+        self.api_base_url = f"http://127.0.0.1:{port}/api/v1"
+        return self.api_base_url
+
+    def shutdown(self):
+        if self._server is not None:
+            self._server.should_exit = True
+            self._thread.join(timeout=10)
+        self.app.dependency_overrides.clear()
+        self.services.firestore_service.close()
+
+
+def write_results(path: str, results: dict):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+        f.write("\n")
@@ -0,0 +1,337 @@
+"""
+End-to-end benchmarks for receipt ingestion, transaction queries and agent turns.
+
+Usage (from the repository root):
+
+    python benchmarks/run.py --output benchmarks/results/$(git rev-parse --short HEAD).json
+    python benchmarks/compare.py benchmarks/results/<base>.json benchmarks/results/<head>.json
+
+Everything runs in one process against the in-memory storage backend (or
+SQLite with ``--storage sqlite``), with Gemini, Maps and Wallet replaced by the
+deterministic fakes in ``fakes.py``. No credentials or network access needed.
+"""
+
+import argparse
+import asyncio
+import itertools
+import logging
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from harness import (
+    BENCHMARK_ID_TOKEN,
+    BENCHMARK_USER_ID,
+    BenchmarkBackend,
+    configure_environment,
+    run_metadata,
+    summarize_latencies,
+    write_results,
+)
+from synthetic_history import HistoryConfig, default_history_end
+
+SCENARIOS = ("ingest", "query", "agent", "analytics")
+
+# Synthetic histories for the query scenario span this many years.
+QUERY_HISTORY_YEARS = 3
+
+# The pattern detectors run by run_comprehensive_proactive_analysis (aegnt/spending_analytics.py)
+ANALYSIS_HELPERS = (
+    "subscription_insights",
+    "category_trend_insights",
+    "merchant_insights",
+    "seasonal_insights",
+    "anomaly_insights",
+)
+
+AGENT_PROMPTS = [
+    "What was my total spending in 2024?",
+    "How much did I spend on groceries last month?",
+    "Show me my spending trends by category",
+    "What store did I spend the most at?",
+]
+
+
+async def bench_ingest(backend: BenchmarkBackend, recordings, requests: int, concurrency: int) -> dict:
+    """POST /transactions/process with the sample receipts, ``concurrency`` requests in flight."""
+    backend.user_id = f"{BENCHMARK_USER_ID}-ingest"
+    images = itertools.cycle(sorted(recordings.images.items()))
+    jobs = [next(images) for _ in range(requests)]
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with backend.client() as client:
+        async def upload(name: str, image: bytes):
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post("/api/v1/transactions/process", files={"file": (name, image)})
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200 or response.json().get("status") != "success":
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(upload(name, image) for name, image in jobs))
+        wall_seconds = time.perf_counter() - start
+
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "wall_seconds": round(wall_seconds, 4),
+        "throughput_rps": round(requests / wall_seconds, 2),
+        "latency": summarize_latencies(latencies),
+    }
+
+
+async def bench_query(backend: BenchmarkBackend, history_sizes, repeats: int) -> dict:
+    """GET /transactions over synthetic histories, for the full range and the last 30 days."""
+    end = default_history_end()
+    windows = {
+        "full_history": ((end - timedelta(days=QUERY_HISTORY_YEARS * 365 + 1)).date().isoformat(), end.date().isoformat()),
+        "last_30_days": ((end - timedelta(days=30)).date().isoformat(), end.date().isoformat()),
+    }
+    results = {}
+    async with backend.client() as client:
+        for size in history_sizes:
+            user_id = f"{BENCHMARK_USER_ID}-history-{size}"
+            backend.user_id = user_id
+            config = HistoryConfig(years=QUERY_HISTORY_YEARS, transactions_per_month=size / (QUERY_HISTORY_YEARS * 12), user_spread=0, end=end)
+            seeded = await backend.seed_history(user_id, config)
+            size_results = {"transactions": seeded["transactions"], "seed_seconds": seeded["seconds"]}
+            for window, (start_date, end_date) in windows.items():
+                latencies = []
+                rows = response_bytes = 0
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    response = await client.get("/api/v1/transactions", params={"start_date": start_date, "end_date": end_date})
+                    latencies.append(time.perf_counter() - start)
+                    response.raise_for_status()
+                    rows = len(response.json())
+                    response_bytes = len(response.content)
+                size_results[window] = {"rows": rows, "response_bytes": response_bytes, "latency": summarize_latencies(latencies)}
+            results[str(size)] = size_results
+    return results
+
+
+def install_aegnt_fakes(api_base_url: str, latency_ms: float):
+    """Points aegnt's tools at the benchmark backend and fakes their Gemini calls."""
+    import config
+    import tool_definitions
+    from fakes import fake_genai_module
+
+    # The tools read these module globals at call time; the fast path reads config's
+    config.BACKEND_API_BASE_URL = api_base_url
+    tool_definitions.BACKEND_API_BASE_URL = api_base_url
+    tool_definitions.GEMINI_API_KEY = "benchmark"
+    tool_definitions.genai = fake_genai_module(latency_ms)
+    return tool_definitions
+
+
+class FallbackRecorder(logging.Handler):
+    """Collects the fast path's warnings about falling back to the agent."""
+
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def use_direct_data_access(backend: BenchmarkBackend):
+    """Has aegnt's tools read the benchmark backend's storage in process instead of over loopback."""
+    import config
+    import data_access
+    from core.auth import get_current_user
+
+    config.DATA_ACCESS_MODE = "direct"
+    # Tokens resolve to the current benchmark user, as they do over HTTP
+    data_access.attach(backend.services.firestore_service, lambda token: backend.app.dependency_overrides[get_current_user]())
+
+
+async def bench_agent(backend: BenchmarkBackend, turns: int, history_size: int, latency_ms: float, concurrency: int = 1) -> dict:
+    """
+    /invoke_agent turns through the ADK runner and the real tools, backed by the fake model.
+
+    ``concurrency`` users chat at once, each taking an equal share of the turns.
+    """
+    backend.user_id = f"{BENCHMARK_USER_ID}-agent"
+    await backend.seed_history(backend.user_id, HistoryConfig(years=1, transactions_per_month=history_size / 12, user_spread=0))
+    install_aegnt_fakes(backend.serve(), latency_ms)
+
+    import httpx
+    import config
+    # Keep the benchmark's agent sessions out of the working directory
+    config.SESSION_DB_PATH = ":memory:"
+    import main_agent
+    from fakes import ScriptedAgentLlm
+
+    main_agent.root_agent.model = ScriptedAgentLlm(
+        model="scripted-benchmark",
+        user_id=backend.user_id,
+        id_token=BENCHMARK_ID_TOKEN,
+        latency_ms=latency_ms,
+    )
+
+    latencies = []
+    errors = 0
+    transport = httpx.ASGITransport(app=main_agent.app)
+
+    async def chat(client, user: int):
+        nonlocal errors
+        # Turns of one user are serialized by aegnt, so each simulated user gets its own session
+        for turn in range(user, turns, concurrency):
+            start = time.perf_counter()
+            response = await client.post("/invoke_agent", json={
+                "user_id": f"{backend.user_id}-{user}",
+                "prompt": AGENT_PROMPTS[turn % len(AGENT_PROMPTS)],
+                "id_token": BENCHMARK_ID_TOKEN,
+            })
+            latencies.append(time.perf_counter() - start)
+            parts = response.json().get("parts", []) if response.status_code == 200 else []
+            if not any(part["type"] == "text" for part in parts):
+                errors += 1
+
+    # A fast-path turn that falls back runs the agent instead and skews the timings
+    fallbacks = FallbackRecorder()
+    logging.getLogger("fast_path").addHandler(fallbacks)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://aegnt", timeout=None) as client:
+            start = time.perf_counter()
+            await asyncio.gather(*(chat(client, user) for user in range(concurrency)))
+            elapsed = time.perf_counter() - start
+    finally:
+        logging.getLogger("fast_path").removeHandler(fallbacks)
+    if fallbacks.messages:
+        raise RuntimeError(f"{len(fallbacks.messages)} fast-path turn(s) fell back to the agent: {fallbacks.messages[0]}")
+
+    return {
+        "turns": turns,
+        "concurrency": concurrency,
+        "history_size": history_size,
+        "errors": errors,
+        "throughput_tps": round(turns / elapsed, 2),
+        "turn": summarize_latencies(latencies),
+    }
+
+
+async def bench_analytics(backend: BenchmarkBackend, scales, base_per_month: float, analysis_days: int, repeats: int, latency_ms: float) -> dict:
+    """
+    run_comprehensive_proactive_analysis at multiples of a typical user's monthly volume.
+
+    ``end_to_end`` includes fetching the user's spending stats from the
+    backend; ``stats_analysis`` times only the five pattern detectors on them.
+    ``analysis`` times the detectors used when the stats are unavailable, on
+    the fetched history, including reading it into their columnar frame.
+    """
+    tool_definitions = install_aegnt_fakes(backend.serve(), latency_ms)
+    analytics = tool_definitions.spending_analytics
+    results = {}
+    for scale in scales:
+        user_id = f"{BENCHMARK_USER_ID}-analytics-{scale}x"
+        backend.user_id = user_id
+        config = HistoryConfig(years=analysis_days / 365, transactions_per_month=base_per_month * scale, user_spread=0)
+        seeded = await backend.seed_history(user_id, config)
+
+        end_to_end, analysis, stats_analysis = [], [], []
+        insights = 0
+        for _ in range(repeats):
+            start = time.perf_counter()
+            result = await tool_definitions.run_comprehensive_proactive_analysis(user_id, BENCHMARK_ID_TOKEN, analysis_days)
+            end_to_end.append(time.perf_counter() - start)
+            insights = result.get("insight_count", 0)
+
+        end_date = datetime.now().strftime('%Y-%m-%d')
+        start_date = (datetime.now() - timedelta(days=analysis_days)).strftime('%Y-%m-%d')
+        transactions = await tool_definitions.query_transactions(user_id, BENCHMARK_ID_TOKEN, start_date, end_date)
+        for _ in range(repeats):
+            start = time.perf_counter()
+            frame = analytics.SpendingFrame.from_transactions(transactions)
+            for helper in ANALYSIS_HELPERS:
+                getattr(analytics, helper)(frame)
+            analysis.append(time.perf_counter() - start)
+
+        stats = await tool_definitions.get_spending_stats(user_id, BENCHMARK_ID_TOKEN)
+        since = datetime.now().date() - timedelta(days=analysis_days)
+        for _ in range(repeats):
+            start = time.perf_counter()
+            tool_definitions.spending_stats.insights(stats, since)
+            stats_analysis.append(time.perf_counter() - start)
+
+        results[f"{scale}x"] = {
+            "transactions": seeded["transactions"],
+            "insights": insights,
+            "end_to_end": summarize_latencies(end_to_end),
+            "stats_analysis": summarize_latencies(stats_analysis),
+            "analysis": summarize_latencies(analysis),
+        }
+    return {"base_per_month": base_per_month, "analysis_days": analysis_days, "scales": results}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results", "latest.json"), help="Where to write the JSON results")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--storage", choices=("memory", "sqlite"), default="memory", help="Storage backend behind the API")
+    parser.add_argument("--upstream-latency-ms", type=float, default=0, help="Simulated latency added to every faked Gemini/Maps/Wallet call")
+    parser.add_argument("--ingest-requests", type=int, default=120)
+    parser.add_argument("--ingest-concurrency", type=int, default=8)
+    parser.add_argument("--history-sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--query-repeats", type=int, default=5)
+    parser.add_argument("--agent-turns", type=int, default=20)
+    parser.add_argument("--agent-concurrency", type=int, default=1, help="Users chatting with the agent at once")
+    parser.add_argument("--agent-history-size", type=int, default=1000)
+    parser.add_argument("--data-access", choices=("http", "direct"), default="http", help="How aegnt's tools read transactions in the agent and analytics scenarios")
+    parser.add_argument("--analytics-scales", type=int, nargs="+", default=[1, 10, 100], help="Multiples of --analytics-base-per-month")
+    parser.add_argument("--analytics-base-per-month", type=float, default=40.0, help="Transactions per month of a typical user today")
+    parser.add_argument("--analytics-days", type=int, default=90)
+    parser.add_argument("--analytics-repeats", type=int, default=3)
+    return parser.parse_args(argv)
+
+
+async def run(args) -> dict:
+    from fakes import ReceiptRecordings
+
+    recordings = ReceiptRecordings()
+    backend = BenchmarkBackend(recordings, args.upstream_latency_ms)
+    # Per-request INFO logs from the apps would otherwise swamp the summary
+    logging.getLogger().setLevel(logging.WARNING)
+    scenarios = {}
+    if args.data_access == "direct":
+        use_direct_data_access(backend)
+    try:
+        if "ingest" in args.scenarios:
+            print(f"ingest: {args.ingest_requests} receipts, concurrency {args.ingest_concurrency}", file=sys.stderr)
+            scenarios["ingest"] = await bench_ingest(backend, recordings, args.ingest_requests, args.ingest_concurrency)
+        if "query" in args.scenarios:
+            print(f"query: histories of {args.history_sizes} transactions", file=sys.stderr)
+            scenarios["query"] = await bench_query(backend, args.history_sizes, args.query_repeats)
+        if "agent" in args.scenarios:
+            print(f"agent: {args.agent_turns} turns, {args.agent_concurrency} at a time", file=sys.stderr)
+            scenarios["agent"] = await bench_agent(backend, args.agent_turns, args.agent_history_size, args.upstream_latency_ms, args.agent_concurrency)
+        if "analytics" in args.scenarios:
+            print(f"analytics: {args.analytics_scales}x of {args.analytics_base_per_month:g} transactions/month", file=sys.stderr)
+            scenarios["analytics"] = await bench_analytics(
+                backend, args.analytics_scales, args.analytics_base_per_month,
+                args.analytics_days, args.analytics_repeats, args.upstream_latency_ms,
+            )
+    finally:
+        backend.shutdown()
+    return {"meta": run_metadata(args), "scenarios": scenarios}
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory() as tmp:
+        configure_environment(args.storage, os.path.join(tmp, "benchmark.db"))
+        results = asyncio.run(run(args))
+    write_results(args.output, results)
+    print(f"Wrote {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+"""
+Synthetic transaction histories for scale testing.
+
+Generates realistic receipts for many users over years: weighted merchants with
+their own item catalogs, recurring subscriptions (with the occasional price
+rise), weekend and seasonal spikes, multiple currencies and rare outsized
+purchases. Every record is validated against the backend's ``Transaction``
+model and can be bulk-written to any storage backend.
+
+    python benchmarks/synthetic_history.py --users 20 --years 3 --storage sqlite --sqlite-path aegis.db
+
+Generation is deterministic for a given seed and end date.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from harness import add_source_paths, chunked
+
+add_source_paths()
+
+from models.transaction import Transaction  # noqa: E402
+from services.statement_import import IMPORT_CHUNK_SIZE  # noqa: E402
+
+
+@dataclass(frozen=True)
+class Merchant:
+    name: str
+    category: str  # merchant category, as stored on Transaction.category
+    catalog: Tuple[Tuple[str, str, float], ...]  # (item name, item category, typical unit price in INR)
+    weight: float = 1.0  # relative visit frequency
+    max_items: int = 4
+    location: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class Subscription:
+    merchant: str
+    item: str
+    amount: float  # INR
+    category: str = "Subscriptions"
+    day_of_month: int = 1
+    every_months: int = 1
+    price_rise_percent: float = 0.0  # applied once, ``price_rise_after_months`` into the history
+    price_rise_after_months: int = 12
+
+
+DEFAULT_MERCHANTS: Tuple[Merchant, ...] = (
+    Merchant("Kendriya Bhandar Store", "Supermarket", (
+        ("Amul Tone 1L", "Dairy", 68.0), ("Aashirvaad Atta 5kg", "Pantry", 285.0), ("Toor Dal 1kg", "Pantry", 165.0),
+        ("Domex Active Green", "Household", 82.0), ("Basmati Rice 5kg", "Pantry", 640.0), ("Bananas 1 dozen", "Fresh Produce", 60.0),
+    ), weight=6.0, max_items=6, location="Sector-19, Dwarka, New Delhi"),
+    Merchant("Reliance Fresh", "Supermarket", (
+        ("Tomatoes 1kg", "Fresh Produce", 40.0), ("Onions 1kg", "Fresh Produce", 35.0), ("Paneer 200g", "Dairy", 90.0),
+        ("Bread", "Bakery", 45.0), ("Eggs 12", "Dairy", 84.0),
+    ), weight=5.0, max_items=5),
+    Merchant("Sukhdev Vaishno Dhaba", "Restaurant", (
+        ("Dal Makhni", "Main Course", 150.0), ("Aloo Pyaaz Prantha", "Main Course", 55.0), ("Sweet Lassi", "Non-Alcoholic Beverage", 60.0),
+        ("Kullad Chai", "Non-Alcoholic Beverage", 35.0),
+    ), weight=2.0, location="G.T. Road, Murthal, Sonipat"),
+    Merchant("The Local Diners", "Restaurant", (
+        ("Flavoured Mojito", "Alcoholic Beverage", 330.0), ("Crunchy Salad", "Appetizer", 160.0),
+        ("Tequila Chicken", "Main Course", 320.0), ("Surf N Turf", "Main Course", 360.0),
+    ), weight=1.0, location="HRBR Layout, Kalyan Nagar, Bangalore"),
+    Merchant("Swiggy", "Food & Dining", (
+        ("Biryani", "Main Course", 280.0), ("Masala Dosa", "Main Course", 120.0), ("Gulab Jamun", "Dessert", 80.0),
+    ), weight=4.0, max_items=3),
+    Merchant("Indian Oil Petrol Pump", "Transportation & Automotive", (("Petrol", "Fuel", 1500.0),), weight=2.0, max_items=1),
+    Merchant("Uber", "Transportation & Automotive", (("Ride", "Transport", 240.0),), weight=3.0, max_items=1),
+    Merchant("Apollo Pharmacy", "Health & Wellness", (
+        ("Paracetamol 500mg", "Health", 30.0), ("Vitamin D3", "Health", 320.0), ("Hand Sanitizer", "Health", 95.0),
+    ), weight=1.0, max_items=3),
+    Merchant("Croma", "Electronics Store", (
+        ("Phone Charger", "Accessories", 999.0), ("Bluetooth Earphones", "Audio", 2499.0), ("HDMI Cable", "Accessories", 499.0),
+    ), weight=0.4, max_items=2),
+    Merchant("Lifestyle", "Department Store", (
+        ("Cotton Shirt", "Men's Wear", 1299.0), ("Kurta", "Women's Wear", 1499.0), ("Sneakers", "Footwear", 2999.0),
+    ), weight=0.6, max_items=3),
+    Merchant("PVR Cinemas", "Entertainment & Leisure", (("Movie Ticket", "Entertainment", 350.0), ("Popcorn Combo", "Snacks", 420.0)), weight=0.8, max_items=2),
+    Merchant("Gujarat Freight Tools", "Retail & Shopping", (("Stanley Hammer", "Tools", 568.0), ("Automatic Saw", "Tools", 586.0)), weight=0.2, max_items=2),
+)
+
+DEFAULT_SUBSCRIPTIONS: Tuple[Subscription, ...] = (
+    Subscription("Netflix", "Standard Plan", 499.0, day_of_month=5, price_rise_percent=30.0, price_rise_after_months=10),
+    Subscription("Spotify", "Premium Individual", 119.0, day_of_month=12),
+    Subscription("Jio Recharge", "Monthly Plan", 299.0, category="Utilities", day_of_month=20, price_rise_percent=15.0, price_rise_after_months=18),
+    Subscription("Cult.fit", "Gym Membership", 1499.0, category="Health & Wellness", day_of_month=1),
+    Subscription("Amazon Prime", "Annual Membership", 1499.0, day_of_month=15, every_months=12),
+)
+
+# Festive season (Oct-Dec) and the January lull. Scales both how often and how much people spend.
+DEFAULT_SEASONALITY: Dict[int, float] = {1: 0.85, 10: 1.35, 11: 1.5, 12: 1.6}
+
+# Share of transactions per currency and the rate used to convert INR catalog prices.
+DEFAULT_CURRENCIES: Dict[str, float] = {"INR": 0.94, "USD": 0.04, "EUR": 0.02}
+INR_PER_UNIT: Dict[str, float] = {"INR": 1.0, "USD": 83.0, "EUR": 90.0, "GBP": 105.0, "AED": 22.6}
+
+PAYMENT_METHODS: Dict[str, float] = {"UPI": 0.55, "Card": 0.3, "Cash": 0.15}
+
+
+def default_history_end() -> datetime:
+    """Histories end at the start of today (UTC), so 'last N days' queries see them."""
+    return datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+@dataclass
+class HistoryConfig:
+    """Knobs for a generated dataset. Rates are per user; each user gets some jitter around them."""
+
+    users: int = 1
+    years: float = 1.0
+    transactions_per_month: float = 40.0
+    end: datetime = field(default_factory=default_history_end)
+    merchants: Sequence[Merchant] = DEFAULT_MERCHANTS
+    subscriptions: Sequence[Subscription] = DEFAULT_SUBSCRIPTIONS
+    subscriptions_per_user: int = 3
+    currencies: Dict[str, float] = field(default_factory=lambda: dict(DEFAULT_CURRENCIES))
+    payment_methods: Dict[str, float] = field(default_factory=lambda: dict(PAYMENT_METHODS))
+    seasonality: Dict[int, float] = field(default_factory=lambda: dict(DEFAULT_SEASONALITY))
+    weekend_multiplier: float = 1.3
+    amount_sigma: float = 0.35  # spread of the log-normal price noise around catalog prices
+    user_spread: float = 0.3  # spread of per-user activity and spending levels
+    anomaly_rate: float = 0.004  # share of purchases that are outsized one-offs
+    anomaly_multiplier: Tuple[float, float] = (6.0, 20.0)
+    user_prefix: str = "synthetic-user"
+    seed: int = 42
+
+    @property
+    def start(self) -> datetime:
+        return self.end - timedelta(days=round(self.years * 365))
+
+    def user_ids(self) -> List[str]:
+        return [f"{self.user_prefix}-{index:05d}" for index in range(self.users)]
+
+
+def _weighted_choice(rng: random.Random, weights: Dict[str, float]) -> str:
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+
+def _poisson(rng: random.Random, expected: float) -> int:
+    """Knuth's method for small rates, a rounded normal approximation for large ones."""
+    if expected <= 0:
+        return 0
+    if expected > 30:
+        return max(0, round(rng.gauss(expected, math.sqrt(expected))))
+    threshold = math.exp(-expected)
+    count, product = 0, rng.random()
+    while product > threshold:
+        count += 1
+        product *= rng.random()
+    return count
+
+
+def _money(amount_inr: float, currency: str) -> float:
+    return round(amount_inr / INR_PER_UNIT.get(currency, 1.0), 2)
+
+
+def _transaction(user_id: str, store_name: str, category: str, when: datetime, items: List[dict],
+                 currency: str, payment_method: str, location: Optional[str]) -> Transaction:
+    return Transaction(
+        user_id=user_id,
+        store_name=store_name,
+        transaction_date=when,
+        items=items,
+        total_amount=round(sum(item["price"] for item in items), 2),
+        currency=currency,
+        payment_method=payment_method,
+        category=category,
+        location=location,
+    )
+
+
+class UserHistory:
+    """One user's spending habits, drawn once from the config, then replayed day by day."""
+
+    def __init__(self, user_id: str, config: HistoryConfig, rng: random.Random):
+        self.user_id = user_id
+        self.config = config
+        self.rng = rng
+        self.activity = rng.lognormvariate(0, config.user_spread)
+        self.spend_level = rng.lognormvariate(0, config.user_spread)
+        # Everyone has favourite shops: reweight the merchant mix per user
+        self.merchant_weights = [merchant.weight * rng.lognormvariate(0, 0.6) for merchant in config.merchants]
+        count = min(config.subscriptions_per_user, len(config.subscriptions))
+        self.subscriptions = rng.sample(list(config.subscriptions), count)
+
+    def _purchase(self, when: datetime, season: float) -> Transaction:
+        rng, config = self.rng, self.config
+        merchant = rng.choices(config.merchants, weights=self.merchant_weights)[0]
+        currency = _weighted_choice(rng, config.currencies)
+        outlier = rng.random() < config.anomaly_rate
+        picks = rng.sample(merchant.catalog, rng.randint(1, min(merchant.max_items, len(merchant.catalog))))
+        items = []
+        for name, item_category, unit_price in picks:
+            quantity = float(rng.choices((1, 2, 3), weights=(0.7, 0.2, 0.1))[0])
+            price_inr = unit_price * self.spend_level * season * rng.lognormvariate(0, config.amount_sigma)
+            if outlier:
+                price_inr *= rng.uniform(*config.anomaly_multiplier)
+            unit = _money(price_inr, currency)
+            items.append({"name": name, "price": round(unit * quantity, 2), "quantity": quantity, "unit": None,
+                          "category": item_category, "original_price": None, "discount": None})
+        return _transaction(self.user_id, merchant.name, merchant.category, when, items, currency,
+                            _weighted_choice(rng, config.payment_methods), merchant.location)
+
+    def _subscription_charge(self, subscription: Subscription, day: datetime, months_in: int) -> Transaction:
+        amount = subscription.amount
+        if subscription.price_rise_percent and months_in >= subscription.price_rise_after_months:
+            amount *= 1 + subscription.price_rise_percent / 100
+        items = [{"name": subscription.item, "price": round(amount, 2), "quantity": 1.0, "unit": None,
+                  "category": subscription.category, "original_price": None, "discount": None}]
+        return _transaction(self.user_id, subscription.merchant, subscription.category,
+                            day + timedelta(hours=6), items, "INR", "Card", None)
+
+    def transactions(self) -> Iterator[Transaction]:
+        """Yields the user's transactions in date order."""
+        config, rng = self.config, self.rng
+        start = config.start
+        # Normalise so seasonal and weekend peaks move purchases around rather than add to them
+        mean_season = sum(config.seasonality.get(month, 1.0) for month in range(1, 13)) / 12
+        mean_weekday = (5 + 2 * config.weekend_multiplier) / 7
+        daily_rate = config.transactions_per_month * self.activity * 12 / 365 / (mean_season * mean_weekday)
+        day = start
+        while day < config.end:
+            season = config.seasonality.get(day.month, 1.0)
+            expected = daily_rate * season * (config.weekend_multiplier if day.weekday() >= 5 else 1.0)
+            todays = []
+            months_in = (day.year - start.year) * 12 + day.month - start.month
+            for subscription in self.subscriptions:
+                if day.day == subscription.day_of_month and months_in % subscription.every_months == 0:
+                    todays.append(self._subscription_charge(subscription, day, months_in))
+            for _ in range(_poisson(rng, expected)):
+                # Shops are open 08:00-22:00
+                when = day + timedelta(seconds=rng.randrange(8 * 3600, 22 * 3600))
+                todays.append(self._purchase(when, season))
+            todays.sort(key=lambda transaction: transaction.transaction_date)
+            yield from todays
+            day += timedelta(days=1)
+
+
+def generate_user_history(user_id: str, config: HistoryConfig, seed: Optional[int] = None) -> Iterator[Transaction]:
+    """One user's history. The default seed derives from the config seed and the user id."""
+    rng = random.Random(seed if seed is not None else f"{config.seed}:{user_id}")
+    return UserHistory(user_id, config, rng).transactions()
+
+
+def generate_history(config: HistoryConfig) -> Iterator[Tuple[str, Transaction]]:
+    """Every user's history, user by user."""
+    for user_id in config.user_ids():
+        for transaction in generate_user_history(user_id, config):
+            yield user_id, transaction
+
+
+def transaction_chunks(transactions: Iterator[Transaction], chunk_size: int = IMPORT_CHUNK_SIZE) -> Iterator[List[dict]]:
+    """Storage-ready documents in the same shape the statement importer writes."""
+    return chunked((transaction.model_dump(exclude={"id"}) for transaction in transactions), chunk_size)
+
+
+async def write_history(storage, config: HistoryConfig, chunk_size: int = IMPORT_CHUNK_SIZE) -> dict:
+    """
+    Bulk-writes every user's history through ``storage`` (a StorageBackend or
+    FirestoreService) and returns counts and timings.
+    """
+    start = time.perf_counter()
+    written = failed = 0
+    for user_id in config.user_ids():
+        result = await storage.bulk_add_transactions(user_id, transaction_chunks(generate_user_history(user_id, config), chunk_size))
+        written += result["written"]
+        failed += result["failed"]
+    seconds = time.perf_counter() - start
+    return {
+        "users": config.users,
+        "written": written,
+        "failed": failed,
+        "seconds": round(seconds, 3),
+        "per_second": round(written / seconds, 1) if seconds else None,
+        "start": config.start.date().isoformat(),
+        "end": config.end.date().isoformat(),
+    }
+
+
+def _parse_weights(value: str) -> Dict[str, float]:
+    """'INR=0.9,USD=0.1' -> {'INR': 0.9, 'USD': 0.1}"""
+    weights = {}
+    for pair in value.split(","):
+        key, _, weight = pair.partition("=")
+        weights[key.strip()] = float(weight)
+    return weights
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--years", type=float, default=2.0)
+    parser.add_argument("--per-month", type=float, default=40.0, help="Mean transactions per user per month")
+    parser.add_argument("--currencies", type=_parse_weights, default=dict(DEFAULT_CURRENCIES), help="Currency mix, e.g. INR=0.9,USD=0.1")
+    parser.add_argument("--anomaly-rate", type=float, default=HistoryConfig.anomaly_rate)
+    parser.add_argument("--user-prefix", default=HistoryConfig.user_prefix)
+    parser.add_argument("--seed", type=int, default=HistoryConfig.seed)
+    parser.add_argument("--storage", choices=("firestore", "sqlite", "memory"), default="sqlite",
+                        help="Where to write; 'memory' only measures generation and write speed")
+    parser.add_argument("--sqlite-path", default="aegis.db")
+    parser.add_argument("--dry-run", action="store_true", help="Generate and count without writing")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = HistoryConfig(
+        users=args.users,
+        years=args.years,
+        transactions_per_month=args.per_month,
+        currencies=args.currencies,
+        anomaly_rate=args.anomaly_rate,
+        user_prefix=args.user_prefix,
+        seed=args.seed,
+    )
+    if args.dry_run:
+        start = time.perf_counter()
+        count = sum(1 for _ in generate_history(config))
+        print(json.dumps({"users": config.users, "generated": count, "seconds": round(time.perf_counter() - start, 3)}))
+        return
+
+    from services.storage import create_storage_backend
+
+    storage = create_storage_backend(args.storage, os.path.abspath(args.sqlite_path))
+    try:
+        summary = asyncio.run(write_history(storage, config))
+    finally:
+        storage.close()
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()